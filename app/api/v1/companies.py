@@ -7,6 +7,7 @@ from ...schemas.schemas import (
 )
 from .auth_multi_tenant import get_current_active_user
 from ...services.services import CompanyService
+from ...services.pagination import PaginationError
 from typing import Optional
 from datetime import datetime
 import math
@@ -74,42 +75,26 @@ def serialize_datetime(dt):
         return dt.isoformat()
     return dt
 
-def can_user_see_prediction(user: User, prediction_user_id: str, prediction_org_id: str = None):
-    """Check if user can see a specific prediction based on access rules"""
+def get_prediction_filter(user: User, prediction_model):
+    """
+    SQL filter on a prediction model for the predictions a user can see
+    
+    Super admins and tenant admins see every prediction (None); others see
+    the predictions they created and those of their organization.
+    """
     if user.role == "super_admin":
-        return True
+        return None
     
     if user.role == "tenant_admin" and user.tenant_id:
-        return True  
-    
-    if str(prediction_user_id) == str(user.id):
-        return True
+        return None
     
     if user.organization_id is None:
-        return False  
-    
-    if prediction_org_id is None:
-        return False  
-    
-    if str(user.organization_id) == str(prediction_org_id):
-        return True
-    
-    return False
-
-def filter_predictions_for_user(predictions, user: User):
-    """Filter predictions list based on user access permissions"""
-    if user.role == "super_admin":
-        return predictions
-    
-    filtered_predictions = []
-    for pred in predictions:
-        pred_creator_id = getattr(pred, 'created_by', None)
-        pred_org_id = getattr(pred, 'organization_id', None)
-        
-        if can_user_see_prediction(user, pred_creator_id, pred_org_id):
-            filtered_predictions.append(pred)
+        return prediction_model.created_by == user.id
     
-    return filtered_predictions
+    return or_(
+        prediction_model.created_by == user.id,
+        prediction_model.organization_id == user.organization_id
+    )
 
 def safe_float(value):
     """Convert value to float, handling None and NaN values"""
@@ -132,10 +117,13 @@ async def get_companies(
     search: Optional[str] = Query(None),
     sort_by: str = Query("name"),
     sort_order: str = Query("asc"),
+    cursor: Optional[str] = Query(None),
+    count: Optional[str] = Query(None, description="exact, estimate or none"),
+    latest: Optional[int] = Query(None, ge=1, le=100, description="Only the newest N predictions of each type per company"),
     current_user: User = Depends(current_verified_user),
     db: Session = Depends(get_db)
 ):
-    """Get paginated list of companies with filtering and sorting"""
+    """Get paginated list of companies with filtering and sorting (page number or next_cursor)"""
     try:
         if not check_user_permissions(current_user, "user"):
             raise HTTPException(
@@ -153,13 +141,18 @@ async def get_companies(
             search=search,
             sort_by=sort_by,
             sort_order=sort_order,
-            organization_filter=org_filter  
+            organization_filter=org_filter,
+            cursor=cursor,
+            count=count,
+            prediction_filter=lambda model: get_prediction_filter(current_user, model),
+            latest=latest
         )
         
         companies_data = []
         for company in result["companies"]:
-            filtered_annual = filter_predictions_for_user(company.annual_predictions, current_user)
-            filtered_quarterly = filter_predictions_for_user(company.quarterly_predictions, current_user)
+            predictions = result["predictions"][company.id]
+            filtered_annual = predictions["annual"]
+            filtered_quarterly = predictions["quarterly"]
             
             company_data = {
                 "id": str(company.id),
@@ -203,8 +196,8 @@ async def get_companies(
                         "created_at": serialize_datetime(pred.created_at)
                     } for pred in filtered_quarterly
                 ],
-                "annual_predictions_count": len(filtered_annual),
-                "quarterly_predictions_count": len(filtered_quarterly)
+                "annual_predictions_count": predictions["annual_count"],
+                "quarterly_predictions_count": predictions["quarterly_count"]
             }
             companies_data.append(company_data)
         
@@ -214,10 +207,15 @@ async def get_companies(
             total=pagination["total"],
             page=pagination["page"],
             size=pagination["limit"],  
-            pages=pagination["pages"]
+            pages=pagination["pages"],
+            next_cursor=pagination["next_cursor"],
+            total_is_estimate=pagination["total_is_estimate"],
+            count_source=pagination["count_source"]
         )
     except HTTPException:
         raise
+    except PaginationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         import traceback
         print(f"Companies endpoint error: {str(e)}")
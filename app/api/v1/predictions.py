@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, BackgroundTasks, status
+from fastapi import APIRouter, Depends, HTTPException, Request, UploadFile, File, BackgroundTasks, status
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_, or_, text
 from typing import Dict, List, Optional
@@ -16,6 +16,22 @@ from ...schemas.schemas import (
 )
 from ...services.ml_service import ml_model
 from ...services.quarterly_ml_service import quarterly_ml_model
+from ...services.payload_store import payload_store
+from ...services.upload_ingestion import UploadValidationError, ingest_upload
+from ...services.result_export import EXPORT_FORMATS, export_job_predictions
+from ...services.job_progress import job_progress
+from ...services.job_errors import job_error_details, job_errors_page
+from ...services.company_resolver import company_resolver
+from ...services.dashboard_aggregates import (
+    PLATFORM_SCOPE, SYSTEM_SCOPE, average_of_rates, dashboard_aggregates, organization_scope, pooled_rate, user_scope
+)
+from ...services.counting import resolve_count_mode, row_counter
+from ...services.pagination import PaginationError, keyset_page
+from ...services.prediction_statistics import (
+    ACCESS_LEVELS, USER_ROLES, count_created, count_predictions, count_recent, prediction_statistics
+)
+from ...workers.bulk_pipeline import validate_annual_rows, validate_quarterly_rows
+from ...workers.bulk_writer import CONFLICT_POLICIES, default_conflict_policy, natural_key_exists, upsert_rows
 from .auth_multi_tenant import get_current_active_user as current_verified_user
 from app.workers.celery_app import celery_app
 
@@ -69,42 +85,26 @@ def get_organization_context(current_user: User):
     else:
         return current_user.organization_id  # Could be None for basic users
 
-def create_or_get_company(db: Session, company_symbol: str, company_name: str, 
-                         market_cap: float, sector: str, user: User):
-    """Create company with simplified access control"""
+def resolve_company_id(db: Session, company_symbol: str, company_name: str, 
+                       market_cap: float, sector: str, user: User):
+    """Create or get the company in the user's scope, through the shared company resolver"""
     
     access_level = get_user_access_level(user)
     organization_id = user.organization_id if access_level == "organization" else None
     
-    query = db.query(Company).filter(
-        Company.symbol == company_symbol.upper(),
-        Company.access_level == access_level
-    )
-    
-    if access_level == "organization" and organization_id:
-        query = query.filter(Company.organization_id == organization_id)
-    elif access_level == "personal":
-        query = query.filter(Company.created_by == str(user.id))
-    
-    existing_company = query.first()
-    
-    if existing_company:
-        return existing_company
-    
-    company = Company(
-        symbol=company_symbol.upper(),
+    company_id = company_resolver.resolve(
+        db,
+        symbol=company_symbol,
         name=company_name,
         market_cap=market_cap,
         sector=sector,
         access_level=access_level,
         organization_id=organization_id,
-        created_by=str(user.id)
+        user_id=str(user.id),
+        refresh=False
     )
-    
-    db.add(company)
     db.commit()
-    db.refresh(company)
-    return company
+    return company_id
 
 def check_user_permissions(user: User, required_role: str = "user"):
     """Check if user has required permissions based on 5-role hierarchy"""
@@ -133,6 +133,43 @@ def safe_float(value):
     except (ValueError, TypeError):
         return None
 
+def resolve_conflict_policy(conflict_policy: Optional[str]) -> str:
+    """Validate a client-selected conflict policy, falling back to BULK_CONFLICT_POLICY"""
+    if not conflict_policy:
+        return default_conflict_policy()
+    policy = conflict_policy.lower()
+    if policy not in CONFLICT_POLICIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid conflict_policy '{conflict_policy}'. Use one of: {', '.join(CONFLICT_POLICIES)}"
+        )
+    return policy
+
+def job_prediction_model(job: BulkUploadJob):
+    """Prediction table a bulk upload job writes to (older jobs used the *_prediction job types)"""
+    if job.job_type in ("annual", "annual_prediction"):
+        return AnnualPrediction
+    if job.job_type in ("quarterly", "quarterly_prediction"):
+        return QuarterlyPrediction
+    return None
+
+def job_predictions_query(db: Session, job: BulkUploadJob, prediction_model):
+    """(prediction, company) rows written by a bulk upload job, via the indexed bulk_upload_job_id link"""
+    return db.query(prediction_model, Company).join(
+        Company, prediction_model.company_id == Company.id
+    ).filter(
+        prediction_model.bulk_upload_job_id == job.id
+    ).order_by(Company.symbol, prediction_model.reporting_year, prediction_model.reporting_quarter, prediction_model.id)
+
+def count_job_predictions(db: Session, job: BulkUploadJob, prediction_model) -> int:
+    """Exact number of predictions linked to a bulk upload job"""
+    return db.query(func.count(prediction_model.id)).filter(
+        prediction_model.bulk_upload_job_id == job.id
+    ).scalar() or 0
+
+def optional_float(value):
+    return float(value) if value is not None else None
+
 def is_prediction_owner(prediction, current_user):
     """Check if current user is the owner of the prediction"""
     if not prediction or not current_user:
@@ -148,6 +185,7 @@ def is_prediction_owner(prediction, current_user):
 @router.post("/annual", response_model=Dict)
 async def create_annual_prediction(
     request: AnnualPredictionRequest,
+    conflict_policy: Optional[str] = None,  # skip | overwrite | keep_newest
     db: Session = Depends(get_db),
     current_user: User = Depends(current_verified_user)
 ):
@@ -159,10 +197,11 @@ async def create_annual_prediction(
                 detail="Authentication required to create predictions"
             )
 
+        policy = resolve_conflict_policy(conflict_policy)
         access_level = get_user_access_level(current_user)
         organization_id = current_user.organization_id if access_level == "organization" else None
         
-        company = create_or_get_company(
+        company_id = resolve_company_id(
             db=db,
             company_symbol=request.company_symbol,
             company_name=request.company_name,
@@ -171,30 +210,17 @@ async def create_annual_prediction(
             user=current_user
         )
         
-        existing_query = db.query(AnnualPrediction).filter(
-            AnnualPrediction.company_id == company.id,
-            AnnualPrediction.reporting_year == request.reporting_year,
-            AnnualPrediction.access_level == access_level
+        quarter_text = f" {request.reporting_quarter}" if request.reporting_quarter else ""
+        duplicate = HTTPException(
+            status_code=400,
+            detail=f"Annual prediction for {request.company_symbol} in {request.reporting_year}{quarter_text} already exists in your {access_level} scope"
         )
-        
-        if access_level == "organization":
-            existing_query = existing_query.filter(AnnualPrediction.organization_id == organization_id)
-        elif access_level == "personal":
-            existing_query = existing_query.filter(AnnualPrediction.created_by == str(current_user.id))
-        
-        if request.reporting_quarter:
-            existing_query = existing_query.filter(AnnualPrediction.reporting_quarter == request.reporting_quarter)
-        else:
-            existing_query = existing_query.filter(AnnualPrediction.reporting_quarter.is_(None))
-        
-        existing_prediction = existing_query.first()
-        
-        if existing_prediction:
-            quarter_text = f" {request.reporting_quarter}" if request.reporting_quarter else ""
-            raise HTTPException(
-                status_code=400,
-                detail=f"Annual prediction for {request.company_symbol} in {request.reporting_year}{quarter_text} already exists in your {access_level} scope"
-            )
+        # Under skip a stored key is refused before the model runs
+        if policy == "skip" and natural_key_exists(db, AnnualPrediction, dict(
+            company_id=company_id, reporting_year=request.reporting_year,
+            reporting_quarter=request.reporting_quarter, access_level=access_level
+        )):
+            raise duplicate
         
         financial_data = {
             'long_term_debt_to_total_capital': request.long_term_debt_to_total_capital,
@@ -206,9 +232,10 @@ async def create_annual_prediction(
         
         ml_result = await ml_model.predict_annual(financial_data)
         
-        prediction = AnnualPrediction(
+        # The natural-key index decides duplicates atomically; the policy decides what wins
+        upserted = upsert_rows(db, AnnualPrediction, [dict(
             id=uuid.uuid4(),
-            company_id=company.id,
+            company_id=company_id,
             organization_id=organization_id,
             access_level=access_level,
             reporting_year=request.reporting_year,
@@ -226,11 +253,15 @@ async def create_annual_prediction(
             predicted_at=datetime.utcnow(),
             
             created_by=str(current_user.id)
-        )
+        )], policy)
+        
+        if upserted.skipped:
+            db.rollback()
+            raise duplicate
         
-        db.add(prediction)
         db.commit()
-        db.refresh(prediction)
+        prediction = db.query(AnnualPrediction).filter(AnnualPrediction.id == upserted.ids[0]).first()
+        action = "updated" if upserted.updated else "created"
         
         organization_name = None
         if organization_id:
@@ -239,10 +270,10 @@ async def create_annual_prediction(
         
         return {
             "success": True,
-            "message": f"Annual prediction created for {request.company_symbol}",
+            "message": f"Annual prediction {action} for {request.company_symbol}",
             "prediction": {
                 "id": str(prediction.id),
-                "company_id": str(company.id),
+                "company_id": str(company_id),
                 "company_symbol": request.company_symbol,
                 "company_name": request.company_name,
                 "sector": request.sector,
@@ -278,6 +309,7 @@ async def create_annual_prediction(
 @router.post("/quarterly", response_model=Dict)
 async def create_quarterly_prediction(
     request: QuarterlyPredictionRequest,
+    conflict_policy: Optional[str] = None,  # skip | overwrite | keep_newest
     db: Session = Depends(get_db),
     current_user: User = Depends(current_verified_user)
 ):
@@ -289,10 +321,11 @@ async def create_quarterly_prediction(
                 detail="Authentication required to create predictions"
             )
 
+        policy = resolve_conflict_policy(conflict_policy)
         access_level = get_user_access_level(current_user)
         organization_id = current_user.organization_id if access_level == "organization" else None
         
-        company = create_or_get_company(
+        company_id = resolve_company_id(
             db=db,
             company_symbol=request.company_symbol,
             company_name=request.company_name,
@@ -301,25 +334,16 @@ async def create_quarterly_prediction(
             user=current_user
         )
         
-        existing_query = db.query(QuarterlyPrediction).filter(
-            QuarterlyPrediction.company_id == company.id,
-            QuarterlyPrediction.reporting_year == request.reporting_year,
-            QuarterlyPrediction.reporting_quarter == request.reporting_quarter,
-            QuarterlyPrediction.access_level == access_level
+        duplicate = HTTPException(
+            status_code=400,
+            detail=f"Quarterly prediction for {request.company_symbol} in {request.reporting_year} {request.reporting_quarter} already exists in your {access_level} scope"
         )
-        
-        if access_level == "organization":
-            existing_query = existing_query.filter(QuarterlyPrediction.organization_id == organization_id)
-        elif access_level == "personal":
-            existing_query = existing_query.filter(QuarterlyPrediction.created_by == str(current_user.id))
-        
-        existing_prediction = existing_query.first()
-        
-        if existing_prediction:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Quarterly prediction for {request.company_symbol} in {request.reporting_year} {request.reporting_quarter} already exists in your {access_level} scope"
-            )
+        # Under skip a stored key is refused before the model runs
+        if policy == "skip" and natural_key_exists(db, QuarterlyPrediction, dict(
+            company_id=company_id, reporting_year=request.reporting_year,
+            reporting_quarter=request.reporting_quarter, access_level=access_level
+        )):
+            raise duplicate
         
         financial_data = {
             'total_debt_to_ebitda': request.total_debt_to_ebitda,
@@ -330,9 +354,10 @@ async def create_quarterly_prediction(
         
         ml_result = await quarterly_ml_model.predict_quarterly(financial_data)
         
-        prediction = QuarterlyPrediction(
+        # The natural-key index decides duplicates atomically; the policy decides what wins
+        upserted = upsert_rows(db, QuarterlyPrediction, [dict(
             id=uuid.uuid4(),
-            company_id=company.id,
+            company_id=company_id,
             organization_id=organization_id,
             access_level=access_level,
             reporting_year=request.reporting_year,
@@ -351,11 +376,15 @@ async def create_quarterly_prediction(
             predicted_at=datetime.utcnow(),
             
             created_by=str(current_user.id)
-        )
+        )], policy)
+        
+        if upserted.skipped:
+            db.rollback()
+            raise duplicate
         
-        db.add(prediction)
         db.commit()
-        db.refresh(prediction)
+        prediction = db.query(QuarterlyPrediction).filter(QuarterlyPrediction.id == upserted.ids[0]).first()
+        action = "updated" if upserted.updated else "created"
         
         organization_name = None
         if organization_id:
@@ -364,10 +393,10 @@ async def create_quarterly_prediction(
         
         return {
             "success": True,
-            "message": f"Quarterly prediction created for {request.company_symbol}",
+            "message": f"Quarterly prediction {action} for {request.company_symbol}",
             "prediction": {
                 "id": str(prediction.id),
-                "company_id": str(company.id),
+                "company_id": str(company_id),
                 "company_symbol": request.company_symbol,
                 "company_name": request.company_name,
                 "sector": request.sector,
@@ -381,7 +410,7 @@ async def create_quarterly_prediction(
                 "return_on_capital": float(request.return_on_capital),
                 
                 "logistic_probability": float(ml_result.get('logistic_probability', 0)),
-                "gbm_probability": float(ml_result.get('gbm_probability', 0)),
+                "gbm_probability": safe_float(ml_result.get('gbm_probability')),
                 "ensemble_probability": float(ml_result.get('ensemble_probability', 0)),
                 "risk_level": ml_result['risk_level'],
                 "confidence": float(ml_result['confidence']),
@@ -406,6 +435,8 @@ async def create_quarterly_prediction(
 async def get_annual_predictions(
     page: int = 1,
     size: int = 10,
+    cursor: Optional[str] = None,
+    count: Optional[str] = None,
     company_symbol: Optional[str] = None,
     reporting_year: Optional[str] = None,
     db: Session = Depends(get_db),
@@ -441,9 +472,12 @@ async def get_annual_predictions(
         if reporting_year:
             query = query.filter(AnnualPrediction.reporting_year == reporting_year)
         
-        total = query.count()
-        skip = (page - 1) * size
-        results = query.offset(skip).limit(size).all()
+        counted = row_counter.count(db, query, resolve_count_mode(count, cursor))
+        total = counted.total
+        results, next_cursor = keyset_page(
+            query, [AnnualPrediction.created_at, AnnualPrediction.id], lambda row: (row[0].created_at, row[0].id),
+            size, cursor=cursor, descending=True, offset=(page - 1) * size
+        )
         
         prediction_data = []
         for pred, company, organization, creator in results:            
@@ -483,12 +517,17 @@ async def get_annual_predictions(
                 "total": total,
                 "page": page,
                 "size": size,
-                "pages": (total + size - 1) // size
+                "pages": (total + size - 1) // size if total is not None else None,
+                "has_next": next_cursor is not None,
+                "next_cursor": next_cursor,
+                **counted.as_pagination()
             }
         }
         
     except HTTPException:
         raise
+    except PaginationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching annual predictions: {str(e)}")
 
@@ -496,6 +535,8 @@ async def get_annual_predictions(
 async def get_quarterly_predictions(
     page: int = 1,
     size: int = 10,
+    cursor: Optional[str] = None,
+    count: Optional[str] = None,
     company_symbol: Optional[str] = None,
     reporting_year: Optional[str] = None,
     reporting_quarter: Optional[str] = None,
@@ -533,9 +574,12 @@ async def get_quarterly_predictions(
         if reporting_quarter:
             query = query.filter(QuarterlyPrediction.reporting_quarter == reporting_quarter)
         
-        total = query.count()
-        skip = (page - 1) * size
-        results = query.offset(skip).limit(size).all()
+        counted = row_counter.count(db, query, resolve_count_mode(count, cursor))
+        total = counted.total
+        results, next_cursor = keyset_page(
+            query, [QuarterlyPrediction.created_at, QuarterlyPrediction.id], lambda row: (row[0].created_at, row[0].id),
+            size, cursor=cursor, descending=True, offset=(page - 1) * size
+        )
         
         prediction_data = []
         for pred, company, organization, creator in results:
@@ -576,12 +620,17 @@ async def get_quarterly_predictions(
                 "total": total,
                 "page": page,
                 "size": size,
-                "pages": (total + size - 1) // size
+                "pages": (total + size - 1) // size if total is not None else None,
+                "has_next": next_cursor is not None,
+                "next_cursor": next_cursor,
+                **counted.as_pagination()
             }
         }
         
     except HTTPException:
         raise
+    except PaginationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching quarterly predictions: {str(e)}")
 
@@ -590,6 +639,8 @@ async def get_quarterly_predictions(
 async def get_system_annual_predictions(
     page: int = 1,
     size: int = 10,
+    cursor: Optional[str] = None,
+    count: Optional[str] = None,
     company_symbol: Optional[str] = None,
     reporting_year: Optional[str] = None,
     sector: Optional[str] = None,
@@ -626,11 +677,16 @@ async def get_system_annual_predictions(
         if risk_level:
             query = query.filter(AnnualPrediction.risk_level == risk_level)
         
-        query = query.order_by(AnnualPrediction.created_at.desc())
-        
-        total = query.count()
-        skip = (page - 1) * size
-        results = query.offset(skip).limit(size).all()
+        platform_count = None
+        if not (company_symbol or reporting_year or sector or risk_level):
+            # An unfiltered listing is the whole platform scope, whose count is maintained
+            platform_count = lambda: dashboard_aggregates.read(db, [PLATFORM_SCOPE])[PLATFORM_SCOPE]["annual_count"]
+        counted = row_counter.count(db, query, resolve_count_mode(count, cursor), aggregate=platform_count)
+        total = counted.total
+        results, next_cursor = keyset_page(
+            query, [AnnualPrediction.created_at, AnnualPrediction.id], lambda row: (row[0].created_at, row[0].id),
+            size, cursor=cursor, descending=True, offset=(page - 1) * size
+        )
         
         prediction_data = []
         for pred, company, creator in results:            
@@ -669,7 +725,10 @@ async def get_system_annual_predictions(
                 "total": total,
                 "page": page,
                 "size": size,
-                "pages": (total + size - 1) // size
+                "pages": (total + size - 1) // size if total is not None else None,
+                "has_next": next_cursor is not None,
+                "next_cursor": next_cursor,
+                **counted.as_pagination()
             },
             "filters": {
                 "access_level": "system",
@@ -682,6 +741,8 @@ async def get_system_annual_predictions(
         
     except HTTPException:
         raise
+    except PaginationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching system annual predictions: {str(e)}")
 
@@ -689,6 +750,8 @@ async def get_system_annual_predictions(
 async def get_system_quarterly_predictions(
     page: int = 1,
     size: int = 10,
+    cursor: Optional[str] = None,
+    count: Optional[str] = None,
     company_symbol: Optional[str] = None,
     reporting_year: Optional[str] = None,
     reporting_quarter: Optional[str] = None,
@@ -728,11 +791,16 @@ async def get_system_quarterly_predictions(
         if risk_level:
             query = query.filter(QuarterlyPrediction.risk_level == risk_level)
         
-        query = query.order_by(QuarterlyPrediction.created_at.desc())
-        
-        total = query.count()
-        skip = (page - 1) * size
-        results = query.offset(skip).limit(size).all()
+        platform_count = None
+        if not (company_symbol or reporting_year or reporting_quarter or sector or risk_level):
+            # An unfiltered listing is the whole platform scope, whose count is maintained
+            platform_count = lambda: dashboard_aggregates.read(db, [PLATFORM_SCOPE])[PLATFORM_SCOPE]["quarterly_count"]
+        counted = row_counter.count(db, query, resolve_count_mode(count, cursor), aggregate=platform_count)
+        total = counted.total
+        results, next_cursor = keyset_page(
+            query, [QuarterlyPrediction.created_at, QuarterlyPrediction.id], lambda row: (row[0].created_at, row[0].id),
+            size, cursor=cursor, descending=True, offset=(page - 1) * size
+        )
         
         prediction_data = []
         for pred, company, creator in results:            
@@ -772,7 +840,10 @@ async def get_system_quarterly_predictions(
                 "total": total,
                 "page": page,
                 "size": size,
-                "pages": (total + size - 1) // size
+                "pages": (total + size - 1) // size if total is not None else None,
+                "has_next": next_cursor is not None,
+                "next_cursor": next_cursor,
+                **counted.as_pagination()
             },
             "filters": {
                 "access_level": "system",
@@ -786,6 +857,8 @@ async def get_system_quarterly_predictions(
         
     except HTTPException:
         raise
+    except PaginationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching system quarterly predictions: {str(e)}")
 
@@ -794,6 +867,7 @@ async def get_system_quarterly_predictions(
 async def bulk_upload_predictions(
     file: UploadFile = File(...),
     prediction_type: str = "annual",  # annual or quarterly
+    conflict_policy: Optional[str] = None,  # skip | overwrite | keep_newest
     db: Session = Depends(get_db),
     current_user: User = Depends(current_verified_user)
 ):
@@ -814,6 +888,7 @@ async def bulk_upload_predictions(
         import pandas as pd
         import io
         
+        policy = resolve_conflict_policy(conflict_policy)
         content = await file.read()
         df = pd.read_csv(io.StringIO(content.decode('utf-8')))
         
@@ -827,58 +902,52 @@ async def bulk_upload_predictions(
         else:
             final_org_id = None  # Personal predictions (no org)
         
+        # Rows failing validation (blank fields, bad quarters, repeats within the file) are reported, not stored
+        if prediction_type == "annual":
+            frame, row_errors = validate_annual_rows(df)
+        elif prediction_type == "quarterly":
+            frame, row_errors = validate_quarterly_rows(df)
+        else:
+            raise HTTPException(status_code=400, detail=f"Unknown prediction_type: {prediction_type}")
+        
         results = {
             "success": True,
             "total_rows": len(df),
             "successful": 0,
-            "failed": 0,
-            "errors": []
+            "failed": len(row_errors),
+            "errors": [f"Row {entry['row']}: {entry['error']}" for entry in row_errors]
         }
         
-        for index, row in df.iterrows():
+        for row_number, row in frame.to_dict('index').items():
             try:
-                company = create_or_get_company(
+                company_id = resolve_company_id(
                     db=db,
                     company_symbol=row['company_symbol'],
                     company_name=row['company_name'],
-                    market_cap=float(row['market_cap']),
+                    market_cap=row['market_cap'],
                     sector=row['sector'],
                     user=current_user
                 )
                 
                 if prediction_type == "annual":
-                    existing_query = db.query(AnnualPrediction).filter(
-                        AnnualPrediction.company_id == company.id,
-                        AnnualPrediction.reporting_year == row['reporting_year'],
-                        AnnualPrediction.organization_id == final_org_id
-                    )
-                    
-                    if final_org_id is None and current_user.role != "super_admin":
-                        existing_query = existing_query.filter(AnnualPrediction.created_by == str(current_user.id))
-                    
-                    existing = existing_query.first()
-                    
-                    if existing:
-                        scope_text = "global" if current_user.role == "super_admin" else ("organization" if final_org_id else "personal")
-                        results["errors"].append(f"Row {index + 1}: Annual prediction already exists for {row['company_symbol']} {row['reporting_year']} in your {scope_text} scope")
-                        results["failed"] += 1
-                        continue
-                    
                     financial_data = {
-                        'long_term_debt_to_total_capital': float(row['long_term_debt_to_total_capital']),
-                        'total_debt_to_ebitda': float(row['total_debt_to_ebitda']),
-                        'net_income_margin': float(row['net_income_margin']),
-                        'ebit_to_interest_expense': float(row['ebit_to_interest_expense']),
-                        'return_on_assets': float(row['return_on_assets'])
+                        'long_term_debt_to_total_capital': row['long_term_debt_to_total_capital'],
+                        'total_debt_to_ebitda': row['total_debt_to_ebitda'],
+                        'net_income_margin': row['net_income_margin'],
+                        'ebit_to_interest_expense': row['ebit_to_interest_expense'],
+                        'return_on_assets': row['return_on_assets']
                     }
                     
                     ml_result = await ml_model.predict_annual(financial_data)
                     
-                    prediction = AnnualPrediction(
+                    model = AnnualPrediction
+                    duplicate_text = f"Annual prediction already exists for {row['company_symbol']} {row['reporting_year']}"
+                    prediction = dict(
                         id=uuid.uuid4(),
-                        company_id=company.id,
+                        company_id=company_id,
                         organization_id=final_org_id,
-                        reporting_year=row['reporting_year'],
+                        access_level=access_level,
+                        reporting_year=str(row['reporting_year']),
                         long_term_debt_to_total_capital=financial_data['long_term_debt_to_total_capital'],
                         total_debt_to_ebitda=financial_data['total_debt_to_ebitda'],
                         net_income_margin=financial_data['net_income_margin'],
@@ -890,40 +959,25 @@ async def bulk_upload_predictions(
                         predicted_at=datetime.utcnow(),
                         created_by=current_user.id
                     )
-                    
+
                 elif prediction_type == "quarterly":
-                    existing_query = db.query(QuarterlyPrediction).filter(
-                        QuarterlyPrediction.company_id == company.id,
-                        QuarterlyPrediction.reporting_year == row['reporting_year'],
-                        QuarterlyPrediction.reporting_quarter == row['reporting_quarter'],
-                        QuarterlyPrediction.organization_id == final_org_id
-                    )
-                    
-                    if final_org_id is None and current_user.role != "super_admin":
-                        existing_query = existing_query.filter(QuarterlyPrediction.created_by == str(current_user.id))
-                    
-                    existing = existing_query.first()
-                    
-                    if existing:
-                        scope_text = "global" if current_user.role == "super_admin" else ("organization" if final_org_id else "personal")
-                        results["errors"].append(f"Row {index + 1}: Quarterly prediction already exists for {row['company_symbol']} {row['reporting_year']} {row['reporting_quarter']} in your {scope_text} scope")
-                        results["failed"] += 1
-                        continue
-                    
                     financial_data = {
-                        'total_debt_to_ebitda': float(row['total_debt_to_ebitda']),
-                        'sga_margin': float(row['sga_margin']),
-                        'long_term_debt_to_total_capital': float(row['long_term_debt_to_total_capital']),
-                        'return_on_capital': float(row['return_on_capital'])
+                        'total_debt_to_ebitda': row['total_debt_to_ebitda'],
+                        'sga_margin': row['sga_margin'],
+                        'long_term_debt_to_total_capital': row['long_term_debt_to_total_capital'],
+                        'return_on_capital': row['return_on_capital']
                     }
                     
                     ml_result = await quarterly_ml_model.predict_quarterly(financial_data)
                     
-                    prediction = QuarterlyPrediction(
+                    model = QuarterlyPrediction
+                    duplicate_text = f"Quarterly prediction already exists for {row['company_symbol']} {row['reporting_year']} {row['reporting_quarter']}"
+                    prediction = dict(
                         id=uuid.uuid4(),
-                        company_id=company.id,
+                        company_id=company_id,
                         organization_id=final_org_id,
-                        reporting_year=row['reporting_year'],
+                        access_level=access_level,
+                        reporting_year=str(row['reporting_year']),
                         reporting_quarter=row['reporting_quarter'],
                         total_debt_to_ebitda=financial_data['total_debt_to_ebitda'],
                         sga_margin=financial_data['sga_margin'],
@@ -938,11 +992,17 @@ async def bulk_upload_predictions(
                         created_by=current_user.id
                     )
                 
-                db.add(prediction)
+                upserted = upsert_rows(db, model, [prediction], policy)
+                if upserted.skipped:
+                    scope_text = "global" if current_user.role == "super_admin" else ("organization" if final_org_id else "personal")
+                    results["errors"].append(f"Row {row_number}: {duplicate_text} in your {scope_text} scope")
+                    results["failed"] += 1
+                    continue
+                
                 results["successful"] += 1
                 
             except Exception as e:
-                results["errors"].append(f"Row {index + 1}: {str(e)}")
+                results["errors"].append(f"Row {row_number}: {str(e)}")
                 results["failed"] += 1
                 continue
         
@@ -965,6 +1025,7 @@ async def bulk_upload_predictions(
 async def bulk_upload_annual_async(
     background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
+    conflict_policy: Optional[str] = None,  # skip | overwrite | keep_newest
     db: Session = Depends(get_db),
     current_user: User = Depends(current_verified_user)
 ):
@@ -982,6 +1043,7 @@ async def bulk_upload_annual_async(
                 detail="Only CSV and Excel files are supported"
             )
 
+        policy = resolve_conflict_policy(conflict_policy)
         organization_context = get_organization_context(current_user)
         is_global = current_user.role == "super_admin"
         
@@ -992,14 +1054,6 @@ async def bulk_upload_annual_async(
         else:
             final_org_id = None  # User-specific predictions (no org)
         
-        contents = await file.read()
-        file_size = len(contents)
-        
-        if file.filename.endswith('.csv'):
-            df = pd.read_csv(io.StringIO(contents.decode('utf-8')))
-        else:
-            df = pd.read_excel(io.BytesIO(contents))
-        
         required_columns = [
             'company_symbol', 'company_name', 'market_cap', 'sector',
             'reporting_year',
@@ -1007,21 +1061,15 @@ async def bulk_upload_annual_async(
             'net_income_margin', 'ebit_to_interest_expense', 'return_on_assets'
         ]
         
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Missing required columns: {', '.join(missing_columns)}"
-            )
-        
-        data = df.to_dict('records')
-        total_rows = len(data)
-        
-        if total_rows == 0:
-            raise HTTPException(status_code=400, detail="No data found in file")
+        # Parse block by block straight into the payload store (header checked on the first block)
+        try:
+            ingested = await ingest_upload(file, required_columns)
+        except UploadValidationError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
-        if total_rows > 10000:  # Limit for safety
-            raise HTTPException(status_code=400, detail="File contains too many rows (max 10,000)")
+        data = ingested['payload_ref']
+        file_size = ingested['file_size']
+        total_rows = ingested['total_rows']
         
         from app.services.celery_bulk_upload_service import celery_bulk_upload_service
         
@@ -1038,7 +1086,8 @@ async def bulk_upload_annual_async(
             job_id=job_id,
             data=data,
             user_id=str(current_user.id),
-            organization_id=final_org_id
+            organization_id=final_org_id,
+            conflict_policy=policy
         )
         
         return {
@@ -1066,6 +1115,7 @@ async def bulk_upload_annual_async(
 async def bulk_upload_quarterly_async(
     background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
+    conflict_policy: Optional[str] = None,  # skip | overwrite | keep_newest
     db: Session = Depends(get_db),
     current_user: User = Depends(current_verified_user)
 ):
@@ -1083,6 +1133,7 @@ async def bulk_upload_quarterly_async(
                 detail="Only CSV and Excel files are supported"
             )
 
+        policy = resolve_conflict_policy(conflict_policy)
         organization_context = get_organization_context(current_user)
         access_level = get_user_access_level(current_user)
         
@@ -1093,14 +1144,6 @@ async def bulk_upload_quarterly_async(
         else:
             final_org_id = None  # Personal predictions (no org)
         
-        contents = await file.read()
-        file_size = len(contents)
-        
-        if file.filename.endswith('.csv'):
-            df = pd.read_csv(io.StringIO(contents.decode('utf-8')))
-        else:
-            df = pd.read_excel(io.BytesIO(contents))
-        
         required_columns = [
             'company_symbol', 'company_name', 'market_cap', 'sector',
             'reporting_year', 'reporting_quarter',
@@ -1108,27 +1151,22 @@ async def bulk_upload_quarterly_async(
             'long_term_debt_to_total_capital', 'return_on_capital'
         ]
         
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Missing required columns: {', '.join(missing_columns)}"
-            )
-        
-        data = df.to_dict('records')
-        total_rows = len(data)
-        
-        if total_rows == 0:
-            raise HTTPException(status_code=400, detail="No data found in file")
+        # Parse block by block straight into the payload store (header checked on the first block)
+        try:
+            ingested = await ingest_upload(file, required_columns)
+        except UploadValidationError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
-        if total_rows > 10000:
-            raise HTTPException(status_code=400, detail="File contains too many rows (max 10,000)")
+        data = ingested['payload_ref']
+        file_size = ingested['file_size']
+        total_rows = ingested['total_rows']
+        preview = ingested['preview']
         
         # ADDITIONAL DATA VALIDATION - Fail early if data is invalid
         try:
             # Test the first row to ensure all required fields are accessible
-            if len(data) > 0:
-                test_row = data[0]
+            if len(preview) > 0:
+                test_row = preview[0]
                 
                 # Validate required fields exist and are not None/empty
                 required_test_fields = {
@@ -1156,7 +1194,7 @@ async def bulk_upload_quarterly_async(
                 
                 # Test data iteration (same as worker task does)
                 test_iteration_count = 0
-                for i, row in enumerate(data[:3]):  # Test first 3 rows
+                for i, row in enumerate(preview):  # Test first 3 rows
                     if not row or not isinstance(row, dict):
                         raise HTTPException(
                             status_code=400,
@@ -1171,8 +1209,10 @@ async def bulk_upload_quarterly_async(
                     )
                     
         except HTTPException:
+            payload_store.delete(data)
             raise  # Re-raise HTTP exceptions
         except Exception as e:
+            payload_store.delete(data)
             raise HTTPException(
                 status_code=400,
                 detail=f"Data validation failed: {str(e)}. Please check your file format and ensure all required columns have valid data."
@@ -1193,7 +1233,8 @@ async def bulk_upload_quarterly_async(
             job_id=job_id,
             data=data,
             user_id=str(current_user.id),
-            organization_id=final_org_id
+            organization_id=final_org_id,
+            conflict_policy=policy
         )
         
         return {
@@ -1249,6 +1290,47 @@ async def get_bulk_upload_job_status(
         raise HTTPException(status_code=500, detail=f"Error getting job status: {str(e)}")
 
 
+@router.get("/jobs/{job_id}/events")
+async def stream_bulk_upload_job_events(
+    job_id: str,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(current_verified_user)
+):
+    """
+    Stream a bulk upload job's progress as Server-Sent Events
+
+    Events: ``progress`` (row counters; also sent on connect), ``row_errors``
+    (batches of error_details entries) and a final ``completed``, ``failed``
+    or ``cancelled``, after which the stream closes. Replaces polling
+    /jobs/{job_id}/status.
+    """
+    from fastapi.responses import StreamingResponse
+    
+    if not check_user_permissions(current_user, "user"):
+        raise HTTPException(
+            status_code=403,
+            detail="Authentication required to view job status"
+        )
+
+    job = db.query(BulkUploadJob).filter(BulkUploadJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    if not check_user_permissions(current_user, "super_admin"):
+        if job.organization_id != current_user.organization_id:
+            raise HTTPException(
+                status_code=403, 
+                detail="Access denied to this job"
+            )
+
+    return StreamingResponse(
+        job_progress.event_stream(str(job.id), request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/jobs/{job_id}/results")
 async def get_bulk_upload_job_results(
     job_id: str,
@@ -1302,7 +1384,7 @@ async def get_bulk_upload_job_results(
             "started_at": job.started_at.isoformat() if job.started_at else None,
             "completed_at": job.completed_at.isoformat() if job.completed_at else None,
             "error_message": job.error_message,
-            "error_details": json.loads(job.error_details) if job.error_details else []
+            "error_details": job_error_details(job)
         }
         
         # Calculate processing metrics if available
@@ -1316,134 +1398,59 @@ async def get_bulk_upload_job_results(
         if job.total_rows and job.total_rows > 0:
             job_summary["success_rate_percent"] = round((job.successful_rows or 0) / job.total_rows * 100, 2)
         
-        # Now get the actual prediction results based on job type
+        # Predictions written by this job, paginated in the database
         prediction_results = []
+        prediction_model = job_prediction_model(job)
+        total_predictions = count_job_predictions(db, job, prediction_model) if prediction_model else 0
         
-        if job.job_type == "annual_prediction":
-            # Get annual predictions created during this job timeframe
-            query = db.query(AnnualPrediction, Company).join(
-                Company, AnnualPrediction.company_id == Company.id
-            )
-            
-            # Filter by organization if not super admin
-            if not check_user_permissions(current_user, "super_admin"):
-                if current_user.organization_id:
-                    query = query.filter(Company.organization_id == current_user.organization_id)
-                else:
-                    query = query.filter(Company.organization_id.is_(None))
-            
-            # Filter by time range around job processing with tighter window
-            if job.started_at:
-                # Use a tighter time window - predictions should be created during job execution
-                from datetime import timedelta
-                # Use minimal buffer - job execution should be tightly controlled
-                start_time = job.started_at - timedelta(seconds=30)  # 30 second buffer before
-                end_time = job.completed_at if job.completed_at else (job.started_at + timedelta(hours=2))
-                end_time = end_time + timedelta(seconds=30)  # 30 second buffer after
-                
-                query = query.filter(
-                    AnnualPrediction.created_at >= start_time,
-                    AnnualPrediction.created_at <= end_time
-                )
-                
-                # Additional filtering by created_by user if available
-                if job.user_id:
-                    query = query.filter(AnnualPrediction.created_by == str(job.user_id))
-            
-            predictions = query.order_by(AnnualPrediction.created_at.desc()).limit(
-                min(job.total_rows or 1000, 2000)  # Limit to job size or 2000 max
-            ).all()
-            
-            # Apply pagination  
-            total_predictions = len(predictions)
-            start_idx = (page - 1) * page_size
-            end_idx = start_idx + page_size
-            paginated_predictions = predictions[start_idx:end_idx]
+        if prediction_model is AnnualPrediction:
+            predictions = job_predictions_query(db, job, AnnualPrediction).offset(
+                (page - 1) * page_size
+            ).limit(page_size).all()
             
-            for prediction, company in paginated_predictions:
+            for prediction, company in predictions:
                 prediction_results.append({
                     "company_symbol": company.symbol,
-                    "company_name": company.company_name,
+                    "company_name": company.name,
                     "company_sector": company.sector,
                     "prediction_id": str(prediction.id),
-                    "default_probability": round(prediction.default_probability, 4),
-                    "risk_category": prediction.risk_category,
+                    "default_probability": round(float(prediction.probability), 4),
+                    "risk_category": prediction.risk_level,
+                    "confidence": float(prediction.confidence),
                     "financial_metrics": {
-                        "total_debt_to_ebitda": prediction.total_debt_to_ebitda,
-                        "sga_margin": prediction.sga_margin,
-                        "long_term_debt_to_total_capital": prediction.long_term_debt_to_total_capital,
-                        "return_on_capital": prediction.return_on_capital,
-                        "current_ratio": prediction.current_ratio,
-                        "debt_to_equity": prediction.debt_to_equity,
-                        "net_income_margin": prediction.net_income_margin,
-                        "asset_turnover": prediction.asset_turnover,
-                        "ebitda_margin": prediction.ebitda_margin,
-                        "revenue_growth": prediction.revenue_growth,
-                        "total_debt_to_total_assets": prediction.total_debt_to_total_assets,
-                        "operating_margin": prediction.operating_margin,
-                        "roa": prediction.roa,
-                        "roe": prediction.roe
+                        "long_term_debt_to_total_capital": optional_float(prediction.long_term_debt_to_total_capital),
+                        "total_debt_to_ebitda": optional_float(prediction.total_debt_to_ebitda),
+                        "net_income_margin": optional_float(prediction.net_income_margin),
+                        "ebit_to_interest_expense": optional_float(prediction.ebit_to_interest_expense),
+                        "return_on_assets": optional_float(prediction.return_on_assets)
                     },
+                    "year": prediction.reporting_year,
                     "created_at": prediction.created_at.isoformat() if prediction.created_at else None
                 })
             
-        elif job.job_type == "quarterly_prediction":
-            # Get quarterly predictions created during this job timeframe
-            query = db.query(QuarterlyPrediction, Company).join(
-                Company, QuarterlyPrediction.company_id == Company.id
-            )
-            
-            # Filter by organization if not super admin
-            if not check_user_permissions(current_user, "super_admin"):
-                if current_user.organization_id:
-                    query = query.filter(Company.organization_id == current_user.organization_id)
-                else:
-                    query = query.filter(Company.organization_id.is_(None))
-            
-            # Filter by time range around job processing with tighter window
-            if job.started_at:
-                # Use a tighter time window - predictions should be created during job execution
-                from datetime import timedelta
-                # Use minimal buffer - job execution should be tightly controlled
-                start_time = job.started_at - timedelta(seconds=30)  # 30 second buffer before
-                end_time = job.completed_at if job.completed_at else (job.started_at + timedelta(hours=2))
-                end_time = end_time + timedelta(seconds=30)  # 30 second buffer after
-                
-                query = query.filter(
-                    QuarterlyPrediction.created_at >= start_time,
-                    QuarterlyPrediction.created_at <= end_time
-                )
-                
-                # Additional filtering by created_by user if available  
-                if job.user_id:
-                    query = query.filter(QuarterlyPrediction.created_by == str(job.user_id))
-            
-            predictions = query.order_by(QuarterlyPrediction.created_at.desc()).limit(
-                min(job.total_rows or 1000, 2000)  # Limit to job size or 2000 max
-            ).all()
+        elif prediction_model is QuarterlyPrediction:
+            predictions = job_predictions_query(db, job, QuarterlyPrediction).offset(
+                (page - 1) * page_size
+            ).limit(page_size).all()
             
-            # Apply pagination
-            total_predictions = len(predictions) 
-            start_idx = (page - 1) * page_size
-            end_idx = start_idx + page_size
-            paginated_predictions = predictions[start_idx:end_idx]
-            
-            for prediction, company in paginated_predictions:
+            for prediction, company in predictions:
+                probability = prediction.ensemble_probability if prediction.ensemble_probability is not None else prediction.logistic_probability
                 prediction_results.append({
                     "company_symbol": company.symbol,
-                    "company_name": company.company_name,
+                    "company_name": company.name,
                     "company_sector": company.sector,
                     "prediction_id": str(prediction.id),
-                    "default_probability": round(prediction.default_probability, 4),
-                    "risk_category": prediction.risk_category,
+                    "default_probability": round(float(probability), 4) if probability is not None else None,
+                    "risk_category": prediction.risk_level,
+                    "confidence": float(prediction.confidence),
                     "financial_metrics": {
-                        "total_debt_to_ebitda": prediction.total_debt_to_ebitda,
-                        "sga_margin": prediction.sga_margin,
-                        "long_term_debt_to_total_capital": prediction.long_term_debt_to_total_capital,
-                        "return_on_capital": prediction.return_on_capital
+                        "total_debt_to_ebitda": optional_float(prediction.total_debt_to_ebitda),
+                        "sga_margin": optional_float(prediction.sga_margin),
+                        "long_term_debt_to_total_capital": optional_float(prediction.long_term_debt_to_total_capital),
+                        "return_on_capital": optional_float(prediction.return_on_capital)
                     },
-                    "quarter": prediction.quarter,
-                    "year": prediction.year,
+                    "quarter": prediction.reporting_quarter,
+                    "year": prediction.reporting_year,
                     "created_at": prediction.created_at.isoformat() if prediction.created_at else None
                 })
         
@@ -1453,9 +1460,9 @@ async def get_bulk_upload_job_results(
             "pagination": {
                 "page": page,
                 "page_size": page_size,
-                "total_results": total_predictions if 'total_predictions' in locals() else 0,
-                "total_pages": math.ceil((total_predictions if 'total_predictions' in locals() else 0) / page_size),
-                "has_next": page * page_size < (total_predictions if 'total_predictions' in locals() else 0),
+                "total_results": total_predictions,
+                "total_pages": math.ceil(total_predictions / page_size),
+                "has_next": page * page_size < total_predictions,
                 "has_previous": page > 1
             },
             "results": prediction_results
@@ -1471,11 +1478,16 @@ async def get_bulk_upload_job_results(
 @router.get("/jobs/{job_id}/download")
 async def download_bulk_upload_job_results(
     job_id: str,
-    format: str = "csv",  # csv or excel
+    format: str = "csv",  # csv, excel or parquet
     db: Session = Depends(get_db),
     current_user: User = Depends(current_verified_user)
 ):
-    """Download the complete results of a bulk upload job as CSV or Excel file"""
+    """
+    Download the complete results of a bulk upload job as a CSV, Excel or Parquet file
+
+    Rows are streamed from a server-side cursor, so memory use does not grow
+    with the size of the job.
+    """
     from fastapi.responses import StreamingResponse
     
     try:
@@ -1485,10 +1497,9 @@ async def download_bulk_upload_job_results(
                 detail="Authentication required to download job results"
             )
 
-        if format not in ["csv", "excel"]:
-            raise HTTPException(status_code=400, detail="Format must be 'csv' or 'excel'")
+        if format not in EXPORT_FORMATS:
+            raise HTTPException(status_code=400, detail="Format must be 'csv', 'excel' or 'parquet'")
 
-        # Get job results using the existing endpoint logic (without pagination)
         job = db.query(BulkUploadJob).filter(BulkUploadJob.id == job_id).first()
         
         if not job:
@@ -1502,151 +1513,24 @@ async def download_bulk_upload_job_results(
                     detail="Access denied to this job"
                 )
 
-        # Get all predictions (no pagination for download)
-        prediction_data = []
-        
-        if job.job_type == "annual_prediction":
-            query = db.query(AnnualPrediction, Company).join(
-                Company, AnnualPrediction.company_id == Company.id
-            )
-            
-            # Apply same filters as results endpoint
-            if not check_user_permissions(current_user, "super_admin"):
-                if current_user.organization_id:
-                    query = query.filter(Company.organization_id == current_user.organization_id)
-                else:
-                    query = query.filter(Company.organization_id.is_(None))
-            
-            if job.started_at:
-                from datetime import timedelta
-                start_time = job.started_at - timedelta(seconds=30)
-                end_time = job.completed_at if job.completed_at else (job.started_at + timedelta(hours=2))
-                end_time = end_time + timedelta(seconds=30)
-                
-                query = query.filter(
-                    AnnualPrediction.created_at >= start_time,
-                    AnnualPrediction.created_at <= end_time
-                )
-                
-                if job.user_id:
-                    query = query.filter(AnnualPrediction.created_by == str(job.user_id))
-            
-            predictions = query.order_by(AnnualPrediction.created_at.desc()).limit(
-                min(job.total_rows or 1000, 5000)  # Higher limit for download
-            ).all()
-            
-            for prediction, company in predictions:
-                prediction_data.append({
-                    "Company Symbol": company.symbol,
-                    "Company Name": company.company_name,
-                    "Sector": company.sector,
-                    "Default Probability": round(prediction.default_probability, 4),
-                    "Risk Category": prediction.risk_category,
-                    "Reporting Year": prediction.reporting_year,
-                    "Total Debt to EBITDA": prediction.total_debt_to_ebitda,
-                    "SGA Margin": prediction.sga_margin,
-                    "Long Term Debt to Total Capital": prediction.long_term_debt_to_total_capital,
-                    "Return on Capital": prediction.return_on_capital,
-                    "Current Ratio": prediction.current_ratio,
-                    "Debt to Equity": prediction.debt_to_equity,
-                    "Net Income Margin": prediction.net_income_margin,
-                    "Asset Turnover": prediction.asset_turnover,
-                    "EBITDA Margin": prediction.ebitda_margin,
-                    "Revenue Growth": prediction.revenue_growth,
-                    "Total Debt to Total Assets": prediction.total_debt_to_total_assets,
-                    "Operating Margin": prediction.operating_margin,
-                    "ROA": prediction.roa,
-                    "ROE": prediction.roe,
-                    "Created At": prediction.created_at.isoformat() if prediction.created_at else None
-                })
-                
-        elif job.job_type == "quarterly_prediction":
-            query = db.query(QuarterlyPrediction, Company).join(
-                Company, QuarterlyPrediction.company_id == Company.id
-            )
-            
-            # Apply same filters as results endpoint
-            if not check_user_permissions(current_user, "super_admin"):
-                if current_user.organization_id:
-                    query = query.filter(Company.organization_id == current_user.organization_id)
-                else:
-                    query = query.filter(Company.organization_id.is_(None))
-            
-            if job.started_at:
-                from datetime import timedelta
-                start_time = job.started_at - timedelta(seconds=30)
-                end_time = job.completed_at if job.completed_at else (job.started_at + timedelta(hours=2))
-                end_time = end_time + timedelta(seconds=30)
-                
-                query = query.filter(
-                    QuarterlyPrediction.created_at >= start_time,
-                    QuarterlyPrediction.created_at <= end_time
-                )
-                
-                if job.user_id:
-                    query = query.filter(QuarterlyPrediction.created_by == str(job.user_id))
-            
-            predictions = query.order_by(QuarterlyPrediction.created_at.desc()).limit(
-                min(job.total_rows or 1000, 5000)  # Higher limit for download
-            ).all()
-            
-            for prediction, company in predictions:
-                prediction_data.append({
-                    "Company Symbol": company.symbol,
-                    "Company Name": company.company_name,
-                    "Sector": company.sector,
-                    "Quarter": prediction.quarter,
-                    "Year": prediction.year,
-                    "Default Probability": round(prediction.default_probability, 4),
-                    "Risk Category": prediction.risk_category,
-                    "Total Debt to EBITDA": prediction.total_debt_to_ebitda,
-                    "SGA Margin": prediction.sga_margin,
-                    "Long Term Debt to Total Capital": prediction.long_term_debt_to_total_capital,
-                    "Return on Capital": prediction.return_on_capital,
-                    "Created At": prediction.created_at.isoformat() if prediction.created_at else None
-                })
-
-        if not prediction_data:
+        prediction_model = job_prediction_model(job)
+        if prediction_model is None or not count_job_predictions(db, job, prediction_model):
             raise HTTPException(status_code=404, detail="No prediction results found for this job")
 
-        # Create DataFrame and export
-        import pandas as pd
-        df = pd.DataFrame(prediction_data)
-        
+        try:
+            content = export_job_predictions(job.id, prediction_model, format)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
         # Generate filename
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"predictions_{job.job_type}_{job.original_filename}_{timestamp}"
+        filename = f"predictions_{job.job_type}_{job.original_filename}_{timestamp}.{EXPORT_FORMATS[format]['extension']}"
         
-        if format == "csv":
-            # Create CSV
-            output = io.StringIO()
-            df.to_csv(output, index=False)
-            output.seek(0)
-            
-            def iter_csv():
-                yield output.getvalue().encode('utf-8')
-            
-            return StreamingResponse(
-                iter_csv(),
-                media_type="text/csv",
-                headers={"Content-Disposition": f"attachment; filename={filename}.csv"}
-            )
-            
-        elif format == "excel":
-            # Create Excel
-            output = io.BytesIO()
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                df.to_excel(writer, index=False, sheet_name='Predictions')
-            output.seek(0)
-            
-            def iter_excel():
-                yield output.getvalue()
-            
-            return StreamingResponse(
-                iter_excel(),
-                media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                headers={"Content-Disposition": f"attachment; filename={filename}.xlsx"}
-            )
+        return StreamingResponse(
+            content,
+            media_type=EXPORT_FORMATS[format]["media_type"],
+            headers={"Content-Disposition": f"attachment; filename={filename}"}
+        )
         
     except HTTPException:
         raise
@@ -1655,11 +1539,56 @@ async def download_bulk_upload_job_results(
         raise HTTPException(status_code=500, detail=f"Error downloading job results: {str(e)}")
 
 
+@router.get("/jobs/{job_id}/errors")
+async def get_bulk_upload_job_errors(
+    job_id: str,
+    page: int = 1,
+    page_size: int = 100,
+    error_code: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(current_verified_user)
+):
+    """Page through the row errors of a bulk upload job, in row order, optionally for one error code"""
+    try:
+        if not check_user_permissions(current_user, "user"):
+            raise HTTPException(
+                status_code=403,
+                detail="Authentication required to view job errors"
+            )
+
+        job = db.query(BulkUploadJob).filter(BulkUploadJob.id == job_id).first()
+        
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        
+        if not check_user_permissions(current_user, "super_admin"):
+            if job.organization_id != current_user.organization_id:
+                raise HTTPException(
+                    status_code=403, 
+                    detail="Access denied to this job"
+                )
+        
+        return {
+            "success": True,
+            "job_id": str(job.id),
+            "error_details": job_error_details(job),
+            **job_errors_page(db, job, page, page_size, error_code)
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting job errors: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error getting job errors: {str(e)}")
+
+
 @router.get("/jobs")
 async def list_bulk_upload_jobs(
     status: Optional[str] = None,
     limit: int = 50,
     offset: int = 0,
+    cursor: Optional[str] = None,
+    count: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(current_verified_user)
 ):
@@ -1683,10 +1612,12 @@ async def list_bulk_upload_jobs(
         if status:
             query = query.filter(BulkUploadJob.status == status)
         
-        query = query.order_by(BulkUploadJob.created_at.desc())
-        
-        total = query.count()
-        jobs = query.offset(offset).limit(limit).all()
+        counted = row_counter.count(db, query, resolve_count_mode(count, cursor))
+        total = counted.total
+        jobs, next_cursor = keyset_page(
+            query, [BulkUploadJob.created_at, BulkUploadJob.id], lambda job: (job.created_at, job.id),
+            limit, cursor=cursor, descending=True, offset=offset
+        )
         
         job_list = []
         for job in jobs:
@@ -1721,12 +1652,16 @@ async def list_bulk_upload_jobs(
                 "total": total,
                 "limit": limit,
                 "offset": offset,
-                "has_more": (offset + limit) < total
+                "has_more": next_cursor is not None,
+                "next_cursor": next_cursor,
+                **counted.as_pagination()
             }
         }
         
     except HTTPException:
         raise
+    except PaginationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error listing jobs: {str(e)}")
 
@@ -1777,13 +1712,7 @@ async def get_job_details(
         except Exception:
             pass
 
-        error_details_parsed = None
-        if job.error_details and include_errors:
-            try:
-                import json
-                error_details_parsed = json.loads(job.error_details)
-            except (json.JSONDecodeError, TypeError):
-                error_details_parsed = {"raw_error": job.error_details}
+        error_details_parsed = job_error_details(job)
 
         processing_time_seconds = None
         if job.started_at and job.completed_at:
@@ -1832,13 +1761,15 @@ async def get_job_details(
             },
             
             "errors": {
-                "has_errors": bool(job.error_message or job.error_details),
-                "error_message": job.error_message if include_errors else None,
-                "error_details": error_details_parsed if include_errors else None,
-                "error_count": len(error_details_parsed.get('errors', [])) if error_details_parsed and isinstance(error_details_parsed, dict) else None
+                "has_errors": bool(job.error_message or error_details_parsed["error_count"]),
+                "error_message": job.error_message,
+                "error_details": error_details_parsed,
+                "error_count": error_details_parsed["error_count"],
+                # First page of row errors; GET /jobs/{job_id}/errors pages through the rest
+                **job_errors_page(db, job)
             } if include_errors else {
-                "has_errors": bool(job.error_message or job.error_details),
-                "error_count": len(json.loads(job.error_details).get('errors', [])) if job.error_details else 0
+                "has_errors": bool(job.error_message or error_details_parsed["error_count"]),
+                "error_count": error_details_parsed["error_count"]
             },
             
             "celery_info": {
@@ -1900,34 +1831,15 @@ async def get_job_results(
         if job.started_at and job.completed_at:
             processing_time_seconds = (job.completed_at - job.started_at).total_seconds()
 
-        # Get created companies during this job time window
+        # Companies this job wrote predictions for
         created_companies = []
-        if request.include_companies and job.started_at:
-            # Improved companies query with wider time window
-            time_buffer = timedelta(minutes=5)  # 5-minute buffer for database timing
-            start_time = job.started_at - time_buffer
-            end_time = (job.completed_at + time_buffer) if job.completed_at else (job.started_at + timedelta(hours=2))
-            
-            # Companies created around the job time
-            companies_query = db.query(Company).join(
-                AnnualPrediction if job.job_type == 'annual' else QuarterlyPrediction,
-                Company.id == (AnnualPrediction.company_id if job.job_type == 'annual' else QuarterlyPrediction.company_id)
-            ).filter(
-                (AnnualPrediction.created_at if job.job_type == 'annual' else QuarterlyPrediction.created_at) >= start_time,
-                (AnnualPrediction.created_at if job.job_type == 'annual' else QuarterlyPrediction.created_at) <= end_time,
-                (AnnualPrediction.created_by if job.job_type == 'annual' else QuarterlyPrediction.created_by) == job.user_id
-            )
-            
-            # Apply organization filtering
-            if organization_id:
-                companies_query = companies_query.filter(Company.organization_id == organization_id)
-            elif job.organization_id:
-                companies_query = companies_query.filter(Company.organization_id == job.organization_id)
-            else:
-                # For personal data, filter by user created companies
-                companies_query = companies_query.filter(Company.organization_id.is_(None))
-            
-            companies_result = companies_query.distinct().all()
+        prediction_model = job_prediction_model(job)
+        if request.include_companies and prediction_model:
+            companies_result = db.query(Company).filter(
+                Company.id.in_(
+                    db.query(prediction_model.company_id).filter(prediction_model.bulk_upload_job_id == job.id)
+                )
+            ).order_by(Company.symbol).all()
             
             for company in companies_result:
                 created_companies.append({
@@ -1957,55 +1869,12 @@ async def get_job_results(
             }
         }
         
-        if request.include_predictions and job.started_at:
-            if job.job_type == 'annual':
-                # Improved query: Use a wider time window and add user/organization filters
-                time_buffer = timedelta(minutes=5)  # 5-minute buffer for database timing
-                start_time = job.started_at - time_buffer
-                end_time = (job.completed_at + time_buffer) if job.completed_at else (job.started_at + timedelta(hours=2))
-                
-                # Filter by created_by user_id for more accurate linking to job
-                predictions_query = db.query(AnnualPrediction).join(Company).filter(
-                    AnnualPrediction.created_at >= start_time,
-                    AnnualPrediction.created_at <= end_time,
-                    AnnualPrediction.created_by == job.user_id  # Match the user who created the job
-                )
-                
-                # Apply organization filtering
-                if organization_id:
-                    predictions_query = predictions_query.filter(AnnualPrediction.organization_id == organization_id)
-                elif job.organization_id:
-                    predictions_query = predictions_query.filter(AnnualPrediction.organization_id == job.organization_id)
-                else:
-                    # For personal predictions, filter by user and null organization_id
-                    predictions_query = predictions_query.filter(AnnualPrediction.organization_id.is_(None))
-                
-                predictions = predictions_query.all()
-                
-                # Fallback: if we didn't get all expected predictions, try a broader query
-                if len(predictions) < (job.successful_rows or 0) and job.successful_rows and job.successful_rows > 0:
-                    logger.warning(f"Job {job.id}: Expected {job.successful_rows} predictions but found {len(predictions)} with timestamp filter. Trying fallback query.")
-                    
-                    # Fallback query: get the most recent predictions by this user for this job type
-                    fallback_query = db.query(AnnualPrediction).join(Company).filter(
-                        AnnualPrediction.created_by == job.user_id
-                    ).order_by(AnnualPrediction.created_at.desc())
-                    
-                    # Apply organization filtering
-                    if organization_id:
-                        fallback_query = fallback_query.filter(AnnualPrediction.organization_id == organization_id)
-                    elif job.organization_id:
-                        fallback_query = fallback_query.filter(AnnualPrediction.organization_id == job.organization_id)
-                    else:
-                        fallback_query = fallback_query.filter(AnnualPrediction.organization_id.is_(None))
-                    
-                    # Get the most recent predictions (up to the expected number)
-                    fallback_predictions = fallback_query.limit(job.successful_rows).all()
-                    
-                    # Use fallback if it has more predictions than our timestamp query
-                    if len(fallback_predictions) > len(predictions):
-                        logger.info(f"Job {job.id}: Using fallback query which found {len(fallback_predictions)} predictions")
-                        predictions = fallback_predictions
+        if request.include_predictions and prediction_model:
+            if prediction_model is AnnualPrediction:
+                # Exact retrieval through the job link; companies come back in the same query
+                predictions = [
+                    prediction for prediction, _ in job_predictions_query(db, job, AnnualPrediction).all()
+                ]
                 
                 # Process annual predictions
                 probabilities = []
@@ -2080,52 +1949,9 @@ async def get_job_results(
                     del prediction_summary["by_sector"][sector]["probabilities"]  # Remove raw data
                     
             else:  # Quarterly predictions
-                # Improved query: Use a wider time window and add user/organization filters
-                time_buffer = timedelta(minutes=5)  # 5-minute buffer for database timing
-                start_time = job.started_at - time_buffer
-                end_time = (job.completed_at + time_buffer) if job.completed_at else (job.started_at + timedelta(hours=2))
-                
-                predictions_query = db.query(QuarterlyPrediction).join(Company).filter(
-                    QuarterlyPrediction.created_at >= start_time,
-                    QuarterlyPrediction.created_at <= end_time,
-                    QuarterlyPrediction.created_by == job.user_id  # Match the user who created the job
-                )
-                
-                # Apply organization filtering
-                if organization_id:
-                    predictions_query = predictions_query.filter(QuarterlyPrediction.organization_id == organization_id)
-                elif job.organization_id:
-                    predictions_query = predictions_query.filter(QuarterlyPrediction.organization_id == job.organization_id)
-                else:
-                    # For personal predictions, filter by user and null organization_id
-                    predictions_query = predictions_query.filter(QuarterlyPrediction.organization_id.is_(None))
-                
-                predictions = predictions_query.all()
-                
-                # Fallback: if we didn't get all expected predictions, try a broader query
-                if len(predictions) < (job.successful_rows or 0) and job.successful_rows and job.successful_rows > 0:
-                    logger.warning(f"Job {job.id}: Expected {job.successful_rows} predictions but found {len(predictions)} with timestamp filter. Trying fallback query.")
-                    
-                    # Fallback query: get the most recent predictions by this user for this job type
-                    fallback_query = db.query(QuarterlyPrediction).join(Company).filter(
-                        QuarterlyPrediction.created_by == job.user_id
-                    ).order_by(QuarterlyPrediction.created_at.desc())
-                    
-                    # Apply organization filtering
-                    if organization_id:
-                        fallback_query = fallback_query.filter(QuarterlyPrediction.organization_id == organization_id)
-                    elif job.organization_id:
-                        fallback_query = fallback_query.filter(QuarterlyPrediction.organization_id == job.organization_id)
-                    else:
-                        fallback_query = fallback_query.filter(QuarterlyPrediction.organization_id.is_(None))
-                    
-                    # Get the most recent predictions (up to the expected number)
-                    fallback_predictions = fallback_query.limit(job.successful_rows).all()
-                    
-                    # Use fallback if it has more predictions than our timestamp query
-                    if len(fallback_predictions) > len(predictions):
-                        logger.info(f"Job {job.id}: Using fallback query which found {len(fallback_predictions)} predictions")
-                        predictions = fallback_predictions
+                predictions = [
+                    prediction for prediction, _ in job_predictions_query(db, job, QuarterlyPrediction).all()
+                ]
                 
                 # Process quarterly predictions (similar logic but with quarterly fields)
                 probabilities = []
@@ -2174,14 +2000,8 @@ async def get_job_results(
                         "average": sum(confidences) / len(confidences)
                     }
 
-        # Parse error details
-        error_details_parsed = None
-        if job.error_details and request.include_errors:
-            try:
-                import json
-                error_details_parsed = json.loads(job.error_details)
-            except (json.JSONDecodeError, TypeError):
-                error_details_parsed = {"raw_error": job.error_details}
+        # Error counts from the job row; row errors are paged from their own table
+        error_details_parsed = job_error_details(job)
 
         # Build comprehensive response
         results = {
@@ -2208,8 +2028,7 @@ async def get_job_results(
                     "expected_successful_rows": job.successful_rows or 0,
                     "actual_predictions_found": len(created_predictions),
                     "job_started_at": job.started_at.isoformat() if job.started_at else None,
-                    "job_completed_at": job.completed_at.isoformat() if job.completed_at else None,
-                    "search_time_window": f"{job.started_at - timedelta(minutes=5)} to {(job.completed_at + timedelta(minutes=5)) if job.completed_at else (job.started_at + timedelta(hours=2))}" if job.started_at else "No time window"
+                    "job_completed_at": job.completed_at.isoformat() if job.completed_at else None
                 } if request.include_predictions else None
             },
             "analysis": prediction_summary if (request.include_predictions and created_predictions) else None,
@@ -2219,11 +2038,12 @@ async def get_job_results(
                 "completed_at": job.completed_at.isoformat() if job.completed_at else None
             },
             "errors": {
-                "has_errors": bool(job.error_message or job.error_details),
+                "has_errors": bool(job.error_message or error_details_parsed["error_count"]),
                 "error_message": job.error_message if request.include_errors else None,
                 "error_details": error_details_parsed if request.include_errors else None,
-                "error_count": len(error_details_parsed.get('errors', [])) if error_details_parsed and isinstance(error_details_parsed, dict) else 0
-            } if request.include_errors or bool(job.error_message or job.error_details) else None
+                "error_count": error_details_parsed["error_count"],
+                **(job_errors_page(db, job) if request.include_errors else {})
+            } if request.include_errors or bool(job.error_message or error_details_parsed["error_count"]) else None
         }
 
         return results
@@ -2340,6 +2160,7 @@ async def cancel_job(
         job.error_message = "Job cancelled by user"
         
         db.commit()
+        job_progress.publish(str(job.id), "cancelled", {"error_message": job.error_message})
         
         return {
             "success": True,
@@ -2400,56 +2221,27 @@ async def debug_job_predictions(
             "prediction_queries": {}
         }
 
-        if job.started_at:
-            time_buffer = timedelta(minutes=5)
-            start_time = job.started_at - time_buffer
-            end_time = (job.completed_at + time_buffer) if job.completed_at else (job.started_at + timedelta(hours=2))
-
-            if job.job_type == 'annual':
-                # Query 1: With time window and user filter
-                query1 = db.query(AnnualPrediction).filter(
-                    AnnualPrediction.created_at >= start_time,
-                    AnnualPrediction.created_at <= end_time,
-                    AnnualPrediction.created_by == job.user_id
-                )
-                if organization_id:
-                    query1 = query1.filter(AnnualPrediction.organization_id == organization_id)
-                elif job.organization_id:
-                    query1 = query1.filter(AnnualPrediction.organization_id == job.organization_id)
-                else:
-                    query1 = query1.filter(AnnualPrediction.organization_id.is_(None))
-
-                count1 = query1.count()
-                
-                # Query 2: Just by user, recent first
-                query2 = db.query(AnnualPrediction).filter(
-                    AnnualPrediction.created_by == job.user_id
-                ).order_by(AnnualPrediction.created_at.desc())
-                if organization_id:
-                    query2 = query2.filter(AnnualPrediction.organization_id == organization_id)
-                elif job.organization_id:
-                    query2 = query2.filter(AnnualPrediction.organization_id == job.organization_id)
-                else:
-                    query2 = query2.filter(AnnualPrediction.organization_id.is_(None))
-
-                recent_predictions = query2.limit(20).all()
-                
-                debug_info["prediction_queries"] = {
-                    "time_window_query": {
-                        "count": count1,
-                        "start_time": start_time.isoformat(),
-                        "end_time": end_time.isoformat()
-                    },
-                    "recent_predictions": [
-                        {
-                            "id": str(pred.id),
-                            "created_at": pred.created_at.isoformat(),
-                            "company_symbol": pred.company.symbol,
-                            "reporting_year": pred.reporting_year
-                        }
-                        for pred in recent_predictions
-                    ]
-                }
+        prediction_model = job_prediction_model(job)
+        if prediction_model:
+            linked_count = count_job_predictions(db, job, prediction_model)
+            recent_predictions = job_predictions_query(db, job, prediction_model).limit(20).all()
+            
+            debug_info["prediction_queries"] = {
+                "linked_predictions": {
+                    "count": linked_count,
+                    "expected_successful_rows": job.successful_rows or 0,
+                    "matches_job_counters": linked_count == (job.successful_rows or 0)
+                },
+                "sample_predictions": [
+                    {
+                        "id": str(pred.id),
+                        "created_at": pred.created_at.isoformat() if pred.created_at else None,
+                        "company_symbol": company.symbol,
+                        "reporting_year": pred.reporting_year
+                    }
+                    for pred, company in recent_predictions
+                ]
+            }
 
         return {
             "success": True,
@@ -2624,34 +2416,26 @@ async def get_prediction_statistics(
                 detail="Authentication required to view statistics"
             )
 
+        snapshot = prediction_statistics.snapshot(db)
+
         # System-wide statistics (accessible to all users)
-        system_annual_count = db.query(AnnualPrediction).filter(AnnualPrediction.access_level == "system").count()
-        system_quarterly_count = db.query(QuarterlyPrediction).filter(QuarterlyPrediction.access_level == "system").count()
+        system_annual_count = count_predictions(snapshot, "annual", access_level="system")
+        system_quarterly_count = count_predictions(snapshot, "quarterly", access_level="system")
         
         # Personal statistics
-        personal_annual_count = db.query(AnnualPrediction).filter(
-            AnnualPrediction.access_level == "personal",
-            AnnualPrediction.created_by == str(current_user.id)
-        ).count()
-        
-        personal_quarterly_count = db.query(QuarterlyPrediction).filter(
-            QuarterlyPrediction.access_level == "personal",
-            QuarterlyPrediction.created_by == str(current_user.id)
-        ).count()
+        personal_annual_count = count_created(snapshot, "annual", current_user.id, access_level="personal")
+        personal_quarterly_count = count_created(snapshot, "quarterly", current_user.id, access_level="personal")
         
         # Organization statistics (if applicable)
         org_annual_count = 0
         org_quarterly_count = 0
         if current_user.organization_id:
-            org_annual_count = db.query(AnnualPrediction).filter(
-                AnnualPrediction.access_level == "organization",
-                AnnualPrediction.organization_id == current_user.organization_id
-            ).count()
-            
-            org_quarterly_count = db.query(QuarterlyPrediction).filter(
-                QuarterlyPrediction.access_level == "organization",
-                QuarterlyPrediction.organization_id == current_user.organization_id
-            ).count()
+            org_annual_count = count_predictions(
+                snapshot, "annual", organization_id=current_user.organization_id, access_level="organization"
+            )
+            org_quarterly_count = count_predictions(
+                snapshot, "quarterly", organization_id=current_user.organization_id, access_level="organization"
+            )
 
         # Recent job statistics
         recent_jobs_query = db.query(BulkUploadJob).filter(
@@ -3086,7 +2870,7 @@ async def update_quarterly_prediction(
                 "return_on_capital": float(request.return_on_capital),
                 
                 "logistic_probability": float(ml_result.get('logistic_probability', 0)),
-                "gbm_probability": float(ml_result.get('gbm_probability', 0)),
+                "gbm_probability": safe_float(ml_result.get('gbm_probability')),
                 "ensemble_probability": float(ml_result.get('ensemble_probability', 0)),
                 "risk_level": ml_result['risk_level'],
                 "confidence": float(ml_result['confidence']),
@@ -3256,42 +3040,34 @@ async def get_prediction_statistics(
     try:
         pass  # Removed super admin restriction
 
-        total_annual = db.query(AnnualPrediction).count()
-        total_quarterly = db.query(QuarterlyPrediction).count()
-        total_companies = db.query(Company).count()
-        total_users = db.query(User).count()
-        total_organizations = db.query(Organization).count()
+        snapshot = prediction_statistics.snapshot(db)
+
+        total_annual = count_predictions(snapshot, "annual")
+        total_quarterly = count_predictions(snapshot, "quarterly")
+        total_companies = snapshot["total_companies"]
+        total_users = sum(snapshot["users"].values())
+        total_organizations = len(snapshot["organizations"])
 
         annual_by_access = {
-            "personal": db.query(AnnualPrediction).filter(AnnualPrediction.access_level == "personal").count(),
-            "organization": db.query(AnnualPrediction).filter(AnnualPrediction.access_level == "organization").count(),
-            "system": db.query(AnnualPrediction).filter(AnnualPrediction.access_level == "system").count()
+            level: count_predictions(snapshot, "annual", access_level=level) for level in ACCESS_LEVELS
         }
 
         quarterly_by_access = {
-            "personal": db.query(QuarterlyPrediction).filter(QuarterlyPrediction.access_level == "personal").count(),
-            "organization": db.query(QuarterlyPrediction).filter(QuarterlyPrediction.access_level == "organization").count(),
-            "system": db.query(QuarterlyPrediction).filter(QuarterlyPrediction.access_level == "system").count()
+            level: count_predictions(snapshot, "quarterly", access_level=level) for level in ACCESS_LEVELS
         }
 
         org_stats = []
-        organizations = db.query(Organization).all()
-        
-        for org in organizations:
-            org_annual_count = db.query(AnnualPrediction).filter(
-                AnnualPrediction.organization_id == org.id
-            ).count()
-            
-            org_quarterly_count = db.query(QuarterlyPrediction).filter(
-                QuarterlyPrediction.organization_id == org.id
-            ).count()
-            
-            org_user_count = db.query(User).filter(User.organization_id == org.id).count()
+        for org in snapshot["organizations"]:
+            org_annual_count = count_predictions(snapshot, "annual", organization_id=org["id"])
+            org_quarterly_count = count_predictions(snapshot, "quarterly", organization_id=org["id"])
+            org_user_count = sum(
+                count for (_, organization_id), count in snapshot["users"].items() if organization_id == org["id"]
+            )
             
             org_stats.append({
-                "organization_id": str(org.id),
-                "organization_name": org.name,
-                "organization_domain": org.domain,
+                "organization_id": org["id"],
+                "organization_name": org["name"],
+                "organization_domain": org["domain"],
                 "user_count": org_user_count,
                 "annual_predictions": org_annual_count,
                 "quarterly_predictions": org_quarterly_count,
@@ -3299,21 +3075,10 @@ async def get_prediction_statistics(
             })
 
         user_role_stats = {}
-        for role in ["super_admin", "tenant_admin", "org_admin", "org_member", "user"]:
-            role_users = db.query(User).filter(User.role == role).all()
-            role_count = len(role_users)
-            
-            role_annual_count = 0
-            role_quarterly_count = 0
-            
-            for user in role_users:
-                role_annual_count += db.query(AnnualPrediction).filter(
-                    AnnualPrediction.created_by == str(user.id)
-                ).count()
-                
-                role_quarterly_count += db.query(QuarterlyPrediction).filter(
-                    QuarterlyPrediction.created_by == str(user.id)
-                ).count()
+        for role in USER_ROLES:
+            role_count = sum(count for (user_role, _), count in snapshot["users"].items() if user_role == role)
+            role_annual_count = snapshot["by_creator_role"]["annual"].get(role, 0)
+            role_quarterly_count = snapshot["by_creator_role"]["quarterly"].get(role, 0)
             
             user_role_stats[role] = {
                 "user_count": role_count,
@@ -3322,98 +3087,12 @@ async def get_prediction_statistics(
                 "total_predictions": role_annual_count + role_quarterly_count
             }
 
-        user_contributions = {}
-        all_users = db.query(User).all()
-        
-        for user in all_users:
-            annual_count = db.query(AnnualPrediction).filter(
-                AnnualPrediction.created_by == str(user.id)
-            ).count()
-            
-            quarterly_count = db.query(QuarterlyPrediction).filter(
-                QuarterlyPrediction.created_by == str(user.id)
-            ).count()
-            
-            total_count = annual_count + quarterly_count
-            
-            if total_count > 0:  # Only include users who have made predictions
-                org_name = None
-                if user.organization_id:
-                    org = db.query(Organization).filter(Organization.id == user.organization_id).first()
-                    org_name = org.name if org else None
-                
-                user_contributions[user.id] = {
-                    "user_id": str(user.id),
-                    "full_name": user.full_name,
-                    "email": user.email,
-                    "role": user.role,
-                    "organization_name": org_name or "No Organization",
-                    "annual_predictions": annual_count,
-                    "quarterly_predictions": quarterly_count,
-                    "total_predictions": total_count
-                }
-        
-        top_contributors = sorted(
-            user_contributions.values(), 
-            key=lambda x: x["total_predictions"], 
-            reverse=True
-        )[:10]
-
-        company_prediction_query = text("""
-            SELECT 
-                c.id,
-                c.symbol,
-                c.name,
-                c.sector,
-                c.access_level,
-                COALESCE(annual_count, 0) as annual_count,
-                COALESCE(quarterly_count, 0) as quarterly_count,
-                COALESCE(annual_count, 0) + COALESCE(quarterly_count, 0) as total_count
-            FROM companies c
-            LEFT JOIN (
-                SELECT company_id, COUNT(*) as annual_count 
-                FROM annual_predictions 
-                GROUP BY company_id
-            ) ap ON c.id = ap.company_id
-            LEFT JOIN (
-                SELECT company_id, COUNT(*) as quarterly_count 
-                FROM quarterly_predictions 
-                GROUP BY company_id
-            ) qp ON c.id = qp.company_id
-            ORDER BY total_count DESC
-            LIMIT 10
-        """)
-        
-        company_result = db.execute(company_prediction_query).fetchall()
-        top_companies = []
-        
-        for row in company_result:
-            top_companies.append({
-                "company_id": str(row.id),
-                "symbol": row.symbol,
-                "name": row.name,
-                "sector": row.sector,
-                "access_level": row.access_level,
-                "annual_predictions": row.annual_count or 0,
-                "quarterly_predictions": row.quarterly_count or 0,
-                "total_predictions": row.total_count or 0
-            })
-
-        from datetime import datetime, timedelta
-        
-        seven_days_ago = datetime.now() - timedelta(days=7)
-        
-        recent_annual = db.query(AnnualPrediction).filter(
-            AnnualPrediction.created_at >= seven_days_ago
-        ).count()
-        
-        recent_quarterly = db.query(QuarterlyPrediction).filter(
-            QuarterlyPrediction.created_at >= seven_days_ago
-        ).count()
+        recent_annual = count_recent(snapshot, "annual")
+        recent_quarterly = count_recent(snapshot, "quarterly")
 
         return {
             "success": True,
-            "generated_at": datetime.now().isoformat(),
+            "generated_at": snapshot["generated_at"].isoformat(),
             "summary": {
                 "total_predictions": total_annual + total_quarterly,
                 "annual_predictions": total_annual,
@@ -3443,8 +3122,8 @@ async def get_prediction_statistics(
                 "by_user_role": user_role_stats
             },
             "insights": {
-                "top_contributors": top_contributors,
-                "most_predicted_companies": top_companies
+                "top_contributors": snapshot["top_contributors"],
+                "most_predicted_companies": snapshot["top_companies"]
             },
             "metadata": {
                 "access_level_explanation": {
@@ -3548,67 +3227,38 @@ async def get_dashboard(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Dashboard error: {str(e)}")
 
+def _dashboard_figures(aggregate: Dict, average_default_rate: float) -> Dict:
+    """Counts and rates of one dashboard aggregate, in the dashboard response shape"""
+    return {
+        "total_companies": aggregate["company_count"],
+        "total_predictions": aggregate["annual_count"] + aggregate["quarterly_count"],
+        "annual_predictions": aggregate["annual_count"],
+        "quarterly_predictions": aggregate["quarterly_count"],
+        "average_default_rate": round(average_default_rate, 4),
+        "high_risk_companies": aggregate["annual_high_risk"] + aggregate["quarterly_high_risk"],
+        "sectors_covered": aggregate["sectors_covered"]
+    }
+
+
+def _isoformat(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
 async def get_system_dashboard(db: Session, current_user: User):
     """Get system-wide dashboard data"""
-    total_companies = db.query(Company).count()
-    
-    annual_predictions = db.query(AnnualPrediction).count()
-    quarterly_predictions = db.query(QuarterlyPrediction).count()
-    total_predictions = annual_predictions + quarterly_predictions
-    
-    annual_avg = db.query(func.avg(AnnualPrediction.probability)).scalar() or 0
-    quarterly_avg = db.query(func.avg(QuarterlyPrediction.logistic_probability)).scalar() or 0
-    average_default_rate = (annual_avg + quarterly_avg) / 2 if (annual_avg or quarterly_avg) else 0
-    
-    high_risk_annual = db.query(AnnualPrediction).filter(AnnualPrediction.probability > 0.7).count()
-    high_risk_quarterly = db.query(QuarterlyPrediction).filter(QuarterlyPrediction.logistic_probability > 0.7).count()
-    high_risk_companies = high_risk_annual + high_risk_quarterly
-    
-    sectors_covered = db.query(Company.sector).distinct().count()
-    
-    # Get most recent update time for user's data (both annual and quarterly)
-    user_annual_last = db.query(func.max(AnnualPrediction.updated_at)).filter(
-        AnnualPrediction.created_by == str(current_user.id)
-    ).scalar()
-    user_quarterly_last = db.query(func.max(QuarterlyPrediction.updated_at)).filter(
-        QuarterlyPrediction.created_by == str(current_user.id)
-    ).scalar()
-    
-    user_last_updated = None
-    if user_annual_last and user_quarterly_last:
-        user_last_updated = max(user_annual_last, user_quarterly_last)
-    elif user_annual_last:
-        user_last_updated = user_annual_last
-    elif user_quarterly_last:
-        user_last_updated = user_quarterly_last
-    
-    # Get most recent update time for system-wide data (both annual and quarterly)
-    system_annual_last = db.query(func.max(AnnualPrediction.updated_at)).scalar()
-    system_quarterly_last = db.query(func.max(QuarterlyPrediction.updated_at)).scalar()
-    
-    system_last_updated = None
-    if system_annual_last and system_quarterly_last:
-        system_last_updated = max(system_annual_last, system_quarterly_last)
-    elif system_annual_last:
-        system_last_updated = system_annual_last
-    elif system_quarterly_last:
-        system_last_updated = system_quarterly_last
-    
+    own_scope = user_scope(current_user.id)
+    aggregates = dashboard_aggregates.read(db, [SYSTEM_SCOPE, own_scope])
+    system = aggregates[SYSTEM_SCOPE]
+
     return {
         "scope": "system",
         "user_name": current_user.full_name,
         "organization_name": "System Administrator",
-        "total_companies": total_companies,
-        "total_predictions": total_predictions,
-        "annual_predictions": annual_predictions,
-        "quarterly_predictions": quarterly_predictions,
-        "average_default_rate": round(average_default_rate, 4),
-        "high_risk_companies": high_risk_companies,
-        "sectors_covered": sectors_covered,
+        **_dashboard_figures(system, average_of_rates(system)),
         "data_scope": "All system data",
         "last_updated_times": {
-            "user_last_updated": user_last_updated.isoformat() if user_last_updated else None,
-            "system_last_updated": system_last_updated.isoformat() if system_last_updated else None
+            "user_last_updated": _isoformat(aggregates[own_scope]["last_updated_at"]),
+            "system_last_updated": _isoformat(system["last_updated_at"])
         }
     }
 
@@ -3622,241 +3272,55 @@ async def get_organization_dashboard(db: Session, current_user: User):
         raise HTTPException(status_code=404, detail="Organization not found")
     
     if current_user.role == "tenant_admin":
-        companies = db.query(Company).all()
-        annual_predictions = db.query(AnnualPrediction).all()
-        quarterly_predictions = db.query(QuarterlyPrediction).all()
+        # Cross-organization access: the figures of all organizations
+        data_scope = SYSTEM_SCOPE
         data_scope_note = " (Cross-organization access - all orgs)"
-        
-        # For tenant admin - get org-wide times and user-specific times
-        org_annual_filter = None
-        org_quarterly_filter = None
-        user_annual_filter = AnnualPrediction.created_by == str(current_user.id)
-        user_quarterly_filter = QuarterlyPrediction.created_by == str(current_user.id)
     else:
-        companies = db.query(Company).filter(
-            Company.organization_id == current_user.organization_id
-        ).all()
-        
-        annual_predictions = db.query(AnnualPrediction).filter(
-            AnnualPrediction.organization_id == current_user.organization_id
-        ).all()
-        
-        quarterly_predictions = db.query(QuarterlyPrediction).filter(
-            QuarterlyPrediction.organization_id == current_user.organization_id
-        ).all()
+        data_scope = organization_scope(current_user.organization_id)
         data_scope_note = " (Organization data only)"
-        
-        # For org members - get org-specific times and user-specific times
-        org_annual_filter = AnnualPrediction.organization_id == current_user.organization_id
-        org_quarterly_filter = QuarterlyPrediction.organization_id == current_user.organization_id
-        user_annual_filter = and_(
-            AnnualPrediction.organization_id == current_user.organization_id,
-            AnnualPrediction.created_by == str(current_user.id)
-        )
-        user_quarterly_filter = and_(
-            QuarterlyPrediction.organization_id == current_user.organization_id,
-            QuarterlyPrediction.created_by == str(current_user.id)
-        )
-    
-    total_companies = len(companies)
-    annual_predictions_count = len(annual_predictions)
-    quarterly_predictions_count = len(quarterly_predictions)
-    total_predictions = annual_predictions_count + quarterly_predictions_count
-    
-    annual_probs = [p.probability for p in annual_predictions if p.probability is not None]
-    quarterly_probs = [p.logistic_probability for p in quarterly_predictions if p.logistic_probability is not None]
-    all_probs = annual_probs + quarterly_probs
-    average_default_rate = sum(all_probs) / len(all_probs) if all_probs else 0
-    
-    high_risk_annual = len([p for p in annual_predictions if p.probability and p.probability > 0.7])
-    high_risk_quarterly = len([p for p in quarterly_predictions if p.logistic_probability and p.logistic_probability > 0.7])
-    high_risk_companies = high_risk_annual + high_risk_quarterly
-    
-    sectors = set([c.sector for c in companies if c.sector])
-    sectors_covered = len(sectors)
-    
-    # Get most recent update time for user's data
-    user_annual_last = db.query(func.max(AnnualPrediction.updated_at)).filter(
-        user_annual_filter
-    ).scalar()
-    user_quarterly_last = db.query(func.max(QuarterlyPrediction.updated_at)).filter(
-        user_quarterly_filter
-    ).scalar()
-    
-    user_last_updated = None
-    if user_annual_last and user_quarterly_last:
-        user_last_updated = max(user_annual_last, user_quarterly_last)
-    elif user_annual_last:
-        user_last_updated = user_annual_last
-    elif user_quarterly_last:
-        user_last_updated = user_quarterly_last
-    
-    # Get most recent update time for organization/system-wide data
-    if org_annual_filter is not None:
-        org_annual_last = db.query(func.max(AnnualPrediction.updated_at)).filter(
-            org_annual_filter
-        ).scalar()
-    else:
-        org_annual_last = db.query(func.max(AnnualPrediction.updated_at)).scalar()
-        
-    if org_quarterly_filter is not None:
-        org_quarterly_last = db.query(func.max(QuarterlyPrediction.updated_at)).filter(
-            org_quarterly_filter
-        ).scalar()
-    else:
-        org_quarterly_last = db.query(func.max(QuarterlyPrediction.updated_at)).scalar()
-    
-    system_last_updated = None
-    if org_annual_last and org_quarterly_last:
-        system_last_updated = max(org_annual_last, org_quarterly_last)
-    elif org_annual_last:
-        system_last_updated = org_annual_last
-    elif org_quarterly_last:
-        system_last_updated = org_quarterly_last
-    
+
+    own_scope = user_scope(current_user.id)
+    aggregates = dashboard_aggregates.read(db, [data_scope, own_scope])
+    scoped = aggregates[data_scope]
+
     return {
         "scope": "organization",
         "user_name": current_user.full_name,
         "organization_name": organization.name,
-        "total_companies": total_companies,
-        "total_predictions": total_predictions,
-        "annual_predictions": annual_predictions_count,
-        "quarterly_predictions": quarterly_predictions_count,
-        "average_default_rate": round(average_default_rate, 4),
-        "high_risk_companies": high_risk_companies,
-        "sectors_covered": sectors_covered,
+        **_dashboard_figures(scoped, pooled_rate(scoped)),
         "data_scope": f"Data within {organization.name}" + data_scope_note,
         "last_updated_times": {
-            "user_last_updated": user_last_updated.isoformat() if user_last_updated else None,
-            "system_last_updated": system_last_updated.isoformat() if system_last_updated else None
+            "user_last_updated": _isoformat(aggregates[own_scope]["last_updated_at"]),
+            "system_last_updated": _isoformat(scoped["last_updated_at"])
         }
     }
 
 async def get_personal_dashboard(db: Session, current_user: User):
     """Get personal dashboard data"""
-    companies = db.query(Company).filter(Company.created_by == str(current_user.id)).all()
-    
-    annual_predictions = db.query(AnnualPrediction).filter(AnnualPrediction.created_by == str(current_user.id)).all()
-    quarterly_predictions = db.query(QuarterlyPrediction).filter(QuarterlyPrediction.created_by == str(current_user.id)).all()
-    
-    total_companies = len(companies)
-    annual_predictions_count = len(annual_predictions)
-    quarterly_predictions_count = len(quarterly_predictions)
-    total_predictions = annual_predictions_count + quarterly_predictions_count
-    
-    annual_probs = [p.probability for p in annual_predictions if p.probability is not None]
-    quarterly_probs = [p.logistic_probability for p in quarterly_predictions if p.logistic_probability is not None]
-    all_probs = annual_probs + quarterly_probs
-    average_default_rate = sum(all_probs) / len(all_probs) if all_probs else 0
-    
-    high_risk_annual = len([p for p in annual_predictions if p.probability and p.probability > 0.7])
-    high_risk_quarterly = len([p for p in quarterly_predictions if p.logistic_probability and p.logistic_probability > 0.7])
-    high_risk_companies = high_risk_annual + high_risk_quarterly
-    
-    sectors = set([c.sector for c in companies if c.sector])
-    sectors_covered = len(sectors)
-    
-    # Get most recent update time for user's personal data
-    user_annual_last = db.query(func.max(AnnualPrediction.updated_at)).filter(
-        AnnualPrediction.created_by == str(current_user.id)
-    ).scalar()
-    user_quarterly_last = db.query(func.max(QuarterlyPrediction.updated_at)).filter(
-        QuarterlyPrediction.created_by == str(current_user.id)
-    ).scalar()
-    
-    user_last_updated = None
-    if user_annual_last and user_quarterly_last:
-        user_last_updated = max(user_annual_last, user_quarterly_last)
-    elif user_annual_last:
-        user_last_updated = user_annual_last
-    elif user_quarterly_last:
-        user_last_updated = user_quarterly_last
-    
-    # Get most recent update time for all system data (for comparison)
-    system_annual_last = db.query(func.max(AnnualPrediction.updated_at)).scalar()
-    system_quarterly_last = db.query(func.max(QuarterlyPrediction.updated_at)).scalar()
-    
-    system_last_updated = None
-    if system_annual_last and system_quarterly_last:
-        system_last_updated = max(system_annual_last, system_quarterly_last)
-    elif system_annual_last:
-        system_last_updated = system_annual_last
-    elif system_quarterly_last:
-        system_last_updated = system_quarterly_last
-    
+    own_scope = user_scope(current_user.id)
+    aggregates = dashboard_aggregates.read(db, [own_scope, SYSTEM_SCOPE])
+    personal = aggregates[own_scope]
+
     return {
         "scope": "personal",
         "user_name": current_user.full_name,
         "organization_name": "Personal Data",
-        "total_companies": total_companies,
-        "total_predictions": total_predictions,
-        "annual_predictions": annual_predictions_count,
-        "quarterly_predictions": quarterly_predictions_count,
-        "average_default_rate": round(average_default_rate, 4),
-        "high_risk_companies": high_risk_companies,
-        "sectors_covered": sectors_covered,
+        **_dashboard_figures(personal, pooled_rate(personal)),
         "data_scope": "Personal data only",
         "last_updated_times": {
-            "user_last_updated": user_last_updated.isoformat() if user_last_updated else None,
-            "system_last_updated": system_last_updated.isoformat() if system_last_updated else None
+            "user_last_updated": _isoformat(personal["last_updated_at"]),
+            "system_last_updated": _isoformat(aggregates[SYSTEM_SCOPE]["last_updated_at"])
         }
     }
 
 async def get_platform_statistics(db: Session):
     """Get platform-wide statistics - ONLY SYSTEM-LEVEL DATA (access_level='system')"""
-    # Only count companies with system-level access (created by super admin)
-    total_companies = db.query(Company).filter(Company.access_level == "system").count()
-    
-    # Only count predictions with system-level access
-    total_annual = db.query(AnnualPrediction).filter(AnnualPrediction.access_level == "system").count()
-    total_quarterly = db.query(QuarterlyPrediction).filter(QuarterlyPrediction.access_level == "system").count()
-    total_predictions = total_annual + total_quarterly
-    
-    # Average default rate for system-level data only
-    annual_avg = db.query(func.avg(AnnualPrediction.probability)).filter(AnnualPrediction.access_level == "system").scalar() or 0
-    quarterly_avg = db.query(func.avg(QuarterlyPrediction.logistic_probability)).filter(QuarterlyPrediction.access_level == "system").scalar() or 0
-    platform_avg_default = (annual_avg + quarterly_avg) / 2 if (annual_avg or quarterly_avg) else 0
-    
-    # High risk count for system-level data only
-    high_risk_annual = db.query(AnnualPrediction).filter(
-        AnnualPrediction.access_level == "system",
-        AnnualPrediction.probability > 0.7
-    ).count()
-    high_risk_quarterly = db.query(QuarterlyPrediction).filter(
-        QuarterlyPrediction.access_level == "system",
-        QuarterlyPrediction.logistic_probability > 0.7
-    ).count()
-    platform_high_risk = high_risk_annual + high_risk_quarterly
-    
-    # Sectors covered in system-level companies only
-    platform_sectors = db.query(Company.sector).filter(Company.access_level == "system").distinct().count()
-    
-    # Get most recent update time for system-level data only
-    system_annual_last = db.query(func.max(AnnualPrediction.updated_at)).filter(
-        AnnualPrediction.access_level == "system"
-    ).scalar()
-    system_quarterly_last = db.query(func.max(QuarterlyPrediction.updated_at)).filter(
-        QuarterlyPrediction.access_level == "system"
-    ).scalar()
-    
-    system_last_updated = None
-    if system_annual_last and system_quarterly_last:
-        system_last_updated = max(system_annual_last, system_quarterly_last)
-    elif system_annual_last:
-        system_last_updated = system_annual_last
-    elif system_quarterly_last:
-        system_last_updated = system_quarterly_last
-    
+    platform = dashboard_aggregates.read(db, [PLATFORM_SCOPE])[PLATFORM_SCOPE]
+
     return {
-        "total_companies": total_companies,
-        "total_predictions": total_predictions,
-        "annual_predictions": total_annual,
-        "quarterly_predictions": total_quarterly,
-        "average_default_rate": round(platform_avg_default, 4),
-        "high_risk_companies": platform_high_risk,
-        "sectors_covered": platform_sectors,
+        **_dashboard_figures(platform, average_of_rates(platform)),
         "last_updated_times": {
-            "system_last_updated": system_last_updated.isoformat() if system_last_updated else None
+            "system_last_updated": _isoformat(platform["last_updated_at"])
         }
     }
 
@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, ForeignKey, Text, Boolean, Index
+from sqlalchemy import create_engine, Column, Integer, String, DateTime, ForeignKey, Text, Boolean, Index, Float, literal_column
 from sqlalchemy.types import Numeric
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.ext.declarative import declarative_base
@@ -125,6 +125,11 @@ class Company(Base):
     
     __table_args__ = (
         Index('ix_company_symbol_org', 'symbol', 'organization_id', unique=True),
+        # Keyset pagination of company listings for each sort field
+        Index('idx_company_name_id', 'name', 'id'),
+        Index('idx_company_symbol_id', 'symbol', 'id'),
+        Index('idx_company_market_cap_id', 'market_cap', 'id'),
+        Index('idx_company_created_at_id', 'created_at', 'id'),
     )
     
     # Relationships
@@ -157,6 +162,8 @@ class AnnualPrediction(Base):
     predicted_at = Column(DateTime, nullable=True)
     
     created_by = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)
+    # Bulk upload job that last wrote this row (NULL for single predictions)
+    bulk_upload_job_id = Column(UUID(as_uuid=True), ForeignKey("bulk_upload_jobs.id", ondelete="SET NULL"), nullable=True)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
@@ -166,6 +173,21 @@ class AnnualPrediction(Base):
         Index('idx_annual_company_reporting_year', 'company_id', 'reporting_year'),
         Index('idx_annual_organization', 'organization_id'),
         Index('idx_annual_created_by', 'created_by'),
+        Index('idx_annual_bulk_upload_job', 'bulk_upload_job_id'),
+        # Keyset pagination: newest first overall, within an access level, an organization or a creator
+        Index('idx_annual_created_at_id', 'created_at', 'id'),
+        Index('idx_annual_company_created_at_id', 'company_id', 'created_at', 'id'),
+        Index('idx_annual_access_created_at_id', 'access_level', 'created_at', 'id'),
+        Index('idx_annual_org_created_at_id', 'organization_id', 'created_at', 'id'),
+        Index('idx_annual_creator_created_at_id', 'created_by', 'created_at', 'id'),
+        # Natural key: companies are already per-scope rows, so company + access level pins the scope.
+        # A NULL quarter counts as one value, hence the COALESCE.
+        # The '' is a literal so ON CONFLICT targets compile to the same expression as the index.
+        Index(
+            'uq_annual_natural_key',
+            company_id, reporting_year, func.coalesce(reporting_quarter, literal_column("''")), access_level,
+            unique=True
+        ),
     )
 
 class QuarterlyPrediction(Base):
@@ -193,6 +215,8 @@ class QuarterlyPrediction(Base):
     predicted_at = Column(DateTime, nullable=True)
     
     created_by = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)
+    # Bulk upload job that last wrote this row (NULL for single predictions)
+    bulk_upload_job_id = Column(UUID(as_uuid=True), ForeignKey("bulk_upload_jobs.id", ondelete="SET NULL"), nullable=True)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
@@ -202,6 +226,17 @@ class QuarterlyPrediction(Base):
         Index('idx_quarterly_company_reporting_year_quarter', 'company_id', 'reporting_year', 'reporting_quarter'),
         Index('idx_quarterly_organization', 'organization_id'),
         Index('idx_quarterly_created_by', 'created_by'),
+        Index('idx_quarterly_bulk_upload_job', 'bulk_upload_job_id'),
+        Index('idx_quarterly_created_at_id', 'created_at', 'id'),
+        Index('idx_quarterly_company_created_at_id', 'company_id', 'created_at', 'id'),
+        Index('idx_quarterly_access_created_at_id', 'access_level', 'created_at', 'id'),
+        Index('idx_quarterly_org_created_at_id', 'organization_id', 'created_at', 'id'),
+        Index('idx_quarterly_creator_created_at_id', 'created_by', 'created_at', 'id'),
+        Index(
+            'uq_quarterly_natural_key',
+            company_id, reporting_year, reporting_quarter, access_level,
+            unique=True
+        ),
     )
 
 class BulkUploadJob(Base):
@@ -240,8 +275,72 @@ class BulkUploadJob(Base):
         Index('idx_bulk_job_user', 'user_id'),
         Index('idx_bulk_job_org', 'organization_id'),
         Index('idx_bulk_job_created', 'created_at'),
+        Index('idx_bulk_job_user_created_id', 'user_id', 'created_at', 'id'),
+        Index('idx_bulk_job_org_created_id', 'organization_id', 'created_at', 'id'),
     )
 
+class BulkUploadCheckpoint(Base):
+    __tablename__ = "bulk_upload_checkpoints"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    job_id = Column(UUID(as_uuid=True), ForeignKey("bulk_upload_jobs.id", ondelete="CASCADE"), nullable=False)
+    part = Column(Integer, nullable=False, default=0)  # 0 for single-task jobs, the chunk index for chunked ones
+
+    # Highest upload row number whose outcome is committed; written in the same transaction as the rows
+    last_row = Column(Integer, nullable=False, default=0)
+    successful_rows = Column(Integer, default=0)
+    updated_rows = Column(Integer, default=0)
+    failed_rows = Column(Integer, default=0)
+    error_details = Column(Text, nullable=True)  # no longer written; row errors are staged to bulk_upload_job_errors
+
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index('idx_bulk_checkpoint_job_part', 'job_id', 'part', unique=True),
+    )
+
+class BulkUploadJobError(Base):
+    __tablename__ = "bulk_upload_job_errors"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job_id = Column(UUID(as_uuid=True), ForeignKey("bulk_upload_jobs.id", ondelete="CASCADE"), nullable=False)
+    part = Column(Integer, nullable=False, default=0)  # writer of the error: 0, or the chunk index for chunked jobs
+
+    row_number = Column(Integer, nullable=True)  # 1-based upload row, NULL for errors of the whole job or chunk
+    error_code = Column(String(40), nullable=False)
+    message = Column(Text, nullable=False)
+
+    created_at = Column(DateTime, default=func.now())
+
+    __table_args__ = (
+        Index('idx_bulk_job_error_job_row', 'job_id', 'row_number'),
+        Index('idx_bulk_job_error_job_part', 'job_id', 'part'),
+    )
+
+class DashboardAggregate(Base):
+    __tablename__ = "dashboard_aggregates"
+
+    # system (all data), platform (access_level 'system'), organization or user (created_by)
+    scope_type = Column(String(20), primary_key=True)
+    scope_id = Column(String(64), primary_key=True, default="")  # organization/user id, '' for system and platform
+
+    company_count = Column(Integer, nullable=False, default=0)
+    sectors_covered = Column(Integer, nullable=False, default=0)
+
+    annual_count = Column(Integer, nullable=False, default=0)
+    annual_probability_sum = Column(Float, nullable=False, default=0.0)
+    annual_probability_count = Column(Integer, nullable=False, default=0)  # rows with a probability
+    annual_high_risk = Column(Integer, nullable=False, default=0)
+
+    quarterly_count = Column(Integer, nullable=False, default=0)
+    quarterly_probability_sum = Column(Float, nullable=False, default=0.0)  # of logistic_probability
+    quarterly_probability_count = Column(Integer, nullable=False, default=0)
+    quarterly_high_risk = Column(Integer, nullable=False, default=0)
+
+    last_updated_at = Column(DateTime, nullable=True)  # latest prediction write in the scope
+    refreshed_at = Column(DateTime, nullable=True)  # last full recount (UTC)
+
 def get_database_url():
     """Get database URL with proper fallback and validation"""
     import os
@@ -285,7 +285,11 @@ def create_app() -> FastAPI:
                 health_status["services"]["ml_models"] = {
                     "status": "healthy",
                     "loaded": True,
-                    "models": ["annual_prediction", "quarterly_prediction"]
+                    "models": ["annual_prediction", "quarterly_prediction"],
+                    "prediction_cache": {
+                        "annual": ml_model.prediction_cache.stats(),
+                        "quarterly": quarterly_ml_model.prediction_cache.stats()
+                    }
                 }
             else:
                 health_status["services"]["ml_models"] = {
@@ -18,10 +18,13 @@ class WhitelistStatus(str, Enum):
 class PaginatedResponse(BaseModel):
     """Generic paginated response schema."""
     items: List[dict]
-    total: int
+    total: Optional[int] = None  # not counted when paging by cursor
     page: int
     size: int
-    pages: int
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None
+    total_is_estimate: bool = False
+    count_source: str = "exact"  # exact, aggregate, planner or none
 
 class UserBase(BaseModel):
     email: EmailStr
@@ -406,7 +409,7 @@ class PredictionResponse(BaseModel):
     reporting_year: str
     reporting_quarter: str
     logistic_probability: float
-    gbm_probability: float
+    gbm_probability: Optional[float]
     ensemble_probability: float
     risk_level: str
     confidence: float
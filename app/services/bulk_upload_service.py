@@ -198,7 +198,8 @@ class BulkUploadService:
                         risk_level=ml_result['risk_level'],
                         confidence=self.safe_float(ml_result['confidence']),
                         predicted_at=datetime.utcnow(),
-                        created_by=user_id
+                        created_by=user_id,
+                        bulk_upload_job_id=job_id
                     )
                     
                     db.add(prediction)
@@ -301,7 +302,8 @@ class BulkUploadService:
                         risk_level=ml_result['risk_level'],
                         confidence=self.safe_float(ml_result['confidence']),
                         predicted_at=datetime.utcnow(),
-                        created_by=user_id
+                        created_by=user_id,
+                        bulk_upload_job_id=job_id
                     )
                     
                     db.add(prediction)
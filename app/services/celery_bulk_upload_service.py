@@ -2,16 +2,38 @@
 
 import pandas as pd
 import io
+import os
 import json
+import math
+import time
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
 from sqlalchemy.orm import Session
 from app.core.database import get_session_local, BulkUploadJob
+from app.services.payload_store import PayloadRef, is_payload_ref, payload_row_count, payload_store
+from app.services.job_progress import job_progress
+from app.services.throughput_stats import throughput_stats
+from app.services.job_errors import job_error_details
 import uuid
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Annual uploads with at least this many rows are split into chunks processed
+# in parallel by the workers (0 disables chunking, see chunked_tasks)
+CHUNK_THRESHOLD_ROWS = int(os.getenv("BULK_CHUNK_THRESHOLD", "5000"))
+
+# Seconds the auto-scaling snapshot shown with uploads and job status is reused
+SCALING_STATUS_CACHE_SECONDS = float(os.getenv("SCALING_STATUS_CACHE_SECONDS", "30"))
+
+# Once throughput is measured, jobs expected to run up to these many seconds
+# go to high_priority / medium_priority, anything longer to low_priority
+HIGH_PRIORITY_MAX_SECONDS = float(os.getenv("HIGH_PRIORITY_MAX_SECONDS", "60"))
+MEDIUM_PRIORITY_MAX_SECONDS = float(os.getenv("MEDIUM_PRIORITY_MAX_SECONDS", "600"))
+
+# Measured annual uploads are split so that each chunk runs about this long
+TARGET_CHUNK_SECONDS = float(os.getenv("BULK_TARGET_CHUNK_SECONDS", "180"))
+
 
 class CeleryBulkUploadService:
     """
@@ -19,6 +41,8 @@ class CeleryBulkUploadService:
     for more robust, scalable processing
     """
     
+    _scaling_status_cache = (0.0, None)
+    
     async def create_bulk_upload_job(
         self, 
         user_id: str,
@@ -59,26 +83,30 @@ class CeleryBulkUploadService:
     async def process_annual_bulk_upload(
         self,
         job_id: str,
-        data: List[Dict[str, Any]],
+        data: Union[List[Dict[str, Any]], PayloadRef],
         user_id: str,
-        organization_id: Optional[str]
+        organization_id: Optional[str],
+        conflict_policy: Optional[str] = None
     ) -> Dict[str, Any]:  # Enhanced return type
         """
         Start async annual bulk upload processing using Celery with smart queue routing
         
+        ``data`` is either the parsed rows or a payload store reference from
+        upload ingestion; rows are stored once and workers get the reference.
+        
         Returns:
             Dictionary with task info and auto-scaling details
         """
         try:
             from app.workers.tasks import process_annual_bulk_upload_task
-            from app.services.auto_scaling_service import auto_scaling_service
+            from app.workers.chunked_tasks import CHUNK_COUNT, split_annual_upload_task
             
-            # SMART QUEUE ROUTING based on file size
-            total_rows = len(data)
-            queue_priority = self._get_task_queue(total_rows)
+            # SMART QUEUE ROUTING based on measured throughput (file size until measured)
+            total_rows = payload_row_count(data)
+            queue_priority = self._get_task_queue(total_rows, 'annual')
             
             # Get current system capacity for user feedback
-            scaling_status = await auto_scaling_service.get_scaling_status()
+            scaling_status = await self._get_scaling_status()
             current_workers = scaling_status.get('scaling_recommendation', {}).get('current_workers', 4)
             queue_metrics = scaling_status.get('queue_metrics', {})
             
@@ -89,19 +117,34 @@ class CeleryBulkUploadService:
             if not user_id or user_id in ['', 'null', 'undefined']:
                 raise ValueError(f"Invalid user_id parameter: '{user_id}'")
                 
-            if not data or not isinstance(data, list):
+            if not data or not (isinstance(data, list) or is_payload_ref(data)):
                 raise ValueError(f"Invalid data parameter: type={type(data)}, length={len(data) if hasattr(data, '__len__') else 'N/A'}")
             
-            # Log data size for debugging
-            data_size_mb = len(str(data).encode('utf-8')) / (1024 * 1024)
-            logger.info(f"📦 Sending ANNUAL task to worker: job_id='{job_id}', user_id='{user_id}', data_rows={total_rows}, data_size_mb={data_size_mb:.2f}")
-            
-            # Apply task with smart routing
-            task = process_annual_bulk_upload_task.apply_async(
-                args=[job_id, data, user_id, organization_id],
-                queue=queue_priority,
-                routing_key=queue_priority
-            )
+            # Store the rows once and send workers only a reference to them
+            payload_ref = data if is_payload_ref(data) else payload_store.put(pd.DataFrame(data), name=job_id)
+            data_size_mb = payload_ref['bytes'] / (1024 * 1024)
+            chunk_count = self._plan_chunks(total_rows, CHUNK_COUNT)
+            chunked = chunk_count > 1
+            logger.info(f"📦 Sending ANNUAL task to worker: job_id='{job_id}', user_id='{user_id}', data_rows={total_rows}, payload={payload_ref['payload_store']}/{payload_ref['format']}, data_size_mb={data_size_mb:.2f}, chunked={chunked}")
+            
+            throughput_stats.note_dispatch(job_id, queue_priority, 'annual', chunk_count)
+            
+            if chunked:
+                # Large upload: a worker splits it by company and fans the chunks out as a chord
+                task = split_annual_upload_task.apply_async(
+                    args=[job_id, payload_ref, user_id, organization_id],
+                    kwargs={'conflict_policy': conflict_policy, 'queue': queue_priority, 'chunk_count': chunk_count},
+                    queue=queue_priority,
+                    routing_key=queue_priority
+                )
+            else:
+                # Apply task with smart routing
+                task = process_annual_bulk_upload_task.apply_async(
+                    args=[job_id, payload_ref, user_id, organization_id],
+                    kwargs={'conflict_policy': conflict_policy},
+                    queue=queue_priority,
+                    routing_key=queue_priority
+                )
             
             SessionLocal = get_session_local()
             db = SessionLocal()
@@ -109,9 +152,11 @@ class CeleryBulkUploadService:
             try:
                 job = db.query(BulkUploadJob).filter(BulkUploadJob.id == job_id).first()
                 if job:
-                    if hasattr(job, 'celery_task_id'):
+                    # A fast worker may already own the job (and, when chunked, its chord task id)
+                    if hasattr(job, 'celery_task_id') and not job.celery_task_id:
                         job.celery_task_id = task.id
-                    job.status = 'queued'
+                    if job.status == 'pending':
+                        job.status = 'queued'
                     db.commit()
             except Exception as e:
                 logger.error(f"Error updating job with task ID: {str(e)}")
@@ -120,15 +165,16 @@ class CeleryBulkUploadService:
             
             # Calculate queue position and estimated completion
             queue_position = queue_metrics.get(queue_priority, {}).get('pending_tasks', 0) + 1
-            estimated_minutes = self._calculate_estimated_time(total_rows, queue_priority, current_workers)
+            estimated_minutes = self._calculate_estimated_time(total_rows, queue_priority, current_workers, 'annual', chunk_count)
             
             return {
                 'task_id': task.id,
+                'chunked': chunked,
                 'queue_priority': queue_priority,
                 'queue_position': queue_position,
                 'current_worker_capacity': current_workers * 8,  # 8 workers per instance
                 'estimated_time_minutes': estimated_minutes,
-                'processing_message': self._get_processing_message(total_rows, queue_priority),
+                'processing_message': self._get_processing_message(total_rows, queue_priority, estimated_minutes),
                 'system_load': self._get_system_load_status(queue_metrics)
             }
             
@@ -139,26 +185,29 @@ class CeleryBulkUploadService:
     async def process_quarterly_bulk_upload(
         self,
         job_id: str,
-        data: List[Dict[str, Any]],
+        data: Union[List[Dict[str, Any]], PayloadRef],
         user_id: str,
-        organization_id: Optional[str]
+        organization_id: Optional[str],
+        conflict_policy: Optional[str] = None
     ) -> Dict[str, Any]:  # Enhanced return type
         """
         Start async quarterly bulk upload processing using Celery with smart queue routing
         
+        ``data`` is either the parsed rows or a payload store reference from
+        upload ingestion; rows are stored once and workers get the reference.
+        
         Returns:
             Dictionary with task info and auto-scaling details
         """
         try:
             from app.workers.tasks import process_quarterly_bulk_upload_task
-            from app.services.auto_scaling_service import auto_scaling_service
             
-            # SMART QUEUE ROUTING based on file size
-            total_rows = len(data)
-            queue_priority = self._get_task_queue(total_rows)
+            # SMART QUEUE ROUTING based on measured throughput (file size until measured)
+            total_rows = payload_row_count(data)
+            queue_priority = self._get_task_queue(total_rows, 'quarterly')
             
             # Get current system capacity for user feedback
-            scaling_status = await auto_scaling_service.get_scaling_status()
+            scaling_status = await self._get_scaling_status()
             current_workers = scaling_status.get('scaling_recommendation', {}).get('current_workers', 4)
             queue_metrics = scaling_status.get('queue_metrics', {})
             
@@ -169,16 +218,20 @@ class CeleryBulkUploadService:
             if not user_id or user_id in ['', 'null', 'undefined']:
                 raise ValueError(f"Invalid user_id parameter: '{user_id}'")
                 
-            if not data or not isinstance(data, list):
+            if not data or not (isinstance(data, list) or is_payload_ref(data)):
                 raise ValueError(f"Invalid data parameter: type={type(data)}, length={len(data) if hasattr(data, '__len__') else 'N/A'}")
             
-            # Log data size for debugging
-            data_size_mb = len(str(data).encode('utf-8')) / (1024 * 1024)
-            logger.info(f"📦 Sending QUARTERLY task to worker: job_id='{job_id}', user_id='{user_id}', data_rows={total_rows}, data_size_mb={data_size_mb:.2f}")
+            # Store the rows once and send workers only a reference to them
+            payload_ref = data if is_payload_ref(data) else payload_store.put(pd.DataFrame(data), name=job_id)
+            data_size_mb = payload_ref['bytes'] / (1024 * 1024)
+            logger.info(f"📦 Sending QUARTERLY task to worker: job_id='{job_id}', user_id='{user_id}', data_rows={total_rows}, payload={payload_ref['payload_store']}/{payload_ref['format']}, data_size_mb={data_size_mb:.2f}")
+            
+            throughput_stats.note_dispatch(job_id, queue_priority, 'quarterly')
             
             # Apply task with smart routing
             task = process_quarterly_bulk_upload_task.apply_async(
-                args=[job_id, data, user_id, organization_id],
+                args=[job_id, payload_ref, user_id, organization_id],
+                kwargs={'conflict_policy': conflict_policy},
                 queue=queue_priority,
                 routing_key=queue_priority
             )
@@ -189,9 +242,11 @@ class CeleryBulkUploadService:
             try:
                 job = db.query(BulkUploadJob).filter(BulkUploadJob.id == job_id).first()
                 if job:
-                    if hasattr(job, 'celery_task_id'):
+                    # A fast worker may already have started the job
+                    if hasattr(job, 'celery_task_id') and not job.celery_task_id:
                         job.celery_task_id = task.id
-                    job.status = 'queued'
+                    if job.status == 'pending':
+                        job.status = 'queued'
                     db.commit()
             except Exception as e:
                 logger.error(f"Error updating job with task ID: {str(e)}")
@@ -200,7 +255,7 @@ class CeleryBulkUploadService:
             
             # Calculate queue position and estimated completion
             queue_position = queue_metrics.get(queue_priority, {}).get('pending_tasks', 0) + 1
-            estimated_minutes = self._calculate_estimated_time(total_rows, queue_priority, current_workers)
+            estimated_minutes = self._calculate_estimated_time(total_rows, queue_priority, current_workers, 'quarterly')
             
             return {
                 'task_id': task.id,
@@ -208,7 +263,7 @@ class CeleryBulkUploadService:
                 'queue_position': queue_position,
                 'current_worker_capacity': current_workers * 8,  # 8 workers per instance
                 'estimated_time_minutes': estimated_minutes,
-                'processing_message': self._get_processing_message(total_rows, queue_priority),
+                'processing_message': self._get_processing_message(total_rows, queue_priority, estimated_minutes),
                 'system_load': self._get_system_load_status(queue_metrics)
             }
             
@@ -240,11 +295,13 @@ class CeleryBulkUploadService:
                 except Exception as e:
                     logger.warning(f"Could not get Celery task status: {str(e)}")
             
+            processed_rows, successful_rows, failed_rows, live_progress = self._job_counters(job)
+            
             # Calculate progress percentage
             progress_percentage = 0
-            if job.total_rows and job.total_rows > 0 and job.processed_rows is not None:
+            if job.total_rows and job.total_rows > 0 and processed_rows is not None:
                 try:
-                    progress = (job.processed_rows / job.total_rows) * 100
+                    progress = (processed_rows / job.total_rows) * 100
                     import math
                     progress_percentage = round(progress, 2) if not (math.isnan(progress) or math.isinf(progress)) else 0
                 except (ZeroDivisionError, TypeError):
@@ -257,15 +314,16 @@ class CeleryBulkUploadService:
                 'job_type': job.job_type,
                 'original_filename': job.original_filename,
                 'total_rows': job.total_rows or 0,
-                'processed_rows': job.processed_rows or 0,
-                'successful_rows': job.successful_rows or 0,
-                'failed_rows': job.failed_rows or 0,
+                'processed_rows': processed_rows or 0,
+                'successful_rows': successful_rows or 0,
+                'failed_rows': failed_rows or 0,
                 'error_message': job.error_message,
-                'error_details': json.loads(job.error_details) if job.error_details else None,
+                'error_details': job_error_details(job),
                 'created_at': job.created_at.isoformat() if job.created_at else None,
                 'started_at': job.started_at.isoformat() if job.started_at else None,
                 'completed_at': job.completed_at.isoformat() if job.completed_at else None,
                 'progress_percentage': progress_percentage,
+                'progress_updated_at': datetime.utcfromtimestamp(live_progress['updated_at']).isoformat() if live_progress and live_progress['updated_at'] else None,
                 'celery_task_id': celery_task_id,
                 'celery_status': celery_status,
                 'celery_meta': celery_meta
@@ -273,14 +331,13 @@ class CeleryBulkUploadService:
             
             # ADD AUTO-SCALING INFORMATION
             try:
-                from app.services.auto_scaling_service import auto_scaling_service
-                
-                scaling_status = await auto_scaling_service.get_scaling_status()
+                scaling_status = await self._get_scaling_status()
                 queue_metrics = scaling_status.get('queue_metrics', {})
                 current_workers = scaling_status.get('scaling_recommendation', {}).get('current_workers', 4)
                 
-                # Determine queue priority based on file size
-                queue_priority = self._get_task_queue(job.total_rows or 0)
+                # The queue the job was dispatched to (re-derived once the dispatch note is gone)
+                dispatch = throughput_stats.dispatch(job_id) or {}
+                queue_priority = dispatch.get('queue') or self._get_task_queue(job.total_rows or 0, job.job_type)
                 
                 # Get current queue position (if still pending/processing)
                 queue_position = 0
@@ -289,11 +346,14 @@ class CeleryBulkUploadService:
                 
                 # Calculate estimated completion time
                 estimated_completion = None
-                if job.status == 'processing' and job.total_rows and job.processed_rows is not None:
-                    remaining_rows = job.total_rows - job.processed_rows
+                if job.status == 'processing' and job.total_rows and processed_rows is not None:
+                    remaining_rows = job.total_rows - processed_rows
                     if remaining_rows > 0:
-                        estimated_minutes = self._calculate_estimated_time(remaining_rows, queue_priority, current_workers)
-                        from datetime import datetime, timedelta
+                        estimated_minutes = self._calculate_estimated_time(
+                            remaining_rows, queue_priority, current_workers, job.job_type,
+                            tasks=dispatch.get('tasks', 1), include_wait=False
+                        )
+                        from datetime import timedelta
                         estimated_completion = (datetime.now() + timedelta(minutes=estimated_minutes)).isoformat()
                 
                 # Add auto-scaling fields
@@ -318,7 +378,7 @@ class CeleryBulkUploadService:
                     'processing_rate': '4.0 tasks/min'
                 })
             
-            return job_data
+            return response
             
         except Exception as e:
             logger.error(f"Error getting job status: {str(e)}")
@@ -349,10 +409,12 @@ class CeleryBulkUploadService:
                 except Exception as e:
                     logger.warning(f"Could not get Celery task status: {str(e)}")
             
+            processed_rows, successful_rows, failed_rows, live_progress = self._job_counters(job)
+            
             progress_percentage = 0
-            if job.total_rows and job.total_rows > 0 and job.processed_rows is not None:
+            if job.total_rows and job.total_rows > 0 and processed_rows is not None:
                 try:
-                    progress = (job.processed_rows / job.total_rows) * 100
+                    progress = (processed_rows / job.total_rows) * 100
                     import math
                     progress_percentage = round(progress, 2) if not (math.isnan(progress) or math.isinf(progress)) else 0
                 except (ZeroDivisionError, TypeError):
@@ -364,15 +426,16 @@ class CeleryBulkUploadService:
                 'job_type': job.job_type,
                 'original_filename': job.original_filename,
                 'total_rows': job.total_rows or 0,
-                'processed_rows': job.processed_rows or 0,
-                'successful_rows': job.successful_rows or 0,
-                'failed_rows': job.failed_rows or 0,
+                'processed_rows': processed_rows or 0,
+                'successful_rows': successful_rows or 0,
+                'failed_rows': failed_rows or 0,
                 'error_message': job.error_message,
-                'error_details': json.loads(job.error_details) if job.error_details else None,
+                'error_details': job_error_details(job),
                 'created_at': job.created_at.isoformat() if job.created_at else None,
                 'started_at': job.started_at.isoformat() if job.started_at else None,
                 'completed_at': job.completed_at.isoformat() if job.completed_at else None,
                 'progress_percentage': progress_percentage,
+                'progress_updated_at': datetime.utcfromtimestamp(live_progress['updated_at']).isoformat() if live_progress and live_progress['updated_at'] else None,
                 'celery_task_id': celery_task_id,
                 'celery_status': celery_status,
                 'celery_meta': celery_meta
@@ -386,9 +449,54 @@ class CeleryBulkUploadService:
         finally:
             db.close()
     
+    def _job_counters(self, job: BulkUploadJob):
+        """
+        (processed, successful, failed, live_progress) for a job
+
+        Running jobs report live counters from Redis (job_progress); the job
+        row is only written through periodically and at completion.
+        """
+        processed_rows, successful_rows, failed_rows = job.processed_rows, job.successful_rows, job.failed_rows
+        live_progress = job_progress.get(str(job.id)) if job.status in ['pending', 'queued', 'processing'] else None
+        if live_progress:
+            processed_rows = max(processed_rows or 0, live_progress['processed'])
+            successful_rows = max(successful_rows or 0, live_progress['successful'])
+            failed_rows = max(failed_rows or 0, live_progress['failed'])
+        return processed_rows, successful_rows, failed_rows, live_progress
+    
+    async def _get_scaling_status(self) -> Dict[str, Any]:
+        """
+        Auto-scaling status for job feedback, cached for SCALING_STATUS_CACHE_SECONDS
+
+        Building it broadcasts Celery inspect calls that take seconds, which
+        would otherwise be paid by every upload and every status poll.
+        """
+        cached_at, status = self._scaling_status_cache
+        if status is not None and time.monotonic() - cached_at < SCALING_STATUS_CACHE_SECONDS:
+            return status
+        from app.services.auto_scaling_service import auto_scaling_service
+        status = await auto_scaling_service.get_scaling_status()
+        self._scaling_status_cache = (time.monotonic(), status)
+        return status
+    
     # AUTO-SCALING HELPER METHODS
-    def _get_task_queue(self, total_rows: int) -> str:
-        """Determine optimal queue based on file size"""
+    def _get_task_queue(self, total_rows: int, job_type: str = 'annual') -> str:
+        """
+        Determine optimal queue from the job's expected run time
+
+        The run time comes from the measured rows/sec of the job type (see
+        throughput_stats), so small jobs stay on high_priority and never queue
+        behind large ones; until enough jobs are measured, file size decides.
+        """
+        rate = throughput_stats.rows_per_second(job_type)
+        if rate:
+            expected_seconds = total_rows / rate
+            if expected_seconds <= HIGH_PRIORITY_MAX_SECONDS:
+                return "high_priority"
+            elif expected_seconds <= MEDIUM_PRIORITY_MAX_SECONDS:
+                return "medium_priority"
+            return "low_priority"
+        
         if total_rows < 2000:
             return "high_priority"    # Small files - process immediately
         elif total_rows < 8000:
@@ -396,8 +504,42 @@ class CeleryBulkUploadService:
         else:
             return "low_priority"     # Large files - background processing
     
-    def _calculate_estimated_time(self, total_rows: int, queue_priority: str, current_workers: int) -> int:
-        """Calculate estimated processing time based on queue and system load"""
+    def _plan_chunks(self, total_rows: int, max_chunks: int) -> int:
+        """
+        Number of parallel chunks for an annual upload (1 = a single task)
+
+        With measured throughput, enough chunks for each to run about
+        TARGET_CHUNK_SECONDS; before that, max_chunks from CHUNK_THRESHOLD_ROWS up.
+        """
+        if not CHUNK_THRESHOLD_ROWS or max_chunks <= 1:
+            return 1
+        rate = throughput_stats.rows_per_second('annual')
+        if rate:
+            return max(1, min(max_chunks, math.ceil(total_rows / (rate * TARGET_CHUNK_SECONDS))))
+        return max_chunks if total_rows >= CHUNK_THRESHOLD_ROWS else 1
+    
+    def _calculate_estimated_time(
+        self,
+        total_rows: int,
+        queue_priority: str,
+        current_workers: int,
+        job_type: str = 'annual',
+        tasks: int = 1,
+        include_wait: bool = True
+    ) -> int:
+        """
+        Calculate estimated processing time in minutes
+
+        Measured: median queue wait (unless the job already started) plus the
+        rows over the median per-task rows/sec times the job's parallel tasks.
+        Unmeasured: static per-queue rates scaled by worker count.
+        """
+        rate = throughput_stats.rows_per_second(job_type, queue_priority)
+        if rate:
+            wait = (throughput_stats.wait_seconds(queue_priority) or 0) if include_wait else 0
+            seconds = wait + total_rows / (rate * max(tasks, 1))
+            return max(1, math.ceil(seconds / 60))
+        
         base_processing_rates = {
             "high_priority": 100,    # rows per minute
             "medium_priority": 60,   # rows per minute  
@@ -420,14 +562,15 @@ class CeleryBulkUploadService:
         buffer = queue_buffers.get(queue_priority, 1.5)
         return int(estimated_minutes * buffer)
     
-    def _get_processing_message(self, total_rows: int, queue_priority: str) -> str:
+    def _get_processing_message(self, total_rows: int, queue_priority: str, estimated_minutes: int) -> str:
         """Get user-friendly processing message"""
-        messages = {
-            "high_priority": f"Fast processing - Results in 2-5 minutes ({total_rows:,} rows)",
-            "medium_priority": f"Standard processing - Results in 10-20 minutes ({total_rows:,} rows)",
-            "low_priority": f"Large file processing - Results in 20-40 minutes ({total_rows:,} rows)"
+        labels = {
+            "high_priority": "Fast processing",
+            "medium_priority": "Standard processing",
+            "low_priority": "Large file processing"
         }
-        return messages.get(queue_priority, f"Processing {total_rows:,} rows")
+        label = labels.get(queue_priority, "Processing")
+        return f"{label} - Results in about {estimated_minutes} minute{'s' if estimated_minutes != 1 else ''} ({total_rows:,} rows)"
     
     def _get_system_load_status(self, queue_metrics: dict) -> str:
         """Determine current system load status"""
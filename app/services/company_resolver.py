@@ -0,0 +1,361 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from ..core.database import Company
+
+logger = logging.getLogger(__name__)
+
+IN_CLAUSE_BATCH_SIZE = 1000
+
+# Session.info slot for ids created in a transaction that has not committed yet
+PENDING_INFO_KEY = "company_resolver_pending"
+
+ScopeKey = Tuple[str, str, str]
+
+
+def company_scope_filters(access_level: str, organization_id: Optional[str], user_id: str) -> List:
+    """Company lookup filters for the scope a row is written into"""
+    if access_level == "organization":
+        return [Company.organization_id == organization_id, Company.access_level == "organization"]
+    if access_level == "system":
+        return [Company.access_level == "system"]
+    return [
+        Company.organization_id.is_(None),
+        Company.access_level == "personal",
+        Company.created_by == user_id
+    ]
+
+
+def scope_owner(access_level: str, organization_id: Optional[str], user_id: Optional[str]) -> str:
+    """Who a company scope belongs to: the organization, the user (personal) or nobody (system)"""
+    if access_level == "organization":
+        return str(organization_id)
+    if access_level == "personal":
+        return str(user_id)
+    return ""
+
+
+class CompanyResolver:
+    """
+    Shared symbol -> Company.id resolution for every upload and prediction path.
+
+    Companies are rows per scope, so mappings are keyed by (symbol, access
+    level, owner), the owner being the organization for organization scope
+    and the creating user for personal scope. Lookups go through a bounded
+    per-process LRU, then an optional Redis tier shared by API processes and
+    Celery workers, and only then the database, one IN query per batch of
+    missing symbols.
+
+    Ids of companies created in a transaction are cached once it commits;
+    a rollback discards them. Any change to a company's key columns or a
+    deletion invalidates every tier: the Redis generation counter is bumped,
+    which re-keys the shared tier and tells other processes to drop their
+    local entries. Local entries also expire after a TTL, which bounds
+    staleness when Redis is off.
+
+    Configuration (environment):
+        ENABLE_COMPANY_CACHE             - enable the cache (default true)
+        COMPANY_CACHE_MAX_SIZE           - max entries in the in-process LRU (default 50000)
+        COMPANY_CACHE_LOCAL_TTL_SECONDS  - lifetime of in-process entries (default 300)
+        ENABLE_REDIS_CACHE               - enable the shared Redis tier (default false)
+        CACHE_TTL_SECONDS                - TTL of Redis entries (default 3600)
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("ENABLE_COMPANY_CACHE", "true").lower() == "true"
+        self.max_size = int(os.getenv("COMPANY_CACHE_MAX_SIZE", "50000"))
+        self.local_ttl = float(os.getenv("COMPANY_CACHE_LOCAL_TTL_SECONDS", "300"))
+        self.redis_enabled = os.getenv("ENABLE_REDIS_CACHE", "false").lower() == "true"
+        self.redis_ttl = int(os.getenv("CACHE_TTL_SECONDS", "3600"))
+
+        self.generation = "0"
+        self._entries: "OrderedDict[ScopeKey, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis = None
+
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def active(self) -> bool:
+        return self.enabled and self.max_size > 0
+
+    @staticmethod
+    def make_key(symbol: str, access_level: str, organization_id: Optional[str], user_id: Optional[str]) -> ScopeKey:
+        return (str(symbol).strip().upper(), access_level, scope_owner(access_level, organization_id, user_id))
+
+    def resolve(
+        self,
+        db,
+        symbol: str,
+        name: str,
+        market_cap: float,
+        sector: str,
+        access_level: str,
+        organization_id: Optional[str],
+        user_id: str,
+        refresh: bool = True
+    ):
+        """Company id for one symbol in a scope, creating the company if needed (see resolve_many)"""
+        company_ids = self.resolve_many(
+            db,
+            {symbol: {"name": name, "market_cap": market_cap, "sector": sector}},
+            access_level, organization_id, user_id,
+            refresh=refresh
+        )
+        return company_ids[str(symbol).strip().upper()]
+
+    def resolve_many(
+        self,
+        db,
+        companies: Dict[str, Dict[str, Any]],
+        access_level: str,
+        organization_id: Optional[str],
+        user_id: str,
+        refresh: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Bulk create-or-get companies in one scope
+
+        Args:
+            companies: symbol -> {'name', 'market_cap', 'sector'} (the values
+                       new companies are created with)
+            refresh: also write name/market cap/sector onto existing companies,
+                     in one bulk UPDATE
+
+        Returns:
+            Mapping of upper-cased symbol -> company id. New companies are
+            flushed, not committed.
+        """
+        details = {str(symbol).strip().upper(): values for symbol, values in companies.items()}
+        keys = {symbol: self.make_key(symbol, access_level, organization_id, user_id) for symbol in details}
+        pending = db.info.setdefault(PENDING_INFO_KEY, {})
+
+        company_ids: Dict[str, Any] = {}
+        for symbol, key in keys.items():
+            if key in pending:
+                company_ids[symbol] = pending[key]
+
+        lookup = [symbol for symbol in details if symbol not in company_ids]
+        cached = self.get_many([keys[symbol] for symbol in lookup])
+        for symbol, company_id in zip(lookup, cached):
+            if company_id is not None:
+                company_ids[symbol] = uuid.UUID(company_id)
+
+        missing = [symbol for symbol in details if symbol not in company_ids]
+        if missing:
+            found = {}
+            filters = company_scope_filters(access_level, organization_id, user_id)
+            for start in range(0, len(missing), IN_CLAUSE_BATCH_SIZE):
+                batch = missing[start:start + IN_CLAUSE_BATCH_SIZE]
+                for company_id, symbol in db.query(Company.id, Company.symbol).filter(Company.symbol.in_(batch), *filters):
+                    found.setdefault(symbol, company_id)
+            company_ids.update(found)
+            self.set_many({keys[symbol]: company_id for symbol, company_id in found.items()})
+
+        existing = list(company_ids.items())
+        new_companies = []
+        for symbol in details:
+            if symbol in company_ids:
+                continue
+            values = details[symbol]
+            company = Company(
+                id=uuid.uuid4(),
+                symbol=symbol,
+                name=values["name"],
+                market_cap=values["market_cap"],
+                sector=values["sector"],
+                organization_id=organization_id,
+                access_level=access_level,
+                created_by=user_id
+            )
+            new_companies.append(company)
+            company_ids[symbol] = company.id
+            pending[keys[symbol]] = company.id
+
+        if refresh and existing:
+            db.bulk_update_mappings(Company, [
+                {
+                    "id": company_id,
+                    "name": details[symbol]["name"],
+                    "market_cap": details[symbol]["market_cap"],
+                    "sector": details[symbol]["sector"]
+                }
+                for symbol, company_id in existing
+            ])
+        if new_companies:
+            db.add_all(new_companies)
+        db.flush()
+
+        return company_ids
+
+    def get_many(self, keys: List[ScopeKey]) -> List[Optional[str]]:
+        """Look up keys in the local LRU, then in Redis for local misses"""
+        if not self.active or not keys:
+            return [None] * len(keys)
+
+        self._sync_generation()
+        now = time.monotonic()
+        results: List[Optional[str]] = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] < now:
+                    del self._entries[key]
+                    entry = None
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                results.append(entry[0] if entry else None)
+
+        missing = [idx for idx, value in enumerate(results) if value is None]
+        if missing:
+            shared = self._redis_get([keys[idx] for idx in missing])
+            for idx, value in zip(missing, shared):
+                results[idx] = value
+            self._store_local({keys[idx]: results[idx] for idx in missing if results[idx] is not None})
+
+        with self._lock:
+            found = sum(value is not None for value in results)
+            self.hits += found
+            self.misses += len(keys) - found
+            self.redis_hits += sum(results[idx] is not None for idx in missing)
+
+        return results
+
+    def set_many(self, items: Dict[ScopeKey, Any]):
+        """Cache committed company ids in both tiers"""
+        if not self.active or not items:
+            return
+        items = {key: str(company_id) for key, company_id in items.items()}
+        self._store_local(items)
+        self._redis_set(items)
+
+    def invalidate(self):
+        """Drop every cached mapping in this process and, through the generation counter, in all others"""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+        client = self._get_redis()
+        if client is None:
+            return
+        try:
+            self.generation = str(client.incr("company_cache:generation"))
+        except Exception as e:
+            logger.warning(f"Company cache Redis invalidation failed: {e}")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.active,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "redis_hits": self.redis_hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "redis_enabled": self.redis_enabled
+            }
+
+    def _store_local(self, items: Dict[ScopeKey, str]):
+        expires_at = time.monotonic() + self.local_ttl
+        with self._lock:
+            for key, company_id in items.items():
+                self._entries[key] = (company_id, expires_at)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _sync_generation(self):
+        """Drop local entries when another process has invalidated the cache"""
+        client = self._get_redis()
+        if client is None:
+            return
+        try:
+            generation = client.get("company_cache:generation") or "0"
+        except Exception as e:
+            logger.warning(f"Company cache Redis read failed: {e}")
+            return
+        if generation != self.generation:
+            with self._lock:
+                self._entries.clear()
+                self.generation = generation
+
+    def _redis_key(self, key: ScopeKey) -> str:
+        symbol, access_level, owner = key
+        return f"company_cache:{self.generation}:{access_level}:{owner}:{symbol}"
+
+    def _get_redis(self):
+        if not self.redis_enabled:
+            return None
+        if self._redis is None:
+            try:
+                import redis
+                redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+                self._redis = redis.from_url(redis_url, decode_responses=True)
+            except Exception as e:
+                logger.warning(f"Company cache Redis tier disabled: {e}")
+                self.redis_enabled = False
+        return self._redis
+
+    def _redis_get(self, keys: List[ScopeKey]) -> List[Optional[str]]:
+        client = self._get_redis()
+        if client is None or not keys:
+            return [None] * len(keys)
+        try:
+            return client.mget([self._redis_key(key) for key in keys])
+        except Exception as e:
+            logger.warning(f"Company cache Redis read failed: {e}")
+            return [None] * len(keys)
+
+    def _redis_set(self, items: Dict[ScopeKey, str]):
+        client = self._get_redis()
+        if client is None:
+            return
+        try:
+            pipe = client.pipeline(transaction=False)
+            for key, company_id in items.items():
+                pipe.set(self._redis_key(key), company_id, ex=self.redis_ttl)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Company cache Redis write failed: {e}")
+
+
+company_resolver = CompanyResolver()
+
+KEY_COLUMNS = ("symbol", "access_level", "organization_id", "created_by")
+
+
+@event.listens_for(Session, "after_commit")
+def _cache_committed_companies(session):
+    pending = session.info.pop(PENDING_INFO_KEY, None)
+    if pending:
+        company_resolver.set_many(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_companies(session):
+    session.info.pop(PENDING_INFO_KEY, None)
+
+
+@event.listens_for(Company, "after_update")
+def _invalidate_rekeyed_company(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[column].history.has_changes() for column in KEY_COLUMNS):
+        company_resolver.invalidate()
+
+
+@event.listens_for(Company, "after_delete")
+def _invalidate_deleted_company(mapper, connection, target):
+    company_resolver.invalidate()
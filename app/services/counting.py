@@ -0,0 +1,110 @@
+import os
+import json
+import logging
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from .pagination import PaginationError
+
+logger = logging.getLogger(__name__)
+
+# How a listing counts its total:
+#   exact    - COUNT(*) of the filtered query
+#   estimate - exact below COUNT_EXACT_THRESHOLD rows, otherwise a maintained
+#              aggregate or the planner's row estimate
+#   none     - no total
+COUNT_MODES = ("exact", "estimate", "none")
+
+
+@dataclass
+class CountResult:
+    total: Optional[int]
+    approximate: bool = False
+    source: str = "exact"  # exact, aggregate, planner or none
+
+    def as_pagination(self) -> dict:
+        """Fields every paginated response reports about its total"""
+        return {"total_is_estimate": self.approximate, "count_source": self.source}
+
+
+def resolve_count_mode(count: Optional[str], cursor: Optional[str] = None) -> str:
+    """The requested count mode; by default exact for numbered pages and none when paging by cursor"""
+    if count is None:
+        return "none" if cursor else "exact"
+    count = count.lower()
+    if count not in COUNT_MODES:
+        raise PaginationError(f"Unknown count mode '{count}', expected one of {COUNT_MODES}")
+    return count
+
+
+class RowCounter:
+    """
+    Counting strategy for paginated listings.
+
+    ``estimate`` first asks PostgreSQL's planner how many rows the filtered
+    query returns (EXPLAIN, which for an unfiltered scan is the table's
+    pg_class.reltuples). Small results are then counted exactly, since the
+    COUNT is cheap there. Large ones report the estimate, or a count the
+    caller keeps in a maintained aggregate table (e.g. dashboard_aggregates
+    for an unfiltered scope). Other databases always count exactly.
+
+    Configuration (environment):
+        COUNT_EXACT_THRESHOLD - estimated rows below which estimate mode still counts exactly (default 10000)
+    """
+
+    def __init__(self):
+        self.exact_threshold = int(os.getenv("COUNT_EXACT_THRESHOLD", "10000"))
+
+    def count(
+        self,
+        db,
+        query,
+        mode: str = "exact",
+        aggregate: Optional[Callable[[], Optional[int]]] = None
+    ) -> CountResult:
+        """
+        Total of ``query`` under a count mode
+
+        Args:
+            aggregate: returns the exact total from a maintained aggregate,
+                       for queries that cover a whole aggregated scope
+        """
+        if mode == "none":
+            return CountResult(None, source="none")
+        if mode == "estimate":
+            if aggregate is not None:
+                try:
+                    total = aggregate()
+                except Exception as e:
+                    logger.warning(f"Aggregate count failed, falling back: {e}")
+                    total = None
+                if total is not None:
+                    return CountResult(total, source="aggregate")
+            estimate = self.planner_estimate(db, query)
+            if estimate is not None and estimate >= self.exact_threshold:
+                return CountResult(estimate, approximate=True, source="planner")
+        return CountResult(query.order_by(None).count())
+
+    def planner_estimate(self, db, query) -> Optional[int]:
+        """Planner row estimate of a query on PostgreSQL, None elsewhere or when EXPLAIN fails"""
+        bind = db.get_bind()
+        if bind.dialect.name != "postgresql":
+            return None
+        compiled = query.order_by(None).statement.compile(
+            dialect=bind.dialect, compile_kwargs={"render_postcompile": True}
+        )
+        # A failed statement aborts a PostgreSQL transaction; the savepoint keeps the fallback COUNT usable.
+        # It is taken on the connection, so the session's commit/rollback hooks do not fire for it.
+        connection = db.connection()
+        try:
+            with connection.begin_nested():
+                plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+        except Exception as e:
+            logger.warning(f"Planner row estimate failed: {e}")
+            return None
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+
+row_counter = RowCounter()
@@ -0,0 +1,429 @@
+import os
+import uuid
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, case, delete, distinct, event, func, inspect, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from ..core.database import AnnualPrediction, Company, DashboardAggregate, QuarterlyPrediction
+
+logger = logging.getLogger(__name__)
+
+ScopeKey = Tuple[str, str]
+
+SYSTEM_SCOPE: ScopeKey = ("system", "")
+PLATFORM_SCOPE: ScopeKey = ("platform", "")
+
+HIGH_RISK_THRESHOLD = 0.7
+
+# Prediction kind -> (model, probability column the dashboard averages)
+PREDICTION_KINDS = {
+    "annual": (AnnualPrediction, "probability"),
+    "quarterly": (QuarterlyPrediction, "logistic_probability"),
+}
+
+# Columns that decide which scopes a row counts in
+SCOPE_COLUMNS = ("access_level", "organization_id", "created_by")
+COMPANY_COLUMNS = SCOPE_COLUMNS + ("sector",)
+
+# Session.info slot for the aggregate changes of the open transaction
+PENDING_INFO_KEY = "dashboard_aggregates_pending"
+
+# Rows a query-level update reads back by id, and aggregate rows dropped, per statement
+INVALIDATE_BATCH = 500
+
+
+def organization_scope(organization_id) -> ScopeKey:
+    return ("organization", str(organization_id))
+
+
+def user_scope(user_id) -> ScopeKey:
+    return ("user", str(user_id))
+
+
+def row_scopes(access_level: Optional[str], organization_id, created_by) -> List[ScopeKey]:
+    """Every aggregate a company or prediction row counts in"""
+    scopes = [SYSTEM_SCOPE]
+    if access_level == "system":
+        scopes.append(PLATFORM_SCOPE)
+    if organization_id:
+        scopes.append(organization_scope(organization_id))
+    if created_by:
+        scopes.append(user_scope(created_by))
+    return scopes
+
+
+def scope_filters(model, scope: ScopeKey) -> List:
+    """Filters selecting the rows of ``model`` that count in a scope"""
+    scope_type, scope_id = scope
+    if scope_type == "platform":
+        return [model.access_level == "system"]
+    if scope_type == "organization":
+        return [model.organization_id == uuid.UUID(scope_id)]
+    if scope_type == "user":
+        return [model.created_by == uuid.UUID(scope_id)]
+    return []
+
+
+def average_of_rates(aggregate: Dict[str, Any]) -> float:
+    """Mean of the annual and the quarterly average probability (system and platform figures)"""
+    annual = aggregate["annual_probability_sum"] / aggregate["annual_probability_count"] if aggregate["annual_probability_count"] else 0
+    quarterly = aggregate["quarterly_probability_sum"] / aggregate["quarterly_probability_count"] if aggregate["quarterly_probability_count"] else 0
+    return (annual + quarterly) / 2 if (annual or quarterly) else 0
+
+
+def pooled_rate(aggregate: Dict[str, Any]) -> float:
+    """Average probability over annual and quarterly predictions together (organization and personal figures)"""
+    count = aggregate["annual_probability_count"] + aggregate["quarterly_probability_count"]
+    return (aggregate["annual_probability_sum"] + aggregate["quarterly_probability_sum"]) / count if count else 0
+
+
+class _Pending:
+    """Aggregate changes collected while a transaction runs, applied when it commits"""
+
+    def __init__(self):
+        self.deltas: Dict[ScopeKey, Dict[str, float]] = {}
+        self.touched = set()     # scopes with a prediction insert or update: last_updated_at moves
+        self.recount = set()     # scopes whose prediction figures cannot be adjusted by a delta
+        self.companies = set()   # scopes whose company count and sectors must be recounted
+        self.invalidate = set()  # scopes a query-level write changed: dropped and rebuilt on read
+
+    def add_prediction(self, kind: str, values: Dict[str, Any], sign: int):
+        probability = values.get(PREDICTION_KINDS[kind][1])
+        for scope in row_scopes(*(values.get(column) for column in SCOPE_COLUMNS)):
+            delta = self.deltas.setdefault(scope, {})
+            delta[f"{kind}_count"] = delta.get(f"{kind}_count", 0) + sign
+            if probability is not None:
+                probability = float(probability)
+                delta[f"{kind}_probability_sum"] = delta.get(f"{kind}_probability_sum", 0.0) + sign * probability
+                delta[f"{kind}_probability_count"] = delta.get(f"{kind}_probability_count", 0) + sign
+                if probability > HIGH_RISK_THRESHOLD:
+                    delta[f"{kind}_high_risk"] = delta.get(f"{kind}_high_risk", 0) + sign
+            if sign > 0:
+                self.touched.add(scope)
+
+
+class DashboardAggregates:
+    """
+    Precomputed dashboard figures, one ``dashboard_aggregates`` row per scope.
+
+    Scopes are the whole system, the platform data (access_level 'system'),
+    each organization and each user (by created_by). A row holds company and
+    sector counts, per prediction type row counts, probability sums and
+    high-risk counts, and the time of the latest prediction write, so a
+    dashboard is a single indexed read.
+
+    Rows are maintained incrementally in the transaction of the write:
+    ORM inserts, updates and deletes of predictions are turned into deltas
+    at flush time, ``bulk_writer`` reports the rows of its upserts, and the
+    summed deltas are applied with one ``UPDATE ... SET col = col + delta``
+    per scope right before the commit. Rows an upsert overwrites are read
+    before the upsert, so they too become deltas; only a change whose
+    previous values are unknown recounts its scopes, and company writes
+    recount the scope's company and sector figures.
+    Query-level updates and deletes drop the rows of the scopes their
+    matched rows count in. Missing rows are built on first read, and rows older than DASHBOARD_AGGREGATE_MAX_AGE_SECONDS are
+    recounted on read, which bounds drift from writes the tracking does not
+    see (raw SQL, bulk company refreshes).
+
+    Configuration (environment):
+        DASHBOARD_AGGREGATE_MAX_AGE_SECONDS - recount rows older than this on read (default 3600, 0 disables)
+    """
+
+    def __init__(self):
+        self.max_age = float(os.getenv("DASHBOARD_AGGREGATE_MAX_AGE_SECONDS", "3600"))
+
+    def pending(self, db) -> _Pending:
+        return db.info.setdefault(PENDING_INFO_KEY, _Pending())
+
+    def tracked_columns(self, model) -> Tuple[str, ...]:
+        """Columns of a prediction model the aggregates are computed from (empty for other models)"""
+        kind = self._kind(model)
+        return SCOPE_COLUMNS + (PREDICTION_KINDS[kind][1],) if kind is not None else ()
+
+    def note_upsert(self, db, model, rows: List[Dict[str, Any]], result):
+        """
+        Record the effect of a ``bulk_writer`` upsert
+
+        Inserted rows add a delta; updated rows subtract the stored values
+        they replaced (``result.replaced``) and add the new probability.
+        Only an updated row whose previous values were not read, because it
+        was inserted concurrently after the read, recounts its scopes.
+        """
+        kind = self._kind(model)
+        if kind is None:
+            return
+        column = PREDICTION_KINDS[kind][1]
+        pending = self.pending(db)
+        for idx in result.inserted:
+            pending.add_prediction(kind, rows[idx], 1)
+        for idx in result.updated:
+            previous = result.replaced.get(idx)
+            if previous is None:
+                scopes = row_scopes(*(rows[idx].get(name) for name in SCOPE_COLUMNS))
+                pending.recount.update(scopes)
+                pending.touched.update(scopes)
+                continue
+            # An upsert never rewrites the scope columns, so the row stays in the same scopes
+            current = dict(previous)
+            if column in rows[idx]:
+                current[column] = rows[idx][column]
+            pending.add_prediction(kind, previous, -1)
+            pending.add_prediction(kind, current, 1)
+
+    def apply(self, db, pending: _Pending):
+        """Write a transaction's collected changes (inside that transaction)"""
+        table = DashboardAggregate.__table__
+        if pending.invalidate:
+            scopes = sorted(pending.invalidate)
+            for start in range(0, len(scopes), INVALIDATE_BATCH):
+                batch = scopes[start:start + INVALIDATE_BATCH]
+                db.execute(delete(table).where(or_(*[and_(*self._key_filter(scope)) for scope in batch])))
+
+        # Sorted, so concurrent commits lock the shared system and platform rows in the same order
+        skip = pending.recount | pending.invalidate
+        for scope in sorted((set(pending.deltas) | pending.touched) - skip):
+            values = {
+                name: table.c[name] + amount
+                for name, amount in pending.deltas.get(scope, {}).items() if amount
+            }
+            if scope in pending.touched:
+                values["last_updated_at"] = func.now()
+            if values:
+                db.execute(update(table).where(*self._key_filter(scope)).values(**values))
+
+        recount = pending.recount - pending.invalidate
+        if recount:
+            self.refresh(db, sorted(recount))
+        companies_only = pending.companies - skip
+        if companies_only:
+            self.refresh(db, sorted(companies_only), predictions=False)
+
+    def refresh(self, db, scopes: Iterable[ScopeKey], predictions: bool = True) -> Dict[ScopeKey, Dict[str, Any]]:
+        """
+        Recount scopes from the base tables and store them (not committed)
+
+        The stored row is locked first, so deltas of transactions still in
+        flight are applied on top of the recount once they commit instead
+        of being overwritten by it. With ``predictions=False`` only the
+        company and sector counts are recounted.
+        """
+        table = DashboardAggregate.__table__
+        refreshed = {}
+        for scope in scopes:
+            db.execute(select(table.c.scope_type).where(*self._key_filter(scope)).with_for_update())
+            values = self._count_companies(db, scope)
+            if predictions:
+                values.update(self._count_predictions(db, scope))
+                values["refreshed_at"] = datetime.utcnow()
+            refreshed[scope] = values
+
+            insert = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+            statement = insert(table).values(scope_type=scope[0], scope_id=scope[1], **values)
+            if predictions:
+                db.execute(statement.on_conflict_do_update(index_elements=["scope_type", "scope_id"], set_=values))
+            else:
+                # A missing row is built in full on its first read
+                db.execute(update(table).where(*self._key_filter(scope)).values(**values))
+        return refreshed
+
+    def read(self, db, scopes: List[ScopeKey]) -> Dict[ScopeKey, Dict[str, Any]]:
+        """Aggregates of the given scopes in one query, building missing and stale ones"""
+        table = DashboardAggregate.__table__
+        rows = db.execute(select(table).where(or_(*[and_(*self._key_filter(scope)) for scope in scopes]))).all()
+        aggregates = {(row.scope_type, row.scope_id): dict(row._mapping) for row in rows}
+
+        now = datetime.utcnow()
+        rebuild = [
+            scope for scope in scopes
+            if scope not in aggregates
+            or (self.max_age > 0 and (aggregates[scope]["refreshed_at"] is None
+                                      or (now - aggregates[scope]["refreshed_at"]).total_seconds() > self.max_age))
+        ]
+        if rebuild:
+            try:
+                for scope, values in self.refresh(db, rebuild).items():
+                    aggregates[scope] = {"scope_type": scope[0], "scope_id": scope[1], **values}
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Could not rebuild dashboard aggregates {rebuild}: {e}")
+                raise
+        return aggregates
+
+    def _count_companies(self, db, scope: ScopeKey) -> Dict[str, Any]:
+        company_count, sectors_covered = db.query(
+            func.count(Company.id), func.count(distinct(Company.sector))
+        ).filter(*scope_filters(Company, scope)).one()
+        return {"company_count": company_count, "sectors_covered": sectors_covered}
+
+    def _count_predictions(self, db, scope: ScopeKey) -> Dict[str, Any]:
+        values: Dict[str, Any] = {"last_updated_at": None}
+        for kind, (model, column) in PREDICTION_KINDS.items():
+            probability = getattr(model, column)
+            count, probability_sum, probability_count, high_risk, last_updated = db.query(
+                func.count(model.id),
+                func.coalesce(func.sum(probability), 0),
+                func.count(probability),
+                func.count(case((probability > HIGH_RISK_THRESHOLD, 1))),
+                func.max(model.updated_at)
+            ).filter(*scope_filters(model, scope)).one()
+            values.update({
+                f"{kind}_count": count,
+                f"{kind}_probability_sum": float(probability_sum),
+                f"{kind}_probability_count": probability_count,
+                f"{kind}_high_risk": high_risk
+            })
+            if last_updated and (values["last_updated_at"] is None or last_updated > values["last_updated_at"]):
+                values["last_updated_at"] = last_updated
+        return values
+
+    @staticmethod
+    def _key_filter(scope: ScopeKey) -> List:
+        table = DashboardAggregate.__table__
+        return [table.c.scope_type == scope[0], table.c.scope_id == scope[1]]
+
+    @staticmethod
+    def _kind(model) -> Optional[str]:
+        return next((kind for kind, (known, _) in PREDICTION_KINDS.items() if known is model), None)
+
+
+dashboard_aggregates = DashboardAggregates()
+
+
+def _current_values(target, columns: Iterable[str]) -> Dict[str, Any]:
+    return {column: getattr(target, column) for column in columns}
+
+
+def _previous_values(target, columns: Iterable[str]) -> Dict[str, Any]:
+    state = inspect(target)
+    values = {}
+    for column in columns:
+        history = state.attrs[column].history
+        values[column] = history.deleted[0] if history.deleted else getattr(target, column)
+    return values
+
+
+def _keep_previous_value(target, value, oldvalue, initiator):
+    return value
+
+
+# Load the stored value before an expired column is overwritten, so updates can subtract it
+for _model, _column in PREDICTION_KINDS.values():
+    for _name in SCOPE_COLUMNS + (_column,):
+        event.listen(getattr(_model, _name), "set", _keep_previous_value, active_history=True, retval=True)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_flushed_changes(session, flush_context):
+    pending = None
+    for target in session.new:
+        kind = dashboard_aggregates._kind(type(target))
+        if kind is not None:
+            pending = pending or dashboard_aggregates.pending(session)
+            pending.add_prediction(kind, _current_values(target, SCOPE_COLUMNS + (PREDICTION_KINDS[kind][1],)), 1)
+        elif isinstance(target, Company):
+            pending = pending or dashboard_aggregates.pending(session)
+            pending.companies.update(row_scopes(*(getattr(target, column) for column in SCOPE_COLUMNS)))
+
+    for target in session.deleted:
+        kind = dashboard_aggregates._kind(type(target))
+        if kind is not None:
+            pending = pending or dashboard_aggregates.pending(session)
+            pending.add_prediction(kind, _previous_values(target, SCOPE_COLUMNS + (PREDICTION_KINDS[kind][1],)), -1)
+        elif isinstance(target, Company):
+            pending = pending or dashboard_aggregates.pending(session)
+            pending.companies.update(row_scopes(*_previous_values(target, SCOPE_COLUMNS).values()))
+
+    for target in session.dirty:
+        kind = dashboard_aggregates._kind(type(target))
+        if kind is not None and session.is_modified(target):
+            columns = SCOPE_COLUMNS + (PREDICTION_KINDS[kind][1],)
+            pending = pending or dashboard_aggregates.pending(session)
+            pending.add_prediction(kind, _previous_values(target, columns), -1)
+            pending.add_prediction(kind, _current_values(target, columns), 1)
+        elif isinstance(target, Company):
+            state = inspect(target)
+            if any(state.attrs[column].history.has_changes() for column in COMPANY_COLUMNS):
+                pending = pending or dashboard_aggregates.pending(session)
+                pending.companies.update(row_scopes(*_previous_values(target, SCOPE_COLUMNS).values()))
+                pending.companies.update(row_scopes(*_current_values(target, SCOPE_COLUMNS).values()))
+
+
+def _matched_scopes(session, model, whereclause, ids=None) -> set:
+    """Scopes of the rows a query-level write matches (or of the rows with the given ids)"""
+    columns = [getattr(model, column) for column in SCOPE_COLUMNS]
+    if ids is None:
+        statement = select(*columns).distinct()
+        if whereclause is not None:
+            statement = statement.where(whereclause)
+        batches = [statement]
+    else:
+        batches = [
+            select(*columns).distinct().where(model.id.in_(ids[start:start + INVALIDATE_BATCH]))
+            for start in range(0, len(ids), INVALIDATE_BATCH)
+        ]
+    scopes = set()
+    for statement in batches:
+        for row in session.execute(statement):
+            scopes.update(row_scopes(*row))
+    return scopes
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _invalidate_on_query_writes(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return None
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ not in (AnnualPrediction, QuarterlyPrediction, Company):
+        return None
+
+    # The rows bypass flush tracking: drop the aggregates of every scope they counted in before the
+    # write and, for updates that may move them, every scope they count in after it
+    session, model = orm_execute_state.session, mapper.class_
+    whereclause = orm_execute_state.statement.whereclause
+    if orm_execute_state.is_delete:
+        dashboard_aggregates.pending(session).invalidate.update(_matched_scopes(session, model, whereclause))
+        return None
+
+    matched = select(model.id, *(getattr(model, column) for column in SCOPE_COLUMNS))
+    if whereclause is not None:
+        matched = matched.where(whereclause)
+    ids, scopes = [], set()
+    for row in session.execute(matched):
+        ids.append(row[0])
+        scopes.update(row_scopes(*row[1:]))
+    result = orm_execute_state.invoke_statement()
+    if ids:
+        scopes |= _matched_scopes(session, model, None, ids)
+    dashboard_aggregates.pending(session).invalidate.update(scopes)
+    return result
+
+
+def _has_tracked_changes(session) -> bool:
+    tracked = (AnnualPrediction, QuarterlyPrediction, Company)
+    return any(
+        isinstance(target, tracked)
+        for targets in (session.new, session.deleted, session.dirty) for target in targets
+    )
+
+
+@event.listens_for(Session, "before_commit")
+def _apply_pending_changes(session):
+    # Sessions without prediction or company writes commit untouched
+    if PENDING_INFO_KEY not in session.info and not _has_tracked_changes(session):
+        return
+    # The commit's own flush runs after this hook; flush first so its changes are collected too
+    session.flush()
+    pending = session.info.pop(PENDING_INFO_KEY, None)
+    if pending is not None:
+        dashboard_aggregates.apply(session, pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_changes(session):
+    session.info.pop(PENDING_INFO_KEY, None)
@@ -0,0 +1,151 @@
+import json
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, insert, or_
+
+from ..core.database import BulkUploadJob, BulkUploadJobError
+
+# Error codes of bulk upload row errors
+ERROR_MISSING_FIELD = "missing_field"
+ERROR_INVALID_QUARTER = "invalid_quarter"
+ERROR_DUPLICATE_IN_FILE = "duplicate_in_file"
+ERROR_DUPLICATE_STORED = "duplicate_stored"
+ERROR_MODEL_FAILED = "model_failed"
+ERROR_INSERT_FAILED = "insert_failed"
+ERROR_ROW_FAILED = "row_failed"
+ERROR_JOB_FAILED = "job_failed"
+
+# Rows per INSERT when storing a job's errors
+ERROR_INSERT_BATCH = 1000
+
+MAX_ERROR_PAGE_SIZE = 1000
+
+
+def store_job_errors(db, job_id: str, errors: List[Dict[str, Any]], part: int = 0) -> int:
+    """
+    Add row errors to a job part's stored errors (not committed)
+
+    ``errors`` are error_details entries ({'row', 'error', 'code'}); entries
+    without a code are stored as row_failed.
+    """
+    rows = [
+        {
+            "job_id": job_id,
+            "part": part,
+            "row_number": entry.get("row"),
+            "error_code": entry.get("code") or ERROR_ROW_FAILED,
+            "message": str(entry.get("error", ""))
+        }
+        for entry in errors
+    ]
+    for start in range(0, len(rows), ERROR_INSERT_BATCH):
+        db.execute(insert(BulkUploadJobError), rows[start:start + ERROR_INSERT_BATCH])
+    return len(rows)
+
+
+def replace_job_errors(
+    db,
+    job_id: str,
+    errors: List[Dict[str, Any]],
+    part: int = 0,
+    after_row: Optional[int] = None
+) -> int:
+    """
+    Store a job part's row errors, replacing whatever that part stored before (not committed)
+
+    Replacing per part keeps a redelivered task or chunk from storing its
+    errors twice. With ``after_row`` (the part's resume checkpoint) only the
+    errors of later rows and of no row are replaced; those up to it were
+    stored with the checkpoint and stay.
+    """
+    stored = db.query(BulkUploadJobError).filter(
+        BulkUploadJobError.job_id == job_id,
+        BulkUploadJobError.part == part
+    )
+    if after_row is not None:
+        stored = stored.filter(or_(BulkUploadJobError.row_number > after_row, BulkUploadJobError.row_number.is_(None)))
+        errors = [entry for entry in errors if entry.get("row") is None or entry["row"] > after_row]
+    stored.delete(synchronize_session=False)
+    return store_job_errors(db, job_id, errors, part)
+
+
+def error_summary(db, job_id: str) -> Dict[str, Any]:
+    """Stored error count of a job, in total and per error code, from one GROUP BY"""
+    counts = dict(
+        db.query(BulkUploadJobError.error_code, func.count(BulkUploadJobError.id))
+        .filter(BulkUploadJobError.job_id == job_id)
+        .group_by(BulkUploadJobError.error_code)
+        .all()
+    )
+    return {"error_count": sum(counts.values()), "error_codes": counts}
+
+
+def job_error_details(job: BulkUploadJob) -> Dict[str, Any]:
+    """
+    The job's error summary (error_count, error_codes, plus e.g. an exception trace)
+
+    Jobs written before errors had their own table keep the entries in
+    error_details itself; their count is derived from the list.
+    """
+    if not job.error_details:
+        return {"error_count": 0, "error_codes": {}}
+    try:
+        details = json.loads(job.error_details)
+    except (json.JSONDecodeError, TypeError):
+        return {"error_count": 0, "error_codes": {}, "raw_error": job.error_details}
+    if not isinstance(details, dict):
+        return {"error_count": 0, "error_codes": {}}
+    if "error_count" not in details:
+        details["error_count"] = len(details.get("errors") or [])
+    details.pop("errors", None)
+    return details
+
+
+def job_errors_page(
+    db,
+    job: BulkUploadJob,
+    page: int = 1,
+    page_size: int = 100,
+    error_code: Optional[str] = None
+) -> Dict[str, Any]:
+    """One page of a job's row errors in row order, with pagination info"""
+    page = max(page, 1)
+    page_size = min(max(page_size, 1), MAX_ERROR_PAGE_SIZE)
+
+    query = db.query(BulkUploadJobError).filter(BulkUploadJobError.job_id == job.id)
+    if error_code:
+        query = query.filter(BulkUploadJobError.error_code == error_code)
+    total = query.order_by(None).count()
+
+    if total:
+        records = query.order_by(
+            BulkUploadJobError.row_number.asc().nullsfirst(), BulkUploadJobError.id
+        ).offset((page - 1) * page_size).limit(page_size).all()
+        errors = [
+            {"row": record.row_number, "code": record.error_code, "error": record.message}
+            for record in records
+        ]
+    else:
+        # Older jobs kept their (first 100) errors inline
+        try:
+            legacy = json.loads(job.error_details).get("errors", []) if job.error_details else []
+        except (json.JSONDecodeError, TypeError, AttributeError):
+            legacy = []
+        legacy = [entry for entry in legacy if not error_code or entry.get("code", ERROR_ROW_FAILED) == error_code]
+        total = len(legacy)
+        errors = [
+            {"row": entry.get("row"), "code": entry.get("code", ERROR_ROW_FAILED), "error": entry.get("error")}
+            for entry in legacy[(page - 1) * page_size:page * page_size]
+        ]
+
+    return {
+        "errors": errors,
+        "pagination": {
+            "page": page,
+            "page_size": page_size,
+            "total_errors": total,
+            "total_pages": -(-total // page_size),
+            "has_next": page * page_size < total,
+            "has_previous": page > 1
+        }
+    }
@@ -0,0 +1,275 @@
+import os
+import json
+import time
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import func
+from starlette.concurrency import run_in_threadpool
+
+from ..core.database import get_session_local, BulkUploadJob
+
+logger = logging.getLogger(__name__)
+
+COUNTER_FIELDS = ("processed", "successful", "failed")
+
+# Row errors a task publishes as events; the job row keeps the first 100 as well
+ERROR_EVENT_LIMIT = 100
+
+# Seconds between SSE keep-alive comments; the job row is re-checked at the same pace
+EVENTS_KEEPALIVE_SECONDS = float(os.getenv("JOB_EVENTS_KEEPALIVE_SECONDS", "15"))
+
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+
+
+def events_channel(job_id: str) -> str:
+    """Redis pub/sub channel carrying a job's progress, row_errors and completion events"""
+    return f"bulk_job_events:{job_id}"
+
+
+class JobProgress:
+    """
+    Live row counters of running bulk upload jobs.
+
+    Workers add to a Redis hash per job with HINCRBY, so parallel chunks
+    never read-modify-write a counter, and the status endpoint reads the
+    hash instead of the job row. The counters are written through to
+    bulk_upload_jobs at most once per flush interval per job (one worker
+    wins a short Redis lock and issues a single UPDATE); update_job_status
+    folds the final counters in when the job completes or fails.
+
+    Every increment is also published on the job's events channel (see
+    events_channel) with the new totals, next to row_errors and the final
+    completed/failed event, for the SSE endpoint to relay.
+
+    If Redis is unreachable, increments fall back to an atomic
+    ``col = col + n`` UPDATE on the job row.
+
+    Configuration (environment):
+        JOB_PROGRESS_FLUSH_SECONDS  - minimum seconds between DB flushes per job (default 5)
+        JOB_PROGRESS_TTL_SECONDS    - expiry of a job's counters in Redis (default 86400)
+    """
+
+    def __init__(self):
+        self.flush_seconds = float(os.getenv("JOB_PROGRESS_FLUSH_SECONDS", "5"))
+        self.ttl = int(os.getenv("JOB_PROGRESS_TTL_SECONDS", "86400"))
+        self._redis = None
+
+    def _key(self, job_id: str) -> str:
+        return f"bulk_job_progress:{job_id}"
+
+    def _get_redis(self):
+        if self._redis is None:
+            import redis
+            redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+            self._redis = redis.from_url(redis_url, decode_responses=True)
+        return self._redis
+
+    def reset(self, job_id: str):
+        """Drop a job's counters before its rows are (re)processed"""
+        try:
+            self._get_redis().delete(self._key(job_id), f"{self._key(job_id)}:flush")
+        except Exception as e:
+            logger.warning(f"Could not reset progress of job {job_id}: {e}")
+
+    def increment(self, job_id: str, processed: int = 0, successful: int = 0, failed: int = 0):
+        """Add row counts to a job, flushing them to the database when the interval is due"""
+        if not (processed or successful or failed):
+            return
+
+        key = self._key(job_id)
+        try:
+            pipe = self._get_redis().pipeline()
+            pipe.hincrby(key, "processed", processed)
+            pipe.hincrby(key, "successful", successful)
+            pipe.hincrby(key, "failed", failed)
+            pipe.hset(key, "updated_at", time.time())
+            pipe.expire(key, self.ttl)
+            pipe.set(f"{key}:flush", 1, nx=True, ex=max(int(self.flush_seconds), 1))
+            counters = pipe.execute()
+        except Exception as e:
+            logger.warning(f"Redis progress update failed for job {job_id}, writing to the job row: {e}")
+            self._increment_db(job_id, processed, successful, failed)
+            return
+
+        totals = dict(zip(COUNTER_FIELDS, counters[:3]))
+        self.publish(job_id, "progress", totals)
+
+        # The NX lock is only acquired by the first increment of each interval
+        if counters[-1]:
+            self._flush_db(job_id, totals)
+
+    def publish(self, job_id: str, event: str, data: Dict[str, Any]):
+        """Send an event to the job's SSE subscribers (fire and forget)"""
+        try:
+            self._get_redis().publish(events_channel(job_id), json.dumps({"event": event, "job_id": job_id, **data}, default=str))
+        except Exception as e:
+            logger.warning(f"Could not publish {event} event for job {job_id}: {e}")
+
+    def publish_errors(self, job_id: str, errors: List[Dict[str, Any]]):
+        """Publish row errors (error_details entries) as one row_errors event"""
+        if errors:
+            self.publish(job_id, "row_errors", {"errors": errors})
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Current counters of a running job, or None when the job has no live progress"""
+        try:
+            raw = self._get_redis().hgetall(self._key(job_id))
+        except Exception as e:
+            logger.warning(f"Could not read progress of job {job_id}: {e}")
+            return None
+        if not raw:
+            return None
+        progress = {field: int(raw.get(field, 0)) for field in COUNTER_FIELDS}
+        progress["updated_at"] = float(raw["updated_at"]) if raw.get("updated_at") else None
+        return progress
+
+    def pop(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Read and clear a job's counters once it has finished"""
+        progress = self.get(job_id)
+        self.reset(job_id)
+        return progress
+
+    def snapshot(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job status with the freshest counters (live ones while running), None if the job does not exist"""
+        SessionLocal = get_session_local()
+        db = SessionLocal()
+
+        try:
+            job = db.query(BulkUploadJob).filter(BulkUploadJob.id == job_id).first()
+            if not job:
+                return None
+            snapshot = {
+                "status": job.status,
+                "total_rows": job.total_rows or 0,
+                "processed": job.processed_rows or 0,
+                "successful": job.successful_rows or 0,
+                "failed": job.failed_rows or 0,
+                "error_message": job.error_message
+            }
+        finally:
+            db.close()
+
+        if snapshot["status"] not in TERMINAL_STATUSES:
+            live = self.get(job_id)
+            if live:
+                for field in COUNTER_FIELDS:
+                    snapshot[field] = max(snapshot[field], live[field])
+        return snapshot
+
+    async def event_stream(self, job_id: str, is_disconnected: Callable[[], Awaitable[bool]]) -> AsyncIterator[str]:
+        """
+        Server-Sent Events for one job, relayed from its Redis channel
+
+        Subscribes before taking the opening snapshot so no event falls in
+        between, and ends after the completed/failed event. Keep-alive
+        comments double as a check of the job row, so a stream whose worker
+        died without publishing still ends once the job is marked finished.
+        """
+        import redis.asyncio as aioredis
+
+        client = aioredis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0"), decode_responses=True)
+        pubsub = client.pubsub()
+        try:
+            await pubsub.subscribe(events_channel(job_id))
+
+            snapshot = await run_in_threadpool(self.snapshot, job_id)
+            if snapshot is None:
+                return
+            final = snapshot["status"] in TERMINAL_STATUSES
+            event = snapshot["status"] if final else "progress"
+            yield sse_event(event, {"event": event, "job_id": job_id, **snapshot})
+            if final:
+                return
+
+            keepalive_at = time.monotonic() + EVENTS_KEEPALIVE_SECONDS
+            while not await is_disconnected():
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is not None:
+                    payload = json.loads(message["data"])
+                    yield sse_event(payload["event"], payload)
+                    if payload["event"] in TERMINAL_STATUSES:
+                        return
+                    continue
+
+                if time.monotonic() >= keepalive_at:
+                    keepalive_at = time.monotonic() + EVENTS_KEEPALIVE_SECONDS
+                    snapshot = await run_in_threadpool(self.snapshot, job_id)
+                    if snapshot is None or snapshot["status"] in TERMINAL_STATUSES:
+                        if snapshot is not None:
+                            yield sse_event(snapshot["status"], {"event": snapshot["status"], "job_id": job_id, **snapshot})
+                        return
+                    yield ": keep-alive\n\n"
+        finally:
+            await pubsub.unsubscribe()
+            await pubsub.close()
+            await client.close()
+
+    def _flush_db(self, job_id: str, counters: Dict[str, int]):
+        """Write Redis totals to the job row; GREATEST keeps a late flush from moving counters back"""
+        SessionLocal = get_session_local()
+        db = SessionLocal()
+
+        try:
+            db.query(BulkUploadJob).filter(BulkUploadJob.id == job_id).update({
+                BulkUploadJob.processed_rows: func.greatest(func.coalesce(BulkUploadJob.processed_rows, 0), counters["processed"]),
+                BulkUploadJob.successful_rows: func.greatest(func.coalesce(BulkUploadJob.successful_rows, 0), counters["successful"]),
+                BulkUploadJob.failed_rows: func.greatest(func.coalesce(BulkUploadJob.failed_rows, 0), counters["failed"]),
+            }, synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error flushing progress of job {job_id}: {str(e)}")
+        finally:
+            db.close()
+
+    def _increment_db(self, job_id: str, processed: int, successful: int, failed: int):
+        SessionLocal = get_session_local()
+        db = SessionLocal()
+
+        try:
+            db.query(BulkUploadJob).filter(BulkUploadJob.id == job_id).update({
+                BulkUploadJob.processed_rows: func.coalesce(BulkUploadJob.processed_rows, 0) + processed,
+                BulkUploadJob.successful_rows: func.coalesce(BulkUploadJob.successful_rows, 0) + successful,
+                BulkUploadJob.failed_rows: func.coalesce(BulkUploadJob.failed_rows, 0) + failed,
+            }, synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error incrementing counters for job {job_id}: {str(e)}")
+        finally:
+            db.close()
+
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """One Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class ProgressReporter:
+    """
+    Turns the running totals a task keeps into increments for one job
+
+    ``errors`` is the task's append-only error list; entries added since the
+    previous report are published, up to ERROR_EVENT_LIMIT per task.
+    """
+
+    def __init__(self, job_id: str, progress: Optional[JobProgress] = None):
+        self.job_id = job_id
+        self.progress = progress or job_progress
+        self.reported = dict.fromkeys(COUNTER_FIELDS, 0)
+        self.errors_seen = 0
+
+    def report(self, processed: int, successful: int, failed: int, errors: Optional[List[Dict[str, Any]]] = None):
+        totals = {"processed": processed, "successful": successful, "failed": failed}
+        deltas = {field: totals[field] - self.reported[field] for field in COUNTER_FIELDS}
+        self.reported = totals
+        self.progress.increment(self.job_id, **deltas)
+
+        if errors is not None and len(errors) > self.errors_seen:
+            budget = max(ERROR_EVENT_LIMIT - min(self.errors_seen, ERROR_EVENT_LIMIT), 0)
+            self.progress.publish_errors(self.job_id, errors[self.errors_seen:self.errors_seen + budget])
+            self.errors_seen = len(errors)
+
+
+job_progress = JobProgress()
@@ -4,15 +4,51 @@ import pickle
 import os
 import joblib
 import warnings
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
+from .prediction_cache import PredictionCache, file_fingerprint
+from .scoring_engine import (
+    BatchInput,
+    LogisticFastPath,
+    batch_to_matrix,
+    ScoringTable,
+    classify_risk_levels,
+    compile_scoring_info,
+    confidence_scores,
+    fast_logistic_enabled,
+    features_frame,
+    row_features,
+)
+
 warnings.filterwarnings("ignore")
 
 class MLModelService:
+    RATIO_FIELDS = [
+        'long_term_debt_to_total_capital',
+        'total_debt_to_ebitda',
+        'net_income_margin',
+        'ebit_to_interest_expense',
+        'return_on_assets'
+    ]
+
+    SINGLE_VARIABLES = [
+        'long-term debt / total capital (%)',
+        'total debt / ebitda',
+        'net income margin',
+        'ebit / interest expense',
+        'return on assets'
+    ]
+
+    FEATURES = [f"bin_{variable}" for variable in SINGLE_VARIABLES]
+
     def __init__(self):
         self.model = None
         self.scoring_info = None
+        self.scoring_tables = None
+        self.logistic_fast_path = None
+        self.model_version = None
+        self.prediction_cache = PredictionCache("annual")
         base_dir = os.path.dirname(os.path.dirname(__file__))  
         self.model_path = os.path.join(base_dir, "models", "annual_logistic_model.pkl")
         self.scoring_info_path = os.path.join(base_dir, "models", "scoring_info.pkl")
@@ -25,6 +61,15 @@ class MLModelService:
             
             with open(self.scoring_info_path, "rb") as f:
                 self.scoring_info = pickle.load(f)
+
+            self.scoring_tables = compile_scoring_info(self.scoring_info)
+            self.logistic_fast_path = (
+                LogisticFastPath.from_model(self.model, self.FEATURES)
+                if fast_logistic_enabled() else None
+            )
+
+            self.model_version = file_fingerprint(self.model_path, self.scoring_info_path)
+            self.prediction_cache.reset(self.model_version)
                 
             print("✅ ML Model and scoring info loaded successfully")
         except Exception as e:
@@ -36,28 +81,14 @@ class MLModelService:
         df[value_col] = df[value_col].replace([None, 'NM', 'N/A', ''], np.nan)
         df[value_col] = pd.to_numeric(df[value_col], errors='coerce')
 
-        intervals = scoring_info[value_col]['intervals']
-        rates = scoring_info[value_col]['rates']
-
-        def assign_rate(x):
-            if pd.isna(x) or x is None:
-                if "Missing" in intervals:
-                    return rates[intervals.index("Missing")]
-                else:
-                    return rates[0] if rates else 0.0
-            for idx, iv in enumerate(intervals):
-                if iv == "Missing":
-                    continue
-                low, high = iv
-                if low < x <= high:
-                    return rates[idx]
-            if rates:
-                return rates[0] 
-            return 0.0  
+        if scoring_info is self.scoring_info and self.scoring_tables is not None:
+            table = self.scoring_tables[value_col]
+        else:
+            table = ScoringTable.from_scoring_info(scoring_info[value_col])
 
         prefix = 'bin_'
         new_column_name = f"{prefix}{value_col}"
-        df[new_column_name] = df[value_col].apply(assign_rate)
+        df[new_column_name] = table.score(df[value_col].to_numpy(dtype=float))
         
         return df
 
@@ -77,7 +108,7 @@ class MLModelService:
             Dictionary with prediction results
         """
         try:
-            if self.model is None or self.scoring_info is None:
+            if self.model is None or self.scoring_tables is None:
                 return {
                     "probability": 0.5,
                     "risk_level": "UNKNOWN",
@@ -86,21 +117,7 @@ class MLModelService:
                     "predicted_at": datetime.utcnow().isoformat()
                 }
 
-            single_variables = [
-                'long-term debt / total capital (%)',
-                'total debt / ebitda',
-                'net income margin',
-                'ebit / interest expense',
-                'return on assets'
-            ]
-
-            required_fields = {
-                'long_term_debt_to_total_capital': 'long-term debt / total capital (%)',
-                'total_debt_to_ebitda': 'total debt / ebitda',
-                'net_income_margin': 'net income margin',
-                'ebit_to_interest_expense': 'ebit / interest expense',
-                'return_on_assets': 'return on assets'
-            }
+            required_fields = dict(zip(self.RATIO_FIELDS, self.SINGLE_VARIABLES))
 
             missing_fields = []
             for field in required_fields.keys():
@@ -117,62 +134,9 @@ class MLModelService:
                     "predicted_at": datetime.utcnow().isoformat()
                 }
 
-            values = [
-                financial_ratios['long_term_debt_to_total_capital'],     
-                financial_ratios['total_debt_to_ebitda'],                
-                financial_ratios['net_income_margin'],                   
-                financial_ratios['ebit_to_interest_expense'],            
-                financial_ratios['return_on_assets']                     
-            ]
+            values = [financial_ratios[field] for field in self.RATIO_FIELDS]
 
-            df = pd.DataFrame([values], columns=single_variables)
-            
-            for value_col in single_variables:
-                df = self.binned_runscoring(df, value_col, self.scoring_info)
-
-            features = [
-                'bin_long-term debt / total capital (%)',
-                'bin_total debt / ebitda',
-                'bin_net income margin',
-                'bin_ebit / interest expense',
-                'bin_return on assets'
-            ]
-
-            X = df[features]
-            
-            if X.isnull().any().any():
-                print(f"❌ Warning: NaN values found in features: {X.isnull().sum()}")
-                for feature in features:
-                    if X[feature].isnull().any():
-                        original_col = feature.replace('bin_', '')
-                        if original_col in self.scoring_info and 'rates' in self.scoring_info[original_col]:
-                            rates = self.scoring_info[original_col]['rates']
-                            default_value = rates[0] if rates else 0.0
-                            X[feature] = X[feature].fillna(default_value)
-                            print(f"Filled NaN in {feature} with default value: {default_value}")
-
-            probability = self.model.predict_proba(X)[:, 1][0]
-
-            probability_percentage = probability * 100
-
-            if probability_percentage > 15:
-                risk_level = "CRITICAL"
-            elif probability_percentage >= 5:
-                risk_level = "HIGH"
-            elif probability_percentage >= 2:
-                risk_level = "MEDIUM"
-            else:
-                risk_level = "LOW"
-
-            confidence = max(abs(probability - 0.5) * 2, 0.5)
-
-            return {
-                "probability": float(probability),
-                "risk_level": risk_level,
-                "confidence": float(confidence),
-                "model_features": {feature: float(df[feature].iloc[0]) for feature in features},
-                "predicted_at": datetime.utcnow().isoformat()
-            }
+            return self.predict_batch(np.array([values], dtype=object))[0]
 
         except Exception as e:
             print(f"❌ Prediction error: {e}")
@@ -184,6 +148,68 @@ class MLModelService:
                 "predicted_at": datetime.utcnow().isoformat()
             }
 
+    def _score_features(self, binned: np.ndarray) -> np.ndarray:
+        """Default probabilities for an already-binned feature matrix"""
+        if self.logistic_fast_path is not None:
+            return self.logistic_fast_path.predict_proba(binned)
+        return self.model.predict_proba(features_frame(binned, self.FEATURES))[:, 1]
+
+    def bin_features(self, raw: np.ndarray) -> np.ndarray:
+        """Bin an (n_rows, 5) raw ratio matrix into model features"""
+        binned = np.empty_like(raw)
+        for idx, value_col in enumerate(self.SINGLE_VARIABLES):
+            binned[:, idx] = self.scoring_tables[value_col].score(raw[:, idx])
+        return binned
+
+    def predict_batch(self, data: BatchInput) -> List[Dict]:
+        """
+        Predict default probabilities for many companies in one model call
+
+        Args:
+            data: DataFrame with the 5 ratio columns, or an (n_rows, 5) array
+                  in RATIO_FIELDS order
+
+        Returns:
+            List of prediction dictionaries, one per input row, in input order
+        """
+        if self.model is None or self.scoring_tables is None:
+            raise RuntimeError("Model or scoring info not loaded")
+
+        raw = batch_to_matrix(data, self.RATIO_FIELDS)
+        if len(raw) == 0:
+            return []
+
+        keys = [self.prediction_cache.make_key(row) for row in raw]
+        results = self.prediction_cache.get_many(keys)
+
+        misses = [idx for idx, result in enumerate(results) if result is None]
+        if misses:
+            computed = self._predict_rows(raw[misses])
+            for idx, result in zip(misses, computed):
+                results[idx] = result
+            self.prediction_cache.set_many({keys[idx]: results[idx] for idx in misses})
+
+        predicted_at = datetime.utcnow().isoformat()
+        return [{**result, "predicted_at": predicted_at} for result in results]
+
+    def _predict_rows(self, raw: np.ndarray) -> List[Dict]:
+        """Score a raw ratio matrix; results carry no timestamp so they can be cached"""
+        binned = self.bin_features(raw)
+        probabilities = self._score_features(binned)
+        risk_levels = classify_risk_levels(probabilities)
+        confidences = confidence_scores(probabilities)
+        model_features = row_features(binned, self.FEATURES)
+
+        return [
+            {
+                "probability": float(probabilities[idx]),
+                "risk_level": str(risk_levels[idx]),
+                "confidence": float(confidences[idx]),
+                "model_features": model_features[idx]
+            }
+            for idx in range(len(binned))
+        ]
+
     async def predict_annual(self, financial_ratios: Dict[str, float]) -> Dict:
         """
         Async wrapper for annual prediction - calls predict_default_probability
@@ -0,0 +1,91 @@
+import json
+import uuid
+import base64
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import tuple_
+
+
+class PaginationError(ValueError):
+    """Invalid paging parameters, reported to clients as a 400"""
+
+
+class InvalidCursorError(PaginationError):
+    """A pagination cursor that was not issued for this listing"""
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Opaque cursor for the sort key values of the last row of a page"""
+    payload = [
+        value.isoformat() if isinstance(value, (datetime, date))
+        else str(value) if isinstance(value, (uuid.UUID, Decimal))
+        else value
+        for value in values
+    ]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence) -> List[Any]:
+    """Sort key values of a cursor, converted back to the Python types of ``columns``"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError(f"Malformed cursor: {e}")
+    if not isinstance(payload, list) or len(payload) != len(columns):
+        raise InvalidCursorError("Cursor does not match the sort order")
+
+    values = []
+    for value, column in zip(payload, columns):
+        try:
+            python_type = column.type.python_type
+        except NotImplementedError:
+            python_type = None
+        try:
+            if value is None or python_type is None or isinstance(value, python_type):
+                values.append(value)
+            elif python_type is datetime:
+                values.append(datetime.fromisoformat(value))
+            else:
+                values.append(python_type(value))
+        except (ValueError, TypeError) as e:
+            raise InvalidCursorError(f"Malformed cursor value: {e}")
+    return values
+
+
+def keyset_page(
+    query,
+    columns: Sequence,
+    key: Callable[[Any], Tuple],
+    size: int,
+    cursor: Optional[str] = None,
+    descending: bool = False,
+    offset: int = 0
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    One page of ``query`` ordered by ``columns`` (last one unique, e.g. the id)
+
+    With a cursor the page starts right after the row the cursor was issued
+    for, using a row-value comparison a composite index on ``columns`` can
+    seek to; without one it falls back to ``offset``, so page-numbered
+    callers keep working. The sort columns must not be NULL.
+
+    Args:
+        key: sort key values of a result row, in ``columns`` order
+        descending: sort every column descending instead of ascending
+
+    Returns:
+        The rows of the page and the cursor of the next page (None on the last page)
+    """
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        position = tuple_(*columns)
+        query = query.filter(position < tuple_(*values) if descending else position > tuple_(*values))
+        offset = 0
+
+    query = query.order_by(*[column.desc() if descending else column.asc() for column in columns])
+    rows = query.offset(offset).limit(size + 1).all()
+
+    next_cursor = encode_cursor(key(rows[size - 1])) if len(rows) > size else None
+    return rows[:size], next_cursor
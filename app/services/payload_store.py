@@ -0,0 +1,162 @@
+import io
+import os
+import uuid
+import shutil
+import logging
+import tempfile
+import pandas as pd
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+
+logger = logging.getLogger(__name__)
+
+PayloadRef = Dict[str, Any]
+
+
+class PayloadStore:
+    """
+    Short-lived blob store for bulk upload payloads.
+
+    The API stores the parsed upload once as a compressed Parquet blob and
+    sends Celery only a small reference dict, so broker messages stay tiny no
+    matter how many rows an upload has. Columns pyarrow cannot type (e.g.
+    ratio columns mixing numbers with 'NM') fall back to a compressed pickle
+    of the frame, which keeps the values exactly as pandas read them.
+
+    Uploads parsed incrementally are written with ``put_frames``, one Parquet
+    row group per block, so the whole file never has to be in memory at once.
+
+    Configuration (environment):
+        BULK_PAYLOAD_STORE        - "redis" (default, shared by all workers) or "file"
+        BULK_PAYLOAD_DIR          - directory for the file store
+        BULK_PAYLOAD_TTL_SECONDS  - expiry of Redis payloads (default 86400)
+    """
+
+    def __init__(self):
+        self.backend = os.getenv("BULK_PAYLOAD_STORE", "redis").lower()
+        if self.backend not in ("redis", "file"):
+            logger.warning(f"Unknown BULK_PAYLOAD_STORE '{self.backend}', falling back to 'redis'")
+            self.backend = "redis"
+        self.directory = os.getenv(
+            "BULK_PAYLOAD_DIR", os.path.join(os.getenv("TMPDIR", "/tmp"), "bulk_payloads")
+        )
+        self.ttl = int(os.getenv("BULK_PAYLOAD_TTL_SECONDS", "86400"))
+        self._redis = None
+
+    def put(self, df: pd.DataFrame, name: Optional[str] = None) -> PayloadRef:
+        """Serialize a frame into the store and return its reference"""
+        blob, fmt = self._serialize(df)
+        return self._store(io.BytesIO(blob), fmt, len(df), name)
+
+    def put_frames(self, frames: Iterable[pd.DataFrame], columns: Sequence[str], name: Optional[str] = None) -> PayloadRef:
+        """
+        Stream blocks of text columns into one Parquet payload
+
+        Every column is stored as a nullable string, so blocks always share a
+        schema whatever their values look like; the worker pipelines coerce
+        numbers themselves. Blocks are spooled to a temporary file as they
+        arrive.
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            blocks = list(frames)
+            df = pd.concat(blocks, ignore_index=True) if blocks else pd.DataFrame(columns=list(columns))
+            return self.put(df, name)
+
+        schema = pa.schema([(column, pa.string()) for column in columns])
+        rows = 0
+        with tempfile.TemporaryFile() as spool:
+            with pq.ParquetWriter(spool, schema, compression="zstd") as writer:
+                for frame in frames:
+                    writer.write_table(pa.Table.from_pandas(frame[list(columns)], schema=schema, preserve_index=False))
+                    rows += len(frame)
+            spool.seek(0)
+            return self._store(spool, "parquet", rows, name)
+
+    def get(self, ref: PayloadRef) -> pd.DataFrame:
+        """Load the frame behind a reference"""
+        if ref["payload_store"] == "redis":
+            blob = self._get_redis().get(ref["location"])
+            if blob is None:
+                raise LookupError(f"Bulk upload payload {ref['location']} expired or missing")
+            source = io.BytesIO(blob)
+        else:
+            source = ref["location"]
+
+        if ref["format"] == "parquet":
+            return pd.read_parquet(source)
+        return pd.read_pickle(source, compression="gzip")
+
+    def delete(self, ref: PayloadRef):
+        """Drop a payload once its job no longer needs it"""
+        try:
+            if ref["payload_store"] == "redis":
+                self._get_redis().delete(ref["location"])
+            elif os.path.exists(ref["location"]):
+                os.remove(ref["location"])
+        except Exception as e:
+            logger.warning(f"Could not delete bulk upload payload {ref.get('location')}: {e}")
+
+    def _store(self, source, fmt: str, rows: int, name: Optional[str]) -> PayloadRef:
+        name = name or str(uuid.uuid4())
+
+        if self.backend == "redis":
+            location = f"bulk_payload:{name}"
+            blob = source.read()
+            size = len(blob)
+            self._get_redis().set(location, blob, ex=self.ttl)
+        else:
+            os.makedirs(self.directory, exist_ok=True)
+            location = os.path.join(self.directory, f"{name}.{fmt}")
+            with open(location, "wb") as f:
+                shutil.copyfileobj(source, f)
+                size = f.tell()
+
+        return {
+            "payload_store": self.backend,
+            "location": location,
+            "format": fmt,
+            "rows": rows,
+            "bytes": size
+        }
+
+    def _serialize(self, df: pd.DataFrame):
+        buffer = io.BytesIO()
+        try:
+            df.to_parquet(buffer, compression="zstd", index=False)
+            return buffer.getvalue(), "parquet"
+        except ImportError:
+            pass
+        except Exception as e:
+            logger.info(f"Payload not Arrow-typed ({e}), storing as compressed pickle")
+
+        buffer = io.BytesIO()
+        df.to_pickle(buffer, compression={"method": "gzip", "compresslevel": 1})
+        return buffer.getvalue(), "pickle"
+
+    def _get_redis(self):
+        if self._redis is None:
+            import redis
+            redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+            self._redis = redis.from_url(redis_url)
+        return self._redis
+
+
+def is_payload_ref(data: Any) -> bool:
+    return isinstance(data, dict) and "payload_store" in data and "location" in data
+
+
+def payload_row_count(data: Union[List[Dict[str, Any]], PayloadRef]) -> int:
+    """Row count of an inline payload or a stored reference"""
+    return data["rows"] if is_payload_ref(data) else len(data)
+
+
+def load_payload_frame(data: Union[List[Dict[str, Any]], PayloadRef]) -> pd.DataFrame:
+    """DataFrame for either an inline list of row dicts or a stored reference"""
+    if is_payload_ref(data):
+        return payload_store.get(data)
+    return pd.DataFrame(data)
+
+
+payload_store = PayloadStore()
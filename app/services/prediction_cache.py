@@ -0,0 +1,185 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def file_fingerprint(*paths: str) -> str:
+    """Short content hash of model artifacts, used as the cache model version"""
+    digest = hashlib.sha1()
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def copy_entry(value):
+    """Copy of a JSON-like cache entry, so callers never share its nested dicts or lists"""
+    if isinstance(value, dict):
+        return {key: copy_entry(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [copy_entry(item) for item in value]
+    return value
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache of model predictions keyed by exact ratio vectors.
+
+    Scoring is deterministic for a given model, so identical ratios always
+    produce the same result. Keys hold the exact float values: rounding them
+    would let two inputs on either side of a scoring bin edge share one
+    cached (and for one of them wrong) prediction. Keys carry the model version, which
+    changes whenever the model files change, and `reset` clears the local
+    tier on model reload. An optional Redis tier shares entries across
+    Celery workers and API processes. Entries are copied on the way in and
+    out, so a caller changing a returned prediction never alters the cache.
+
+    Configuration (environment):
+        ENABLE_ML_CACHE       - enable the cache (default true)
+        ML_CACHE_MAX_SIZE     - max entries in the in-process LRU (default 10000)
+        ENABLE_REDIS_CACHE    - enable the shared Redis tier (default false)
+        CACHE_TTL_SECONDS     - TTL of Redis entries (default 3600)
+    """
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self.enabled = os.getenv("ENABLE_ML_CACHE", "true").lower() == "true"
+        self.max_size = int(os.getenv("ML_CACHE_MAX_SIZE", "10000"))
+        self.redis_enabled = os.getenv("ENABLE_REDIS_CACHE", "false").lower() == "true"
+        self.redis_ttl = int(os.getenv("CACHE_TTL_SECONDS", "3600"))
+
+        self.model_version = "unversioned"
+        self._entries: "OrderedDict[Tuple, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis = None
+
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def active(self) -> bool:
+        return self.enabled and self.max_size > 0
+
+    def reset(self, model_version: str):
+        """Drop every local entry and start keying on a new model version"""
+        with self._lock:
+            self._entries.clear()
+            self.model_version = model_version
+            self.hits = self.redis_hits = self.misses = self.evictions = 0
+
+    def make_key(self, values: Iterable[float], *extra) -> Tuple:
+        """Exact feature tuple (NaN -> None) plus any extra scoring options"""
+        exact = tuple(None if np.isnan(value) else float(value).hex() for value in values)
+        return exact + tuple(extra)
+
+    def get_many(self, keys: List[Tuple]) -> List[Optional[Dict]]:
+        """Look up keys in the local LRU, then in Redis for local misses"""
+        if not self.active:
+            return [None] * len(keys)
+
+        results: List[Optional[Dict]] = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    entry = copy_entry(entry)
+                results.append(entry)
+
+        missing = [idx for idx, entry in enumerate(results) if entry is None]
+        if missing:
+            shared = self._redis_get([keys[idx] for idx in missing])
+            for idx, entry in zip(missing, shared):
+                if entry is not None:
+                    results[idx] = entry
+            self._store_local({keys[idx]: results[idx] for idx in missing if results[idx] is not None})
+
+        with self._lock:
+            found = sum(entry is not None for entry in results)
+            self.hits += found
+            self.misses += len(keys) - found
+            self.redis_hits += sum(results[idx] is not None for idx in missing)
+
+        return results
+
+    def set_many(self, items: Dict[Tuple, Dict]):
+        """Store freshly computed predictions in both tiers"""
+        if not self.active or not items:
+            return
+        self._store_local(items)
+        self._redis_set(items)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.active,
+                "model_version": self.model_version,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "redis_hits": self.redis_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "redis_enabled": self.redis_enabled
+            }
+
+    def _store_local(self, items: Dict[Tuple, Dict]):
+        with self._lock:
+            for key, entry in items.items():
+                self._entries[key] = copy_entry(entry)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _redis_key(self, key: Tuple) -> str:
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return f"ml_cache:{self.namespace}:{self.model_version}:{digest}"
+
+    def _get_redis(self):
+        if not self.redis_enabled:
+            return None
+        if self._redis is None:
+            try:
+                import redis
+                redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+                self._redis = redis.from_url(redis_url, decode_responses=True)
+            except Exception as e:
+                logger.warning(f"Prediction cache Redis tier disabled: {e}")
+                self.redis_enabled = False
+        return self._redis
+
+    def _redis_get(self, keys: List[Tuple]) -> List[Optional[Dict]]:
+        client = self._get_redis()
+        if client is None or not keys:
+            return [None] * len(keys)
+        try:
+            raw = client.mget([self._redis_key(key) for key in keys])
+            return [json.loads(value) if value else None for value in raw]
+        except Exception as e:
+            logger.warning(f"Prediction cache Redis read failed: {e}")
+            return [None] * len(keys)
+
+    def _redis_set(self, items: Dict[Tuple, Dict]):
+        client = self._get_redis()
+        if client is None:
+            return
+        try:
+            pipe = client.pipeline(transaction=False)
+            for key, entry in items.items():
+                pipe.set(self._redis_key(key), json.dumps(entry), ex=self.redis_ttl)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Prediction cache Redis write failed: {e}")
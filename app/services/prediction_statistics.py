@@ -0,0 +1,305 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import case, event, func, text
+from sqlalchemy.orm import Session
+
+from ..core.database import AnnualPrediction, Company, Organization, QuarterlyPrediction, User
+
+logger = logging.getLogger(__name__)
+
+PREDICTION_MODELS = {"annual": AnnualPrediction, "quarterly": QuarterlyPrediction}
+ACCESS_LEVELS = ("personal", "organization", "system")
+USER_ROLES = ("super_admin", "tenant_admin", "org_admin", "org_member", "user")
+
+RECENT_DAYS = 7
+TOP_LIMIT = 10
+
+# Tables whose writes make a snapshot stale
+TRACKED_TABLES = {model.__tablename__ for model in (AnnualPrediction, QuarterlyPrediction, Company, User, Organization)}
+
+# Session.info flag: the open transaction wrote to a tracked table
+CHANGED_INFO_KEY = "prediction_statistics_changed"
+
+GENERATION_KEY = "prediction_stats:generation"
+
+TOP_COMPANIES_QUERY = text("""
+    SELECT
+        c.id,
+        c.symbol,
+        c.name,
+        c.sector,
+        c.access_level,
+        COALESCE(annual_count, 0) as annual_count,
+        COALESCE(quarterly_count, 0) as quarterly_count,
+        COALESCE(annual_count, 0) + COALESCE(quarterly_count, 0) as total_count
+    FROM companies c
+    LEFT JOIN (
+        SELECT company_id, COUNT(*) as annual_count
+        FROM annual_predictions
+        GROUP BY company_id
+    ) ap ON c.id = ap.company_id
+    LEFT JOIN (
+        SELECT company_id, COUNT(*) as quarterly_count
+        FROM quarterly_predictions
+        GROUP BY company_id
+    ) qp ON c.id = qp.company_id
+    ORDER BY total_count DESC
+    LIMIT :limit
+""")
+
+
+def _key(value) -> Optional[str]:
+    return str(value) if value is not None else None
+
+
+class PredictionStatistics:
+    """
+    Prediction statistics from a fixed number of grouped queries.
+
+    A snapshot holds, per prediction type, counts grouped by
+    (organization_id, access_level) with the last-7-days count alongside,
+    counts grouped by (created_by, access_level) and counts per creator
+    role, plus user counts grouped by (role, organization_id), the
+    organization list and the most predicted companies. Every breakdown
+    the statistics endpoints return is summed from it in Python, so the
+    number of queries does not grow with organizations or users.
+
+    Snapshots are reused for PREDICTION_STATS_CACHE_SECONDS. Committing a
+    write to predictions, companies, users or organizations drops this
+    process's snapshot and, with ENABLE_REDIS_CACHE, bumps a generation
+    counter that tells the other processes to drop theirs.
+
+    Configuration (environment):
+        PREDICTION_STATS_CACHE_SECONDS - seconds a snapshot is reused (default 60, 0 disables)
+        ENABLE_REDIS_CACHE             - share invalidations across processes (default false)
+    """
+
+    def __init__(self):
+        self.cache_seconds = float(os.getenv("PREDICTION_STATS_CACHE_SECONDS", "60"))
+        self.redis_enabled = os.getenv("ENABLE_REDIS_CACHE", "false").lower() == "true"
+
+        self.generation = "0"
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._cached_at = 0.0
+        self._lock = threading.Lock()
+        self._redis = None
+
+    def snapshot(self, db) -> Dict[str, Any]:
+        """The current statistics snapshot, rebuilt when expired or invalidated"""
+        generation = self._shared_generation()
+        with self._lock:
+            if (
+                self._snapshot is not None
+                and generation == self.generation
+                and time.monotonic() - self._cached_at < self.cache_seconds
+            ):
+                return self._snapshot
+
+        snapshot = self._build(db)
+        with self._lock:
+            self._snapshot = snapshot
+            self._cached_at = time.monotonic()
+            self.generation = generation
+        return snapshot
+
+    def invalidate(self):
+        """Drop the snapshot here and, through the generation counter, in every other process"""
+        with self._lock:
+            self._snapshot = None
+        client = self._get_redis()
+        if client is None:
+            return
+        try:
+            client.incr(GENERATION_KEY)
+        except Exception as e:
+            logger.warning(f"Prediction statistics Redis invalidation failed: {e}")
+
+    def _build(self, db) -> Dict[str, Any]:
+        generated_at = datetime.now()
+        recent_since = generated_at - timedelta(days=RECENT_DAYS)
+
+        by_scope: Dict[str, Dict[Tuple[Optional[str], str], Dict[str, int]]] = {}
+        by_creator: Dict[str, Dict[Tuple[Optional[str], str], int]] = {}
+        by_creator_role: Dict[str, Dict[str, int]] = {}
+        for kind, model in PREDICTION_MODELS.items():
+            by_scope[kind] = {
+                (_key(organization_id), access_level): {"count": count, "recent": recent or 0}
+                for organization_id, access_level, count, recent in db.query(
+                    model.organization_id,
+                    model.access_level,
+                    func.count(model.id),
+                    func.count(case((model.created_at >= recent_since, 1)))
+                ).group_by(model.organization_id, model.access_level)
+            }
+            by_creator[kind] = {
+                (_key(created_by), access_level): count
+                for created_by, access_level, count in db.query(
+                    model.created_by, model.access_level, func.count(model.id)
+                ).group_by(model.created_by, model.access_level)
+            }
+            by_creator_role[kind] = dict(
+                db.query(User.role, func.count(model.id))
+                .join(User, User.id == model.created_by)
+                .group_by(User.role)
+                .all()
+            )
+
+        users = {
+            (role, _key(organization_id)): count
+            for role, organization_id, count in db.query(
+                User.role, User.organization_id, func.count(User.id)
+            ).group_by(User.role, User.organization_id)
+        }
+        organizations = [
+            {"id": str(org_id), "name": name, "domain": domain}
+            for org_id, name, domain in db.query(Organization.id, Organization.name, Organization.domain)
+        ]
+
+        snapshot = {
+            "generated_at": generated_at,
+            "by_scope": by_scope,
+            "by_creator": by_creator,
+            "by_creator_role": by_creator_role,
+            "users": users,
+            "organizations": organizations,
+            "total_companies": db.query(func.count(Company.id)).scalar() or 0,
+            "top_companies": [
+                {
+                    "company_id": str(row.id),
+                    "symbol": row.symbol,
+                    "name": row.name,
+                    "sector": row.sector,
+                    "access_level": row.access_level,
+                    "annual_predictions": row.annual_count or 0,
+                    "quarterly_predictions": row.quarterly_count or 0,
+                    "total_predictions": row.total_count or 0
+                }
+                for row in db.execute(TOP_COMPANIES_QUERY, {"limit": TOP_LIMIT})
+            ],
+        }
+        snapshot["top_contributors"] = self._top_contributors(db, by_creator)
+        return snapshot
+
+    def _top_contributors(self, db, by_creator) -> List[Dict[str, Any]]:
+        totals: Dict[str, Dict[str, int]] = {}
+        for kind, counts in by_creator.items():
+            for (created_by, _), count in counts.items():
+                if created_by is not None:
+                    per_kind = totals.setdefault(created_by, {"annual": 0, "quarterly": 0})
+                    per_kind[kind] += count
+        ranked = sorted(totals.items(), key=lambda item: item[1]["annual"] + item[1]["quarterly"], reverse=True)
+
+        contributors = []
+        # Creators are ranked before their users are loaded, TOP_LIMIT at a time; a further
+        # slice is only read when creators of the previous one no longer exist
+        for start in range(0, len(ranked), TOP_LIMIT):
+            candidates = ranked[start:start + TOP_LIMIT]
+            users = {
+                str(user.id): (user, org_name)
+                for user, org_name in db.query(User, Organization.name)
+                .outerjoin(Organization, Organization.id == User.organization_id)
+                .filter(User.id.in_([uuid.UUID(created_by) for created_by, _ in candidates]))
+            }
+            for created_by, per_kind in candidates:
+                if created_by not in users:
+                    continue
+                user, org_name = users[created_by]
+                contributors.append({
+                    "user_id": created_by,
+                    "full_name": user.full_name,
+                    "email": user.email,
+                    "role": user.role,
+                    "organization_name": org_name or "No Organization",
+                    "annual_predictions": per_kind["annual"],
+                    "quarterly_predictions": per_kind["quarterly"],
+                    "total_predictions": per_kind["annual"] + per_kind["quarterly"]
+                })
+                if len(contributors) == TOP_LIMIT:
+                    return contributors
+        return contributors
+
+    def _shared_generation(self) -> str:
+        client = self._get_redis()
+        if client is None:
+            return self.generation
+        try:
+            return client.get(GENERATION_KEY) or "0"
+        except Exception as e:
+            logger.warning(f"Prediction statistics Redis read failed: {e}")
+            return self.generation
+
+    def _get_redis(self):
+        if not self.redis_enabled:
+            return None
+        if self._redis is None:
+            try:
+                import redis
+                redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+                self._redis = redis.from_url(redis_url, decode_responses=True)
+            except Exception as e:
+                logger.warning(f"Prediction statistics Redis tier disabled: {e}")
+                self.redis_enabled = False
+        return self._redis
+
+
+def count_predictions(snapshot: Dict[str, Any], kind: str, organization_id=None, access_level: Optional[str] = None) -> int:
+    """Predictions of a type in a snapshot, optionally limited to one organization and/or access level"""
+    organization_id = _key(organization_id)
+    return sum(
+        counts["count"]
+        for (org, level), counts in snapshot["by_scope"][kind].items()
+        if (organization_id is None or org == organization_id) and (access_level is None or level == access_level)
+    )
+
+
+def count_created(snapshot: Dict[str, Any], kind: str, user_id, access_level: Optional[str] = None) -> int:
+    """Predictions of a type a user created, optionally limited to one access level"""
+    user_id = _key(user_id)
+    return sum(
+        count
+        for (created_by, level), count in snapshot["by_creator"][kind].items()
+        if created_by == user_id and (access_level is None or level == access_level)
+    )
+
+
+def count_recent(snapshot: Dict[str, Any], kind: str) -> int:
+    """Predictions of a type created in the RECENT_DAYS before the snapshot"""
+    return sum(counts["recent"] for counts in snapshot["by_scope"][kind].values())
+
+
+prediction_statistics = PredictionStatistics()
+
+
+@event.listens_for(Session, "after_flush")
+def _note_flushed_writes(session, flush_context):
+    for target in list(session.new) + list(session.dirty) + list(session.deleted):
+        if getattr(target, "__tablename__", None) in TRACKED_TABLES:
+            session.info[CHANGED_INFO_KEY] = True
+            return
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _note_statement_writes(orm_execute_state):
+    # Covers query-level updates/deletes and the Core inserts/upserts of bulk_writer
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    table = getattr(orm_execute_state.statement, "table", None)
+    if getattr(table, "name", None) in TRACKED_TABLES:
+        orm_execute_state.session.info[CHANGED_INFO_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session):
+    if session.info.pop(CHANGED_INFO_KEY, False):
+        prediction_statistics.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_writes(session):
+    session.info.pop(CHANGED_INFO_KEY, None)
@@ -4,17 +4,62 @@ import pickle
 import os
 import joblib
 import warnings
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
+from .prediction_cache import PredictionCache, file_fingerprint
+from .scoring_engine import (
+    BatchInput,
+    LogisticFastPath,
+    batch_to_matrix,
+    ScoringTable,
+    classify_risk_levels,
+    compile_scoring_info,
+    confidence_scores,
+    fast_logistic_enabled,
+    features_frame,
+    row_features,
+)
+
 warnings.filterwarnings("ignore")
 
+# How the LightGBM score (display-only; ensemble_probability is the logistic score) is produced:
+#   batch    - scored alongside the logistic model, one predict call per batch
+#   deferred - left empty at prediction time and backfilled by bulk jobs in one pass
+#   skip     - never scored, gbm_probability is stored as NULL
+GBM_MODES = ("batch", "deferred", "skip")
+
 class QuarterlyMLModelService:
+    RATIO_FIELDS = [
+        'total_debt_to_ebitda',
+        'sga_margin',
+        'long_term_debt_to_total_capital',
+        'return_on_capital'
+    ]
+
+    SINGLE_VARIABLES = [
+        'total debt / ebitda',
+        'sg&a margin',
+        'long-term debt / total capital (%)',
+        'return on capital'
+    ]
+
+    BINNED_FEATURES = [f"bin_{variable}" for variable in SINGLE_VARIABLES]
+
     def __init__(self):
         self.logistic_model = None
         self.lgb_model = None
         self.step_scaler = None
         self.scoring_info = None
+        self.scoring_tables = None
+        self.logistic_fast_path = None
+        self.model_version = None
+        self.prediction_cache = PredictionCache("quarterly")
+
+        self.gbm_mode = os.getenv("QUARTERLY_GBM_MODE", "batch").lower()
+        if self.gbm_mode not in GBM_MODES:
+            print(f"⚠️ Unknown QUARTERLY_GBM_MODE '{self.gbm_mode}', falling back to 'batch'")
+            self.gbm_mode = "batch"
         
         base_dir = os.path.dirname(os.path.dirname(__file__))  
         self.models_dir = os.path.join(base_dir, "models")
@@ -35,6 +80,17 @@ class QuarterlyMLModelService:
             
             with open(self.scoring_info_path, "rb") as f:
                 self.scoring_info = pickle.load(f)
+
+            self.scoring_tables = compile_scoring_info(self.scoring_info)
+            self.logistic_fast_path = (
+                LogisticFastPath.from_model(self.logistic_model, self.BINNED_FEATURES)
+                if fast_logistic_enabled() else None
+            )
+
+            self.model_version = file_fingerprint(
+                self.logistic_model_path, self.lgb_model_path, self.scoring_info_path
+            )
+            self.prediction_cache.reset(self.model_version)
                 
             print("✅ Quarterly ML Models and scoring info loaded successfully")
         except Exception as e:
@@ -46,32 +102,18 @@ class QuarterlyMLModelService:
         df[value_col] = df[value_col].replace([None, 'NM', 'N/A', ''], np.nan)
         df[value_col] = pd.to_numeric(df[value_col], errors='coerce')
 
-        intervals = scoring_info[value_col]['intervals']
-        rates = scoring_info[value_col]['rates']
-
-        def assign_rate(x):
-            if pd.isna(x) or x is None:
-                if "Missing" in intervals:
-                    return rates[intervals.index("Missing")]
-                else:
-                    return rates[0] if rates else 0.0
-            for idx, iv in enumerate(intervals):
-                if iv == "Missing":
-                    continue
-                low, high = iv
-                if low < x <= high:
-                    return rates[idx]
-            if rates:
-                return rates[0]  
-            return 0.0  
+        if scoring_info is self.scoring_info and self.scoring_tables is not None:
+            table = self.scoring_tables[value_col]
+        else:
+            table = ScoringTable.from_scoring_info(scoring_info[value_col])
 
         prefix = 'bin_'
         new_column_name = f"{prefix}{value_col}"
-        df[new_column_name] = df[value_col].apply(assign_rate)
+        df[new_column_name] = table.score(df[value_col].to_numpy(dtype=float))
         
         return df
 
-    def predict_quarterly_default_probability(self, financial_ratios: Dict[str, float]) -> Dict:
+    def predict_quarterly_default_probability(self, financial_ratios: Dict[str, float], gbm_mode: Optional[str] = None) -> Dict:
         """
         Predict quarterly default probability for a company based on financial ratios
         
@@ -81,12 +123,14 @@ class QuarterlyMLModelService:
                 - sga_margin: SG&A margin (%)
                 - long_term_debt_to_total_capital: Long-term debt / total capital (%)
                 - return_on_capital: Return on capital (%)
+            gbm_mode: Override for the service GBM mode. A single request has no
+                deferred pass, so "deferred" scores GBM inline here.
                 
         Returns:
             Dictionary with prediction results from both models
         """
         try:
-            if self.logistic_model is None or self.gbm_model is None or self.scoring_info is None:
+            if self.logistic_model is None or self.gbm_model is None or self.scoring_tables is None:
                 return {
                     "logistic_probability": 0.5,
                     "gbm_probability": 0.5,
@@ -97,19 +141,7 @@ class QuarterlyMLModelService:
                     "predicted_at": datetime.utcnow().isoformat()
                 }
 
-            single_variables = [
-                'total debt / ebitda',
-                'sg&a margin',
-                'long-term debt / total capital (%)',
-                'return on capital'
-            ]
-
-            required_fields = {
-                'total_debt_to_ebitda': 'total debt / ebitda',
-                'sga_margin': 'sg&a margin',
-                'long_term_debt_to_total_capital': 'long-term debt / total capital (%)',
-                'return_on_capital': 'return on capital'
-            }
+            required_fields = dict(zip(self.RATIO_FIELDS, self.SINGLE_VARIABLES))
 
             missing_fields = []
             for field in required_fields.keys():
@@ -128,76 +160,11 @@ class QuarterlyMLModelService:
                     "predicted_at": datetime.utcnow().isoformat()
                 }
 
-            values = [
-                financial_ratios['total_debt_to_ebitda'],
-                financial_ratios['sga_margin'],
-                financial_ratios['long_term_debt_to_total_capital'],
-                financial_ratios['return_on_capital']
-            ]
+            values = [financial_ratios[field] for field in self.RATIO_FIELDS]
 
-            df = pd.DataFrame([values], columns=single_variables)
-            
-            df_binned = df.copy()
-            for value_col in single_variables:
-                df_binned = self.binned_runscoring(df_binned, value_col, self.scoring_info)
-
-            binned_features = [
-                'bin_total debt / ebitda',
-                'bin_sg&a margin',
-                'bin_long-term debt / total capital (%)',
-                'bin_return on capital'
-            ]
-
-            X_logistic = df_binned[binned_features]
-            
-            if X_logistic.isnull().any().any():
-                print(f"❌ Warning: NaN values found in logistic features: {X_logistic.isnull().sum()}")
-                for feature in binned_features:
-                    if X_logistic[feature].isnull().any():
-                        original_col = feature.replace('bin_', '')
-                        if original_col in self.scoring_info and 'rates' in self.scoring_info[original_col]:
-                            rates = self.scoring_info[original_col]['rates']
-                            default_value = rates[0] if rates else 0.0
-                            X_logistic[feature] = X_logistic[feature].fillna(default_value)
-                            print(f"Filled NaN in {feature} with default value: {default_value}")
-            
-            logistic_probability = self.logistic_model.predict_proba(X_logistic)[:, 1][0]
+            mode = gbm_mode or ("skip" if self.gbm_mode == "skip" else "batch")
 
-            X_gbm = df[single_variables]
-            
-            if X_gbm.isnull().any().any():
-                print(f"❌ Warning: NaN values found in GBM features: {X_gbm.isnull().sum()}")
-                X_gbm = X_gbm.fillna(0)
-            
-            gbm_probability = self.gbm_model.predict(X_gbm)[0]
-
-            ensemble_probability = logistic_probability  
-
-            probability_percentage = ensemble_probability * 100
-
-            if probability_percentage > 15:
-                risk_level = "CRITICAL"
-            elif probability_percentage >= 5:
-                risk_level = "HIGH"
-            elif probability_percentage >= 2:
-                risk_level = "MEDIUM"
-            else:
-                risk_level = "LOW"
-
-            confidence = max(abs(ensemble_probability - 0.5) * 2, 0.5)
-
-            return {
-                "logistic_probability": float(logistic_probability),
-                "gbm_probability": float(gbm_probability),
-                "ensemble_probability": float(ensemble_probability),
-                "risk_level": risk_level,
-                "confidence": float(confidence),
-                "model_features": {
-                    "binned_features": {feature: float(df_binned[feature].iloc[0]) for feature in binned_features},
-                    "raw_features": {feature: float(df[feature].iloc[0]) for feature in single_variables}
-                },
-                "predicted_at": datetime.utcnow().isoformat()
-            }
+            return self.predict_batch(np.array([values], dtype=object), gbm_mode=mode)[0]
 
         except Exception as e:
             print(f"❌ Quarterly prediction error: {e}")
@@ -211,9 +178,103 @@ class QuarterlyMLModelService:
                 "predicted_at": datetime.utcnow().isoformat()
             }
 
-    def predict_default_probability(self, financial_ratios: Dict[str, float]) -> Dict:
+    def _score_logistic(self, binned: np.ndarray) -> np.ndarray:
+        """Logistic default probabilities for an already-binned feature matrix"""
+        if self.logistic_fast_path is not None:
+            return self.logistic_fast_path.predict_proba(binned)
+        return self.logistic_model.predict_proba(features_frame(binned, self.BINNED_FEATURES))[:, 1]
+
+    def predict_gbm_batch(self, data: BatchInput) -> np.ndarray:
+        """
+        LightGBM probabilities for a whole batch in one predict call
+
+        Used by bulk jobs to score GBM over an entire upload, either up front
+        ("batch" mode) or after the rows are stored ("deferred" mode).
+        """
+        if self.gbm_model is None:
+            raise RuntimeError("GBM model not loaded")
+
+        raw = batch_to_matrix(data, self.RATIO_FIELDS)
+        if len(raw) == 0:
+            return np.empty(0, dtype=float)
+        return self._score_gbm(raw)
+
+    def _score_gbm(self, raw: np.ndarray) -> np.ndarray:
+        """LightGBM probabilities for raw ratios, with NaN filled as 0 like the single-row path"""
+        X_gbm = features_frame(np.where(np.isnan(raw), 0.0, raw), self.SINGLE_VARIABLES)
+        return np.asarray(self.gbm_model.predict(X_gbm), dtype=float)
+
+    def bin_features(self, raw: np.ndarray) -> np.ndarray:
+        """Bin an (n_rows, 4) raw ratio matrix into logistic model features"""
+        binned = np.empty_like(raw)
+        for idx, value_col in enumerate(self.SINGLE_VARIABLES):
+            binned[:, idx] = self.scoring_tables[value_col].score(raw[:, idx])
+        return binned
+
+    def predict_batch(self, data: BatchInput, gbm_mode: Optional[str] = None) -> List[Dict]:
+        """
+        Predict quarterly default probabilities for many companies in one pass
+
+        Args:
+            data: DataFrame with the 4 ratio columns, or an (n_rows, 4) array
+                  in RATIO_FIELDS order
+            gbm_mode: Override for the service GBM mode; only "batch" scores
+                      GBM here, otherwise gbm_probability is None
+
+        Returns:
+            List of prediction dictionaries, one per input row, in input order
+        """
+        if self.logistic_model is None or self.gbm_model is None or self.scoring_tables is None:
+            raise RuntimeError("Models or scoring info not loaded")
+
+        raw = batch_to_matrix(data, self.RATIO_FIELDS)
+        if len(raw) == 0:
+            return []
+
+        score_gbm = (gbm_mode or self.gbm_mode) == "batch"
+        keys = [self.prediction_cache.make_key(row, score_gbm) for row in raw]
+        results = self.prediction_cache.get_many(keys)
+
+        misses = [idx for idx, result in enumerate(results) if result is None]
+        if misses:
+            computed = self._predict_rows(raw[misses], score_gbm)
+            for idx, result in zip(misses, computed):
+                results[idx] = result
+            self.prediction_cache.set_many({keys[idx]: results[idx] for idx in misses})
+
+        predicted_at = datetime.utcnow().isoformat()
+        return [{**result, "predicted_at": predicted_at} for result in results]
+
+    def _predict_rows(self, raw: np.ndarray, score_gbm: bool) -> List[Dict]:
+        """Score a raw ratio matrix; results carry no timestamp so they can be cached"""
+        binned = self.bin_features(raw)
+        logistic_probabilities = self._score_logistic(binned)
+        gbm_probabilities = self._score_gbm(raw) if score_gbm else None
+
+        ensemble_probabilities = logistic_probabilities
+        risk_levels = classify_risk_levels(ensemble_probabilities)
+        confidences = confidence_scores(ensemble_probabilities)
+        binned_features = row_features(binned, self.BINNED_FEATURES)
+        raw_features = row_features(raw, self.SINGLE_VARIABLES)
+
+        return [
+            {
+                "logistic_probability": float(logistic_probabilities[idx]),
+                "gbm_probability": float(gbm_probabilities[idx]) if gbm_probabilities is not None else None,
+                "ensemble_probability": float(ensemble_probabilities[idx]),
+                "risk_level": str(risk_levels[idx]),
+                "confidence": float(confidences[idx]),
+                "model_features": {
+                    "binned_features": binned_features[idx],
+                    "raw_features": raw_features[idx]
+                }
+            }
+            for idx in range(len(raw))
+        ]
+
+    def predict_default_probability(self, financial_ratios: Dict[str, float], gbm_mode: Optional[str] = None) -> Dict:
         """Alias for predict_quarterly_default_probability for compatibility"""
-        return self.predict_quarterly_default_probability(financial_ratios)
+        return self.predict_quarterly_default_probability(financial_ratios, gbm_mode=gbm_mode)
 
     async def predict_quarterly(self, financial_ratios: Dict[str, float]) -> Dict:
         """
@@ -0,0 +1,197 @@
+import io
+import os
+import csv
+import logging
+import tempfile
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple
+
+from sqlalchemy import func, select
+
+from ..core.database import get_session_local, Company, AnnualPrediction, QuarterlyPrediction
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched per round trip from the server-side cursor; also the Parquet row group size
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "5000"))
+
+# Bytes read per chunk when streaming a finished XLSX/Parquet file
+STREAM_CHUNK_BYTES = 1024 * 1024
+
+EXPORT_FORMATS = {
+    "csv": {"media_type": "text/csv", "extension": "csv"},
+    "excel": {
+        "media_type": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        "extension": "xlsx"
+    },
+    "parquet": {"media_type": "application/vnd.apache.parquet", "extension": "parquet"},
+}
+
+# (header, column expression, arrow type name) per prediction table, in file order
+ANNUAL_EXPORT_COLUMNS = [
+    ("Company Symbol", Company.symbol, "string"),
+    ("Company Name", Company.name, "string"),
+    ("Sector", Company.sector, "string"),
+    ("Default Probability", AnnualPrediction.probability, "float64"),
+    ("Risk Category", AnnualPrediction.risk_level, "string"),
+    ("Confidence", AnnualPrediction.confidence, "float64"),
+    ("Reporting Year", AnnualPrediction.reporting_year, "string"),
+    ("Long Term Debt to Total Capital", AnnualPrediction.long_term_debt_to_total_capital, "float64"),
+    ("Total Debt to EBITDA", AnnualPrediction.total_debt_to_ebitda, "float64"),
+    ("Net Income Margin", AnnualPrediction.net_income_margin, "float64"),
+    ("EBIT to Interest Expense", AnnualPrediction.ebit_to_interest_expense, "float64"),
+    ("Return on Assets", AnnualPrediction.return_on_assets, "float64"),
+    ("Created At", AnnualPrediction.created_at, "timestamp"),
+]
+
+QUARTERLY_EXPORT_COLUMNS = [
+    ("Company Symbol", Company.symbol, "string"),
+    ("Company Name", Company.name, "string"),
+    ("Sector", Company.sector, "string"),
+    ("Quarter", QuarterlyPrediction.reporting_quarter, "string"),
+    ("Year", QuarterlyPrediction.reporting_year, "string"),
+    (
+        "Default Probability",
+        func.coalesce(QuarterlyPrediction.ensemble_probability, QuarterlyPrediction.logistic_probability),
+        "float64"
+    ),
+    ("Risk Category", QuarterlyPrediction.risk_level, "string"),
+    ("Confidence", QuarterlyPrediction.confidence, "float64"),
+    ("Total Debt to EBITDA", QuarterlyPrediction.total_debt_to_ebitda, "float64"),
+    ("SGA Margin", QuarterlyPrediction.sga_margin, "float64"),
+    ("Long Term Debt to Total Capital", QuarterlyPrediction.long_term_debt_to_total_capital, "float64"),
+    ("Return on Capital", QuarterlyPrediction.return_on_capital, "float64"),
+    ("Created At", QuarterlyPrediction.created_at, "timestamp"),
+]
+
+
+def _export_columns(prediction_model) -> List[Tuple[str, Any, str]]:
+    return ANNUAL_EXPORT_COLUMNS if prediction_model is AnnualPrediction else QUARTERLY_EXPORT_COLUMNS
+
+
+def _cell(value: Any) -> Any:
+    """Numeric columns come back as Decimal; files get plain floats"""
+    return float(value) if isinstance(value, Decimal) else value
+
+
+def _text_cell(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else _cell(value)
+
+
+def iter_job_prediction_batches(job_id, prediction_model, batch_size: int = EXPORT_BATCH_ROWS) -> Iterator[List[tuple]]:
+    """
+    Yield the job's prediction rows in batches from a server-side cursor
+
+    Uses its own session so the stream outlives the request handler, and
+    selects only the exported columns (no ORM entities). The filter is the
+    indexed bulk_upload_job_id link.
+    """
+    columns = _export_columns(prediction_model)
+    statement = select(*[expression for _, expression, _ in columns]).select_from(prediction_model).join(
+        Company, prediction_model.company_id == Company.id
+    ).where(
+        prediction_model.bulk_upload_job_id == job_id
+    ).order_by(
+        Company.symbol, prediction_model.reporting_year, prediction_model.reporting_quarter, prediction_model.id
+    ).execution_options(yield_per=batch_size)
+
+    SessionLocal = get_session_local()
+    db = SessionLocal()
+    try:
+        for partition in db.execute(statement).partitions():
+            yield [tuple(row) for row in partition]
+    finally:
+        db.close()
+
+
+def _stream_file(spool) -> Iterator[bytes]:
+    spool.seek(0)
+    while True:
+        chunk = spool.read(STREAM_CHUNK_BYTES)
+        if not chunk:
+            break
+        yield chunk
+
+
+def stream_csv(job_id, prediction_model) -> Iterator[bytes]:
+    """CSV bytes, one chunk per fetched batch"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([header for header, _, _ in _export_columns(prediction_model)])
+
+    for batch in iter_job_prediction_batches(job_id, prediction_model):
+        writer.writerows([_text_cell(value) for value in row] for row in batch)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def stream_excel(job_id, prediction_model) -> Iterator[bytes]:
+    """
+    XLSX bytes from a write-only openpyxl workbook
+
+    Write-only sheets keep rows on disk, so memory stays flat; the finished
+    workbook is spooled to a temporary file and streamed from there.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Predictions")
+    sheet.append([header for header, _, _ in _export_columns(prediction_model)])
+    for batch in iter_job_prediction_batches(job_id, prediction_model):
+        for row in batch:
+            sheet.append([_cell(value) for value in row])
+
+    with tempfile.TemporaryFile() as spool:
+        workbook.save(spool)
+        yield from _stream_file(spool)
+
+
+def stream_parquet(job_id, prediction_model) -> Iterator[bytes]:
+    """Parquet bytes, one typed row group per fetched batch, spooled to a temporary file"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns = _export_columns(prediction_model)
+    arrow_types = {"string": pa.string(), "float64": pa.float64(), "timestamp": pa.timestamp("us")}
+    schema = pa.schema([(header, arrow_types[kind]) for header, _, kind in columns])
+
+    with tempfile.TemporaryFile() as spool:
+        with pq.ParquetWriter(spool, schema, compression="zstd") as writer:
+            for batch in iter_job_prediction_batches(job_id, prediction_model):
+                arrays = [
+                    pa.array([_cell(row[idx]) for row in batch], type=schema.field(idx).type)
+                    for idx in range(len(columns))
+                ]
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        yield from _stream_file(spool)
+
+
+EXPORT_WRITERS: Dict[str, Callable[[Any, Any], Iterator[bytes]]] = {
+    "csv": stream_csv,
+    "excel": stream_excel,
+    "parquet": stream_parquet,
+}
+
+
+def export_job_predictions(job_id, prediction_model, export_format: str) -> Iterator[bytes]:
+    """
+    Byte stream of a job's predictions in ``export_format`` (csv, excel or parquet)
+
+    Nothing is queried until the stream is iterated.
+
+    Raises:
+        ValueError: unknown format, or parquet without pyarrow installed
+    """
+    if export_format not in EXPORT_WRITERS:
+        raise ValueError(f"Format must be one of: {', '.join(EXPORT_FORMATS)}")
+    if export_format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ValueError("Parquet export requires pyarrow")
+    return EXPORT_WRITERS[export_format](job_id, prediction_model)
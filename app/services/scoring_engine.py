@@ -0,0 +1,178 @@
+import os
+import pandas as pd
+import numpy as np
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Sequence, Union
+
+BatchInput = Union[np.ndarray, pd.DataFrame]
+
+MISSING_TOKENS = ['NM', 'N/A', '']
+
+
+def coerce_ratio_values(values) -> np.ndarray:
+    """Convert raw ratio values to a float array, mapping None/'NM'/'N/A'/'' to NaN"""
+    series = pd.Series(values, dtype=object).replace(MISSING_TOKENS, np.nan)
+    return pd.to_numeric(series, errors='coerce').to_numpy(dtype=float)
+
+
+def batch_to_matrix(data: BatchInput, fields: Sequence[str]) -> np.ndarray:
+    """
+    Turn a batch of financial ratios into an (n_rows, n_fields) float matrix
+
+    Args:
+        data: DataFrame with one column per field, or an array whose columns
+              are already in `fields` order
+        fields: Ordered list of financial ratio field names
+
+    Returns:
+        Float matrix with NaN for missing/unparseable values
+    """
+    if isinstance(data, pd.DataFrame):
+        missing_columns = [field for field in fields if field not in data.columns]
+        if missing_columns:
+            raise ValueError(f"Missing required financial ratios: {missing_columns}")
+        columns = [data[field].to_numpy() for field in fields]
+    else:
+        array = np.asarray(data, dtype=object)
+        if array.ndim == 1:
+            array = array.reshape(1, -1)
+        if array.ndim != 2 or array.shape[1] != len(fields):
+            raise ValueError(
+                f"Expected an array of shape (n_rows, {len(fields)}), got {array.shape}"
+            )
+        columns = [array[:, idx] for idx in range(len(fields))]
+
+    if not columns or len(columns[0]) == 0:
+        return np.empty((0, len(fields)), dtype=float)
+
+    return np.column_stack([coerce_ratio_values(column) for column in columns])
+
+
+def _frozen(values: List[float]) -> np.ndarray:
+    array = np.asarray(values, dtype=float)
+    array.setflags(write=False)
+    return array
+
+
+@dataclass(frozen=True)
+class ScoringTable:
+    """Binned-scoring rules for one ratio, compiled to sorted NumPy edge/rate arrays"""
+    lows: np.ndarray
+    highs: np.ndarray
+    rates: np.ndarray
+    default_rate: float
+    missing_rate: float
+
+    @classmethod
+    def from_scoring_info(cls, info: Dict) -> "ScoringTable":
+        """Compile one scoring_info entry ({'intervals': [...], 'rates': [...]})"""
+        intervals = info['intervals']
+        rates = info['rates']
+
+        default_rate = float(rates[0]) if rates else 0.0
+        missing_rate = float(rates[intervals.index("Missing")]) if "Missing" in intervals else default_rate
+
+        bounded = [(iv, rate) for iv, rate in zip(intervals, rates) if iv != "Missing"]
+        bounded.sort(key=lambda item: item[0][1])
+
+        return cls(
+            lows=_frozen([iv[0] for iv, _ in bounded]),
+            highs=_frozen([iv[1] for iv, _ in bounded]),
+            rates=_frozen([rate for _, rate in bounded]),
+            default_rate=default_rate,
+            missing_rate=missing_rate
+        )
+
+    def score(self, values: np.ndarray) -> np.ndarray:
+        """
+        Map raw values to their bin rates.
+
+        Mirrors the original per-value rules of `binned_runscoring`: a value
+        falls in (low, high], NaN takes the "Missing" rate, and anything outside
+        every interval falls back to the first rate.
+        """
+        x = np.asarray(values, dtype=float)
+        scored = np.full(x.shape, self.default_rate, dtype=float)
+
+        if len(self.highs):
+            idx = np.minimum(np.searchsorted(self.highs, x, side='left'), len(self.highs) - 1)
+            matched = (x <= self.highs[idx]) & (x > self.lows[idx])
+            scored = np.where(matched, self.rates[idx], scored)
+
+        scored[np.isnan(x)] = self.missing_rate
+        return scored
+
+
+def compile_scoring_info(scoring_info: Dict) -> Mapping[str, ScoringTable]:
+    """Compile a loaded scoring_info pickle into read-only per-ratio scoring tables"""
+    return MappingProxyType({
+        value_col: ScoringTable.from_scoring_info(info)
+        for value_col, info in scoring_info.items()
+    })
+
+
+@dataclass(frozen=True)
+class LogisticFastPath:
+    """coef_/intercept_ of a fitted binary LogisticRegression, scored with a plain dot product"""
+    coef: np.ndarray
+    intercept: float
+
+    @classmethod
+    def from_model(cls, model, feature_names: Sequence[str]) -> Optional["LogisticFastPath"]:
+        """
+        Extract the linear terms from a fitted model.
+
+        Returns None when the model is not a plain binary linear classifier or
+        was trained on a different feature order, so callers keep predict_proba.
+        """
+        coef = getattr(model, 'coef_', None)
+        intercept = getattr(model, 'intercept_', None)
+        classes = getattr(model, 'classes_', None)
+        if coef is None or intercept is None or classes is None or len(classes) != 2:
+            return None
+
+        coef = np.asarray(coef, dtype=float)
+        if coef.shape != (1, len(feature_names)):
+            return None
+
+        trained_on = getattr(model, 'feature_names_in_', None)
+        if trained_on is not None and list(trained_on) != list(feature_names):
+            return None
+
+        return cls(coef=_frozen(coef[0]), intercept=float(np.asarray(intercept).ravel()[0]))
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Positive-class probabilities: sigmoid(X @ coef + intercept)"""
+        z = np.asarray(X, dtype=float) @ self.coef + self.intercept
+        return np.exp(-np.logaddexp(0.0, -z))
+
+
+def fast_logistic_enabled() -> bool:
+    """Whether ML services should bypass sklearn predict_proba (ML_FAST_LOGISTIC, default on)"""
+    return os.getenv("ML_FAST_LOGISTIC", "true").lower() == "true"
+
+
+def classify_risk_levels(probabilities: np.ndarray) -> np.ndarray:
+    """Vectorized risk bucketing matching the single-prediction thresholds"""
+    percentage = np.asarray(probabilities, dtype=float) * 100
+    return np.select(
+        [percentage > 15, percentage >= 5, percentage >= 2],
+        ["CRITICAL", "HIGH", "MEDIUM"],
+        default="LOW"
+    )
+
+
+def confidence_scores(probabilities: np.ndarray) -> np.ndarray:
+    """Vectorized confidence score: max(|p - 0.5| * 2, 0.5)"""
+    return np.maximum(np.abs(np.asarray(probabilities, dtype=float) - 0.5) * 2, 0.5)
+
+
+def features_frame(matrix: np.ndarray, columns: Sequence[str]) -> pd.DataFrame:
+    """Wrap a feature matrix with the column names the models were trained on"""
+    return pd.DataFrame(matrix, columns=list(columns))
+
+
+def row_features(matrix: np.ndarray, columns: Sequence[str]) -> List[Dict[str, float]]:
+    """Per-row {feature: value} dictionaries for prediction payloads"""
+    return [dict(zip(columns, map(float, row))) for row in matrix]
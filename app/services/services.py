@@ -1,8 +1,12 @@
 from sqlalchemy.orm import Session, joinedload, selectinload
-from sqlalchemy import and_, or_, desc
+from sqlalchemy import and_, or_, desc, func
 from ..core.database import Company, User, AnnualPrediction, QuarterlyPrediction
 from ..schemas.schemas import CompanyCreate, PredictionRequest
-from typing import Optional, List, Dict, Any
+from .company_resolver import company_resolver
+from .counting import resolve_count_mode, row_counter
+from .dashboard_aggregates import SYSTEM_SCOPE, dashboard_aggregates
+from .pagination import keyset_page
+from typing import Any, Callable, Dict, List, Optional
 from datetime import datetime, timedelta
 
 class CompanyService:
@@ -17,16 +21,32 @@ class CompanyService:
         search: Optional[str] = None,
         sort_by: str = "name",
         sort_order: str = "asc",
-        organization_filter=None  
+        organization_filter=None,
+        cursor: Optional[str] = None,
+        count: Optional[str] = None,
+        prediction_filter: Optional[Callable[[Any], Any]] = None,
+        latest: Optional[int] = None
     ):
-        """Get paginated list of companies with their predictions"""
+        """
+        Get paginated list of companies with their predictions (page number or keyset cursor)
+
+        The page of companies is selected first, without its predictions,
+        so the page size is a number of companies rather than of joined
+        prediction rows. The predictions of the page are then loaded with
+        one query per type (see _load_page_predictions).
+
+        ``count`` is a counting mode (exact, estimate or none); by default
+        numbered pages are counted exactly and cursor pages not at all.
+
+        Args:
+            prediction_filter: SQL criterion of the predictions the caller may
+                               see, given the prediction model (None sees all)
+            latest: only load the newest ``latest`` predictions of each type per company
+        """
         skip = (page - 1) * limit
         take = min(limit, 100)
 
-        query = self.db.query(Company).options(
-            joinedload(Company.annual_predictions),
-            joinedload(Company.quarterly_predictions)
-        )
+        query = self.db.query(Company)
 
         if organization_filter is not None:
             query = query.filter(organization_filter)
@@ -42,20 +62,13 @@ class CompanyService:
             query = query.filter(search_filter)
 
         valid_sort_fields = ["name", "symbol", "market_cap", "created_at"]
-        if sort_by in valid_sort_fields:
-            sort_column = getattr(Company, sort_by)
-            if sort_order == "desc":
-                query = query.order_by(desc(sort_column))
-            else:
-                query = query.order_by(sort_column)
-        else:
-            query = query.order_by(Company.name)
+        sort_column = getattr(Company, sort_by if sort_by in valid_sort_fields else "name")
 
         count_query = self.db.query(Company)
-        
+
         if organization_filter is not None:
             count_query = count_query.filter(organization_filter)
-            
+
         if sector:
             count_query = count_query.filter(Company.sector.ilike(f"%{sector}%"))
         if search:
@@ -64,22 +77,90 @@ class CompanyService:
                 Company.symbol.ilike(f"%{search}%")
             )
             count_query = count_query.filter(search_filter)
-        total = count_query.count()
 
-        companies = query.offset(skip).limit(take).all()
+        system_count = None
+        if organization_filter is None and not sector and not search:
+            # Every company: the system scope's maintained company count
+            system_count = lambda: dashboard_aggregates.read(self.db, [SYSTEM_SCOPE])[SYSTEM_SCOPE]["company_count"]
+        counted = row_counter.count(self.db, count_query, resolve_count_mode(count, cursor), aggregate=system_count)
+        total = counted.total
+
+        # The id breaks ties so pages neither repeat nor skip companies sharing a sort value
+        companies, next_cursor = keyset_page(
+            query, [sort_column, Company.id], lambda company: (getattr(company, sort_column.key), company.id),
+            take, cursor=cursor, descending=sort_order == "desc", offset=skip
+        )
 
         return {
             "companies": companies,
+            "predictions": self._load_page_predictions(
+                [company.id for company in companies], prediction_filter, latest
+            ),
             "pagination": {
                 "page": page,
                 "limit": take,
                 "total": total,
-                "pages": (total + take - 1) // take,
-                "has_next": skip + take < total,
-                "has_prev": page > 1
+                "pages": (total + take - 1) // take if total is not None else None,
+                "has_next": next_cursor is not None,
+                "has_prev": page > 1 or bool(cursor),
+                "next_cursor": next_cursor,
+                **counted.as_pagination()
             }
         }
 
+    def _load_page_predictions(
+        self,
+        company_ids: List[Any],
+        prediction_filter: Optional[Callable[[Any], Any]] = None,
+        latest: Optional[int] = None
+    ) -> Dict[Any, Dict[str, Any]]:
+        """
+        Visible predictions of a page of companies, newest first
+
+        Each prediction type is read with one query restricted to the page's
+        company ids and to ``prediction_filter``, so rows the caller may not
+        see are never fetched. With ``latest`` a row_number() window keeps
+        the newest predictions per company, and a grouped COUNT still
+        reports how many are visible in total.
+
+        Returns:
+            Per company id: "annual" and "quarterly" prediction lists and
+            "annual_count" and "quarterly_count" totals
+        """
+        loaded = {company_id: {} for company_id in company_ids}
+        if not company_ids:
+            return loaded
+
+        for kind, model in (("annual", AnnualPrediction), ("quarterly", QuarterlyPrediction)):
+            criteria = [model.company_id.in_(company_ids)]
+            visible = prediction_filter(model) if prediction_filter is not None else None
+            if visible is not None:
+                criteria.append(visible)
+            newest_first = [model.created_at.desc(), model.id.desc()]
+
+            query = self.db.query(model).filter(*criteria)
+            if latest:
+                ranked = self.db.query(
+                    model.id,
+                    func.row_number().over(partition_by=model.company_id, order_by=newest_first).label("position")
+                ).filter(*criteria).subquery()
+                query = query.join(ranked, ranked.c.id == model.id).filter(ranked.c.position <= latest)
+                totals = dict(
+                    self.db.query(model.company_id, func.count(model.id))
+                    .filter(*criteria)
+                    .group_by(model.company_id)
+                    .all()
+                )
+
+            for company_id in company_ids:
+                loaded[company_id][kind] = []
+            for prediction in query.order_by(model.company_id, *newest_first).all():
+                loaded[prediction.company_id][kind].append(prediction)
+            for company_id, predictions in loaded.items():
+                predictions[f"{kind}_count"] = totals.get(company_id, 0) if latest else len(predictions[kind])
+
+        return loaded
+
     def get_company_by_id(self, company_id: str):
         """Get company by ID with all predictions"""
         return self.db.query(Company).options(
@@ -467,6 +548,9 @@ class DatabaseService:
             affected_records = count_companies + count_annual + count_quarterly + count_otp + count_sessions + count_users
         
         self.db.commit()
+        if "companies" in tables_reset:
+            # Bulk deletes skip the ORM events the resolver listens to
+            company_resolver.invalidate()
         return {
             "tables_reset": tables_reset,
             "affected_records": affected_records
@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import logging
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+QUEUES = ("high_priority", "medium_priority", "low_priority")
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile (q in 0..100) of a list of samples, None when empty"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = min(len(ordered) - 1, max(0, int(round(q / 100 * (len(ordered) - 1)))))
+    return ordered[rank]
+
+
+class ThroughputStats:
+    """
+    Measured throughput of bulk upload jobs, per queue.
+
+    When a job is dispatched, its queue, job type and task count (the number
+    of chunks for chunked uploads, 1 otherwise) are noted in Redis together
+    with the enqueue time; the first 'processing' status adds the start time.
+    When the job completes, one sample is pushed onto a capped Redis list for
+    its queue, shared by API processes and workers:
+
+        rows_per_second  - rows / processing seconds / tasks, i.e. per worker task
+        wait_seconds     - seconds between dispatch and the first task starting
+
+    Reads summarise the last THROUGHPUT_SAMPLE_SIZE samples as percentiles;
+    with fewer than THROUGHPUT_MIN_SAMPLES samples they return None and the
+    caller keeps its static defaults. Redis being unreachable only costs the
+    measurements, never the upload.
+
+    Configuration (environment):
+        THROUGHPUT_SAMPLE_SIZE   - samples kept per queue (default 200)
+        THROUGHPUT_MIN_SAMPLES   - samples needed before measurements are used (default 5)
+        THROUGHPUT_CACHE_SECONDS - seconds a process reuses the samples it read (default 30)
+        JOB_PROGRESS_TTL_SECONDS - expiry of a job's dispatch note (default 86400)
+    """
+
+    def __init__(self):
+        self.sample_size = int(os.getenv("THROUGHPUT_SAMPLE_SIZE", "200"))
+        self.min_samples = int(os.getenv("THROUGHPUT_MIN_SAMPLES", "5"))
+        self.cache_seconds = float(os.getenv("THROUGHPUT_CACHE_SECONDS", "30"))
+        self.note_ttl = int(os.getenv("JOB_PROGRESS_TTL_SECONDS", "86400"))
+        self._redis = None
+        self._cache = (0.0, None)
+
+    def _samples_key(self, queue: str) -> str:
+        return f"bulk_throughput:{queue}"
+
+    def _note_key(self, job_id: str) -> str:
+        return f"bulk_job_dispatch:{job_id}"
+
+    def _get_redis(self):
+        if self._redis is None:
+            import redis
+            redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+            self._redis = redis.from_url(redis_url, decode_responses=True)
+        return self._redis
+
+    def note_dispatch(self, job_id: str, queue: str, job_type: str, tasks: int = 1):
+        """Remember where and when a job was queued"""
+        key = self._note_key(job_id)
+        try:
+            pipe = self._get_redis().pipeline()
+            pipe.hset(key, mapping={"queue": queue, "job_type": job_type, "tasks": tasks, "queued_at": time.time()})
+            pipe.expire(key, self.note_ttl)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Could not note dispatch of job {job_id}: {e}")
+
+    def note_tasks(self, job_id: str, tasks: int):
+        """Record how many parallel tasks a job was split into"""
+        try:
+            self._get_redis().hset(self._note_key(job_id), "tasks", tasks)
+        except Exception as e:
+            logger.warning(f"Could not note task count of job {job_id}: {e}")
+
+    def note_started(self, job_id: str):
+        """Record when the first task of a job started (later calls keep the first time)"""
+        try:
+            self._get_redis().hsetnx(self._note_key(job_id), "started_at", time.time())
+        except Exception as e:
+            logger.warning(f"Could not note start of job {job_id}: {e}")
+
+    def dispatch(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Queue and task count a job was dispatched with, None when it was not noted (or the note expired)"""
+        try:
+            note = self._get_redis().hgetall(self._note_key(job_id))
+        except Exception as e:
+            logger.warning(f"Could not read dispatch of job {job_id}: {e}")
+            return None
+        if not note.get("queue"):
+            return None
+        return {"queue": note["queue"], "tasks": max(int(note.get("tasks") or 1), 1)}
+
+    def record_completion(self, job_id: str, total_rows: int):
+        """Turn a completed job's dispatch note into a sample for its queue"""
+        key = self._note_key(job_id)
+        try:
+            client = self._get_redis()
+            note = client.hgetall(key)
+            client.delete(key)
+        except Exception as e:
+            logger.warning(f"Could not read dispatch of job {job_id}: {e}")
+            return
+
+        if not note.get("queued_at") or not note.get("started_at") or not total_rows:
+            return
+        finished_at = time.time()
+        queued_at, started_at = float(note["queued_at"]), float(note["started_at"])
+        processing_seconds = max(finished_at - started_at, 1e-3)
+        tasks = max(int(note.get("tasks") or 1), 1)
+
+        sample = {
+            "job_type": note.get("job_type"),
+            "rows": total_rows,
+            "tasks": tasks,
+            "rows_per_second": total_rows / processing_seconds / tasks,
+            "wait_seconds": max(started_at - queued_at, 0.0),
+            "at": finished_at
+        }
+        samples_key = self._samples_key(note.get("queue") or "medium_priority")
+        try:
+            pipe = client.pipeline()
+            pipe.lpush(samples_key, json.dumps(sample))
+            pipe.ltrim(samples_key, 0, self.sample_size - 1)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Could not record throughput of job {job_id}: {e}")
+
+    def samples(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Recent samples of every queue, newest first, reused for THROUGHPUT_CACHE_SECONDS"""
+        cached_at, samples = self._cache
+        if samples is not None and time.monotonic() - cached_at < self.cache_seconds:
+            return samples
+        try:
+            pipe = self._get_redis().pipeline()
+            for queue in QUEUES:
+                pipe.lrange(self._samples_key(queue), 0, self.sample_size - 1)
+            raw = pipe.execute()
+            samples = {queue: [json.loads(entry) for entry in entries] for queue, entries in zip(QUEUES, raw)}
+        except Exception as e:
+            logger.warning(f"Could not read throughput samples: {e}")
+            samples = {queue: [] for queue in QUEUES}
+        self._cache = (time.monotonic(), samples)
+        return samples
+
+    def rows_per_second(self, job_type: str, queue: Optional[str] = None, q: float = 50) -> Optional[float]:
+        """
+        Measured rows per second of one worker task for a job type
+
+        Uses the queue's own samples when it has enough of them and the
+        samples of every queue otherwise; None without enough samples.
+        """
+        samples = self.samples()
+        rates = [s["rows_per_second"] for s in samples.get(queue, []) if s.get("job_type") == job_type] if queue else []
+        if len(rates) < self.min_samples:
+            rates = [s["rows_per_second"] for entries in samples.values() for s in entries if s.get("job_type") == job_type]
+        if len(rates) < self.min_samples:
+            return None
+        return percentile(rates, q)
+
+    def wait_seconds(self, queue: str, q: float = 50) -> Optional[float]:
+        """Measured wait between dispatch and start on a queue, None without enough samples"""
+        waits = [s["wait_seconds"] for s in self.samples().get(queue, [])]
+        if len(waits) < self.min_samples:
+            return None
+        return percentile(waits, q)
+
+    def summary(self) -> Dict[str, Any]:
+        """Per-queue percentiles of the recent samples"""
+        summary = {}
+        for queue, entries in self.samples().items():
+            rates = [s["rows_per_second"] for s in entries]
+            waits = [s["wait_seconds"] for s in entries]
+            summary[queue] = {
+                "samples": len(entries),
+                "rows_per_second_p50": percentile(rates, 50),
+                "rows_per_second_p10": percentile(rates, 10),
+                "wait_seconds_p50": percentile(waits, 50),
+                "wait_seconds_p90": percentile(waits, 90)
+            }
+        return summary
+
+
+throughput_stats = ThroughputStats()
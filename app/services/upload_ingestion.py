@@ -0,0 +1,128 @@
+import os
+import logging
+import itertools
+import pandas as pd
+from typing import Any, Dict, IO, Iterator, List, Optional, Sequence
+
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from .payload_store import payload_store
+
+logger = logging.getLogger(__name__)
+
+# Rows parsed per block; each block becomes one Parquet row group
+BLOCK_ROWS = int(os.getenv("BULK_UPLOAD_BLOCK_ROWS", "5000"))
+
+# Upper bound on rows per upload (0 = unlimited)
+MAX_UPLOAD_ROWS = int(os.getenv("BULK_UPLOAD_MAX_ROWS", "1000000"))
+
+# Rows kept in memory for request-time sanity checks
+PREVIEW_ROWS = 3
+
+
+class UploadValidationError(ValueError):
+    """The upload is unusable (bad header, no rows, too many rows); the message is safe to show"""
+
+
+def _text_value(value: Any) -> Optional[str]:
+    """Cell value as stored in the payload: text, with blanks as None"""
+    if value is None:
+        return None
+    if isinstance(value, float) and value != value:
+        return None
+    text = str(value)
+    return text if text.strip() else None
+
+
+def _csv_blocks(source: IO[bytes]) -> Iterator[pd.DataFrame]:
+    reader = pd.read_csv(source, dtype=str, chunksize=BLOCK_ROWS, encoding="utf-8-sig")
+    for block in reader:
+        yield block.astype(object).where(block.notna(), None)
+
+
+def _xlsx_blocks(source: IO[bytes]) -> Iterator[pd.DataFrame]:
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(name).strip() if name is not None else f"Unnamed: {idx}" for idx, name in enumerate(header)]
+
+        block: List[List[Optional[str]]] = []
+        for values in rows:
+            values = [_text_value(value) for value in values[:len(columns)]]
+            if not any(value is not None for value in values):
+                continue  # blank line, as read_csv skips them
+            block.append(values + [None] * (len(columns) - len(values)))
+            if len(block) >= BLOCK_ROWS:
+                yield pd.DataFrame(block, columns=columns, dtype=object)
+                block = []
+        if block:
+            yield pd.DataFrame(block, columns=columns, dtype=object)
+    finally:
+        workbook.close()
+
+
+def _ingest(source: IO[bytes], filename: str, required_columns: Sequence[str], name: Optional[str]) -> Dict[str, Any]:
+    blocks = _csv_blocks(source) if filename.endswith(".csv") else _xlsx_blocks(source)
+
+    first = next(blocks, None)
+    if first is None or first.empty:
+        raise UploadValidationError("No data found in file")
+
+    missing_columns = [col for col in required_columns if col not in first.columns]
+    if missing_columns:
+        raise UploadValidationError(f"Missing required columns: {', '.join(missing_columns)}")
+
+    preview = first.head(PREVIEW_ROWS).to_dict("records")
+    columns = list(first.columns)
+
+    def counted_blocks() -> Iterator[pd.DataFrame]:
+        rows = 0
+        for block in itertools.chain([first], blocks):
+            rows += len(block)
+            if MAX_UPLOAD_ROWS and rows > MAX_UPLOAD_ROWS:
+                raise UploadValidationError(f"File contains too many rows (max {MAX_UPLOAD_ROWS:,})")
+            yield block
+
+    payload_ref = payload_store.put_frames(counted_blocks(), columns, name=name)
+    return {"payload_ref": payload_ref, "total_rows": payload_ref["rows"], "preview": preview}
+
+
+async def ingest_upload(
+    file: UploadFile,
+    required_columns: Sequence[str],
+    name: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Parse a CSV/XLSX upload block by block straight into the payload store
+
+    The multipart parser has already spooled the body to a temporary file, so
+    the file is read from there in a worker thread: CSV with pandas' chunked
+    reader, XLSX with openpyxl in read-only mode. The header is checked on the
+    first block, before the rest of the file is parsed. Values are kept as text
+    (blank cells as None); the worker pipelines coerce them.
+
+    Returns:
+        {"payload_ref", "total_rows", "file_size", "preview"} where preview holds
+        the first rows as dicts for request-time checks
+
+    Raises:
+        UploadValidationError: missing columns, no rows, or more than BULK_UPLOAD_MAX_ROWS rows
+    """
+    source = file.file
+    source.seek(0, os.SEEK_END)
+    file_size = source.tell()
+    source.seek(0)
+
+    ingested = await run_in_threadpool(_ingest, source, file.filename, required_columns, name)
+    ingested["file_size"] = file_size
+    logger.info(
+        f"📥 Ingested {file.filename}: {ingested['total_rows']} rows, {file_size} bytes -> "
+        f"{ingested['payload_ref']['payload_store']}/{ingested['payload_ref']['format']} ({ingested['payload_ref']['bytes']} bytes)"
+    )
+    return ingested
@@ -0,0 +1,143 @@
+"""
+Checkpoints that let bulk upload tasks resume instead of starting over.
+
+Celery runs these tasks with ``task_acks_late`` and
+``task_reject_on_worker_lost``, so a worker that dies mid-job gets the whole
+task redelivered. Each task part (part 0 for single-task jobs, the chunk
+index for chunked ones) records the highest upload row whose outcome is
+committed, staged in the same transaction as the rows themselves. A
+redelivered task skips every row up to that checkpoint, so nothing is
+rescored or inserted twice and the counters carry over.
+
+Rows are always written in ascending row order, which is what makes a
+single "last row" enough to describe what is already committed. The row
+errors of the rows a checkpoint passes go to bulk_upload_job_errors in the
+same transaction, so a resumed task keeps them as stored and only writes
+the errors of the rows after its checkpoint.
+"""
+
+import os
+import logging
+from itertools import chain
+from typing import Any, Callable, Dict, List, Optional
+
+from ..core.database import BulkUploadCheckpoint, BulkUploadJob
+from ..services.job_errors import store_job_errors
+
+logger = logging.getLogger(__name__)
+
+# Seconds a bulk task works before checkpointing and re-queueing itself, kept under task_soft_time_limit
+TASK_YIELD_SECONDS = float(os.getenv("BULK_TASK_YIELD_SECONDS", str(6 * 60)))
+
+FINISHED_JOB_STATUSES = ("completed", "failed", "cancelled")
+
+
+def yield_deadline(start_time: float) -> float:
+    """time.time() after which a task stops between batches and continues in a fresh run"""
+    return start_time + TASK_YIELD_SECONDS
+
+
+def job_is_finished(db, job_id: str) -> bool:
+    """True when a (redelivered) task finds its job already finished or cancelled"""
+    job = db.query(BulkUploadJob).filter(BulkUploadJob.id == job_id).first()
+    return job is not None and job.status in FINISHED_JOB_STATUSES
+
+
+def load_checkpoint(db, job_id: str, part: int = 0) -> Optional[BulkUploadCheckpoint]:
+    """The committed checkpoint of one job part, None when the part has not committed anything yet"""
+    return db.query(BulkUploadCheckpoint).filter(
+        BulkUploadCheckpoint.job_id == job_id,
+        BulkUploadCheckpoint.part == part
+    ).first()
+
+
+def checkpoint_row(checkpoint: Optional[BulkUploadCheckpoint]) -> Optional[int]:
+    """Row up to which a part's errors are stored with its checkpoint, None without one"""
+    return checkpoint.last_row if checkpoint else None
+
+
+def stage_checkpoint(
+    db,
+    job_id: str,
+    part: int,
+    last_row: int,
+    successful_rows: int,
+    updated_rows: int,
+    failed_rows: int,
+    errors: List[Dict[str, Any]]
+) -> BulkUploadCheckpoint:
+    """
+    Move a part's checkpoint forward without committing
+
+    Call it inside the transaction that commits the rows up to ``last_row``
+    so the checkpoint and the rows land together or not at all. Counters are
+    the part's totals through ``last_row``, not increments. Of ``errors``,
+    those of rows after the previous checkpoint up to ``last_row`` are
+    stored in the job's error table with it.
+    """
+    checkpoint = load_checkpoint(db, job_id, part)
+    if checkpoint is None:
+        checkpoint = BulkUploadCheckpoint(job_id=job_id, part=part, last_row=0)
+        db.add(checkpoint)
+
+    previous_row = checkpoint.last_row or 0
+    store_job_errors(db, job_id, [
+        entry for entry in errors
+        if entry.get('row') is not None and previous_row < entry['row'] <= last_row
+    ], part)
+
+    checkpoint.last_row = int(last_row)
+    checkpoint.successful_rows = successful_rows
+    checkpoint.updated_rows = updated_rows
+    checkpoint.failed_rows = failed_rows
+    db.flush()
+    return checkpoint
+
+
+def clear_checkpoints(db, job_id: str) -> int:
+    """Drop every checkpoint of a finished job (not committed)"""
+    return db.query(BulkUploadCheckpoint).filter(
+        BulkUploadCheckpoint.job_id == job_id
+    ).delete(synchronize_session=False)
+
+
+def insert_checkpointer(
+    db,
+    job_id: str,
+    part: int,
+    checkpoint: Optional[BulkUploadCheckpoint],
+    skipped_error: Callable[[int], Dict[str, Any]],
+    rejected: Optional[List[Dict[str, Any]]] = None
+) -> Callable:
+    """
+    ``checkpoint`` callback for insert_prediction_mappings
+
+    Stages the part's totals (those carried over from ``checkpoint`` plus the
+    current run's insert outcome) with every committed batch, together with
+    the row errors of the rows the batch passes: rows ``rejected`` before the
+    insert (e.g. in validation), stored duplicates and failed inserts.
+    ``skipped_error`` turns the index of a mapping left alone by the conflict
+    policy into its row error.
+    """
+    rejected = rejected or []
+    base_successful = (checkpoint.successful_rows or 0) if checkpoint else 0
+    base_updated = (checkpoint.updated_rows or 0) if checkpoint else 0
+    base_failed = (checkpoint.failed_rows or 0) if checkpoint else 0
+
+    def stage(last_row: int, committed, pending, insert_errors: List[Dict[str, Any]]):
+        updated = len(committed.updated) + len(pending.updated)
+        successful = len(committed.inserted) + len(pending.inserted) + updated
+        failed = len(committed.skipped) + len(pending.skipped) + len(insert_errors)
+
+        # Skips of earlier batches were stored with their own checkpoint
+        errors = list(chain(rejected, (skipped_error(idx) for idx in pending.skipped), insert_errors))
+
+        stage_checkpoint(
+            db, job_id, part, last_row,
+            successful_rows=base_successful + successful,
+            updated_rows=base_updated + updated,
+            failed_rows=base_failed + failed,
+            errors=errors
+        )
+
+    return stage
@@ -0,0 +1,361 @@
+"""
+Columnar stages for bulk prediction uploads.
+
+Each stage works on the whole payload instead of row by row:
+
+    validate (incl. in-file duplicates) -> resolve companies -> score -> upsert
+
+Rows rejected by a stage are recorded as row errors (same shape as the
+job's error_details entries) and dropped before the next stage, so the
+model and the database only ever see rows that passed every check.
+"""
+
+import time
+import uuid
+import logging
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from ..core.database import AnnualPrediction, User
+from ..services.company_resolver import company_resolver
+from ..services.job_errors import (
+    ERROR_DUPLICATE_IN_FILE,
+    ERROR_INSERT_FAILED,
+    ERROR_INVALID_QUARTER,
+    ERROR_MISSING_FIELD,
+    ERROR_ROW_FAILED,
+)
+from .bulk_writer import UpsertResult, upsert_rows
+
+logger = logging.getLogger(__name__)
+
+ANNUAL_RATIO_FIELDS = [
+    'long_term_debt_to_total_capital',
+    'total_debt_to_ebitda',
+    'net_income_margin',
+    'ebit_to_interest_expense',
+    'return_on_assets'
+]
+
+ANNUAL_REQUIRED_FIELDS = [
+    'company_symbol', 'company_name', 'market_cap', 'sector', 'reporting_year'
+] + ANNUAL_RATIO_FIELDS
+
+ANNUAL_NUMERIC_FIELDS = ['market_cap'] + ANNUAL_RATIO_FIELDS
+
+QUARTERLY_RATIO_FIELDS = [
+    'total_debt_to_ebitda',
+    'sga_margin',
+    'long_term_debt_to_total_capital',
+    'return_on_capital'
+]
+
+QUARTERLY_REQUIRED_FIELDS = [
+    'company_symbol', 'company_name', 'market_cap', 'sector', 'reporting_year', 'reporting_quarter'
+] + QUARTERLY_RATIO_FIELDS
+
+QUARTERLY_NUMERIC_FIELDS = ['market_cap'] + QUARTERLY_RATIO_FIELDS
+
+# 'Q3', 'q3', '3' and '3.0' (Excel floats) are all quarter 3
+QUARTER_PATTERN = r'^Q?([1-4])(?:\.0*)?$'
+
+INSERT_BATCH_SIZE = 1000
+
+# Original 1-based row number carried by chunk payloads
+ROW_NUMBER_COLUMN = '_row'
+
+
+def row_error(row_number: int, error: str, code: str = ERROR_ROW_FAILED) -> Dict[str, Any]:
+    """Build an error_details entry for a 1-based row number (see job_errors for the codes)"""
+    return {'row': int(row_number), 'code': code, 'error': error}
+
+
+def coerce_float_column(series: pd.Series) -> pd.Series:
+    """Vectorized safe_float: unparseable, NaN and inf values become 0"""
+    values = pd.to_numeric(series, errors='coerce').astype(float)
+    return values.replace([np.inf, -np.inf], np.nan).fillna(0.0)
+
+
+def _is_blank(series: pd.Series) -> pd.Series:
+    return series.isna() | (series.astype(str).str.strip() == '')
+
+
+def partition_by_company(df: pd.DataFrame, chunk_count: int) -> List[pd.DataFrame]:
+    """
+    Split an upload into at most ``chunk_count`` frames for parallel workers
+
+    Every row of a company lands in the same chunk, so chunks never race to
+    create the same company and in-file duplicates are still caught by the
+    chunk's validation stage. Rows keep their original row number in '_row'.
+    """
+    frame = df.reset_index(drop=True)
+    frame[ROW_NUMBER_COLUMN] = np.arange(1, len(frame) + 1)
+
+    symbols = frame['company_symbol'].astype(str).str.strip().str.upper()
+    codes, uniques = pd.factorize(symbols)
+    chunk_count = max(1, min(chunk_count, len(uniques)))
+
+    # Largest companies first onto the lightest chunk keeps chunk sizes even
+    sizes = np.bincount(codes, minlength=len(uniques))
+    loads = [0] * chunk_count
+    assignment = np.empty(len(uniques), dtype=int)
+    for code in np.argsort(-sizes, kind='stable'):
+        target = loads.index(min(loads))
+        assignment[code] = target
+        loads[target] += sizes[code]
+
+    chunk_of_row = assignment[codes]
+    return [frame.loc[chunk_of_row == chunk] for chunk in range(chunk_count) if loads[chunk]]
+
+
+def normalize_quarter_column(series: pd.Series) -> pd.Series:
+    """Vectorized normalize_quarter: 'q2', ' 2 ', 2 and 2.0 become 'Q2', anything else None"""
+    digits = series.astype(str).str.strip().str.upper().str.extract(QUARTER_PATTERN, expand=False)
+    return ('Q' + digits).astype(object).where(digits.notna(), None)
+
+
+def validate_rows(
+    data: Union[List[Dict[str, Any]], pd.DataFrame],
+    required_fields: List[str],
+    numeric_fields: List[str],
+    quarter_required: bool = False
+) -> Tuple[pd.DataFrame, List[Dict[str, Any]]]:
+    """
+    Validation stage shared by annual and quarterly uploads
+
+    Every check runs over whole columns and marks the rows it rejects; each
+    rejected row gets one error, from the first check it failed, in this
+    order: blank required field, invalid quarter, repeat of a key (symbol,
+    year, quarter) already seen earlier in the file. Numeric fields are
+    coerced rather than rejected (unparseable, NaN and inf become 0).
+
+    Returns:
+        (frame, errors) where frame holds only valid rows, indexed by their
+        1-based row number, and errors is the per-row error table as
+        error_details entries ordered by row
+
+    A '_row' column (set on chunk payloads, see partition_by_company) is used
+    as the row number instead of the position in ``data``.
+    """
+    df = pd.DataFrame(data)
+    if ROW_NUMBER_COLUMN in df.columns:
+        df.index = pd.Index(df.pop(ROW_NUMBER_COLUMN).astype(int), name='row')
+    else:
+        df.index = pd.RangeIndex(1, len(df) + 1, name='row')
+
+    for field in required_fields:
+        if field not in df.columns:
+            df[field] = None
+    if 'reporting_quarter' not in df.columns:
+        df['reporting_quarter'] = None
+
+    checks = [
+        (_is_blank(df[field]), f"Missing required field: {field}", ERROR_MISSING_FIELD)
+        for field in required_fields if field not in numeric_fields
+    ]
+
+    raw_quarter = df['reporting_quarter'].astype(object)
+    quarter_blank = _is_blank(raw_quarter)
+    quarter = normalize_quarter_column(raw_quarter)
+    if quarter_required:
+        checks.append((~quarter_blank & quarter.isna(), "Invalid reporting_quarter: " + raw_quarter.astype(str), ERROR_INVALID_QUARTER))
+        df['reporting_quarter'] = quarter
+    else:
+        # Annual rows may carry any quarter label; it is only kept as text
+        df['reporting_quarter'] = raw_quarter.where(~quarter_blank, None).map(
+            lambda value: None if value is None else str(value).strip()
+        )
+
+    message = pd.Series(None, index=df.index, dtype=object)
+    code = pd.Series(None, index=df.index, dtype=object)
+    for failed, text, error_code in reversed(checks):
+        message = message.mask(failed, text)
+        code = code.mask(failed, error_code)
+
+    df['company_symbol'] = df['company_symbol'].astype(str).str.strip().str.upper()
+    df['reporting_year'] = df['reporting_year'].astype(str).str.strip()
+
+    # A key repeated later in the file is rejected; stored keys are left to the conflict policy
+    passed = message.isna()
+    keys = pd.DataFrame({
+        'symbol': df['company_symbol'],
+        'year': df['reporting_year'],
+        'quarter': df['reporting_quarter'].fillna('')
+    }).loc[passed]
+    duplicate = keys.duplicated(keep='first')
+    if duplicate.any():
+        first_row = pd.Series(keys.index, index=keys.index).groupby([keys['symbol'], keys['year'], keys['quarter']]).transform('first')
+        label = (keys['symbol'] + ' ' + keys['year'] + (' ' + keys['quarter']).where(keys['quarter'] != '', ''))
+        duplicate_text = "Duplicate of row " + first_row.astype(str) + " for " + label
+        message.loc[duplicate.index[duplicate]] = duplicate_text[duplicate]
+        code.loc[duplicate.index[duplicate]] = ERROR_DUPLICATE_IN_FILE
+
+    invalid = message.notna()
+    errors = [row_error(row, text, error_code) for row, text, error_code in zip(df.index[invalid], message[invalid], code[invalid])]
+
+    df = df.loc[~invalid].copy()
+    for field in numeric_fields:
+        df[field] = coerce_float_column(df[field])
+
+    return df, errors
+
+
+def validate_annual_rows(data: Union[List[Dict[str, Any]], pd.DataFrame]) -> Tuple[pd.DataFrame, List[Dict[str, Any]]]:
+    """Validation stage for annual uploads; reporting_quarter is optional free text (see validate_rows)"""
+    return validate_rows(data, ANNUAL_REQUIRED_FIELDS, ANNUAL_NUMERIC_FIELDS)
+
+
+def validate_quarterly_rows(data: Union[List[Dict[str, Any]], pd.DataFrame]) -> Tuple[pd.DataFrame, List[Dict[str, Any]]]:
+    """Validation stage for quarterly uploads; quarters are normalized to Q1-Q4 (see validate_rows)"""
+    return validate_rows(data, QUARTERLY_REQUIRED_FIELDS, QUARTERLY_NUMERIC_FIELDS, quarter_required=True)
+
+
+def resolve_access_level(db, organization_id: Optional[str], user_id: str) -> str:
+    """Access level for rows uploaded by this user, decided once per job"""
+    if organization_id:
+        return "organization"
+    user = db.query(User).filter(User.id == user_id).first()
+    if user and user.role == "super_admin":
+        return "system"
+    return "personal"
+
+
+def resolve_companies(
+    db,
+    df: pd.DataFrame,
+    access_level: str,
+    organization_id: Optional[str],
+    user_id: str,
+    market_cap_multiplier: float = 1.0
+) -> Dict[str, Any]:
+    """
+    Bulk create-or-get every company referenced by the frame
+
+    Goes through the shared company resolver (cache, then one IN query per
+    batch of unknown symbols). Existing companies have their name/market
+    cap/sector refreshed from the last row that mentions them; missing
+    companies are inserted together.
+
+    Returns:
+        Mapping of upper-cased symbol -> company id
+    """
+    latest = df.drop_duplicates('company_symbol', keep='last').set_index('company_symbol')
+    companies = {
+        symbol: {
+            'name': row['company_name'],
+            'market_cap': float(row['market_cap']) * market_cap_multiplier,
+            'sector': row['sector']
+        }
+        for symbol, row in latest[['company_name', 'market_cap', 'sector']].iterrows()
+    }
+    return company_resolver.resolve_many(db, companies, access_level, organization_id, user_id)
+
+
+def score_annual_rows(df: pd.DataFrame, ml_model) -> pd.DataFrame:
+    """Run the annual model once over every remaining row"""
+    results = ml_model.predict_batch(df[ANNUAL_RATIO_FIELDS])
+    scored = df.copy()
+    scored['probability'] = [result['probability'] for result in results]
+    scored['risk_level'] = [result['risk_level'] for result in results]
+    scored['confidence'] = [result['confidence'] for result in results]
+    return scored
+
+
+def build_annual_mappings(
+    df: pd.DataFrame,
+    access_level: str,
+    organization_id: Optional[str],
+    user_id: str,
+    bulk_upload_job_id: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """Insert mappings for AnnualPrediction, keyed by row number and linked to the job writing them"""
+    predicted_at = datetime.utcnow()
+    columns = ['company_id', 'reporting_year', 'reporting_quarter'] + ANNUAL_RATIO_FIELDS + [
+        'probability', 'risk_level', 'confidence'
+    ]
+    mappings = []
+    for row_number, values in zip(df.index, df[columns].itertuples(index=False, name=None)):
+        mapping = dict(zip(columns, values))
+        mapping.update(
+            id=uuid.uuid4(),
+            organization_id=organization_id,
+            access_level=access_level,
+            predicted_at=predicted_at,
+            created_by=user_id,
+            bulk_upload_job_id=bulk_upload_job_id,
+            _row=int(row_number)
+        )
+        mappings.append(mapping)
+    return mappings
+
+
+def insert_prediction_mappings(
+    db,
+    model,
+    mappings: List[Dict[str, Any]],
+    on_batch: Optional[Callable[[int, int], None]] = None,
+    batch_size: int = INSERT_BATCH_SIZE,
+    conflict_policy: str = "skip",
+    checkpoint: Optional[Callable[[int, UpsertResult, UpsertResult, List[Dict[str, Any]]], None]] = None,
+    deadline: Optional[float] = None
+) -> Tuple[UpsertResult, List[Dict[str, Any]]]:
+    """
+    Upsert prediction mappings in committed batches
+
+    Each batch is one INSERT ... ON CONFLICT (staged through COPY on
+    PostgreSQL, see bulk_writer), so stored duplicates are resolved by
+    ``conflict_policy`` without a lookup per row. A batch that fails is rolled
+    back and retried row by row so a single bad row is reported against its
+    own row number instead of failing the batch.
+
+    Args:
+        model: AnnualPrediction or QuarterlyPrediction
+        mappings: Insert mappings carrying their 1-based row number in '_row'
+        on_batch: Called with (stored, failed) after every committed batch
+        checkpoint: Called with (last_row, committed, pending, row_errors) inside
+                    every transaction, just before it commits, so the caller
+                    can stage its resume point with the rows (see
+                    bulk_checkpoint); ``pending`` is the outcome being committed
+        deadline: time.time() after which no further batch is started; the
+                  caller finds the rows left over from its checkpoint
+
+    Returns:
+        (upsert_result, row_errors) where the result indexes into ``mappings``
+    """
+    result = UpsertResult()
+    errors: List[Dict[str, Any]] = []
+
+    for offset in range(0, len(mappings), batch_size):
+        if deadline is not None and offset and time.time() >= deadline:
+            break
+
+        batch = mappings[offset:offset + batch_size]
+        rows = [{k: v for k, v in mapping.items() if k != '_row'} for mapping in batch]
+        try:
+            pending = UpsertResult()
+            pending.extend(upsert_rows(db, model, rows, conflict_policy), offset)
+            if checkpoint:
+                checkpoint(batch[-1]['_row'], result, pending, errors)
+            db.commit()
+            result.extend(pending)
+        except Exception as batch_error:
+            db.rollback()
+            logger.warning(f"Bulk insert batch failed, retrying row by row: {batch_error}")
+            for idx, (mapping, row) in enumerate(zip(batch, rows)):
+                try:
+                    pending = UpsertResult()
+                    pending.extend(upsert_rows(db, model, [row], conflict_policy), offset + idx)
+                    if checkpoint:
+                        checkpoint(mapping['_row'], result, pending, errors)
+                    db.commit()
+                    result.extend(pending)
+                except Exception as e:
+                    db.rollback()
+                    errors.append(row_error(mapping['_row'], str(e), ERROR_INSERT_FAILED))
+
+        if on_batch:
+            on_batch(len(result.inserted) + len(result.updated), len(result.skipped) + len(errors))
+
+    return result, errors
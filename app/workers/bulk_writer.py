@@ -0,0 +1,274 @@
+"""
+Bulk row writer for prediction tables.
+
+``upsert_rows`` resolves natural-key conflicts in the database with
+``INSERT ... ON CONFLICT`` instead of a lookup per row. Large PostgreSQL
+batches are streamed with ``COPY ... FROM STDIN`` (CSV) into a temporary
+staging table on the session's own connection, so they stay inside the job
+transaction, and moved over with a single ``INSERT ... SELECT ... ON
+CONFLICT``. Smaller batches and other dialects (SQLite in local runs and
+tests) get multi-row ``INSERT ... VALUES`` statements sized to stay under
+the bind-parameter limit. Under overwrite/keep_newest the stored rows a
+batch may replace are read (and locked) first, in one query, so their
+previous values are known to the dashboard aggregates.
+
+What was written is reported to the dashboard aggregates, which apply the
+changes when the caller commits.
+"""
+
+import io
+import os
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Sequence
+
+from sqlalchemy import Column, MetaData, Table, and_, func, or_, select, text, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from ..services.dashboard_aggregates import dashboard_aggregates
+
+# What to do when a row's natural key is already stored:
+#   skip        - keep the stored prediction, report the row as skipped
+#   overwrite   - replace the stored prediction's values
+#   keep_newest - replace only when the incoming predicted_at is newer
+CONFLICT_POLICIES = ("skip", "overwrite", "keep_newest")
+
+# Below this many rows a plain multi-row INSERT beats creating a staging table
+COPY_MIN_ROWS = 50
+
+# Columns an overwrite never touches: identity, natural key and provenance
+PRESERVED_COLUMNS = {
+    "id", "company_id", "reporting_year", "reporting_quarter", "access_level",
+    "organization_id", "created_by", "created_at"
+}
+
+# SQLite's default SQLITE_MAX_VARIABLE_NUMBER on older builds is 999
+MAX_BIND_PARAMS = 999
+
+
+def _column_defaults(table, columns: Sequence[str], timestamp) -> Dict[str, Callable[[], Any]]:
+    """Producers for Python-side column defaults missing from the rows, which COPY would leave NULL"""
+    defaults = {}
+    for column in table.columns:
+        default = column.default
+        if column.name in columns or default is None:
+            continue
+        if default.is_scalar:
+            defaults[column.name] = lambda value=default.arg: value
+        elif default.is_callable:
+            defaults[column.name] = lambda fn=default.arg: fn(None)
+        elif default.is_clause_element:
+            # func.now(): the transaction timestamp an INSERT would have used
+            defaults[column.name] = lambda: timestamp
+    return defaults
+
+
+def _csv_field(value: Any) -> str:
+    """COPY CSV field: NULL is an empty unquoted field, strings are always quoted"""
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        return '"' + value.replace('"', '""') + '"'
+    return str(value)
+
+
+def _copy_rows(db, table, rows: List[Dict[str, Any]], into: str) -> List[str]:
+    """COPY rows for ``table`` into the staging table ``into``; returns the columns written"""
+    columns = list(rows[0].keys())
+    timestamp = db.execute(text("SELECT LOCALTIMESTAMP")).scalar()
+    defaults = _column_defaults(table, columns, timestamp)
+
+    buffer = io.StringIO()
+    for row in rows:
+        values = [row.get(name) for name in columns] + [produce() for produce in defaults.values()]
+        buffer.write(",".join(map(_csv_field, values)) + "\n")
+    buffer.seek(0)
+
+    written = columns + list(defaults)
+    column_list = ", ".join(f'"{name}"' for name in written)
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f'COPY "{into}" ({column_list}) FROM STDIN WITH (FORMAT csv)', buffer)
+    finally:
+        cursor.close()
+    return written
+
+
+@dataclass
+class UpsertResult:
+    """Outcome of an upsert, as indexes into the submitted rows"""
+    inserted: List[int] = field(default_factory=list)
+    updated: List[int] = field(default_factory=list)
+    skipped: List[int] = field(default_factory=list)
+    ids: Dict[int, Any] = field(default_factory=dict)  # row index -> stored prediction id
+    replaced: Dict[int, Dict[str, Any]] = field(default_factory=dict)  # updated row index -> stored values it replaced
+
+    def extend(self, other: "UpsertResult", offset: int = 0):
+        self.inserted.extend(idx + offset for idx in other.inserted)
+        self.updated.extend(idx + offset for idx in other.updated)
+        self.skipped.extend(idx + offset for idx in other.skipped)
+        self.ids.update({idx + offset: stored_id for idx, stored_id in other.ids.items()})
+        self.replaced.update({idx + offset: values for idx, values in other.replaced.items()})
+
+
+def default_conflict_policy() -> str:
+    """Conflict policy used when a caller does not pick one (BULK_CONFLICT_POLICY, default skip)"""
+    policy = os.getenv("BULK_CONFLICT_POLICY", "skip").lower()
+    return policy if policy in CONFLICT_POLICIES else "skip"
+
+
+def natural_key_index(table):
+    """The unique natural-key index (uq_*) of a prediction table"""
+    return next(index for index in table.indexes if index.unique and index.name.startswith("uq_"))
+
+
+def _natural_key(table, row) -> tuple:
+    access_level = row.get("access_level") or table.c.access_level.default.arg
+    return (str(row["company_id"]), str(row["reporting_year"]), row.get("reporting_quarter") or "", access_level)
+
+
+def _key_values(table, row) -> tuple:
+    """A row's natural key as bind values for the uq_* index expressions"""
+    company_id, reporting_year, reporting_quarter, access_level = _natural_key(table, row)
+    return (uuid.UUID(company_id), reporting_year, reporting_quarter, access_level)
+
+
+def natural_key_exists(db, model, row: Dict[str, Any]) -> bool:
+    """
+    Whether a prediction with ``row``'s natural key is already stored
+
+    Lets single-row callers under the skip policy refuse a duplicate before
+    scoring it; the upsert's ON CONFLICT still settles concurrent writers.
+    """
+    table = model.__table__
+    matches = [expression == value for expression, value in zip(natural_key_index(table).expressions, _key_values(table, row))]
+    return db.execute(select(table.c.id).where(*matches).limit(1)).first() is not None
+
+
+def _replaced_columns(table, columns: Sequence[str]):
+    return [table.c[name] for name in dict.fromkeys(("id", "company_id", "reporting_year", "reporting_quarter", "access_level", *columns))]
+
+
+def _stored_rows(db, table, rows: List[Dict[str, Any]], columns: Sequence[str]) -> Dict[tuple, Dict[str, Any]]:
+    """Stored values of ``columns`` for the rows sharing a natural key with ``rows``, locked until commit"""
+    key = tuple_(*natural_key_index(table).expressions)
+    keys_per_statement = max(MAX_BIND_PARAMS // 4, 1)
+    stored = {}
+    for start in range(0, len(rows), keys_per_statement):
+        keys = [_key_values(table, row) for row in rows[start:start + keys_per_statement]]
+        query = select(*_replaced_columns(table, columns)).where(key.in_(keys)).with_for_update()
+        stored.update((_natural_key(table, found._mapping), dict(found._mapping)) for found in db.execute(query))
+    return stored
+
+
+def _on_conflict(statement, table, policy: str, columns: Sequence[str]):
+    target = list(natural_key_index(table).expressions)
+    if policy == "skip":
+        return statement.on_conflict_do_nothing(index_elements=target)
+
+    excluded = statement.excluded
+    updates = {name: excluded[name] for name in columns if name not in PRESERVED_COLUMNS and name != "updated_at"}
+    if "updated_at" in table.c:
+        updates["updated_at"] = func.now()
+    where = None
+    if policy == "keep_newest":
+        where = or_(table.c.predicted_at.is_(None), excluded.predicted_at > table.c.predicted_at)
+    return statement.on_conflict_do_update(index_elements=target, set_=updates, where=where)
+
+
+def _returning(table):
+    return (table.c.id, table.c.company_id, table.c.reporting_year, table.c.reporting_quarter, table.c.access_level)
+
+
+def _staged_upsert(db, table, rows: List[Dict[str, Any]], policy: str, replaced_columns: Sequence[str] = ()):
+    stage = Table(
+        f"stage_{table.name}_{uuid.uuid4().hex[:8]}",
+        MetaData(),
+        *[Column(column.name, column.type) for column in table.columns],
+        prefixes=["TEMPORARY"],
+        postgresql_on_commit="DROP"
+    )
+    connection = db.connection()
+    stage.create(connection)
+    columns = _copy_rows(db, table, rows, into=stage.name)
+
+    stored = {}
+    if replaced_columns:
+        matches = and_(
+            table.c.company_id == stage.c.company_id,
+            table.c.reporting_year == stage.c.reporting_year,
+            func.coalesce(table.c.reporting_quarter, '') == func.coalesce(stage.c.reporting_quarter, ''),
+            table.c.access_level == stage.c.access_level
+        )
+        query = select(*_replaced_columns(table, replaced_columns)).join(stage, matches).with_for_update(of=table)
+        stored = {_natural_key(table, found._mapping): dict(found._mapping) for found in db.execute(query)}
+
+    statement = pg_insert(table).from_select(columns, select(*[stage.c[name] for name in columns]))
+    returned = db.execute(_on_conflict(statement, table, policy, columns).returning(*_returning(table))).all()
+    stage.drop(connection)
+    return returned, stored
+
+
+def _values_upsert(db, table, rows: List[Dict[str, Any]], policy: str, replaced_columns: Sequence[str] = ()):
+    insert = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    columns = list(rows[0].keys())
+    rows_per_statement = max(MAX_BIND_PARAMS // len(table.columns), 1)
+    stored = _stored_rows(db, table, rows, replaced_columns) if replaced_columns else {}
+    returned = []
+    for start in range(0, len(rows), rows_per_statement):
+        statement = insert(table).values(rows[start:start + rows_per_statement])
+        returned.extend(db.execute(_on_conflict(statement, table, policy, columns).returning(*_returning(table))).all())
+    return returned, stored
+
+
+def upsert_rows(db, model, rows: List[Dict[str, Any]], policy: str = "skip") -> UpsertResult:
+    """
+    Insert prediction rows, resolving natural-key conflicts with ``policy``
+
+    Rows must share the same keys; an ``id`` is assigned to rows without one.
+    A batch must not repeat a natural key under overwrite/keep_newest
+    (PostgreSQL refuses to update one row twice in a statement). Nothing is
+    committed here; the caller owns the transaction.
+    """
+    if policy not in CONFLICT_POLICIES:
+        raise ValueError(f"Unknown conflict policy '{policy}', expected one of {CONFLICT_POLICIES}")
+
+    result = UpsertResult()
+    if not rows:
+        return result
+
+    table = model.__table__
+    rows = [row if row.get("id") else {**row, "id": uuid.uuid4()} for row in rows]
+    # Only an update replaces stored values, and only the aggregated columns need to be known
+    replaced_columns = dashboard_aggregates.tracked_columns(model) if policy != "skip" else ()
+
+    if db.get_bind().dialect.name == "postgresql" and len(rows) >= COPY_MIN_ROWS:
+        returned, stored_rows = _staged_upsert(db, table, rows, policy, replaced_columns)
+    else:
+        returned, stored_rows = _values_upsert(db, table, rows, policy, replaced_columns)
+
+    pending: Dict[tuple, List[int]] = {}
+    for idx, row in enumerate(rows):
+        pending.setdefault(_natural_key(table, row), []).append(idx)
+
+    for stored in returned:
+        candidates = pending.get(_natural_key(table, stored._mapping), [])
+        if not candidates:
+            continue
+        inserted = next((idx for idx in candidates if str(rows[idx]["id"]) == str(stored.id)), None)
+        if inserted is not None:
+            candidates.remove(inserted)
+            result.inserted.append(inserted)
+            result.ids[inserted] = stored.id
+        else:
+            updated = candidates.pop(0)
+            result.updated.append(updated)
+            result.ids[updated] = stored.id
+            previous = stored_rows.get(_natural_key(table, stored._mapping))
+            if previous is not None and str(previous["id"]) == str(stored.id):
+                result.replaced[updated] = previous
+
+    result.skipped = sorted(idx for candidates in pending.values() for idx in candidates)
+    dashboard_aggregates.note_upsert(db, model, rows, result)
+    return result
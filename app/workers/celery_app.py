@@ -61,7 +61,7 @@ celery_app = Celery(
     "bulk_prediction_worker",
     broker=BROKER_URL,
     backend=BACKEND_URL,
-    include=["app.workers.tasks"]
+    include=["app.workers.tasks", "app.workers.chunked_tasks"]
 )
 
 celery_app.conf.update(
@@ -120,7 +120,6 @@ celery_app.conf.update(
     task_routes={
         # HIGH PRIORITY - Small files (< 2000 rows) - Process immediately  
         "app.workers.tasks.process_small_bulk_task": {"queue": "high_priority", "routing_key": "high_priority"},
-        "app.workers.tasks.process_chunk_task": {"queue": "high_priority", "routing_key": "high_priority"},
         
         # MEDIUM PRIORITY - Normal bulk uploads
         "app.workers.tasks.process_bulk_excel_task": {"queue": "medium_priority", "routing_key": "medium_priority"},
@@ -129,6 +128,11 @@ celery_app.conf.update(
         "app.workers.tasks.process_bulk_normalized_task": {"queue": "medium_priority", "routing_key": "medium_priority"},
         "app.workers.tasks.process_quarterly_bulk_task": {"queue": "medium_priority", "routing_key": "medium_priority"},
         
+        # CHUNKED UPLOADS - the split task, its chunks and their chord callback follow the job's queue
+        "app.workers.chunked_tasks.split_annual_upload_task": {"queue": "medium_priority", "routing_key": "medium_priority"},
+        "app.workers.chunked_tasks.process_chunk_task": {"queue": "medium_priority", "routing_key": "medium_priority"},
+        "app.workers.chunked_tasks.finalize_chunked_upload_task": {"queue": "medium_priority", "routing_key": "medium_priority"},
+        
         # LOW PRIORITY - Large files (> 8000 rows) - Background processing
         "app.workers.tasks.process_large_bulk_task": {"queue": "low_priority", "routing_key": "low_priority"},
     },
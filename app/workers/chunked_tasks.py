@@ -2,392 +2,403 @@
 
 import os
 import sys
-import pandas as pd
 import time
 import traceback
-import math
-from datetime import datetime
 from typing import Dict, Any, List, Optional
-from celery import current_task
 
 if sys.platform == "darwin":
     os.environ.setdefault("OBJC_DISABLE_INITIALIZE_FORK_SAFETY", "YES")
 
+from celery import chord
+from celery.exceptions import Retry
+
 from ..workers.celery_app import celery_app
-from ..core.database import get_session_local, BulkUploadJob, Company, AnnualPrediction, QuarterlyPrediction, User, Organization
+from ..core.database import get_session_local, BulkUploadJob, AnnualPrediction
 from ..services.ml_service import ml_model
-from ..services.quarterly_ml_service import quarterly_ml_model
+from ..services.payload_store import PayloadRef, load_payload_frame, payload_row_count, payload_store
+from ..services.job_progress import job_progress
+from ..services.throughput_stats import throughput_stats
+from ..services.job_errors import ERROR_DUPLICATE_STORED, ERROR_JOB_FAILED, replace_job_errors
+from .bulk_pipeline import (
+    partition_by_company,
+    validate_annual_rows,
+    resolve_access_level,
+    resolve_companies,
+    score_annual_rows,
+    build_annual_mappings,
+    insert_prediction_mappings,
+    row_error,
+)
+from .bulk_writer import default_conflict_policy
+from .bulk_checkpoint import job_is_finished, load_checkpoint, checkpoint_row, insert_checkpointer, yield_deadline
+from .tasks import TaskLogger, enhanced_task_logging, update_job_status
 import logging
 
 logger = logging.getLogger(__name__)
 
-def safe_float(value):
-    """Convert value to float, handling None and NaN values"""
-    if value is None:
-        return 0
-    try:
-        float_val = float(value)
-        if math.isnan(float_val) or math.isinf(float_val):
-            return 0
-        return float_val
-    except (ValueError, TypeError):
-        return 0
-
-def update_chunk_progress(
+# Most chunks per large upload; the default matches the prefork pool of one worker instance
+CHUNK_COUNT = int(os.getenv("BULK_CHUNK_COUNT", "8"))
+
+# Errors each chunk publishes and hands to the chord callback; all of them are stored in the job error table
+CHUNK_ERROR_LIMIT = 100
+
+
+def process_annual_chunk(
+    db,
     job_id: str,
-    chunk_index: int,
-    chunk_rows_processed: int,
-    chunk_rows_successful: int,
-    chunk_rows_failed: int,
-    is_chunk_complete: bool = False,
-    error_message: Optional[str] = None
-):
-    """Update job progress when a chunk is processed"""
+    chunk_ref: PayloadRef,
+    user_id: str,
+    organization_id: Optional[str],
+    conflict_policy: str,
+    on_progress,
+    chunk_index: int = 0,
+    deadline: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Run the annual pipeline stages over one chunk
+
+    Row numbers in errors are the upload's, not the chunk's. ``on_progress`` is
+    called with (processed, successful, failed) deltas as the chunk advances.
+
+    Every insert batch moves the chunk's checkpoint (part ``chunk_index``), and
+    a rerun of the chunk only scores and inserts the rows after it. Rows the
+    earlier run already reported are not reported again, and the errors of
+    rows up to the checkpoint are already stored, so 'errors' only holds
+    those of the rows after it and of validation. When ``deadline``
+    passes, the result has 'finished': False and the chunk should be rerun.
+    """
+    checkpoint = load_checkpoint(db, job_id, chunk_index)
+    resume_row = checkpoint.last_row if checkpoint else 0
+
+    frame, errors = validate_annual_rows(load_payload_frame(chunk_ref))
+
+    access_level = resolve_access_level(db, organization_id, user_id)
+    if len(frame):
+        company_ids = resolve_companies(
+            db, frame, access_level, organization_id, user_id,
+            market_cap_multiplier=1_000_000
+        )
+        db.commit()
+        frame['company_id'] = frame['company_symbol'].map(company_ids)
+
+    if not checkpoint:
+        on_progress(len(errors), 0, len(errors))
+
+    base_successful = (checkpoint.successful_rows or 0) if checkpoint else 0
+    base_updated = (checkpoint.updated_rows or 0) if checkpoint else 0
+    base_failed = (checkpoint.failed_rows or 0) if checkpoint else 0
+    rejected = list(errors)
+    frame = frame.loc[frame.index > resume_row]
+
+    if len(frame):
+        frame = score_annual_rows(frame, ml_model)
+    mappings = build_annual_mappings(frame, access_level, organization_id, user_id, job_id)
+
+    def skipped_error(idx: int) -> Dict[str, Any]:
+        row_number = mappings[idx]['_row']
+        return row_error(
+            row_number,
+            f"Prediction already exists for {frame.at[row_number, 'company_symbol']} {frame.at[row_number, 'reporting_year']}",
+            ERROR_DUPLICATE_STORED
+        )
+
+    reported = {'stored': 0, 'failed': 0}
+
+    def on_insert_batch(stored: int, insert_failed: int):
+        stored_delta = stored - reported['stored']
+        failed_delta = insert_failed - reported['failed']
+        reported.update(stored=stored, failed=insert_failed)
+        on_progress(stored_delta + failed_delta, stored_delta, failed_delta)
+
+    upserted, insert_errors = insert_prediction_mappings(
+        db, AnnualPrediction, mappings,
+        on_batch=on_insert_batch,
+        conflict_policy=conflict_policy,
+        checkpoint=insert_checkpointer(db, job_id, chunk_index, checkpoint, skipped_error, rejected=rejected),
+        deadline=deadline
+    )
+    errors.extend(skipped_error(idx) for idx in upserted.skipped)
+    errors.extend(insert_errors)
+
+    # Insert failures of earlier runs are counted on the checkpoint; their errors are stored
+    failed = len(errors) + base_failed
+    handled = len(upserted.inserted) + len(upserted.updated) + len(upserted.skipped) + len(insert_errors)
+
+    return {
+        'finished': handled == len(mappings),
+        'successful': base_successful + len(upserted.inserted) + len(upserted.updated),
+        'updated': base_updated + len(upserted.updated),
+        'failed': failed,
+        'errors': sorted(errors, key=lambda entry: entry['row'])
+    }
+
+
+@celery_app.task(bind=True, name="app.workers.chunked_tasks.split_annual_upload_task")
+@enhanced_task_logging("split_annual_upload_task")
+def split_annual_upload_task(
+    self,
+    job_id: str,
+    payload_ref: PayloadRef,
+    user_id: str,
+    organization_id: Optional[str],
+    conflict_policy: Optional[str] = None,
+    queue: str = "medium_priority",
+    chunk_count: int = CHUNK_COUNT
+) -> Dict[str, Any]:
+    """
+    Split a stored annual upload by company into up to ``chunk_count`` chunks and start them as a chord
+
+    Runs on a worker so the API never loads the whole upload. The job's
+    celery_task_id is pointed at the chord callback, whose result is the job's;
+    a redelivered split task that finds it there does not start a second chord.
+    """
     SessionLocal = get_session_local()
     db = SessionLocal()
-    
+
     try:
         job = db.query(BulkUploadJob).filter(BulkUploadJob.id == job_id).first()
-        if not job:
-            logger.error(f"Job {job_id} not found for chunk progress update")
-            return
-        
-        # Update processed rows (atomic increment)
-        job.processed_rows = (job.processed_rows or 0) + chunk_rows_processed
-        job.successful_rows = (job.successful_rows or 0) + chunk_rows_successful
-        job.failed_rows = (job.failed_rows or 0) + chunk_rows_failed
-        
-        if is_chunk_complete:
-            job.completed_chunks = (job.completed_chunks or 0) + 1
-            logger.info(f"Job {job_id}: Completed chunk {chunk_index}, total completed: {job.completed_chunks}/{job.total_chunks}")
-        
-        # Check if all chunks are complete
-        if job.completed_chunks >= (job.total_chunks or 1):
-            job.status = 'completed'
-            job.completed_at = datetime.utcnow()
-            logger.info(f"Job {job_id}: All chunks completed! Final stats - Total: {job.processed_rows}, Success: {job.successful_rows}, Failed: {job.failed_rows}")
-        
-        # Update error message if provided
-        if error_message:
-            job.error_message = error_message
-            
-        job.updated_at = datetime.utcnow()
-        
-        db.commit()
-        
+        chord_task_id = job.celery_task_id if job else None
+        already_split = job_is_finished(db, job_id) or bool(chord_task_id and chord_task_id != self.request.id)
+    finally:
+        db.close()
+
+    if already_split:
+        logger.info(f"⏭️ Job {job_id} was already split, ignoring redelivered task {self.request.id}")
+        return {"job_id": job_id, "chunks": None, "chord_task_id": chord_task_id}
+
+    try:
+        job_progress.reset(job_id)
+        chunks = partition_by_company(load_payload_frame(payload_ref), chunk_count)
+        header = [
+            process_chunk_task.s(
+                job_id,
+                payload_store.put(chunk, name=f"{job_id}_chunk_{index}"),
+                user_id,
+                organization_id,
+                index,
+                len(chunks),
+                'annual',
+                conflict_policy
+            ).set(queue=queue, routing_key=queue)
+            for index, chunk in enumerate(chunks)
+        ]
+        callback = finalize_chunked_upload_task.s(job_id).set(queue=queue, routing_key=queue)
+        result = chord(header)(callback)
+        payload_store.delete(payload_ref)
+        throughput_stats.note_tasks(job_id, len(chunks))
+
+    except Exception as e:
+        logger.error(f"Splitting job {job_id} into chunks failed: {str(e)}\n{traceback.format_exc()}")
+        update_job_status(job_id, 'failed', error_message=f"Could not split upload into chunks: {str(e)}")
+        raise
+
+    db = SessionLocal()
+
+    try:
+        job = db.query(BulkUploadJob).filter(BulkUploadJob.id == job_id).first()
+        if job:
+            job.celery_task_id = result.id
+            db.commit()
     except Exception as e:
-        logger.error(f"Error updating chunk progress: {str(e)}")
         db.rollback()
+        logger.error(f"Error updating job {job_id} with chord task ID: {str(e)}")
     finally:
         db.close()
 
-@celery_app.task(bind=True, name="process_chunk_task")
+    logger.info(f"🧩 Job {job_id} split into {len(chunks)} chunks: {[len(chunk) for chunk in chunks]} rows")
+    return {"job_id": job_id, "chunks": len(chunks), "chord_task_id": result.id}
+
+
+@celery_app.task(bind=True, name="app.workers.chunked_tasks.process_chunk_task")
+@enhanced_task_logging("process_chunk_task")
 def process_chunk_task(
-    self, 
-    job_id: str, 
-    chunk_data: Dict[str, Any], 
+    self,
+    job_id: str,
+    chunk_ref: PayloadRef,
+    user_id: str,
+    organization_id: Optional[str],
     chunk_index: int,
-    job_type: str,
-    total_chunks: int
-):
+    total_chunks: int,
+    job_type: str = 'annual',
+    conflict_policy: Optional[str] = None
+) -> Dict[str, Any]:
     """
-    Process a single chunk of data for bulk upload
-    This enables parallel processing of large files
-    
+    Process one chunk of a large bulk upload as part of a chord
+
+    Progress is added to the job's live counters (job_progress); the final status is
+    written by finalize_chunked_upload_task once every chunk has returned. A
+    chunk that fails reports its rows as failed instead of raising, so one bad
+    chunk does not stop the callback from finalizing the job. A redelivered
+    chunk resumes from its checkpoint, and a chunk that runs out of time
+    retries itself to continue from there.
+
     Args:
-        job_id: UUID of the bulk upload job
-        chunk_data: Dictionary containing chunk data and metadata
+        job_id: Bulk upload job ID
+        chunk_ref: Payload store reference to this chunk's rows ('_row' holds upload row numbers)
+        user_id: ID of user who initiated upload
+        organization_id: Organization ID (None for super admin global uploads)
         chunk_index: Index of this chunk (0-based)
-        job_type: Type of job (annual/quarterly)
         total_chunks: Total number of chunks in the job
+        job_type: Type of job (only annual uploads are chunked)
+        conflict_policy: skip | overwrite | keep_newest for rows already stored
+
+    Returns:
+        Chunk summary consumed by the chord callback
     """
-    
-    task_id = self.request.id
-    logger.info(f"Starting chunk {chunk_index+1}/{total_chunks} for job {job_id} (Task: {task_id})")
-    
+    start_time = time.time()
+    conflict_policy = conflict_policy or default_conflict_policy()
+    chunk_rows = payload_row_count(chunk_ref)
+    task_logger = TaskLogger("process_chunk_task")
+    progress = {'processed': 0, 'successful': 0, 'failed': 0}
+
+    def on_progress(processed: int, successful: int, failed: int):
+        job_progress.increment(job_id, processed, successful, failed)
+        progress['processed'] += processed
+        progress['successful'] += successful
+        progress['failed'] += failed
+
+    SessionLocal = get_session_local()
+    db = SessionLocal()
+
     try:
-        # Convert chunk data back to DataFrame
-        df = pd.DataFrame(chunk_data['data'])
-        chunk_start_row = chunk_data['chunk_start_row']
-        chunk_end_row = chunk_data['chunk_end_row']
-        
-        logger.info(f"Processing chunk {chunk_index}: rows {chunk_start_row}-{chunk_end_row} ({len(df)} records)")
-        
-        # Initialize counters
-        processed_count = 0
-        success_count = 0
-        failed_count = 0
-        
-        # Process based on job type
-        if job_type == 'annual':
-            success_count, failed_count = process_annual_chunk(job_id, df, chunk_index)
-        elif job_type == 'quarterly':
-            success_count, failed_count = process_quarterly_chunk(job_id, df, chunk_index)
-        else:
-            raise ValueError(f"Unsupported job type: {job_type}")
-        
-        processed_count = len(df)
-        
-        # Update progress
-        update_chunk_progress(
-            job_id=job_id,
-            chunk_index=chunk_index,
-            chunk_rows_processed=processed_count,
-            chunk_rows_successful=success_count,
-            chunk_rows_failed=failed_count,
-            is_chunk_complete=True
-        )
-        
-        # Update Celery task progress
-        self.update_state(
-            state='SUCCESS',
-            meta={
+        # Redelivered after the chord already finalized the job: its checkpoints are gone, do not start over
+        if job_is_finished(db, job_id):
+            logger.info(f"⏭️ Job {job_id} already finished, ignoring redelivered chunk {chunk_index + 1}/{total_chunks}")
+            return {
                 'chunk_index': chunk_index,
-                'processed': processed_count,
-                'successful': success_count,
-                'failed': failed_count,
-                'message': f'Chunk {chunk_index+1}/{total_chunks} completed successfully'
+                'status': 'completed',
+                'rows': chunk_rows,
+                'successful': 0,
+                'updated': 0,
+                'failed': 0,
+                'errors': []
             }
+
+        update_job_status(job_id, 'processing')
+
+        if job_type != 'annual':
+            raise ValueError(f"Unsupported job type for chunked processing: {job_type}")
+
+        result = process_annual_chunk(
+            db, job_id, chunk_ref, user_id, organization_id, conflict_policy, on_progress,
+            chunk_index=chunk_index,
+            deadline=yield_deadline(start_time)
+        )
+        if not result['finished']:
+            logger.info(f"⏸️ Chunk {chunk_index + 1}/{total_chunks} of job {job_id} yielding, continuing from its checkpoint")
+            raise self.retry(countdown=0, max_retries=None)
+
+        # The chunk's row errors go straight to the job's error table; the callback only gets a sample
+        replace_job_errors(
+            db, job_id, result['errors'], part=chunk_index,
+            after_row=checkpoint_row(load_checkpoint(db, job_id, chunk_index))
         )
-        
-        logger.info(f"Chunk {chunk_index+1}/{total_chunks} completed: {success_count} success, {failed_count} failed")
-        
+        db.commit()
+
+        payload_store.delete(chunk_ref)
+        job_progress.publish_errors(job_id, result['errors'][:CHUNK_ERROR_LIMIT])
+
+        task_logger.info(
+            f"🧩 Chunk {chunk_index + 1}/{total_chunks} completed: {result['successful']} stored, {result['failed']} failed",
+            job_id=job_id,
+            user_id=user_id,
+            total_rows=chunk_rows,
+            processed_rows=chunk_rows,
+            successful_rows=result['successful'],
+            failed_rows=result['failed'],
+            processing_time_seconds=time.time() - start_time
+        )
+
         return {
             'chunk_index': chunk_index,
-            'processed': processed_count,
-            'successful': success_count,
-            'failed': failed_count,
-            'status': 'completed'
+            'status': 'completed',
+            'rows': chunk_rows,
+            'successful': result['successful'],
+            'updated': result['updated'],
+            'failed': result['failed'],
+            'errors': result['errors'][:CHUNK_ERROR_LIMIT]
         }
-        
-    except Exception as e:
-        error_msg = f"Error processing chunk {chunk_index}: {str(e)}"
-        logger.error(f"{error_msg}\n{traceback.format_exc()}")
-        
-        # Update progress with error
-        update_chunk_progress(
-            job_id=job_id,
-            chunk_index=chunk_index,
-            chunk_rows_processed=len(chunk_data.get('data', [])),
-            chunk_rows_successful=0,
-            chunk_rows_failed=len(chunk_data.get('data', [])),
-            is_chunk_complete=True,
-            error_message=error_msg
-        )
-        
-        # Update Celery task state
-        self.update_state(
-            state='FAILURE',
-            meta={
-                'chunk_index': chunk_index,
-                'error': error_msg,
-                'message': f'Chunk {chunk_index+1}/{total_chunks} failed'
-            }
-        )
-        
-        raise
 
-def process_annual_chunk(job_id: str, chunk_df: pd.DataFrame, chunk_index: int) -> tuple[int, int]:
-    """Process a chunk for annual predictions"""
-    SessionLocal = get_session_local()
-    db = SessionLocal()
-    
-    success_count = 0
-    failed_count = 0
-    
-    try:
-        # Get job info
-        job = db.query(BulkUploadJob).filter(BulkUploadJob.id == job_id).first()
-        if not job:
-            raise ValueError(f"Job {job_id} not found")
-        
-        for index, row in chunk_df.iterrows():
-            try:
-                # Extract and validate data
-                ticker = str(row.get('ticker', '')).strip().upper()
-                
-                if not ticker:
-                    failed_count += 1
-                    continue
-                
-                # Get or create company
-                company = db.query(Company).filter(Company.ticker == ticker).first()
-                if not company:
-                    company = Company(
-                        ticker=ticker,
-                        company_name=str(row.get('company_name', ticker)),
-                        organization_id=job.organization_id
-                    )
-                    db.add(company)
-                    db.flush()
-                
-                # Prepare features for ML model
-                features = {
-                    'total_debt_to_total_capital': safe_float(row.get('total_debt_to_total_capital')),
-                    'long_term_debt_to_total_capital': safe_float(row.get('long_term_debt_to_total_capital')),
-                    'total_debt_to_ebitda': safe_float(row.get('total_debt_to_ebitda')),
-                    'free_cash_flow_to_total_debt': safe_float(row.get('free_cash_flow_to_total_debt')),
-                    'net_income_to_total_capital': safe_float(row.get('net_income_to_total_capital')),
-                    'return_on_total_capital': safe_float(row.get('return_on_total_capital')),
-                    'return_on_assets': safe_float(row.get('return_on_assets')),
-                    'return_on_equity': safe_float(row.get('return_on_equity')),
-                    'earnings_before_interest_to_total_capital': safe_float(row.get('earnings_before_interest_to_total_capital')),
-                    'ebitda_interest_coverage_ratio': safe_float(row.get('ebitda_interest_coverage_ratio')),
-                    'short_long_term_debt_to_total_capital': safe_float(row.get('short_long_term_debt_to_total_capital')),
-                }
-                
-                # Get ML prediction
-                prediction_result = ml_model.predict_annual(features)
-                
-                # Create prediction record
-                prediction = AnnualPrediction(
-                    company_id=company.id,
-                    organization_id=job.organization_id,
-                    user_id=job.user_id,
-                    
-                    # Original features
-                    total_debt_to_total_capital=features['total_debt_to_total_capital'],
-                    long_term_debt_to_total_capital=features['long_term_debt_to_total_capital'],
-                    total_debt_to_ebitda=features['total_debt_to_ebitda'],
-                    free_cash_flow_to_total_debt=features['free_cash_flow_to_total_debt'],
-                    net_income_to_total_capital=features['net_income_to_total_capital'],
-                    return_on_total_capital=features['return_on_total_capital'],
-                    return_on_assets=features['return_on_assets'],
-                    return_on_equity=features['return_on_equity'],
-                    earnings_before_interest_to_total_capital=features['earnings_before_interest_to_total_capital'],
-                    ebitda_interest_coverage_ratio=features['ebitda_interest_coverage_ratio'],
-                    short_long_term_debt_to_total_capital=features['short_long_term_debt_to_total_capital'],
-                    
-                    # Prediction results
-                    predicted_default_rate=prediction_result['default_rate'],
-                    confidence_score=prediction_result.get('confidence', 0.0),
-                    risk_category=prediction_result.get('risk_category', 'Medium'),
-                    
-                    bulk_upload_job_id=job.id,
-                    chunk_index=chunk_index,
-                    row_index=index
-                )
-                
-                db.add(prediction)
-                success_count += 1
-                
-            except Exception as e:
-                logger.error(f"Error processing row {index} in chunk {chunk_index}: {str(e)}")
-                failed_count += 1
-                continue
-        
-        db.commit()
-        
-    except Exception as e:
-        logger.error(f"Error in annual chunk processing: {str(e)}")
-        db.rollback()
+    except Retry:
         raise
-    finally:
-        db.close()
-    
-    return success_count, failed_count
 
-def process_quarterly_chunk(job_id: str, chunk_df: pd.DataFrame, chunk_index: int) -> tuple[int, int]:
-    """Process a chunk for quarterly predictions"""
-    SessionLocal = get_session_local()
-    db = SessionLocal()
-    
-    success_count = 0
-    failed_count = 0
-    
-    try:
-        # Get job info
-        job = db.query(BulkUploadJob).filter(BulkUploadJob.id == job_id).first()
-        if not job:
-            raise ValueError(f"Job {job_id} not found")
-        
-        for index, row in chunk_df.iterrows():
-            try:
-                # Extract and validate data
-                ticker = str(row.get('ticker', '')).strip().upper()
-                quarter = str(row.get('quarter', '')).strip()
-                year = int(row.get('year', 0))
-                
-                if not ticker or not quarter or not year:
-                    failed_count += 1
-                    continue
-                
-                # Get or create company
-                company = db.query(Company).filter(Company.ticker == ticker).first()
-                if not company:
-                    company = Company(
-                        ticker=ticker,
-                        company_name=str(row.get('company_name', ticker)),
-                        organization_id=job.organization_id
-                    )
-                    db.add(company)
-                    db.flush()
-                
-                # Prepare features for ML model
-                features = {
-                    'total_debt_to_total_capital': safe_float(row.get('total_debt_to_total_capital')),
-                    'long_term_debt_to_total_capital': safe_float(row.get('long_term_debt_to_total_capital')),
-                    'total_debt_to_ebitda': safe_float(row.get('total_debt_to_ebitda')),
-                    'free_cash_flow_to_total_debt': safe_float(row.get('free_cash_flow_to_total_debt')),
-                    'net_income_to_total_capital': safe_float(row.get('net_income_to_total_capital')),
-                    'return_on_total_capital': safe_float(row.get('return_on_total_capital')),
-                    'return_on_assets': safe_float(row.get('return_on_assets')),
-                    'return_on_equity': safe_float(row.get('return_on_equity')),
-                    'earnings_before_interest_to_total_capital': safe_float(row.get('earnings_before_interest_to_total_capital')),
-                    'ebitda_interest_coverage_ratio': safe_float(row.get('ebitda_interest_coverage_ratio')),
-                    'short_long_term_debt_to_total_capital': safe_float(row.get('short_long_term_debt_to_total_capital')),
-                }
-                
-                # Get ML prediction
-                prediction_result = quarterly_ml_model.predict_quarterly(features)
-                
-                # Create prediction record
-                prediction = QuarterlyPrediction(
-                    company_id=company.id,
-                    organization_id=job.organization_id,
-                    user_id=job.user_id,
-                    
-                    quarter=quarter,
-                    year=year,
-                    
-                    # Original features
-                    total_debt_to_total_capital=features['total_debt_to_total_capital'],
-                    long_term_debt_to_total_capital=features['long_term_debt_to_total_capital'],
-                    total_debt_to_ebitda=features['total_debt_to_ebitda'],
-                    free_cash_flow_to_total_debt=features['free_cash_flow_to_total_debt'],
-                    net_income_to_total_capital=features['net_income_to_total_capital'],
-                    return_on_total_capital=features['return_on_total_capital'],
-                    return_on_assets=features['return_on_assets'],
-                    return_on_equity=features['return_on_equity'],
-                    earnings_before_interest_to_total_capital=features['earnings_before_interest_to_total_capital'],
-                    ebitda_interest_coverage_ratio=features['ebitda_interest_coverage_ratio'],
-                    short_long_term_debt_to_total_capital=features['short_long_term_debt_to_total_capital'],
-                    
-                    # Prediction results
-                    predicted_default_rate=prediction_result['default_rate'],
-                    confidence_score=prediction_result.get('confidence', 0.0),
-                    risk_category=prediction_result.get('risk_category', 'Medium'),
-                    
-                    bulk_upload_job_id=job.id,
-                    chunk_index=chunk_index,
-                    row_index=index
-                )
-                
-                db.add(prediction)
-                success_count += 1
-                
-            except Exception as e:
-                logger.error(f"Error processing row {index} in chunk {chunk_index}: {str(e)}")
-                failed_count += 1
-                continue
-        
-        db.commit()
-        
     except Exception as e:
-        logger.error(f"Error in quarterly chunk processing: {str(e)}")
         db.rollback()
-        raise
+        error_msg = f"Error processing chunk {chunk_index + 1}/{total_chunks}: {str(e)}"
+        logger.error(f"{error_msg}\n{traceback.format_exc()}")
+
+        # Rows the chunk had not accounted for yet are failed; stored rows stay stored
+        remaining = max(chunk_rows - progress['processed'], 0)
+        job_progress.increment(job_id, processed=remaining, failed=remaining)
+
+        # The checkpoint also covers rows stored by earlier runs of this chunk
+        checkpoint = load_checkpoint(db, job_id, chunk_index)
+        successful = max(progress['successful'], (checkpoint.successful_rows or 0) if checkpoint else 0)
+
+        errors = [{'row': None, 'code': ERROR_JOB_FAILED, 'error': error_msg}]
+        try:
+            replace_job_errors(db, job_id, errors, part=chunk_index, after_row=checkpoint_row(checkpoint))
+            db.commit()
+        except Exception as store_error:
+            db.rollback()
+            logger.error(f"Could not store errors of chunk {chunk_index + 1}/{total_chunks}: {store_error}")
+
+        return {
+            'chunk_index': chunk_index,
+            'status': 'failed',
+            'rows': chunk_rows,
+            'successful': successful,
+            'updated': (checkpoint.updated_rows or 0) if checkpoint else 0,
+            'failed': chunk_rows - successful,
+            'errors': errors,
+            'error': error_msg
+        }
+
     finally:
         db.close()
-    
-    return success_count, failed_count
+
+
+@celery_app.task(bind=True, name="app.workers.chunked_tasks.finalize_chunked_upload_task")
+def finalize_chunked_upload_task(self, chunk_results: List[Dict[str, Any]], job_id: str) -> Dict[str, Any]:
+    """
+    Chord callback: fold the chunk summaries into the job's final status
+
+    The job completes if any chunk completed; it fails only when every chunk failed.
+    """
+    chunk_results = sorted(chunk_results, key=lambda result: result['chunk_index'])
+    total_rows = sum(result['rows'] for result in chunk_results)
+    successful_rows = sum(result['successful'] for result in chunk_results)
+    updated_rows = sum(result['updated'] for result in chunk_results)
+    failed_rows = sum(result['failed'] for result in chunk_results)
+    failed_chunks = [result for result in chunk_results if result['status'] == 'failed']
+
+    errors = [error for result in chunk_results for error in result['errors']]
+    errors.sort(key=lambda entry: (entry['row'] is None, entry['row'] or 0))
+
+    status = 'failed' if len(failed_chunks) == len(chunk_results) else 'completed'
+    update_job_status(
+        job_id,
+        status,
+        processed_rows=total_rows,
+        successful_rows=successful_rows,
+        failed_rows=failed_rows,
+        error_message="; ".join(result['error'] for result in failed_chunks) or None,
+        error_details={}  # the chunks stored their own row errors, this only records the counts
+    )
+
+    logger.info(
+        f"🎉 Chunked job {job_id} {status}: {len(chunk_results)} chunks, {total_rows} rows, "
+        f"{successful_rows} stored ({updated_rows} updated), {failed_rows} failed"
+    )
+
+    return {
+        "status": status,
+        "job_id": job_id,
+        "chunks": len(chunk_results),
+        "failed_chunks": len(failed_chunks),
+        "total_rows": total_rows,
+        "successful_rows": successful_rows,
+        "updated_rows": updated_rows,
+        "failed_rows": failed_rows,
+        "errors": errors[:10]
+    }
@@ -8,14 +8,46 @@ import io
 import base64
 import pandas as pd
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Union
 from celery import current_task
+from celery.exceptions import Retry
 from functools import wraps
 
 from ..workers.celery_app import celery_app
 from ..core.database import get_session_local, BulkUploadJob, Company, AnnualPrediction, QuarterlyPrediction, User, Organization
 from ..services.ml_service import ml_model
 from ..services.quarterly_ml_service import quarterly_ml_model
+from ..services.payload_store import PayloadRef, is_payload_ref, load_payload_frame, payload_row_count, payload_store
+from ..services.job_progress import job_progress, ProgressReporter
+from ..services.company_resolver import company_resolver
+from ..services.throughput_stats import throughput_stats
+from ..services.job_errors import (
+    ERROR_DUPLICATE_STORED,
+    ERROR_MODEL_FAILED,
+    ERROR_ROW_FAILED,
+    error_summary,
+    replace_job_errors,
+)
+from .bulk_pipeline import (
+    validate_annual_rows,
+    validate_quarterly_rows,
+    resolve_access_level,
+    resolve_companies,
+    score_annual_rows,
+    build_annual_mappings,
+    insert_prediction_mappings,
+    row_error,
+)
+from .bulk_writer import CONFLICT_POLICIES, default_conflict_policy, upsert_rows
+from .bulk_checkpoint import (
+    job_is_finished,
+    load_checkpoint,
+    checkpoint_row,
+    stage_checkpoint,
+    insert_checkpointer,
+    clear_checkpoints,
+    yield_deadline,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -33,28 +65,38 @@ def safe_float(value):
         return 0
 
 
-def normalize_quarter(quarter_value):
-    """Convert quarter value to standard string format (Q1, Q2, Q3, Q4)"""
-    if isinstance(quarter_value, str):
-        # If already in correct format, return as is
-        if quarter_value.upper() in ['Q1', 'Q2', 'Q3', 'Q4']:
-            return quarter_value.upper()
-        # Handle other string formats
-        quarter_value = quarter_value.strip().upper()
-        if quarter_value in ['1', '2', '3', '4']:
-            return f'Q{quarter_value}'
-    
-    # Handle integer values
-    try:
-        quarter_int = int(quarter_value)
-        if quarter_int in [1, 2, 3, 4]:
-            return f'Q{quarter_int}'
-    except (ValueError, TypeError):
-        pass
-    
-    # Default fallback
-    logger.warning(f"Invalid quarter value: {quarter_value}, defaulting to Q1")
-    return 'Q1'
+def optional_float(value):
+    """Like safe_float, but keeps None so nullable columns stay NULL"""
+    return None if value is None else safe_float(value)
+
+
+def backfill_gbm_probabilities(db, pending: List[Dict[str, Any]]) -> int:
+    """
+    Deferred GBM pass for quarterly bulk jobs: score every pending row with one
+    LightGBM predict call and write gbm_probability back in a single bulk update.
+
+    Args:
+        pending: [{'id': prediction_id, 'financial_data': {...}}] for stored rows
+
+    Returns:
+        Number of rows scored
+    """
+    if not pending:
+        return 0
+    # Ids must be known before the rows are flushed (they are assigned with the mapping),
+    # otherwise the bulk update below silently matches nothing
+    if any(item['id'] is None for item in pending):
+        raise ValueError("Deferred GBM rows need their stored prediction id")
+
+    probabilities = quarterly_ml_model.predict_gbm_batch(
+        pd.DataFrame([item['financial_data'] for item in pending])
+    )
+    db.bulk_update_mappings(QuarterlyPrediction, [
+        {'id': item['id'], 'gbm_probability': float(probability)}
+        for item, probability in zip(pending, probabilities)
+    ])
+    db.commit()
+    return len(pending)
 
 
 def update_job_status(
@@ -66,7 +108,19 @@ def update_job_status(
     error_message: Optional[str] = None,
     error_details: Optional[Dict] = None
 ):
-    """Update job status in database"""
+    """
+    Update job status in database
+
+    When the job completes or fails, live counters from job_progress are
+    folded in (explicit counts win) and cleared, and so are its resume
+    checkpoints. Start and completion times feed throughput_stats.
+
+    Row errors passed as ``error_details['errors']`` go to the
+    bulk_upload_job_errors table (see job_errors), apart from those of rows
+    up to the job's resume checkpoint, which were stored with it. The job's
+    error_details column only keeps the error counts per code and any other
+    keys given.
+    """
     SessionLocal = get_session_local()
     db = SessionLocal()
     
@@ -77,6 +131,13 @@ def update_job_status(
         
         job.status = status
         
+        if status in ['completed', 'failed']:
+            live = job_progress.pop(job_id)
+            if live:
+                processed_rows = live['processed'] if processed_rows is None else processed_rows
+                successful_rows = live['successful'] if successful_rows is None else successful_rows
+                failed_rows = live['failed'] if failed_rows is None else failed_rows
+        
         if processed_rows is not None:
             job.processed_rows = processed_rows
         if successful_rows is not None:
@@ -86,15 +147,33 @@ def update_job_status(
         if error_message is not None:
             job.error_message = error_message
         if error_details is not None:
-            job.error_details = json.dumps(error_details)
+            details = dict(error_details)
+            errors = details.pop('errors', None)
+            if errors is not None:
+                replace_job_errors(db, job_id, errors, after_row=checkpoint_row(load_checkpoint(db, job_id)))
+            details.update(error_summary(db, job_id))
+            job.error_details = json.dumps(details, default=str)
         
         if status == 'processing' and job.started_at is None:
             job.started_at = datetime.utcnow()
+            throughput_stats.note_started(job_id)
         elif status in ['completed', 'failed']:
             job.completed_at = datetime.utcnow()
+            clear_checkpoints(db, job_id)
         
         db.commit()
         
+        if status == 'completed':
+            throughput_stats.record_completion(job_id, job.total_rows or 0)
+        
+        if status in ['completed', 'failed']:
+            job_progress.publish(job_id, status, {
+                "processed": job.processed_rows or 0,
+                "successful": job.successful_rows or 0,
+                "failed": job.failed_rows or 0,
+                "error_message": job.error_message
+            })
+        
     except Exception as e:
         db.rollback()
         logger.error(f"Error updating job status: {str(e)}")
@@ -102,72 +181,18 @@ def update_job_status(
         db.close()
 
 
-def create_or_get_company(db, symbol: str, name: str, market_cap: float, sector: str, organization_id: Optional[str], user_id: str) -> Company:
-    """Create or get company with organization scoping"""
-    print(f"[COMPANY-DEBUG] Starting create_or_get_company for {symbol}")
-    
-    if organization_id:
-        print(f"[COMPANY-DEBUG] Using organization scope: {organization_id}")
-        access_level = "organization"
-        print(f"[COMPANY-DEBUG] About to query company with organization")
-        company = db.query(Company).filter(
-            Company.symbol == symbol.upper(),
-            Company.organization_id == organization_id,
-            Company.access_level == "organization"
-        ).first()
-        print(f"[COMPANY-DEBUG] Organization company query completed: {'Found' if company else 'Not found'}")
-    else:
-        print(f"[COMPANY-DEBUG] No organization, checking user: {user_id}")
-        print(f"[COMPANY-DEBUG] About to query user")
-        user = db.query(User).filter(User.id == user_id).first()
-        print(f"[COMPANY-DEBUG] User query completed: {'Found' if user else 'Not found'}")
-        
-        if user and user.role == "super_admin":
-            print(f"[COMPANY-DEBUG] User is super_admin")
-            access_level = "system"
-            print(f"[COMPANY-DEBUG] About to query system company")
-            company = db.query(Company).filter(
-                Company.symbol == symbol.upper(),
-                Company.access_level == "system"
-            ).first()
-            print(f"[COMPANY-DEBUG] System company query completed: {'Found' if company else 'Not found'}")
-        else:
-            print(f"[COMPANY-DEBUG] User is regular user or not found")
-            access_level = "personal"
-            print(f"[COMPANY-DEBUG] About to query personal company")
-            company = db.query(Company).filter(
-                Company.symbol == symbol.upper(),
-                Company.organization_id.is_(None),
-                Company.access_level == "personal",
-                Company.created_by == user_id
-            ).first()
-            print(f"[COMPANY-DEBUG] Personal company query completed: {'Found' if company else 'Not found'}")
-    
-    if not company:
-        print(f"[COMPANY-DEBUG] No existing company found, creating new one")
-        company = Company(
-            symbol=symbol.upper(),
-            name=name,
-            market_cap=safe_float(market_cap),  # Market cap already in millions
-            sector=sector,
-            organization_id=organization_id,
-            access_level=access_level,
-            created_by=user_id
-        )
-        print(f"[COMPANY-DEBUG] Company object created, about to add to DB")
-        db.add(company)
-        print(f"[COMPANY-DEBUG] Company added to DB, about to flush")
-        db.flush()  
-        print(f"[COMPANY-DEBUG] DB flush completed")
-    else:
-        print(f"[COMPANY-DEBUG] Updating existing company")
-        company.name = name
-        company.market_cap = safe_float(market_cap)  # Market cap already in millions
-        company.sector = sector
-        print(f"[COMPANY-DEBUG] Company update completed")
-    
-    print(f"[COMPANY-DEBUG] create_or_get_company completed for {symbol}")
-    return company
+def resolve_company_id(db, symbol: str, name: str, market_cap: float, sector: str, organization_id: Optional[str], user_id: str):
+    """Create or get a company with organization scoping, through the shared company resolver"""
+    return company_resolver.resolve(
+        db,
+        symbol=symbol,
+        name=name,
+        market_cap=safe_float(market_cap),  # Market cap already in millions
+        sector=sector,
+        access_level=resolve_access_level(db, organization_id, user_id),
+        organization_id=organization_id,
+        user_id=user_id
+    )
 
 
 # ENHANCED LOGGING SYSTEM FOR WORKER TASKS
@@ -326,24 +351,28 @@ def enhanced_task_logging(task_name: str = None):
 def process_annual_bulk_upload_task(
     self, 
     job_id: str, 
-    data: List[Dict[str, Any]], 
+    data: Union[List[Dict[str, Any]], PayloadRef], 
     user_id: str, 
-    organization_id: Optional[str]
+    organization_id: Optional[str],
+    conflict_policy: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     Enhanced Celery task to process annual predictions bulk upload with comprehensive logging
     
     Args:
         job_id: Bulk upload job ID
-        data: List of row data from Excel/CSV
+        data: List of row data from Excel/CSV, or a payload store reference to it
         user_id: ID of user who initiated upload
         organization_id: Organization ID (None for super admin global uploads)
+        conflict_policy: skip | overwrite | keep_newest for rows already stored
+                         (defaults to BULK_CONFLICT_POLICY)
         
     Returns:
         Dictionary with processing results
     """
     task_id = self.request.id
     start_time = time.time()
+    conflict_policy = conflict_policy or default_conflict_policy()
     
     # CRITICAL: Validate task parameters immediately
     if not job_id or job_id in ['', 'undefined', 'null']:
@@ -354,11 +383,15 @@ def process_annual_bulk_upload_task(
         logger.error(f"❌ CRITICAL: Invalid user_id parameter: {user_id}")
         raise ValueError(f"Invalid user_id parameter: {user_id}")
         
-    if not data or not isinstance(data, list):
+    if not data or not (isinstance(data, list) or is_payload_ref(data)):
         logger.error(f"❌ CRITICAL: Invalid data parameter: {type(data)}, length: {len(data) if hasattr(data, '__len__') else 'N/A'}")
         raise ValueError(f"Invalid data parameter: {type(data)}")
         
-    logger.info(f"✅ Task parameter validation passed: job_id={job_id}, user_id={user_id}, data_rows={len(data)}, org_id={organization_id}")
+    if conflict_policy not in CONFLICT_POLICIES:
+        logger.error(f"❌ CRITICAL: Invalid conflict_policy parameter: {conflict_policy}")
+        raise ValueError(f"Invalid conflict_policy parameter: {conflict_policy}")
+        
+    logger.info(f"✅ Task parameter validation passed: job_id={job_id}, user_id={user_id}, data_rows={payload_row_count(data)}, org_id={organization_id}")
     
     # Initialize enhanced logger
     task_logger = TaskLogger("process_annual_bulk_upload_task")
@@ -370,7 +403,7 @@ def process_annual_bulk_upload_task(
     try:
         job = db.query(BulkUploadJob).filter(BulkUploadJob.id == job_id).first()
         file_name = job.original_filename if job else "unknown-file"
-        total_rows = len(data)
+        total_rows = payload_row_count(data)
         
         # Determine queue priority based on file size
         if total_rows <= 100:
@@ -391,216 +424,152 @@ def process_annual_bulk_upload_task(
             organization_id=organization_id or "global"
         )
         
+        # A redelivered task whose job already finished has nothing left to do
+        if job_is_finished(db, job_id):
+            logger.info(f"⏭️ Job {job_id} already finished, ignoring redelivered task {task_id}")
+            return {"status": job.status, "job_id": job_id, "resumed": False}
+        
+        # Rows up to the checkpoint were committed by an earlier run of this task
+        checkpoint = load_checkpoint(db, job_id)
+        resume_row = checkpoint.last_row if checkpoint else 0
+        if resume_row:
+            task_logger.info(
+                f"♻️ Resuming after row {resume_row}",
+                job_id=job_id,
+                user_id=user_id,
+                file_name=file_name,
+                total_rows=total_rows
+            )
+        
         # Update job status
         update_job_status(job_id, 'processing')
+        job_progress.reset(job_id)
+        progress = ProgressReporter(job_id)
         
-        # Initialize caches for performance optimization
-        user_cache = {}  # Cache user lookups
-        company_cache = {}  # Cache company lookups
-        
-        successful_rows = 0
+        base_successful = (checkpoint.successful_rows or 0) if checkpoint else 0
+        base_updated = (checkpoint.updated_rows or 0) if checkpoint else 0
+        base_failed = (checkpoint.failed_rows or 0) if checkpoint else 0
+        successful_rows = base_successful
         failed_rows = 0
         error_details = []
         
-        # Progress tracking for large files
-        progress_interval = max(1, total_rows // 20)  # Report progress every 5%
-        next_progress_report = progress_interval
+        def report_progress(processed_rows: int, successful: int, failed: int, status_message: str):
+            # Live counters go to Redis; job_progress writes them through to the job row in batches
+            progress.report(processed_rows, successful, failed, errors=error_details)
+            task_logger.info(
+                f"📈 {status_message}",
+                job_id=job_id,
+                user_id=user_id,
+                file_name=file_name,
+                total_rows=total_rows,
+                processed_rows=processed_rows,
+                queue_priority=queue_priority,
+                successful_rows=successful,
+                failed_rows=failed
+            )
         
-        # Main processing loop with enhanced logging
+        # Staged pipeline: every stage runs over the whole payload and drops the rows it rejects
         try:
-            self.update_state(
-                state="PROGRESS",
-                meta={
-                    "status": "Processing annual predictions...",
-                    "current": 0,
-                    "total": total_rows,
-                    "job_id": job_id
-                }
+            # Stage 1: validation, numeric coercion and in-file duplicates
+            frame, validation_errors = validate_annual_rows(load_payload_frame(data))
+            error_details.extend(validation_errors)
+            failed_rows += len(validation_errors)
+            if validation_errors:
+                task_logger.warning(
+                    f"⚠️ Rejected {len(validation_errors)} rows in validation",
+                    job_id=job_id,
+                    failed_rows=len(validation_errors)
+                )
+            
+            # Stage 2: one access-level lookup and one bulk company resolve
+            access_level = resolve_access_level(db, organization_id, user_id)
+            if len(frame):
+                company_ids = resolve_companies(
+                    db, frame, access_level, organization_id, user_id,
+                    market_cap_multiplier=1_000_000
+                )
+                db.commit()
+                frame['company_id'] = frame['company_symbol'].map(company_ids)
+            
+            # Validation and duplicate errors are recomputed on resume; insert outcomes come from the checkpoint,
+            # and the errors of rows up to it are already stored
+            pre_insert_failed = failed_rows
+            pre_insert_processed = pre_insert_failed + base_successful + base_failed
+            failed_rows += base_failed
+            report_progress(pre_insert_processed, successful_rows, failed_rows, f"Validated {total_rows} rows, scoring {len(frame)}")
+            
+            if resume_row:
+                frame = frame.loc[frame.index > resume_row]
+            
+            # Stage 3: one batch model call
+            if len(frame):
+                frame = score_annual_rows(frame, ml_model)
+            
+            # Stage 4: batched upsert with per-row fallback, checkpointed with every batch
+            mappings = build_annual_mappings(frame, access_level, organization_id, user_id, job_id)
+            
+            def skipped_error(idx: int) -> Dict[str, Any]:
+                row_number = mappings[idx]['_row']
+                return row_error(
+                    row_number,
+                    f"Prediction already exists for {frame.at[row_number, 'company_symbol']} {frame.at[row_number, 'reporting_year']}",
+                    ERROR_DUPLICATE_STORED
+                )
+            
+            def on_insert_batch(stored: int, insert_failed: int):
+                report_progress(
+                    pre_insert_processed + stored + insert_failed,
+                    base_successful + stored,
+                    pre_insert_failed + base_failed + insert_failed,
+                    f"Processed {pre_insert_processed + stored + insert_failed}/{total_rows} rows"
+                )
+            
+            upserted, insert_errors = insert_prediction_mappings(
+                db, AnnualPrediction, mappings,
+                on_batch=on_insert_batch,
+                conflict_policy=conflict_policy,
+                checkpoint=insert_checkpointer(db, job_id, 0, checkpoint, skipped_error, rejected=validation_errors),
+                deadline=yield_deadline(start_time)
             )
+            skipped_errors = [skipped_error(idx) for idx in upserted.skipped]
+            updated_rows = base_updated + len(upserted.updated)
+            successful_rows += len(upserted.inserted) + len(upserted.updated)
+            failed_rows += len(skipped_errors) + len(insert_errors)
+            error_details.extend(skipped_errors)
+            error_details.extend(insert_errors)
+            error_details.sort(key=lambda entry: entry['row'])
             
-            for i, row in enumerate(data):
-                try:
-                    # Progress reporting with detailed logging
-                    if i >= next_progress_report or i == total_rows - 1:
-                        progress_percent = (i / total_rows) * 100
-                        elapsed_time = time.time() - start_time
-                        rows_per_second = i / elapsed_time if elapsed_time > 0 else 0
-                        estimated_remaining = ((total_rows - i) / rows_per_second) if rows_per_second > 0 else 0
-                        
-                        task_logger.info(
-                            f"📈 Processing progress: {progress_percent:.1f}% ({i}/{total_rows} rows)",
-                            job_id=job_id,
-                            user_id=user_id,
-                            file_name=file_name,
-                            total_rows=total_rows,
-                            processed_rows=i,
-                            queue_priority=queue_priority,
-                            successful_rows=successful_rows,
-                            failed_rows=failed_rows,
-                            estimated_remaining_seconds=estimated_remaining
-                        )
-                        next_progress_report = min(i + progress_interval, total_rows)
-                        
-                        # Update job progress
-                        update_job_status(
-                            job_id, 
-                            'processing', 
-                            processed_rows=i,
-                            successful_rows=successful_rows,
-                            failed_rows=failed_rows
-                        )
-                    
-                    # Process individual row with error resilience
-                    try:
-                        company = create_or_get_company_cached(
-                            db=db,
-                            symbol=row['company_symbol'],
-                            name=row['company_name'],
-                            market_cap=safe_float(row['market_cap']),
-                            sector=row['sector'],
-                            organization_id=organization_id,
-                            user_id=user_id,
-                            user_cache=user_cache,
-                            company_cache=company_cache
-                        )
-                    
-                        existing_query = db.query(AnnualPrediction).filter(
-                            AnnualPrediction.company_id == company.id,
-                            AnnualPrediction.reporting_year == str(row['reporting_year'])
-                        )
-                        
-                        if row.get('reporting_quarter'):
-                            existing_query = existing_query.filter(
-                                AnnualPrediction.reporting_quarter == row['reporting_quarter']
-                            )
-                        else:
-                            existing_query = existing_query.filter(
-                                AnnualPrediction.reporting_quarter.is_(None)
-                            )
-                
-                        existing_prediction = existing_query.first()
-                        if existing_prediction:
-                            failed_rows += 1
-                            error_details.append({
-                                'row': i + 1,
-                                'error': f"Prediction already exists for {row['company_symbol']} {row['reporting_year']}"
-                            })
-                            # Log duplicate skip for debugging
-                            task_logger.warning(
-                                f"⚠️ Skipping duplicate prediction for {row['company_symbol']} {row['reporting_year']}",
-                                job_id=job_id,
-                                row_number=i+1,
-                                company_symbol=row['company_symbol'],
-                                reporting_year=row['reporting_year']
-                            )
-                            continue
-                        
-                        financial_data = {
-                            'long_term_debt_to_total_capital': safe_float(row['long_term_debt_to_total_capital']),
-                            'total_debt_to_ebitda': safe_float(row['total_debt_to_ebitda']),
-                            'net_income_margin': safe_float(row['net_income_margin']),
-                            'ebit_to_interest_expense': safe_float(row['ebit_to_interest_expense']),
-                            'return_on_assets': safe_float(row['return_on_assets'])
-                        }
-                        
-                        ml_result = ml_model.predict_default_probability(financial_data)
-                        
-                        if organization_id:
-                            access_level = "organization"
-                        else:
-                            user = db.query(User).filter(User.id == user_id).first()
-                            if user and user.role == "super_admin":
-                                access_level = "system"
-                            else:
-                                access_level = "personal"
-                        
-                        prediction = AnnualPrediction(
-                            id=uuid.uuid4(),
-                            company_id=company.id,
-                            organization_id=organization_id,
-                            access_level=access_level,
-                            reporting_year=str(row['reporting_year']),
-                            reporting_quarter=row.get('reporting_quarter') if row.get('reporting_quarter') else None,
-                            long_term_debt_to_total_capital=safe_float(row['long_term_debt_to_total_capital']),
-                            total_debt_to_ebitda=safe_float(row['total_debt_to_ebitda']),
-                            net_income_margin=safe_float(row['net_income_margin']),
-                            ebit_to_interest_expense=safe_float(row['ebit_to_interest_expense']),
-                            return_on_assets=safe_float(row['return_on_assets']),
-                            probability=safe_float(ml_result['probability']),
-                            risk_level=ml_result['risk_level'],
-                            confidence=safe_float(ml_result['confidence']),
-                            predicted_at=datetime.utcnow(),
-                            created_by=user_id
-                        )
-                        
-                        db.add(prediction)
-                        successful_rows += 1
-                        
-                        if (i + 1) % 50 == 0:
-                            db.commit()
-                            update_job_status(
-                                job_id, 
-                                'processing',
-                                processed_rows=i + 1,
-                                successful_rows=successful_rows,
-                                failed_rows=failed_rows
-                            )
-                            
-                            self.update_state(
-                                state="PROGRESS",
-                                meta={
-                                    "status": f"Processed {i + 1}/{total_rows} rows",
-                                    "current": i + 1,
-                                    "total": total_rows,
-                                    "successful": successful_rows,
-                                    "failed": failed_rows,
-                                    "job_id": job_id
-                                }
-                            )
-                            
-                    except Exception as e:
-                        failed_rows += 1
-                        error_details.append({
-                            'row': i + 1,
-                            'data': {k: str(v) for k, v in row.items()},  
-                            'error': str(e)
-                        })
-                        
-                        # Enhanced error logging for individual rows
-                        task_logger.error(
-                            f"❌ Row processing failed: {str(e)}",
-                            job_id=job_id,
-                            user_id=user_id,
-                            file_name=file_name,
-                            total_rows=total_rows,
-                            processed_rows=i,
-                            queue_priority=queue_priority,
-                            row_number=i+1,
-                            company_symbol=row.get('company_symbol', 'unknown'),
-                            error=str(e)
-                        )
-                        
-                        db.rollback()
-                        continue
-                        
-                except Exception as outer_error:
-                    # Handle any errors not caught by nested try/except in row processing
-                    failed_rows += 1
-                    error_details.append({
-                        'row': i + 1,
-                        'error': f"Outer processing error: {str(outer_error)}"
-                    })
-                    
-                    task_logger.error(
-                        f"❌ Outer processing error on row {i+1}: {str(outer_error)}",
-                        job_id=job_id,
-                        user_id=user_id,
-                        row_number=i+1,
-                        error=str(outer_error)
-                    )
-                    
-                    db.rollback()
-                    continue
+            # Out of time: the rest continues in a fresh run of this task, from the checkpoint
+            handled = len(upserted.inserted) + len(upserted.updated) + len(upserted.skipped) + len(insert_errors)
+            if handled < len(mappings):
+                progress.report(pre_insert_processed + handled, successful_rows, failed_rows, errors=error_details)
+                task_logger.info(
+                    f"⏸️ Yielding after {handled}/{len(mappings)} rows of this run, continuing from the checkpoint",
+                    job_id=job_id,
+                    user_id=user_id,
+                    file_name=file_name,
+                    total_rows=total_rows,
+                    processed_rows=pre_insert_processed + handled
+                )
+                raise self.retry(countdown=0, max_retries=None)
+            
+            progress.report(total_rows, successful_rows, failed_rows, errors=error_details)
+            
+            for duplicate in skipped_errors:
+                task_logger.warning(
+                    f"⚠️ Skipping duplicate prediction on row {duplicate['row']}: {duplicate['error']}",
+                    job_id=job_id,
+                    row_number=duplicate['row']
+                )
+            
+            for insert_error in insert_errors:
+                task_logger.error(
+                    f"❌ Row processing failed: {insert_error['error']}",
+                    job_id=job_id,
+                    user_id=user_id,
+                    row_number=insert_error['row'],
+                    error=insert_error['error']
+                )
         
             # Final commit and completion logging
             db.commit()
@@ -628,7 +597,8 @@ def process_annual_bulk_upload_task(
             # Log final summary for debugging
             task_logger.success(
                 f"🎉 Job completion summary: Processed {total_rows} rows, "
-                f"Created {successful_rows} predictions, "
+                f"Created {successful_rows - updated_rows} predictions, "
+                f"Updated {updated_rows} ({conflict_policy}), "
                 f"Skipped {failed_rows} duplicates/errors",
                 job_id=job_id,
                 user_id=user_id,
@@ -645,8 +615,14 @@ def process_annual_bulk_upload_task(
                 processed_rows=total_rows,
                 successful_rows=successful_rows,
                 failed_rows=failed_rows,
-                error_details={'errors': error_details[:100]}  
+                error_details={'errors': error_details}
             )
+            
+            if is_payload_ref(data):
+                payload_store.delete(data)
+        
+        except Retry:
+            raise
         
         except Exception as processing_error:
             # Handle any errors during the main processing loop
@@ -661,7 +637,7 @@ def process_annual_bulk_upload_task(
             update_job_status(
                 job_id,
                 'failed',
-                processed_rows=len(data) if 'data' in locals() else 0,
+                processed_rows=total_rows,
                 successful_rows=successful_rows if 'successful_rows' in locals() else 0,
                 failed_rows=failed_rows if 'failed_rows' in locals() else 0,
                 error_message=str(processing_error)
@@ -674,7 +650,9 @@ def process_annual_bulk_upload_task(
             "job_id": job_id,
             "total_rows": total_rows,
             "successful_rows": successful_rows,
+            "updated_rows": updated_rows,
             "failed_rows": failed_rows,
+            "conflict_policy": conflict_policy,
             "processing_time_seconds": round(processing_time, 2),
             "rows_per_second": round(rows_per_second, 2),
             "success_rate_percent": round(success_rate, 2),
@@ -683,6 +661,9 @@ def process_annual_bulk_upload_task(
         
         return result
         
+    except Retry:
+        raise
+        
     except Exception as e:
         db.rollback()
         error_msg = str(e)
@@ -746,83 +727,15 @@ def process_annual_bulk_upload_task(
         db.close()
 
 
-# PERFORMANCE OPTIMIZATION: Add caching for database lookups
-def create_or_get_company_cached(db, symbol: str, name: str, market_cap: float, sector: str, 
-                                organization_id: Optional[str], user_id: str, 
-                                user_cache: dict, company_cache: dict) -> Company:
-    """Optimized version with caching to avoid repeated DB queries"""
-    cache_key = f"{symbol}_{organization_id or 'none'}_{user_id}"
-    
-    # Check company cache first
-    if cache_key in company_cache:
-        company = company_cache[cache_key]
-        # Update company data
-        company.name = name
-        company.market_cap = safe_float(market_cap) * 1_000_000
-        company.sector = sector
-        return company
-    
-    # Check user cache
-    if user_id not in user_cache:
-        user = db.query(User).filter(User.id == user_id).first()
-        user_cache[user_id] = user
-    else:
-        user = user_cache[user_id]
-    
-    # Determine access level
-    if organization_id:
-        access_level = "organization"
-        company = db.query(Company).filter(
-            Company.symbol == symbol.upper(),
-            Company.organization_id == organization_id,
-            Company.access_level == "organization"
-        ).first()
-    else:
-        if user and user.role == "super_admin":
-            access_level = "system"
-            company = db.query(Company).filter(
-                Company.symbol == symbol.upper(),
-                Company.access_level == "system"
-            ).first()
-        else:
-            access_level = "personal"
-            company = db.query(Company).filter(
-                Company.symbol == symbol.upper(),
-                Company.organization_id.is_(None),
-                Company.access_level == "personal",
-                Company.created_by == user_id
-            ).first()
-    
-    if not company:
-        company = Company(
-            symbol=symbol.upper(),
-            name=name,
-            market_cap=safe_float(market_cap) * 1_000_000,
-            sector=sector,
-            organization_id=organization_id,
-            access_level=access_level,
-            created_by=user_id
-        )
-        db.add(company)
-        db.flush()
-    else:
-        company.name = name
-        company.market_cap = safe_float(market_cap) * 1_000_000
-        company.sector = sector
-    
-    # Cache the result
-    company_cache[cache_key] = company
-    return company
-
-
 @celery_app.task(bind=True, name="app.workers.tasks.process_quarterly_bulk_upload_task")
 @enhanced_task_logging("process_quarterly_bulk_upload_task")
 def process_quarterly_bulk_upload_task(
     self, 
     job_id: str, 
-    data: List[Dict[str, Any]], 
+    data: Union[List[Dict[str, Any]], PayloadRef], 
     user_id: str, 
-    organization_id: Optional[str]
+    organization_id: Optional[str],
+    conflict_policy: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     Enhanced Celery task to process quarterly predictions bulk upload with comprehensive logging
@@ -830,15 +743,18 @@ def process_quarterly_bulk_upload_task(
     
     Args:
         job_id: Bulk upload job ID
-        data: List of row data from Excel/CSV
+        data: List of row data from Excel/CSV, or a payload store reference to it
         user_id: ID of user who initiated upload
         organization_id: Organization ID (None for super admin global uploads)
+        conflict_policy: skip | overwrite | keep_newest for rows already stored
+                         (defaults to BULK_CONFLICT_POLICY)
         
     Returns:
         Dictionary with processing results
     """
     task_id = self.request.id
     start_time = time.time()
+    conflict_policy = conflict_policy or default_conflict_policy()
     
     # CRITICAL: Validate task parameters immediately
     if not job_id or job_id in ['', 'undefined', 'null']:
@@ -849,11 +765,17 @@ def process_quarterly_bulk_upload_task(
         logger.error(f"❌ CRITICAL: Invalid user_id parameter: {user_id}")
         raise ValueError(f"Invalid user_id parameter: {user_id}")
         
-    if not data or not isinstance(data, list):
+    if not data or not (isinstance(data, list) or is_payload_ref(data)):
         logger.error(f"❌ CRITICAL: Invalid data parameter: {type(data)}, length: {len(data) if hasattr(data, '__len__') else 'N/A'}")
         raise ValueError(f"Invalid data parameter: {type(data)}")
         
-    logger.info(f"✅ Task parameter validation passed: job_id={job_id}, user_id={user_id}, data_rows={len(data)}, org_id={organization_id}")
+    if conflict_policy not in CONFLICT_POLICIES:
+        logger.error(f"❌ CRITICAL: Invalid conflict_policy parameter: {conflict_policy}")
+        raise ValueError(f"Invalid conflict_policy parameter: {conflict_policy}")
+        
+    logger.info(f"✅ Task parameter validation passed: job_id={job_id}, user_id={user_id}, data_rows={payload_row_count(data)}, org_id={organization_id}")
+    
+    payload_ref = data if is_payload_ref(data) else None
     
     # Initialize enhanced logger
     task_logger = TaskLogger("process_quarterly_bulk_upload_task")
@@ -870,7 +792,7 @@ def process_quarterly_bulk_upload_task(
     try:
         job = db.query(BulkUploadJob).filter(BulkUploadJob.id == job_id).first()
         file_name = job.original_filename if job else "unknown-file"
-        total_rows = len(data)
+        total_rows = payload_row_count(data)
         
         # Determine queue priority based on file size
         if total_rows <= 100:
@@ -896,60 +818,149 @@ def process_quarterly_bulk_upload_task(
             rows_per_second=0
         )
         
-        update_job_status(job_id, 'processing')
+        # A redelivered task whose job already finished has nothing left to do
+        if job_is_finished(db, job_id):
+            logger.info(f"⏭️ Job {job_id} already finished, ignoring redelivered task {task_id}")
+            return {"status": job.status, "job_id": job_id, "resumed": False}
+        
+        # Rows up to the checkpoint were committed (or failed) in an earlier run of this task; their errors are stored
+        checkpoint = load_checkpoint(db, job_id)
+        resume_row = checkpoint.last_row if checkpoint else 0
+        if checkpoint:
+            successful_rows = checkpoint.successful_rows or 0
+            failed_rows = checkpoint.failed_rows or 0
+            task_logger.info(
+                f"♻️ Resuming after row {resume_row}",
+                job_id=job_id,
+                user_id=user_id,
+                file_name=file_name,
+                total_rows=total_rows
+            )
         
-        self.update_state(
-            state="PROGRESS",
-            meta={
-                "status": "Processing quarterly predictions...",
-                "current": 0,
-                "total": total_rows,
-                "job_id": job_id
-            }
-        )
+        update_job_status(job_id, 'processing')
+        job_progress.reset(job_id)
+        progress = ProgressReporter(job_id)
+        progress.report(resume_row, successful_rows, failed_rows)
+        
+        # Validation stage: bad rows are rejected here and never reach the company resolver, model or DB
+        frame, validation_errors = validate_quarterly_rows(load_payload_frame(data) if payload_ref else data)
+        rejected_rows = [entry for entry in validation_errors if entry['row'] > resume_row]
+        frame = frame.loc[frame.index > resume_row]
+        
+        # GBM is display-only, so it is scored outside the per-row loop:
+        # once over the rows left to process ("batch"), after insert ("deferred"), or not at all ("skip")
+        gbm_mode = quarterly_ml_model.gbm_mode
+        upload_gbm_probabilities = None
+        deferred_gbm_rows = []
+        if gbm_mode == 'batch':
+            upload_gbm_probabilities = quarterly_ml_model.predict_gbm_batch(frame[quarterly_ml_model.RATIO_FIELDS])
+        
+        access_level = resolve_access_level(db, organization_id, user_id)
+        updated_rows = (checkpoint.updated_rows or 0) if checkpoint else 0
+        pending_rows = []
+        checkpointed_row = resume_row
+        deadline = yield_deadline(start_time)
+        
+        def stage_progress(last_row: int, successful: int, updated: int, failed: int, errors: List[Dict[str, Any]]):
+            stage_checkpoint(db, job_id, 0, last_row, successful, updated, failed, errors)
+        
+        def flush_pending_rows(through_row: int):
+            """
+            Upsert buffered predictions in one statement and fold the outcome into the counters
+
+            Every row up to ``through_row`` is accounted for afterwards, so the
+            checkpoint moves there; while the upsert runs, each committed batch
+            carries a checkpoint at its own last row.
+            """
+            nonlocal successful_rows, failed_rows, updated_rows, checkpointed_row
+            # Rows rejected in validation are accounted for once the checkpoint passes them
+            while rejected_rows and rejected_rows[0]['row'] <= through_row:
+                error_details.append(rejected_rows.pop(0))
+                failed_rows += 1
+            if not pending_rows:
+                stage_progress(through_row, successful_rows, updated_rows, failed_rows, error_details)
+                db.commit()
+                checkpointed_row = through_row
+                return
+            db.commit()  # companies created since the last flush must survive a failed batch
+            mappings = [{k: v for k, v in entry.items() if k not in ('_label', 'financial_data')} for entry in pending_rows]
+            
+            def skipped_error(idx: int) -> Dict[str, Any]:
+                return row_error(pending_rows[idx]['_row'], f"Prediction already exists for {pending_rows[idx]['_label']}", ERROR_DUPLICATE_STORED)
+            
+            # Errors recorded since the last checkpoint belong to rows up to through_row
+            window = [entry for entry in error_details if entry['row'] > checkpointed_row]
+            
+            def stage_batch(last_row: int, committed, pending, insert_errors: List[Dict[str, Any]]):
+                covered = [entry for entry in window if entry['row'] <= last_row]
+                skipped = list(committed.skipped) + list(pending.skipped)
+                # Skips of earlier batches were stored with their own checkpoint
+                stage_progress(
+                    last_row,
+                    successful_rows + len(committed.inserted) + len(committed.updated) + len(pending.inserted) + len(pending.updated),
+                    updated_rows + len(committed.updated) + len(pending.updated),
+                    failed_rows - len(window) + len(covered) + len(skipped) + len(insert_errors),
+                    covered + [skipped_error(idx) for idx in pending.skipped] + insert_errors
+                )
+            
+            upserted, insert_errors = insert_prediction_mappings(
+                db, QuarterlyPrediction, mappings, conflict_policy=conflict_policy, checkpoint=stage_batch
+            )
+            successful_rows += len(upserted.inserted) + len(upserted.updated)
+            updated_rows += len(upserted.updated)
+            failed_rows += len(upserted.skipped) + len(insert_errors)
+            error_details.extend(skipped_error(idx) for idx in upserted.skipped)
+            error_details.extend(insert_errors)
+            if gbm_mode == 'deferred':
+                for idx, stored_id in upserted.ids.items():
+                    deferred_gbm_rows.append({'id': stored_id, 'financial_data': pending_rows[idx]['financial_data']})
+            pending_rows.clear()
+            stage_progress(through_row, successful_rows, updated_rows, failed_rows, error_details)
+            db.commit()
+            checkpointed_row = through_row
         
-        for i, row in enumerate(data):
+        def run_deferred_gbm():
+            if not deferred_gbm_rows:
+                return
             try:
-                company = create_or_get_company(
-                    db=db,
+                scored = backfill_gbm_probabilities(db, deferred_gbm_rows)
+                logger.info(f"🌲 Deferred GBM pass scored {scored} quarterly predictions for job {job_id}")
+            except Exception as gbm_error:
+                db.rollback()
+                logger.error(f"Deferred GBM pass failed for job {job_id}: {str(gbm_error)}")
+            deferred_gbm_rows.clear()
+        
+        previous_row = resume_row
+        for position, (row_number, row) in enumerate(frame.to_dict('index').items()):
+            # Out of time: continue in a fresh run of this task once everything so far is checkpointed
+            if checkpointed_row == previous_row and previous_row > resume_row and time.time() >= deadline:
+                run_deferred_gbm()
+                task_logger.info(
+                    f"⏸️ Yielding after row {previous_row}, continuing from the checkpoint",
+                    job_id=job_id,
+                    user_id=user_id,
+                    file_name=file_name,
+                    total_rows=total_rows,
+                    processed_rows=previous_row
+                )
+                raise self.retry(countdown=0, max_retries=None)
+            previous_row = row_number
+            
+            try:
+                company_id = company_resolver.resolve(
+                    db,
                     symbol=row['company_symbol'],
                     name=row['company_name'],
-                    market_cap=safe_float(row['market_cap']),
+                    market_cap=row['market_cap'],
                     sector=row['sector'],
+                    access_level=access_level,
                     organization_id=organization_id,
                     user_id=user_id
                 )
                 
-                # Normalize quarter format
-                normalized_quarter = normalize_quarter(row['reporting_quarter'])
-                
-                existing_prediction = db.query(QuarterlyPrediction).filter(
-                    QuarterlyPrediction.company_id == company.id,
-                    QuarterlyPrediction.reporting_year == str(row['reporting_year']),
-                    QuarterlyPrediction.reporting_quarter == normalized_quarter
-                ).first()
-                
-                if existing_prediction:
-                    failed_rows += 1
-                    error_details.append({
-                        'row': i + 1,
-                        'error': f"Prediction already exists for {row['company_symbol']} {row['reporting_year']} {row['reporting_quarter']}"
-                    })
-                    continue
-                
-                financial_data = {
-                    'total_debt_to_ebitda': safe_float(row['total_debt_to_ebitda']),
-                    'sga_margin': safe_float(row['sga_margin']),
-                    'long_term_debt_to_total_capital': safe_float(row['long_term_debt_to_total_capital']),
-                    'return_on_capital': safe_float(row['return_on_capital'])
-                }
-                
-                logger.info(f"🔍 DEBUG: Processing row {i+1}/{len(data)} - {row['company_symbol']} with financial_data: {financial_data}")
+                financial_data = {field: row[field] for field in quarterly_ml_model.RATIO_FIELDS}
                 
-                # Check for None/invalid values that might cause hanging
-                for key, value in financial_data.items():
-                    if value is None or (isinstance(value, float) and (math.isnan(value) or math.isinf(value))):
-                        logger.warning(f"⚠️ DEBUG: Invalid value for {key}: {value} in row {i+1}")
+                logger.info(f"🔍 DEBUG: Processing row {row_number}/{total_rows} - {row['company_symbol']} with financial_data: {financial_data}")
                 
                 try:
                     import signal
@@ -962,87 +973,68 @@ def process_quarterly_bulk_upload_task(
                     signal.alarm(30)  # 30 seconds timeout
                     
                     try:
-                        ml_result = quarterly_ml_model.predict_quarterly_default_probability(financial_data)
+                        ml_result = quarterly_ml_model.predict_quarterly_default_probability(financial_data, gbm_mode='skip')
                         signal.alarm(0)  # Cancel the alarm
                         logger.info(f"✅ DEBUG: ML prediction successful for {row['company_symbol']}: {ml_result.get('logistic_probability', 'N/A')}")
                     except TimeoutError:
                         signal.alarm(0)  # Cancel the alarm
                         logger.error(f"⏰ DEBUG: ML prediction timed out for {row['company_symbol']} after 30 seconds")
                         failed_rows += 1
-                        error_details.append({
-                            'row': i + 1,
-                            'error': f"ML prediction timed out after 30 seconds"
-                        })
+                        error_details.append(row_error(row_number, "ML prediction timed out after 30 seconds", ERROR_MODEL_FAILED))
                         continue
                         
                 except Exception as ml_error:
                     signal.alarm(0)  # Cancel the alarm if set
                     logger.error(f"❌ DEBUG: ML prediction failed for {row['company_symbol']}: {str(ml_error)}")
                     failed_rows += 1
-                    error_details.append({
-                        'row': i + 1,
-                        'error': f"ML prediction failed: {str(ml_error)}"
-                    })
+                    error_details.append(row_error(row_number, f"ML prediction failed: {str(ml_error)}", ERROR_MODEL_FAILED))
                     continue
                 
-                if organization_id:
-                    access_level = "organization"
-                else:
-                    user = db.query(User).filter(User.id == user_id).first()
-                    if user and user.role == "super_admin":
-                        access_level = "system"
-                    else:
-                        access_level = "personal"
-                
-                prediction = QuarterlyPrediction(
+                # Stored duplicates are resolved by ON CONFLICT when the buffer is flushed
+                pending_rows.append(dict(
+                    _row=row_number,
+                    _label=f"{row['company_symbol']} {row['reporting_year']} {row['reporting_quarter']}",
+                    financial_data=financial_data,
                     id=uuid.uuid4(),
-                    company_id=company.id,
+                    company_id=company_id,
                     organization_id=organization_id,
                     access_level=access_level,
                     reporting_year=str(row['reporting_year']),
-                    reporting_quarter=normalized_quarter,
-                    total_debt_to_ebitda=safe_float(row['total_debt_to_ebitda']),
-                    sga_margin=safe_float(row['sga_margin']),
-                    long_term_debt_to_total_capital=safe_float(row['long_term_debt_to_total_capital']),
-                    return_on_capital=safe_float(row['return_on_capital']),
+                    reporting_quarter=row['reporting_quarter'],
+                    total_debt_to_ebitda=financial_data['total_debt_to_ebitda'],
+                    sga_margin=financial_data['sga_margin'],
+                    long_term_debt_to_total_capital=financial_data['long_term_debt_to_total_capital'],
+                    return_on_capital=financial_data['return_on_capital'],
                     logistic_probability=safe_float(ml_result.get('logistic_probability', 0)),
-                    gbm_probability=safe_float(ml_result.get('gbm_probability', 0)),
+                    gbm_probability=float(upload_gbm_probabilities[position]) if upload_gbm_probabilities is not None else None,
                     ensemble_probability=safe_float(ml_result.get('ensemble_probability', 0)),
                     risk_level=ml_result['risk_level'],
                     confidence=safe_float(ml_result['confidence']),
                     predicted_at=datetime.utcnow(),
-                    created_by=user_id
-                )
-                
-                db.add(prediction)
-                successful_rows += 1
+                    created_by=user_id,
+                    bulk_upload_job_id=job_id
+                ))
                 
                 # Enhanced progress logging every 7 rows or at specific intervals
-                if (i + 1) % 7 == 0 or (i + 1) in [1, 5, 10, 15, 20] or (i + 1) == total_rows:
+                if (position + 1) % 7 == 0 or (position + 1) in [1, 5, 10, 15, 20] or position + 1 == len(frame):
+                    # Flush buffered predictions for progress updates
+                    flush_pending_rows(row_number)
                     current_time = time.time()
                     processing_time = current_time - start_time
-                    rows_per_second = (i + 1) / processing_time if processing_time > 0 else 0
-                    progress_percent = ((i + 1) / total_rows) * 100 if total_rows > 0 else 0
-                    success_rate = (successful_rows / (i + 1)) * 100 if (i + 1) > 0 else 0
+                    rows_per_second = row_number / processing_time if processing_time > 0 else 0
+                    progress_percent = (row_number / total_rows) * 100 if total_rows > 0 else 0
+                    success_rate = (successful_rows / row_number) * 100 if row_number > 0 else 0
                     
-                    # Database commit for progress updates
-                    db.commit()
-                    update_job_status(
-                        job_id, 
-                        'processing',
-                        processed_rows=i + 1,
-                        successful_rows=successful_rows,
-                        failed_rows=failed_rows
-                    )
+                    progress.report(row_number, successful_rows, failed_rows, errors=error_details)
                     
                     # Enhanced progress logging
                     task_logger.log_progress(
-                        f"📈 Processing progress: {progress_percent:.1f}% ({i + 1}/{total_rows} rows)",
+                        f"📈 Processing progress: {progress_percent:.1f}% ({row_number}/{total_rows} rows)",
                         job_id=job_id,
                         user_id=user_id,
                         file_name=file_name,
                         total_rows=total_rows,
-                        processed_rows=i + 1,
+                        processed_rows=row_number,
                         queue_priority=queue_priority,
                         successful_rows=successful_rows,
                         failed_rows=failed_rows,
@@ -1050,42 +1042,23 @@ def process_quarterly_bulk_upload_task(
                         processing_time_seconds=processing_time,
                         rows_per_second=rows_per_second
                     )
+                elif (position + 1) % 50 == 0:  # Fallback for larger files
+                    flush_pending_rows(row_number)
+                    progress.report(row_number, successful_rows, failed_rows, errors=error_details)
                     
-                    self.update_state(
-                        state="PROGRESS",
-                        meta={
-                            "status": f"Processed {i + 1}/{total_rows} rows",
-                            "current": i + 1,
-                            "total": total_rows,
-                            "successful": successful_rows,
-                            "failed": failed_rows,
-                            "job_id": job_id
-                        }
-                    )
-                elif (i + 1) % 50 == 0:  # Fallback for larger files
-                    db.commit()
-                    update_job_status(
-                        job_id, 
-                        'processing',
-                        processed_rows=i + 1,
-                        successful_rows=successful_rows,
-                        failed_rows=failed_rows
-                    )
-                    
-            except Exception as row_error:
+            except Exception as row_exception:
                 failed_rows += 1
-                error_details.append({
-                    'row': i + 1,
-                    'data': {k: str(v) for k, v in row.items()},  
-                    'error': str(row_error)
-                })
+                error_details.append(row_error(row_number, str(row_exception), ERROR_ROW_FAILED))
                 
                 db.rollback()
                 continue
             
-        # Final commit and completion logging
+        # Final flush and completion logging
+        flush_pending_rows(total_rows)
         db.commit()
         
+        run_deferred_gbm()
+        
         processing_time = time.time() - start_time
         rows_per_second = total_rows / processing_time if processing_time > 0 else 0
         success_rate = (successful_rows / total_rows) * 100 if total_rows > 0 else 0
@@ -1112,15 +1085,20 @@ def process_quarterly_bulk_upload_task(
             processed_rows=total_rows,
             successful_rows=successful_rows,
             failed_rows=failed_rows,
-            error_details={'errors': error_details[:100]}  
+            error_details={'errors': error_details}
         )
         
+        if payload_ref:
+            payload_store.delete(payload_ref)
+        
         result = {
             "status": "completed",
             "job_id": job_id,
             "total_rows": total_rows,
             "successful_rows": successful_rows,
+            "updated_rows": updated_rows,
             "failed_rows": failed_rows,
+            "conflict_policy": conflict_policy,
             "processing_time_seconds": round(processing_time, 2),
             "rows_per_second": round(rows_per_second, 2),
             "success_rate_percent": round(success_rate, 2),
@@ -1128,6 +1106,9 @@ def process_quarterly_bulk_upload_task(
         }
         
         return result
+    
+    except Retry:
+        raise
             
     except Exception as e:
         db.rollback()
@@ -1228,7 +1209,7 @@ def process_bulk_excel_task(self, file_content_b64: str, original_filename: str)
                     continue
                 
                 # Create or get company
-                company = create_or_get_company(
+                company_id = resolve_company_id(
                     db=db,
                     symbol=company_symbol,
                     name=company_name,
@@ -1258,7 +1239,7 @@ def process_bulk_excel_task(self, file_content_b64: str, original_filename: str)
                 # Save prediction result
                 prediction = AnnualPrediction(
                     id=uuid.uuid4(),
-                    company_id=company.id,
+                    company_id=company_id,
                     organization_id=None,  # Global scope
                     access_level="system",  # System access for bulk uploads
                     reporting_year=str(row['reporting_year']),
@@ -1409,7 +1390,7 @@ def process_quarterly_bulk_task(file_content_b64: str, original_filename: str, o
                 sector = row.get('sector')
                 
                 # Create or get company
-                company = create_or_get_company(
+                company_id = resolve_company_id(
                     db=db,
                     symbol=company_symbol,
                     name=company_name,
@@ -1421,7 +1402,7 @@ def process_quarterly_bulk_task(file_content_b64: str, original_filename: str, o
                 
                 # Check if prediction already exists
                 existing_prediction = db.query(QuarterlyPrediction).filter(
-                    QuarterlyPrediction.company_id == company.id,
+                    QuarterlyPrediction.company_id == company_id,
                     QuarterlyPrediction.reporting_year == str(row['reporting_year']),
                     QuarterlyPrediction.reporting_quarter == row['reporting_quarter']
                 ).first()
@@ -1450,7 +1431,7 @@ def process_quarterly_bulk_task(file_content_b64: str, original_filename: str, o
                 # Save prediction result
                 prediction = QuarterlyPrediction(
                     id=uuid.uuid4(),
-                    company_id=company.id,
+                    company_id=company_id,
                     organization_id=organization_id,
                     access_level="organization" if organization_id else "personal",
                     reporting_year=str(row['reporting_year']),
@@ -1460,7 +1441,7 @@ def process_quarterly_bulk_task(file_content_b64: str, original_filename: str, o
                     long_term_debt_to_total_capital=safe_float(row['long_term_debt_to_total_capital']),
                     return_on_capital=safe_float(row['return_on_capital']),
                     logistic_probability=safe_float(ml_result.get('logistic_probability', 0)),
-                    gbm_probability=safe_float(ml_result.get('gbm_probability', 0)),
+                    gbm_probability=optional_float(ml_result.get('gbm_probability')),
                     ensemble_probability=safe_float(ml_result.get('ensemble_probability', 0)),
                     risk_level=ml_result['risk_level'],
                     confidence=safe_float(ml_result['confidence']),
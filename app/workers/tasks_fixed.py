@@ -16,6 +16,7 @@ from ..workers.celery_app import celery_app
 from ..core.database import get_session_local, BulkUploadJob, Company, AnnualPrediction, QuarterlyPrediction, User, Organization
 from ..services.ml_service import ml_model
 from ..services.quarterly_ml_service import quarterly_ml_model
+from ..services.company_resolver import company_resolver
 
 logger = logging.getLogger(__name__)
 
@@ -78,50 +79,24 @@ def update_job_status(
         db.close()
 
 
-def create_or_get_company(db, symbol: str, name: str, market_cap: float, sector: str, organization_id: Optional[str], user_id: str) -> Company:
-    """Create or get company with organization scoping"""
+def resolve_company_id(db, symbol: str, name: str, market_cap: float, sector: str, organization_id: Optional[str], user_id: str):
+    """Create or get company with organization scoping, through the shared company resolver"""
     if organization_id:
         access_level = "organization"
-        company = db.query(Company).filter(
-            Company.symbol == symbol.upper(),
-            Company.organization_id == organization_id,
-            Company.access_level == "organization"
-        ).first()
     else:
         user = db.query(User).filter(User.id == user_id).first()
-        if user and user.role == "super_admin":
-            access_level = "system"
-            company = db.query(Company).filter(
-                Company.symbol == symbol.upper(),
-                Company.access_level == "system"
-            ).first()
-        else:
-            access_level = "personal"
-            company = db.query(Company).filter(
-                Company.symbol == symbol.upper(),
-                Company.organization_id.is_(None),
-                Company.access_level == "personal",
-                Company.created_by == user_id
-            ).first()
-    
-    if not company:
-        company = Company(
-            symbol=symbol.upper(),
-            name=name,
-            market_cap=safe_float(market_cap),  # Market cap already in millions
-            sector=sector,
-            organization_id=organization_id,
-            access_level=access_level,
-            created_by=user_id
-        )
-        db.add(company)
-        db.flush()  
-    else:
-        company.name = name
-        company.market_cap = safe_float(market_cap)  # Market cap already in millions
-        company.sector = sector
+        access_level = "system" if user and user.role == "super_admin" else "personal"
     
-    return company
+    return company_resolver.resolve(
+        db,
+        symbol=symbol,
+        name=name,
+        market_cap=safe_float(market_cap),  # Market cap already in millions
+        sector=sector,
+        access_level=access_level,
+        organization_id=organization_id,
+        user_id=user_id
+    )
 
 
 # ENHANCED LOGGING SYSTEM FOR WORKER TASKS
@@ -345,7 +320,7 @@ def process_annual_bulk_upload_task(
                     
                     # Process individual row with error resilience
                     try:
-                        company = create_or_get_company(
+                        company_id = resolve_company_id(
                             db=db,
                             symbol=row['company_symbol'],
                             name=row['company_name'],
@@ -356,7 +331,7 @@ def process_annual_bulk_upload_task(
                         )
                     
                         existing_query = db.query(AnnualPrediction).filter(
-                            AnnualPrediction.company_id == company.id,
+                            AnnualPrediction.company_id == company_id,
                             AnnualPrediction.reporting_year == str(row['reporting_year'])
                         )
                         
@@ -399,7 +374,7 @@ def process_annual_bulk_upload_task(
                         
                         prediction = AnnualPrediction(
                             id=uuid.uuid4(),
-                            company_id=company.id,
+                            company_id=company_id,
                             organization_id=organization_id,
                             access_level=access_level,
                             reporting_year=str(row['reporting_year']),
@@ -413,7 +388,8 @@ def process_annual_bulk_upload_task(
                             risk_level=ml_result['risk_level'],
                             confidence=safe_float(ml_result['confidence']),
                             predicted_at=datetime.utcnow(),
-                            created_by=user_id
+                            created_by=user_id,
+                            bulk_upload_job_id=job_id
                         )
                         
                         db.add(prediction)
@@ -657,7 +633,7 @@ def process_quarterly_bulk_upload_task(
         
         for i, row in enumerate(data):
             try:
-                company = create_or_get_company(
+                company_id = resolve_company_id(
                     db=db,
                     symbol=row['company_symbol'],
                     name=row['company_name'],
@@ -668,7 +644,7 @@ def process_quarterly_bulk_upload_task(
                 )
                 
                 existing_prediction = db.query(QuarterlyPrediction).filter(
-                    QuarterlyPrediction.company_id == company.id,
+                    QuarterlyPrediction.company_id == company_id,
                     QuarterlyPrediction.reporting_year == str(row['reporting_year']),
                     QuarterlyPrediction.reporting_quarter == row['reporting_quarter']
                 ).first()
@@ -701,7 +677,7 @@ def process_quarterly_bulk_upload_task(
                 
                 prediction = QuarterlyPrediction(
                     id=uuid.uuid4(),
-                    company_id=company.id,
+                    company_id=company_id,
                     organization_id=organization_id,
                     access_level=access_level,
                     reporting_year=str(row['reporting_year']),
@@ -716,7 +692,8 @@ def process_quarterly_bulk_upload_task(
                     risk_level=ml_result['risk_level'],
                     confidence=safe_float(ml_result['confidence']),
                     predicted_at=datetime.utcnow(),
-                    created_by=user_id
+                    created_by=user_id,
+                    bulk_upload_job_id=job_id
                 )
                 
                 db.add(prediction)
@@ -22,6 +22,7 @@ from ..workers.celery_app import celery_app
 from ..core.database import get_session_local, BulkUploadJob, Company, AnnualPrediction, QuarterlyPrediction, User, Organization
 from ..services.ml_service import ml_model
 from ..services.quarterly_ml_service import quarterly_ml_model
+from ..services.company_resolver import company_resolver
 
 logger = logging.getLogger(__name__)
 
@@ -47,116 +48,42 @@ def batched(iterable, batch_size: int):
 # OPTIMIZED COMPANY MANAGEMENT
 
 class OptimizedCompanyManager:
-    """High-performance company lookup and creation with caching"""
+    """Bulk company lookup and creation through the shared company resolver"""
     
     def __init__(self, db):
         self.db = db
-        self.cache = {}  # symbol -> company mapping
         
     def bulk_get_or_create_companies(
         self, 
         company_data_list: List[Dict], 
         organization_id: Optional[str], 
         user_id: str
-    ) -> List[Company]:
-        """Bulk company lookup/creation with minimal DB queries"""
+    ) -> List[Any]:
+        """Company id for every row, resolved with one cache/IN lookup for the batch"""
         
-        # Extract unique company symbols
         unique_companies = {}
         for data in company_data_list:
             symbol = data['company_symbol'].upper()
             if symbol not in unique_companies:
                 unique_companies[symbol] = {
-                    'symbol': symbol,
                     'name': data['company_name'],
-                    'market_cap': safe_float(data['market_cap']),
+                    'market_cap': safe_float(data['market_cap']),  # Already in millions
                     'sector': data['sector']
                 }
         
-        # Check cache first
-        cached_companies = {}
-        symbols_to_lookup = []
+        if organization_id:
+            access_level = "organization"
+        else:
+            user = self.db.query(User).filter(User.id == user_id).first()
+            access_level = "system" if user and user.role == "super_admin" else "personal"
         
-        for symbol, data in unique_companies.items():
-            cache_key = f"{symbol}_{organization_id}_{user_id}"
-            if cache_key in self.cache:
-                cached_companies[symbol] = self.cache[cache_key]
-            else:
-                symbols_to_lookup.append(symbol)
-        
-        # Bulk database lookup for missing companies
-        found_companies = {}
-        if symbols_to_lookup:
-            if organization_id:
-                existing = self.db.query(Company).filter(
-                    Company.symbol.in_(symbols_to_lookup),
-                    Company.organization_id == organization_id,
-                    Company.access_level == "organization"
-                ).all()
-            else:
-                user = self.db.query(User).filter(User.id == user_id).first()
-                if user and user.role == "super_admin":
-                    existing = self.db.query(Company).filter(
-                        Company.symbol.in_(symbols_to_lookup),
-                        Company.access_level == "system"
-                    ).all()
-                else:
-                    existing = self.db.query(Company).filter(
-                        Company.symbol.in_(symbols_to_lookup),
-                        Company.organization_id.is_(None),
-                        Company.access_level == "personal",
-                        Company.created_by == user_id
-                    ).all()
-            
-            # Update cache and found companies
-            for company in existing:
-                cache_key = f"{company.symbol}_{organization_id}_{user_id}"
-                self.cache[cache_key] = company
-                found_companies[company.symbol] = company
-        
-        # Bulk create missing companies
-        companies_to_create = []
-        access_level = "organization" if organization_id else ("system" if user_id else "personal")
-        
-        for symbol in symbols_to_lookup:
-            if symbol not in found_companies:
-                company_data = unique_companies[symbol]
-                companies_to_create.append({
-                    'symbol': symbol,
-                    'name': company_data['name'],
-                    'market_cap': company_data['market_cap'],  # Already in millions
-                    'sector': company_data['sector'],
-                    'organization_id': organization_id,
-                    'access_level': access_level,
-                    'created_by': user_id
-                })
-        
-        if companies_to_create:
-            # Use bulk insert for new companies
-            self.db.bulk_insert_mappings(Company, companies_to_create)
-            self.db.commit()
-            
-            # Fetch newly created companies and update cache
-            new_symbols = [c['symbol'] for c in companies_to_create]
-            new_companies = self.db.query(Company).filter(Company.symbol.in_(new_symbols)).all()
-            
-            for company in new_companies:
-                cache_key = f"{company.symbol}_{organization_id}_{user_id}"
-                self.cache[cache_key] = company
-                found_companies[company.symbol] = company
-        
-        # Return companies in original order
-        result_companies = []
-        for data in company_data_list:
-            symbol = data['company_symbol'].upper()
-            if symbol in cached_companies:
-                result_companies.append(cached_companies[symbol])
-            elif symbol in found_companies:
-                result_companies.append(found_companies[symbol])
-            else:
-                raise Exception(f"Company not found after creation: {symbol}")
+        company_ids = company_resolver.resolve_many(
+            self.db, unique_companies, access_level, organization_id, user_id, refresh=False
+        )
+        self.db.commit()
         
-        return result_companies
+        # Return company ids in original order
+        return [company_ids[data['company_symbol'].upper()] for data in company_data_list]
 
 # OPTIMIZED ML PREDICTION SERVICE
 
@@ -361,7 +288,7 @@ def process_annual_bulk_upload_optimized(
             
             try:
                 # Step 1: Bulk company lookup/creation (single DB operation)
-                companies = company_manager.bulk_get_or_create_companies(
+                row_company_ids = company_manager.bulk_get_or_create_companies(
                     batch, organization_id, user_id
                 )
                 
@@ -380,7 +307,7 @@ def process_annual_bulk_upload_optimized(
                 ml_results = ml_service.predict_annual_batch(financial_data_batch)
                 
                 # Step 4: Bulk duplicate checking (single query)
-                company_ids = [str(company.id) for company in companies]
+                company_ids = [str(company_id) for company_id in row_company_ids]
                 existing_predictions = bulk_check_existing_annual_predictions(
                     db, company_ids, batch
                 )
@@ -400,12 +327,12 @@ def process_annual_bulk_upload_optimized(
                     else:
                         access_level = "personal"
                 
-                for i, (row, company, ml_result) in enumerate(zip(batch, companies, ml_results)):
+                for i, (row, company_id, ml_result) in enumerate(zip(batch, row_company_ids, ml_results)):
                     try:
                         # Check for duplicates
                         year = str(row['reporting_year'])
                         quarter = row.get('reporting_quarter')
-                        duplicate_key = (str(company.id), year, quarter)
+                        duplicate_key = (str(company_id), year, quarter)
                         
                         if duplicate_key in existing_predictions:
                             batch_failed += 1
@@ -418,7 +345,7 @@ def process_annual_bulk_upload_optimized(
                         # Create prediction object
                         prediction_dict = {
                             'id': uuid.uuid4(),
-                            'company_id': company.id,
+                            'company_id': company_id,
                             'organization_id': organization_id,
                             'access_level': access_level,
                             'reporting_year': year,
@@ -432,7 +359,8 @@ def process_annual_bulk_upload_optimized(
                             'risk_level': ml_result['risk_level'],
                             'confidence': safe_float(ml_result['confidence']),
                             'predicted_at': datetime.utcnow(),
-                            'created_by': user_id
+                            'created_by': user_id,
+                            'bulk_upload_job_id': job_id
                         }
                         
                         predictions_to_insert.append(prediction_dict)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Migration script adding the composite indexes behind keyset (cursor) pagination
+
+create_all only creates indexes together with their table, so databases
+created before these indexes were declared on the models never get them and
+cursor pages fall back to sorting the whole table. This creates them with
+CREATE INDEX CONCURRENTLY, so listings keep working while they build:
+
+- (sort column, id) on companies for each /companies sort order
+- (created_at, id) on both prediction tables, alone and led by access_level,
+  organization_id and created_by for the scoped listings
+- (company_id, created_at, id) on both prediction tables, for loading the
+  newest predictions of a page of companies
+- (user_id | organization_id, created_at, id) on bulk_upload_jobs
+
+An index left invalid by an interrupted concurrent build is dropped and
+built again.
+
+Usage:
+    python scripts/add_keyset_pagination_indexes.py [--dry-run]
+"""
+
+import os
+import sys
+import logging
+from pathlib import Path
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+backend_dir = Path(__file__).parent.parent
+env_path = backend_dir / '.env'
+load_dotenv(env_path)
+
+KEYSET_INDEXES = [
+    {"table": "companies", "index": "idx_company_name_id", "columns": "name, id"},
+    {"table": "companies", "index": "idx_company_symbol_id", "columns": "symbol, id"},
+    {"table": "companies", "index": "idx_company_market_cap_id", "columns": "market_cap, id"},
+    {"table": "companies", "index": "idx_company_created_at_id", "columns": "created_at, id"},
+    {"table": "annual_predictions", "index": "idx_annual_created_at_id", "columns": "created_at, id"},
+    {"table": "annual_predictions", "index": "idx_annual_company_created_at_id", "columns": "company_id, created_at, id"},
+    {"table": "annual_predictions", "index": "idx_annual_access_created_at_id", "columns": "access_level, created_at, id"},
+    {"table": "annual_predictions", "index": "idx_annual_org_created_at_id", "columns": "organization_id, created_at, id"},
+    {"table": "annual_predictions", "index": "idx_annual_creator_created_at_id", "columns": "created_by, created_at, id"},
+    {"table": "quarterly_predictions", "index": "idx_quarterly_created_at_id", "columns": "created_at, id"},
+    {"table": "quarterly_predictions", "index": "idx_quarterly_company_created_at_id", "columns": "company_id, created_at, id"},
+    {"table": "quarterly_predictions", "index": "idx_quarterly_access_created_at_id", "columns": "access_level, created_at, id"},
+    {"table": "quarterly_predictions", "index": "idx_quarterly_org_created_at_id", "columns": "organization_id, created_at, id"},
+    {"table": "quarterly_predictions", "index": "idx_quarterly_creator_created_at_id", "columns": "created_by, created_at, id"},
+    {"table": "bulk_upload_jobs", "index": "idx_bulk_job_user_created_id", "columns": "user_id, created_at, id"},
+    {"table": "bulk_upload_jobs", "index": "idx_bulk_job_org_created_id", "columns": "organization_id, created_at, id"},
+]
+
+
+def index_state(conn, index: str):
+    """None when the index is missing, otherwise whether it is valid"""
+    row = conn.execute(text("""
+        SELECT i.indisvalid FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = :index
+    """), {"index": index}).first()
+    return None if row is None else row[0]
+
+
+def add_keyset_indexes(dry_run: bool = False) -> bool:
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        logger.error("❌ DATABASE_URL not found in environment variables")
+        return False
+
+    try:
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+        engine = create_engine(database_url, isolation_level="AUTOCOMMIT")
+
+        with engine.connect() as conn:
+            for spec in KEYSET_INDEXES:
+                table, index, columns = spec["table"], spec["index"], spec["columns"]
+
+                state = index_state(conn, index)
+                status = "missing" if state is None else "ready" if state else "invalid"
+                logger.info(f"🔍 {table}: {index} ({columns}) {status}")
+
+                if dry_run or state:
+                    continue
+
+                if state is False:
+                    conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index}"))
+                    logger.info(f"🗑️  {table}: dropped invalid {index}")
+
+                conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index} ON {table} ({columns})"))
+                logger.info(f"✅ {table}: index {index} ready")
+
+            if not dry_run:
+                for table in sorted({spec["table"] for spec in KEYSET_INDEXES}):
+                    conn.execute(text(f"ANALYZE {table}"))
+                logger.info("📈 Analyzed tables for the query planner")
+
+        return True
+
+    except Exception as e:
+        logger.error(f"❌ Migration failed: {e}")
+        return False
+
+
+def main():
+    dry_run = "--dry-run" in sys.argv
+    logger.info("=" * 60)
+    logger.info("🏗️  Keyset pagination indexes" + (" (dry run)" if dry_run else ""))
+    logger.info("=" * 60)
+
+    if not add_keyset_indexes(dry_run=dry_run):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
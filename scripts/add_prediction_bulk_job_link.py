@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Migration script linking prediction rows to the bulk upload job that wrote them
+
+Adds the nullable bulk_upload_job_id foreign key (ON DELETE SET NULL) and its
+index to both prediction tables. Job result and download endpoints filter on
+this column instead of a created_at window.
+
+Rows written before the migration are then linked by the criteria those
+endpoints used to apply: a prediction belongs to a job of its type started
+by its creator when it was created between 30 seconds before the job started
+and 30 seconds after it completed (two hours after the start for jobs that
+never completed). A row matching several jobs goes to the latest started one.
+Rows that already have a link are never changed, so reruns are safe.
+
+Usage:
+    python scripts/add_prediction_bulk_job_link.py [--dry-run]
+"""
+
+import os
+import sys
+import logging
+from pathlib import Path
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+backend_dir = Path(__file__).parent.parent
+env_path = backend_dir / '.env'
+load_dotenv(env_path)
+
+JOB_LINKS = [
+    {"table": "annual_predictions", "index": "idx_annual_bulk_upload_job", "job_types": ("annual", "annual_prediction")},
+    {"table": "quarterly_predictions", "index": "idx_quarterly_bulk_upload_job", "job_types": ("quarterly", "quarterly_prediction")}
+]
+
+# Predictions of pre-migration jobs, matched by the old created_at window around each job
+LEGACY_MATCHES = """
+    SELECT DISTINCT ON (p.id) p.id AS prediction_id, j.id AS job_id
+    FROM {table} p
+    JOIN bulk_upload_jobs j
+      ON j.user_id = p.created_by
+     AND j.job_type IN ('{job_types}')
+     AND j.started_at IS NOT NULL
+     AND p.created_at >= j.started_at - INTERVAL '30 seconds'
+     AND p.created_at <= COALESCE(j.completed_at, j.started_at + INTERVAL '2 hours') + INTERVAL '30 seconds'
+    {unlinked}
+    ORDER BY p.id, j.started_at DESC
+"""
+
+
+def column_exists(conn, table: str) -> bool:
+    return conn.execute(text("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = :table AND column_name = 'bulk_upload_job_id'
+    """), {"table": table}).first() is not None
+
+
+def legacy_matches(link, column_present: bool = True) -> str:
+    return LEGACY_MATCHES.format(
+        table=link["table"],
+        job_types="', '".join(link["job_types"]),
+        unlinked="WHERE p.bulk_upload_job_id IS NULL" if column_present else ""
+    )
+
+
+def add_job_links(dry_run: bool = False) -> bool:
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        logger.error("❌ DATABASE_URL not found in environment variables")
+        return False
+
+    try:
+        engine = create_engine(database_url)
+
+        with engine.connect() as conn:
+            for link in JOB_LINKS:
+                table, index = link["table"], link["index"]
+
+                exists = column_exists(conn, table)
+                logger.info(f"🔍 {table}: bulk_upload_job_id {'already present' if exists else 'missing'}")
+
+                if dry_run:
+                    matched = conn.execute(text(f"SELECT COUNT(*) FROM ({legacy_matches(link, exists)}) m")).scalar()
+                    logger.info(f"🔍 {table}: {matched} unlinked rows match a job's time window")
+                    continue
+
+                if not exists:
+                    conn.execute(text(f"""
+                        ALTER TABLE {table}
+                        ADD COLUMN bulk_upload_job_id UUID
+                        REFERENCES bulk_upload_jobs(id) ON DELETE SET NULL
+                    """))
+                    conn.commit()
+                    logger.info(f"➕ {table}: added bulk_upload_job_id")
+
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {index} ON {table} (bulk_upload_job_id)"))
+                conn.commit()
+                logger.info(f"✅ {table}: index {index} ready")
+
+                linked = conn.execute(text(f"""
+                    UPDATE {table} p SET bulk_upload_job_id = m.job_id
+                    FROM ({legacy_matches(link)}) m
+                    WHERE p.id = m.prediction_id
+                """)).rowcount
+                conn.commit()
+                logger.info(f"🔗 {table}: linked {linked} rows written before the migration")
+
+        return True
+
+    except Exception as e:
+        logger.error(f"❌ Migration failed: {e}")
+        return False
+
+
+def main():
+    dry_run = "--dry-run" in sys.argv
+    logger.info("=" * 60)
+    logger.info("🏗️  Prediction to bulk upload job link" + (" (dry run)" if dry_run else ""))
+    logger.info("=" * 60)
+
+    if not add_job_links(dry_run=dry_run):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Migration script adding the natural-key unique indexes on prediction tables
+
+Bulk uploads and the create endpoints rely on these indexes for
+INSERT ... ON CONFLICT. A unique index cannot be built while duplicates
+exist, so each table's duplicate keys are reported first, and by default a
+table with duplicates is left without its index.
+
+With --delete-duplicates every row that is not the most recently predicted
+one for its key is copied to <table>_duplicates_backup and then deleted, in
+one transaction, before the index is built. --dry-run only reports.
+
+Usage:
+    python scripts/add_prediction_natural_keys.py [--dry-run | --delete-duplicates]
+"""
+
+import os
+import sys
+import logging
+from pathlib import Path
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+backend_dir = Path(__file__).parent.parent
+env_path = backend_dir / '.env'
+load_dotenv(env_path)
+
+NATURAL_KEYS = [
+    {
+        "table": "annual_predictions",
+        "index": "uq_annual_natural_key",
+        "key": "company_id, reporting_year, COALESCE(reporting_quarter, ''), access_level"
+    },
+    {
+        "table": "quarterly_predictions",
+        "index": "uq_quarterly_natural_key",
+        "key": "company_id, reporting_year, reporting_quarter, access_level"
+    }
+]
+
+
+def duplicate_ids_sql(table: str, key: str) -> str:
+    """Ids of every row that is not the newest one for its natural key"""
+    return f"""
+        SELECT id FROM (
+            SELECT id, ROW_NUMBER() OVER (
+                PARTITION BY {key}
+                ORDER BY predicted_at DESC NULLS LAST, created_at DESC NULLS LAST, id
+            ) AS rank
+            FROM {table}
+        ) ranked
+        WHERE rank > 1
+    """
+
+
+def report_duplicates(conn, table: str, key: str, limit: int = 10):
+    """Log the natural keys with the most rows"""
+    rows = conn.execute(text(f"""
+        SELECT {key}, COUNT(*) AS row_count FROM {table}
+        GROUP BY {key} HAVING COUNT(*) > 1
+        ORDER BY COUNT(*) DESC LIMIT :limit
+    """), {"limit": limit}).all()
+    for row in rows:
+        logger.info(f"   {tuple(str(value) for value in row[:-1])}: {row[-1]} rows")
+
+
+def add_natural_keys(dry_run: bool = False, delete_duplicates: bool = False) -> bool:
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        logger.error("❌ DATABASE_URL not found in environment variables")
+        return False
+
+    try:
+        engine = create_engine(database_url)
+
+        complete = True
+        with engine.connect() as conn:
+            for natural_key in NATURAL_KEYS:
+                table, index, key = natural_key["table"], natural_key["index"], natural_key["key"]
+
+                duplicates = conn.execute(text(f"SELECT COUNT(*) FROM ({duplicate_ids_sql(table, key)}) d")).scalar()
+                logger.info(f"🔍 {table}: {duplicates} duplicate rows on ({key})")
+                if duplicates:
+                    report_duplicates(conn, table, key)
+
+                if dry_run:
+                    continue
+
+                if duplicates and not delete_duplicates:
+                    logger.error(f"❌ {table}: index {index} not created; rerun with --delete-duplicates to remove them")
+                    complete = False
+                    continue
+
+                if duplicates:
+                    backup = f"{table}_duplicates_backup"
+                    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {backup} (LIKE {table})"))
+                    conn.execute(text(f"INSERT INTO {backup} SELECT * FROM {table} WHERE id IN ({duplicate_ids_sql(table, key)})"))
+                    conn.execute(text(f"DELETE FROM {table} WHERE id IN ({duplicate_ids_sql(table, key)})"))
+                    conn.commit()
+                    logger.info(f"🧹 {table}: moved {duplicates} duplicates to {backup}, kept the newest prediction per key")
+
+                conn.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS {index} ON {table} ({key})"))
+                conn.commit()
+                logger.info(f"✅ {table}: unique index {index} ready")
+
+        return complete
+
+    except Exception as e:
+        logger.error(f"❌ Migration failed: {e}")
+        return False
+
+
+def main():
+    dry_run = "--dry-run" in sys.argv
+    delete_duplicates = "--delete-duplicates" in sys.argv
+    if dry_run and delete_duplicates:
+        logger.error("❌ --dry-run and --delete-duplicates cannot be combined")
+        sys.exit(2)
+    logger.info("=" * 60)
+    logger.info("🏗️  Prediction natural-key constraints" + (" (dry run)" if dry_run else ""))
+    logger.info("=" * 60)
+
+    if not add_natural_keys(dry_run=dry_run, delete_duplicates=delete_duplicates):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
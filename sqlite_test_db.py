@@ -0,0 +1,26 @@
+"""
+In-memory SQLite sessions for the checks in test_*.py
+
+The models use PostgreSQL's UUID type, which SQLite cannot render; it is
+created as CHAR(32) here, the storage SQLAlchemy already converts UUID
+values to on backends without a native UUID type.
+"""
+
+from sqlalchemy import create_engine
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+
+
+@compiles(UUID, "sqlite")
+def _uuid_as_char(type_, compiler, **kw):
+    return "CHAR(32)"
+
+
+def make_session(*models):
+    """Session on a fresh in-memory database holding only the tables of ``models``"""
+    from app.core.database import Base
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[model.__table__ for model in models])
+    return sessionmaker(bind=engine)()
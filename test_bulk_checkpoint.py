@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Checks for bulk upload resume checkpoints (app/workers/bulk_checkpoint.py)
+"""
+
+import os
+import sys
+import uuid
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def failed_rows(first, last):
+    return [{'row': row, 'error': f"Row {row} failed", 'code': 'model_failed'} for row in range(first, last + 1)]
+
+
+def stored_rows(db, job_id):
+    from app.core.database import BulkUploadJobError
+
+    return [record.row_number for record in db.query(BulkUploadJobError).filter(
+        BulkUploadJobError.job_id == job_id
+    ).order_by(BulkUploadJobError.row_number.asc().nullsfirst()).all()]
+
+
+def test_checkpoint_errors_survive_resume():
+    """Every row error staged with a checkpoint is kept when a resumed run stores its own errors"""
+    from app.core.database import BulkUploadCheckpoint, BulkUploadJobError
+    from app.services.job_errors import replace_job_errors
+    from app.workers.bulk_checkpoint import checkpoint_row, load_checkpoint, stage_checkpoint
+    from sqlite_test_db import make_session
+
+    db = make_session(BulkUploadCheckpoint, BulkUploadJobError)
+    job_id = uuid.uuid4()
+
+    # Two committed batches, with more errors than a checkpoint used to keep
+    errors = failed_rows(1, 150)
+    stage_checkpoint(db, job_id, 0, 100, 0, 0, 100, errors)
+    db.commit()
+    errors += failed_rows(151, 250)
+    stage_checkpoint(db, job_id, 0, 200, 0, 0, 200, errors)
+    db.commit()
+
+    # A batch rolled back by a dying worker leaves neither its checkpoint nor its errors
+    stage_checkpoint(db, job_id, 0, 250, 0, 0, 250, errors)
+    db.rollback()
+    assert stored_rows(db, job_id) == list(range(1, 201))
+
+    # The resumed run only knows the errors of the rows after the checkpoint
+    resumed = failed_rows(201, 260) + [{'row': None, 'error': 'Model reloaded', 'code': 'job_failed'}]
+    replace_job_errors(db, job_id, resumed, after_row=checkpoint_row(load_checkpoint(db, job_id)))
+    db.commit()
+
+    assert stored_rows(db, job_id) == [None] + list(range(1, 261))
+
+
+def test_replace_without_checkpoint_replaces_part():
+    """Without a checkpoint a part's stored errors are replaced as a whole"""
+    from app.core.database import BulkUploadJobError
+    from app.services.job_errors import replace_job_errors
+    from sqlite_test_db import make_session
+
+    db = make_session(BulkUploadJobError)
+    job_id = uuid.uuid4()
+    replace_job_errors(db, job_id, failed_rows(1, 5))
+    replace_job_errors(db, job_id, failed_rows(3, 4))
+    db.commit()
+
+    assert stored_rows(db, job_id) == [3, 4]
+
+
+if __name__ == "__main__":
+    test_checkpoint_errors_survive_resume()
+    test_replace_without_checkpoint_replaces_part()
+    print("✅ Bulk checkpoint checks passed")
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Checks for natural-key upserts of prediction rows (app/workers/bulk_writer.py)
+"""
+
+import os
+import sys
+import uuid
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def annual_row(company_id, probability):
+    return {
+        'company_id': company_id, 'reporting_year': '2024', 'access_level': 'personal',
+        'probability': probability, 'risk_level': 'Low', 'confidence': 0.9
+    }
+
+
+def setup_company():
+    from app.core.database import AnnualPrediction, Company, DashboardAggregate
+    from sqlite_test_db import make_session
+
+    db = make_session(Company, AnnualPrediction, DashboardAggregate)
+    company = Company(id=uuid.uuid4(), symbol='AAPL', name='Apple Inc.', market_cap=2500000, sector='Technology')
+    db.add(company)
+    db.commit()
+    return db, company.id
+
+
+def test_annual_upsert_skips_stored_natural_key():
+    """Upserting an annual row twice keeps the first one (NULL quarter is part of the key)"""
+    from app.core.database import AnnualPrediction
+    from app.workers.bulk_writer import upsert_rows
+
+    db, company_id = setup_company()
+    first = upsert_rows(db, AnnualPrediction, [annual_row(company_id, 0.2)])
+    db.commit()
+    second = upsert_rows(db, AnnualPrediction, [annual_row(company_id, 0.8)])
+    db.commit()
+
+    assert (first.inserted, second.inserted, second.skipped) == ([0], [], [0])
+    stored = db.query(AnnualPrediction).all()
+    assert len(stored) == 1 and float(stored[0].probability) == 0.2
+
+
+def test_annual_upsert_overwrites_stored_natural_key():
+    """Under overwrite the second upsert replaces the stored prediction's values"""
+    from app.core.database import AnnualPrediction
+    from app.workers.bulk_writer import upsert_rows
+
+    db, company_id = setup_company()
+    upsert_rows(db, AnnualPrediction, [annual_row(company_id, 0.2)], policy='overwrite')
+    db.commit()
+    second = upsert_rows(db, AnnualPrediction, [annual_row(company_id, 0.8)], policy='overwrite')
+    db.commit()
+
+    assert (second.inserted, second.updated) == ([], [0])
+    assert 0 in second.replaced and float(second.replaced[0]['probability']) == 0.2
+    stored = db.query(AnnualPrediction).all()
+    assert len(stored) == 1 and float(stored[0].probability) == 0.8
+
+
+def test_natural_key_exists_before_scoring():
+    """The pre-scoring duplicate check sees a stored annual key, NULL quarter included"""
+    from app.core.database import AnnualPrediction
+    from app.workers.bulk_writer import natural_key_exists, upsert_rows
+
+    db, company_id = setup_company()
+    key = dict(company_id=company_id, reporting_year='2024', reporting_quarter=None, access_level='personal')
+    assert not natural_key_exists(db, AnnualPrediction, key)
+
+    upsert_rows(db, AnnualPrediction, [annual_row(company_id, 0.2)])
+    db.commit()
+    assert natural_key_exists(db, AnnualPrediction, key)
+    assert not natural_key_exists(db, AnnualPrediction, dict(key, access_level='organization'))
+
+
+if __name__ == "__main__":
+    test_annual_upsert_skips_stored_natural_key()
+    test_annual_upsert_overwrites_stored_natural_key()
+    test_natural_key_exists_before_scoring()
+    print("✅ Bulk writer checks passed")
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Checks for the dashboard aggregate session hooks (app/services/dashboard_aggregates.py)
+"""
+
+import os
+import sys
+import uuid
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+ORG_A = uuid.uuid4()
+ORG_B = uuid.uuid4()
+
+
+def setup_predictions():
+    """Two organization predictions on one company, with the system and both organization rows built"""
+    from app.core.database import AnnualPrediction, Company, DashboardAggregate, QuarterlyPrediction
+    from app.services.dashboard_aggregates import SYSTEM_SCOPE, dashboard_aggregates, organization_scope
+    from sqlite_test_db import make_session
+
+    db = make_session(Company, AnnualPrediction, QuarterlyPrediction, DashboardAggregate)
+    company = Company(id=uuid.uuid4(), symbol='AAPL', name='Apple Inc.', market_cap=2500000, sector='Technology')
+    db.add(company)
+    for organization_id, year in ((ORG_A, '2023'), (ORG_B, '2024')):
+        db.add(AnnualPrediction(
+            company_id=company.id, organization_id=organization_id, access_level='organization',
+            reporting_year=year, probability=0.5, risk_level='Medium', confidence=0.9
+        ))
+    db.commit()
+    dashboard_aggregates.read(db, [SYSTEM_SCOPE, organization_scope(ORG_A), organization_scope(ORG_B)])
+    return db
+
+
+def stored_scopes(db):
+    from app.core.database import DashboardAggregate
+
+    return {(row.scope_type, row.scope_id) for row in db.query(DashboardAggregate).all()}
+
+
+def test_query_delete_drops_only_matched_scopes():
+    """A query-level delete drops the aggregates its rows counted in and keeps the others"""
+    from app.core.database import AnnualPrediction
+    from app.services.dashboard_aggregates import SYSTEM_SCOPE, dashboard_aggregates, organization_scope
+
+    db = setup_predictions()
+    db.query(AnnualPrediction).filter(AnnualPrediction.organization_id == ORG_A).delete()
+    db.commit()
+
+    assert stored_scopes(db) == {organization_scope(ORG_B)}
+    assert dashboard_aggregates.read(db, [SYSTEM_SCOPE])[SYSTEM_SCOPE]["annual_count"] == 1
+
+
+def test_query_update_drops_scopes_before_and_after():
+    """A query-level update moving rows between organizations drops both organizations' aggregates"""
+    from app.core.database import AnnualPrediction
+    from app.services.dashboard_aggregates import dashboard_aggregates, organization_scope
+
+    db = setup_predictions()
+    db.query(AnnualPrediction).filter(AnnualPrediction.organization_id == ORG_A).update(
+        {AnnualPrediction.organization_id: ORG_B}, synchronize_session=False
+    )
+    db.commit()
+
+    assert stored_scopes(db) == set()
+    aggregate = dashboard_aggregates.read(db, [organization_scope(ORG_B)])[organization_scope(ORG_B)]
+    assert aggregate["annual_count"] == 2
+
+
+def test_commit_without_tracked_changes_runs_no_statements():
+    """Sessions that wrote no predictions or companies commit without a flush or an aggregate write"""
+    from sqlalchemy import event
+    from app.core.database import AnnualPrediction
+
+    db = setup_predictions()
+    db.query(AnnualPrediction).all()
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+    db.commit()
+
+    assert statements == []
+
+
+if __name__ == "__main__":
+    test_query_delete_drops_only_matched_scopes()
+    test_query_update_drops_scopes_before_and_after()
+    test_commit_without_tracked_changes_runs_no_statements()
+    print("✅ Dashboard aggregate checks passed")
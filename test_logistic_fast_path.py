@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Parity check: NumPy logistic fast path vs sklearn predict_proba on the sample workbooks in data/
+"""
+
+import glob
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Add the app directory to Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+TOLERANCE = 1e-12
+
+
+def load_workbooks(prefix: str) -> pd.DataFrame:
+    """Concatenate every data/<prefix>_part_*.xlsx workbook (backups excluded)"""
+    paths = sorted(
+        path for path in glob.glob(os.path.join(DATA_DIR, f"{prefix}_part_*.xlsx"))
+        if not path.endswith('_backup.xlsx')
+    )
+    return pd.concat([pd.read_excel(path) for path in paths], ignore_index=True)
+
+
+def test_annual_fast_path_parity():
+    """Annual model: fast path must match predict_proba on every workbook row"""
+    from app.services.ml_service import ml_model
+
+    assert ml_model.logistic_fast_path is not None, "Annual fast path was not extracted at load"
+
+    df = load_workbooks('annual_predictions')
+    binned = ml_model.bin_features(df[ml_model.RATIO_FIELDS].to_numpy(dtype=float))
+
+    fast = ml_model.logistic_fast_path.predict_proba(binned)
+    sklearn = ml_model.model.predict_proba(pd.DataFrame(binned, columns=ml_model.FEATURES))[:, 1]
+
+    max_diff = float(np.max(np.abs(fast - sklearn)))
+    print(f"📊 Annual rows: {len(df)}, max |fast - predict_proba| = {max_diff:.2e}")
+    assert max_diff < TOLERANCE
+
+
+def test_quarterly_fast_path_parity():
+    """Quarterly logistic model: fast path must match predict_proba on every workbook row"""
+    from app.services.quarterly_ml_service import quarterly_ml_model
+
+    assert quarterly_ml_model.logistic_fast_path is not None, "Quarterly fast path was not extracted at load"
+
+    df = load_workbooks('quarterly_predictions')
+    binned = quarterly_ml_model.bin_features(df[quarterly_ml_model.RATIO_FIELDS].to_numpy(dtype=float))
+
+    fast = quarterly_ml_model.logistic_fast_path.predict_proba(binned)
+    sklearn = quarterly_ml_model.logistic_model.predict_proba(
+        pd.DataFrame(binned, columns=quarterly_ml_model.BINNED_FEATURES)
+    )[:, 1]
+
+    max_diff = float(np.max(np.abs(fast - sklearn)))
+    print(f"📊 Quarterly rows: {len(df)}, max |fast - predict_proba| = {max_diff:.2e}")
+    assert max_diff < TOLERANCE
+
+
+if __name__ == "__main__":
+    print("🧪 Logistic fast path parity")
+    print("=" * 50)
+
+    test_annual_fast_path_parity()
+    test_quarterly_fast_path_parity()
+
+    print("=" * 50)
+    print("✅ Fast path matches sklearn predict_proba")
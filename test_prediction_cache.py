@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Checks for the prediction cache (app/services/prediction_cache.py)
+"""
+
+import os
+import sys
+
+import numpy as np
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def bin_edge(table) -> float:
+    """A finite upper bin edge whose rate differs from the next bin's"""
+    for idx in range(len(table.highs) - 1):
+        if np.isfinite(table.highs[idx]) and table.rates[idx] != table.rates[idx + 1]:
+            return float(table.highs[idx])
+    raise AssertionError("No bin edge with distinct rates")
+
+
+def test_values_across_a_bin_edge_are_cached_apart():
+    """Ratios a rounding step apart but in different bins get their own predictions"""
+    from app.services.ml_service import ml_model
+
+    # First ratio (long-term debt / total capital) on either side of one of its bin edges
+    edge = bin_edge(ml_model.scoring_tables[ml_model.SINGLE_VARIABLES[0]])
+    rows = np.array([[edge, 1.0, 1.0, 1.0, 1.0], [edge + 1e-9, 1.0, 1.0, 1.0, 1.0]])
+
+    ml_model.prediction_cache.reset(ml_model.prediction_cache.model_version)
+    cached = [ml_model.predict_batch(rows[[idx]])[0]['probability'] for idx in range(len(rows))]
+    expected = [result['probability'] for result in ml_model._predict_rows(rows)]
+
+    assert cached == expected
+    assert cached[0] != cached[1]
+
+
+def test_returned_entries_do_not_alias_the_cache():
+    """Changing a returned prediction leaves the cached one untouched"""
+    from app.services.prediction_cache import PredictionCache
+
+    cache = PredictionCache("test")
+    key = cache.make_key(np.array([1.5, 2.5]))
+    stored = {"probability": 0.1, "model_features": {"a": 1.0}}
+    cache.set_many({key: stored})
+    stored["model_features"]["a"] = 2.0
+    cache.get_many([key])[0]["model_features"]["a"] = 3.0
+
+    assert cache.get_many([key])[0] == {"probability": 0.1, "model_features": {"a": 1.0}}
+
+
+if __name__ == "__main__":
+    test_values_across_a_bin_edge_are_cached_apart()
+    test_returned_entries_do_not_alias_the_cache()
+    print("✅ Prediction cache checks passed")